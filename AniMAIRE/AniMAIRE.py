@@ -9,7 +9,15 @@ from .utils import get_correctly_formatted_particle_dist_list, get_kp_index, val
 from .anisotropic_MAIRE_engine.spectralCalculations.rigiditySpectrum import DLRmodelSpectrum, CommonModifiedPowerLawSpectrum, CommonModifiedPowerLawSpectrumSplit, PowerLawSpectrum
 from .anisotropic_MAIRE_engine.spectralCalculations.pitchAngleDistribution import IsotropicPitchAngleDistribution, gaussianBeeckPitchAngleDistribution, isotropicPitchAngleDistribution, gaussianPitchAngleDistribution
 from .anisotropic_MAIRE_engine.generalEngineInstance import generalEngineInstance, default_array_of_lats_and_longs
+from .anisotropic_MAIRE_engine.AsymptoticDirectionSet import AsymptoticDirectionSet
+from .anisotropic_MAIRE_engine.parallelExecutor import configure_executor
+from .anisotropic_MAIRE_engine.resourceGovernor import configure_cpu_budget
+from .anisotropic_MAIRE_engine.gridQualityPresets import get_grid_quality_preset, grid_quality_presets
+from .anisotropic_MAIRE_engine.spatialGrids import get_regular_grid_cells, get_cell_corners, subdivide_cells, get_location_keys, get_cells_to_refine, get_equal_area_array_of_lats_and_longs
+from .anisotropic_MAIRE_engine.cacheManager import get_cache_directory
+from .anisotropic_MAIRE_engine.fingerprints import memoize_by_fingerprint
 from .DoseRateFrame import DoseRateFrame
+from joblib import Memory
 import logging
 
 import datetime as dt
@@ -35,6 +43,13 @@ def run_from_spectra(
         use_OTSOpy: bool = True,
         asymp_dir_file: Optional[str] = None,
         record_full_output: bool = False,
+        integration_mode: str = "matrix",
+        asymptotic_direction_set: Optional[AsymptoticDirectionSet] = None,
+        cutoff_rigidity_bin_width_GV: Optional[float] = None,
+        dose_types: Optional[List[str]] = None,
+        grid_quality: Optional[str] = None,
+        equal_area_grid: bool = False,
+        memoize_stages: bool = True,
         **mag_cos_kwargs,
 ) -> DoseRateFrame:
     """
@@ -75,6 +90,31 @@ def run_from_spectra(
         Path to a file containing pre-calculated asymptotic directions.
     - record_full_output: bool, optional
         Whether to record full output attributes.
+    - integration_mode: str, optional
+        Either "matrix" (default) to calculate dose rates at all locations with a single product against tabulated atmospheric response kernels,
+        or "quadrature" to integrate the spectrum at each location separately.
+    - asymptotic_direction_set: AsymptoticDirectionSet, optional
+        Asymptotic directions from a previous run (available as the asymptotic_direction_set attribute of its output) to reuse,
+        skipping trajectory tracing. The date and time and Kp index default to those of the set. The set is not kept when
+        the output is pickled or cached, which only stores its fingerprint.
+    - cutoff_rigidity_bin_width_GV: float, optional
+        For isotropic fast calculations, round predicted cutoff rigidities to multiples of this width so that locations with
+        similar cutoffs share a single dose integration. By default cutoff rigidities are not rounded.
+    - dose_types: list, optional
+        The dose rate types to calculate and output, chosen from "edose", "adose", "dosee", "tn1", "tn2", "tn3", "SEU" and "SEL",
+        for example ["edose"]. Response kernels and integrations are only evaluated for these types. By default all are calculated.
+    - grid_quality: str, optional
+        One of "draft", "standard" or "precise", setting the rigidity levels, arrival directions and latitude/longitude grid spacing
+        of the asymptotic direction calculations together. Each preset in grid_quality_presets states a benchmarked bound on its
+        edose error relative to "precise". Explicitly supplied array_of_lats_and_longs, nIncrements_high, nIncrements_low and
+        array_of_zeniths_and_azimuths arguments take precedence over the preset.
+    - equal_area_grid: bool, optional
+        Whether to calculate dose rates on an equal-area HEALPix grid instead of the default latitude/longitude grid, with the
+        grid_quality preset's spacing or 5 degrees by default. An equal-area grid needs about a third fewer locations for the same
+        resolution at the equator. Cannot be combined with an explicitly supplied array_of_lats_and_longs.
+    - memoize_stages: bool, optional
+        Whether to reuse the asymptotic directions, pitch angles, weighting factors and dose integrations of earlier runs in this
+        process whose inputs are unchanged, so that, for example, a rerun with a different spectrum does not recalculate pitch angles.
     - **mag_cos_kwargs: additional keyword arguments
         Additional arguments to pass to AsympDirsCalculator.
 
@@ -93,6 +133,40 @@ def run_from_spectra(
             bool(mag_cos_kwargs)):
             raise ValueError("Error: When asymp_dir_file is provided, no additional asymptotic direction parameters, Kp_index, array_of_lats_and_longs, date_and_time, cache_magnetocosmics_run, or mag_cos_kwargs should be supplied.")
 
+    if asymptotic_direction_set is not None:
+        if (asymp_dir_file is not None or
+            use_default_9_zeniths_azimuths or
+            array_of_lats_and_longs is not default_array_of_lats_and_longs or
+            bool(mag_cos_kwargs)):
+            raise ValueError("Error: When asymptotic_direction_set is provided, asymp_dir_file, use_default_9_zeniths_azimuths, array_of_lats_and_longs and mag_cos_kwargs should not be supplied.")
+        if ((date_and_time is not None) and (asymptotic_direction_set.date_and_time is not None) and
+            ((date_and_time if date_and_time.tzinfo is not None else date_and_time.replace(tzinfo=dt.timezone.utc)) != asymptotic_direction_set.date_and_time)):
+            raise ValueError("Error: date_and_time does not match the date and time of the supplied asymptotic_direction_set.")
+        if (Kp_index is not None) and (asymptotic_direction_set.Kp_index is not None) and (Kp_index != asymptotic_direction_set.Kp_index):
+            raise ValueError("Error: Kp_index does not match the Kp index of the supplied asymptotic_direction_set.")
+        if date_and_time is None:
+            date_and_time = asymptotic_direction_set.date_and_time
+        if Kp_index is None:
+            Kp_index = asymptotic_direction_set.Kp_index
+
+    if equal_area_grid:
+        if (asymp_dir_file is not None) or (asymptotic_direction_set is not None) or (array_of_lats_and_longs is not default_array_of_lats_and_longs):
+            raise ValueError("Error: equal_area_grid cannot be used together with array_of_lats_and_longs, asymp_dir_file or asymptotic_direction_set.")
+        array_of_lats_and_longs = get_equal_area_array_of_lats_and_longs(5.0)
+
+    rigidity_levels = None
+    if grid_quality is not None:
+        if (asymp_dir_file is not None) or (asymptotic_direction_set is not None):
+            raise ValueError("Error: grid_quality cannot be used together with asymp_dir_file or asymptotic_direction_set, as no asymptotic directions are calculated.")
+        grid_quality_preset = get_grid_quality_preset(grid_quality)
+        if (array_of_lats_and_longs is default_array_of_lats_and_longs) or equal_area_grid:
+            array_of_lats_and_longs = grid_quality_preset.get_array_of_lats_and_longs(equal_area=equal_area_grid)
+        preset_kwargs = grid_quality_preset.get_asymptotic_direction_kwargs()
+        if use_default_9_zeniths_azimuths:
+            preset_kwargs.pop("array_of_zeniths_and_azimuths")
+        mag_cos_kwargs = {**preset_kwargs, **mag_cos_kwargs}
+        rigidity_levels = grid_quality_preset.get_rigidity_levels()
+
     if date_and_time is None:
         date_and_time = dt.datetime.utcnow()
 
@@ -126,7 +200,13 @@ def run_from_spectra(
                                           array_of_lats_and_longs=array_of_lats_and_longs,
                                           cache_magnetocosmics_runs=cache_asymptotic_directions,
                                           generate_NM_count_rates=generate_NM_count_rates,
-                                          asymp_dir_file=asymp_dir_file)
+                                          asymp_dir_file=asymp_dir_file,
+                                          integration_mode=integration_mode,
+                                          asymptotic_direction_set=asymptotic_direction_set,
+                                          cutoff_rigidity_bin_width_GV=cutoff_rigidity_bin_width_GV,
+                                          dose_types=dose_types,
+                                          rigidity_levels=rigidity_levels,
+                                          memoize_stages=memoize_stages)
     
     output_dose_rate_DF_data = engine_to_run.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths, record_full_output=record_full_output,  **mag_cos_kwargs)
 
@@ -137,8 +217,11 @@ def run_from_spectra(
     # Remove variables that are not direct inputs or are modified later/internal
     run_parameters.pop('mag_cos_kwargs', None) 
     run_parameters.pop('engine_to_run', None)
+    run_parameters.pop('asymptotic_direction_set', None) # Stored on the output frame instead
     run_parameters.pop('output_dose_rate_DF', None)
     run_parameters.pop('list_of_particle_distributions', None) # Added below specifically
+    for grid_quality_variable in ['grid_quality_preset', 'preset_kwargs', 'rigidity_levels']:
+        run_parameters.pop(grid_quality_variable, None) # Recoverable from grid_quality
     run_parameters.update(mag_cos_kwargs) # Add back mag_cos_kwargs flattened
 
     # Create DoseRateFrame instance
@@ -146,11 +229,144 @@ def run_from_spectra(
         data=output_dose_rate_DF_data,
         timestamp=date_and_time,
         particle_distributions=list_of_particle_distributions,
-        run_parameters=run_parameters
+        run_parameters=run_parameters,
+        asymptotic_direction_set=engine_to_run.asymptotic_direction_set
     )
 
     return output_dose_rate_DF
 
+# Cached runs of normalised spectrum components, which are scaled and summed to give the dose rates of any normalisation and weights
+run_from_spectra_cached = memoize_by_fingerprint(Memory(get_cache_directory("event"), verbose=0), "event")(run_from_spectra)
+
+# Cached component runs without a date and time are all run for one reference time, which is renewed once it is this old
+linear_component_reference_time_resolution = dt.timedelta(minutes=15)
+_linear_component_reference_time = None
+
+def get_linear_component_reference_time() -> dt.datetime:
+    """
+    Get the date and time that cached component runs without a date and time are run for.
+
+    The first call takes the current time, to the nearest second, and later calls reuse it until it is older than
+    linear_component_reference_time_resolution, so that a sweep over spectrum normalisations reuses the same component runs.
+
+    Returns:
+    - dt.datetime
+        The reference date and time, in UTC.
+    """
+    global _linear_component_reference_time
+    current_time = dt.datetime.now(dt.timezone.utc)
+    if (_linear_component_reference_time is None) or (current_time - _linear_component_reference_time >= linear_component_reference_time_resolution):
+        _linear_component_reference_time = current_time.replace(microsecond=0)
+    return _linear_component_reference_time
+
+def run_linear_components(component_kwargs: List[dict], weights: List[float], cache_components: bool = True, **kwargs) -> DoseRateFrame:
+    """
+    Calculate the dose rates of a spectrum that is a weighted sum of component spectra from the dose rates of each component.
+
+    Components with a weight of zero are not run. With cache_components, each component is cached on its own, so runs that
+    differ only in their weights, such as the normalisations of a parameter sweep or of consecutive event timestamps,
+    reuse the same component runs. Cached components without a date and time are run for get_linear_component_reference_time(),
+    rather than the time of each run.
+
+    Parameters:
+    - component_kwargs: list[dict]
+        The run_from_spectra arguments that differ between components, such as proton_rigidity_spectrum and proton_pitch_angle_distribution.
+    - weights: list[float]
+        The weight of each component.
+    - cache_components: bool, optional
+        Whether to cache the dose rates of each component.
+    - **kwargs: additional keyword arguments
+        Arguments to pass to run_from_spectra for every component.
+
+    Returns:
+    - output_dose_rate_DF: DoseRateFrame
+        The weighted sum of the dose rates of the components.
+    """
+    if cache_components and (kwargs.get("date_and_time") is None) and (kwargs.get("asymp_dir_file") is None) and (kwargs.get("asymptotic_direction_set") is None):
+        # the date and time would otherwise default to the time of each run, giving every run a new cache key
+        kwargs["date_and_time"] = get_linear_component_reference_time()
+    run_component = run_from_spectra_cached if cache_components else run_from_spectra
+
+    nonzero_components = [(component, weight) for component, weight in zip(component_kwargs, weights) if weight != 0.0] or [(component_kwargs[0], 0.0)]
+    component_dose_rates = [run_component(**kwargs, **component) for component, _ in nonzero_components]
+    return DoseRateFrame.from_linear_combination(component_dose_rates, [weight for _, weight in nonzero_components])
+
+def run_from_spectra_with_adaptive_grid(
+        initial_grid_spacing_degrees: float = 10.0,
+        minimum_cell_size_degrees: float = 1.25,
+        refinement_tolerance: float = 0.05,
+        refinement_dose_type: str = "edose",
+        **kwargs,
+) -> DoseRateFrame:
+    """
+    Calculate dose rates on a grid that is only refined where the dose rate map has sharp structure.
+
+    Dose rates are first calculated at the corners of square cells of side initial_grid_spacing_degrees covering the globe.
+    Each cell whose refinement_dose_type dose rate varies across its corners by more than refinement_tolerance times the largest
+    dose rate at that altitude is split into four, and dose rates are calculated at the new corners. This repeats until no
+    cells need refining or cells reach minimum_cell_size_degrees. Only the new locations are traced at each step.
+
+    Parameters:
+    - initial_grid_spacing_degrees: float, optional
+        The side length in degrees of the starting cells. 180 must be a whole multiple of it.
+    - minimum_cell_size_degrees: float, optional
+        The smallest cell side length in degrees.
+    - refinement_tolerance: float, optional
+        The largest allowed variation in dose rate across a cell, as a fraction of the largest dose rate at the same altitude.
+    - refinement_dose_type: str, optional
+        The dose rate type used to decide which cells to refine.
+    - **kwargs: additional keyword arguments
+        Additional arguments to pass to run_from_spectra. array_of_lats_and_longs, asymp_dir_file and asymptotic_direction_set cannot be supplied.
+
+    Returns:
+    - output_dose_rate_DF: DoseRateFrame
+        DoseRateFrame containing the dose rates at every calculated location, which form an irregular grid. Its
+        asymptotic_direction_set is None, as the directions are calculated over several runs.
+    """
+    if any(key in kwargs for key in ["array_of_lats_and_longs", "asymp_dir_file", "asymptotic_direction_set"]):
+        raise ValueError("Error: array_of_lats_and_longs, asymp_dir_file and asymptotic_direction_set cannot be supplied for adaptive grid runs.")
+    if minimum_cell_size_degrees <= 0.0:
+        raise ValueError("Error: minimum_cell_size_degrees must be positive.")
+
+    # every run must use the same time, rather than each defaulting to the current time
+    if kwargs.get("date_and_time") is None:
+        kwargs["date_and_time"] = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+
+    cells = get_regular_grid_cells(initial_grid_spacing_degrees)
+    dose_rate_frames = []
+    calculated_location_keys = get_location_keys(np.empty((0, 2)))
+    dose_rates_at_locations = None
+    while len(cells) > 0:
+        corners = np.unique(get_cell_corners(cells).reshape(-1, 2), axis=0)
+        new_locations = corners[~get_location_keys(corners).isin(calculated_location_keys)]
+        if len(new_locations) > 0:
+            dose_rate_frames.append(run_from_spectra(array_of_lats_and_longs=new_locations, **kwargs))
+            calculated_location_keys = calculated_location_keys.append(get_location_keys(new_locations))
+
+            all_dose_rates = pd.concat(dose_rate_frames, ignore_index=True)
+            location_keys = get_location_keys(all_dose_rates[["latitude", "longitude"]].to_numpy())
+            dose_rates_at_locations = pd.DataFrame({"latitude": location_keys.get_level_values(0),
+                                                    "longitude": location_keys.get_level_values(1),
+                                                    "altitude (km)": all_dose_rates["altitude (km)"].to_numpy(),
+                                                    "dose rate": all_dose_rates[refinement_dose_type].to_numpy()}
+                                                   ).pivot_table(index=["latitude", "longitude"], columns="altitude (km)", values="dose rate", aggfunc="first")
+
+        cells = subdivide_cells(cells[get_cells_to_refine(cells, dose_rates_at_locations, refinement_tolerance, minimum_cell_size_degrees)])
+
+    run_parameters = {**dose_rate_frames[0].run_parameters,
+                      "array_of_lats_and_longs": np.asarray(list(calculated_location_keys)),
+                      "initial_grid_spacing_degrees": initial_grid_spacing_degrees,
+                      "minimum_cell_size_degrees": minimum_cell_size_degrees,
+                      "refinement_tolerance": refinement_tolerance,
+                      "refinement_dose_type": refinement_dose_type}
+
+    return DoseRateFrame(
+        data=pd.concat(dose_rate_frames, ignore_index=True).sort_values(["latitude", "longitude", "altitude (km)"], ignore_index=True),
+        timestamp=dose_rate_frames[0].timestamp,
+        particle_distributions=dose_rate_frames[0].particle_distributions,
+        run_parameters=run_parameters,
+    )
+
 def run_from_power_law_gaussian_distribution(
         J0: float, gamma: float, deltaGamma: float, sigma: float, 
         reference_pitch_angle_latitude: float, reference_pitch_angle_longitude: float, 
@@ -200,6 +416,28 @@ def run_from_power_law_gaussian_distribution(
         **kwargs,
     )
 
+def get_double_power_law_spectrum(J0: float, gamma: float, deltaGamma: float, use_split_spectrum: bool = False) -> Callable[[float], float]:
+    """
+    Get the rigidity spectrum used by run_from_double_power_law_gaussian_distribution.
+
+    Parameters:
+    - J0: float
+        Normalization factor for the spectrum.
+    - gamma: float
+        Spectral index.
+    - deltaGamma: float
+        Change in spectral index.
+    - use_split_spectrum: bool, optional
+        Whether to use a split spectrum.
+
+    Returns:
+    - Callable[[float], float]
+        The rigidity spectrum.
+    """
+    if use_split_spectrum:
+        return CommonModifiedPowerLawSpectrumSplit(J0, gamma, deltaGamma)
+    return CommonModifiedPowerLawSpectrum(J0, gamma, deltaGamma, lowerLimit=0.814529, upperLimit=21.084584)
+
 def run_from_double_power_law_gaussian_distribution(
         J0: float, gamma: float, deltaGamma: float, sigma_1: float, sigma_2: float,
         B: float, alpha_prime: float,
@@ -207,6 +445,8 @@ def run_from_double_power_law_gaussian_distribution(
         Kp_index: Optional[int] = None, date_and_time: Optional[dt.datetime] = None,
         use_split_spectrum: bool = False,
         asymp_dir_file: Optional[str] = None,
+        use_linear_components: bool = False,
+        cache_components: bool = True,
         **kwargs
 ) -> DoseRateFrame:
     """
@@ -237,6 +477,12 @@ def run_from_double_power_law_gaussian_distribution(
         Date and time for the simulation.
     - use_split_spectrum: bool, optional
         Whether to use a split spectrum.
+    - use_linear_components: bool, optional
+        Whether to calculate the dose rates as J0 * (D1 + B * D2), where D1 and D2 are the dose rates of a spectrum with J0 = 1
+        and each of the two Gaussian pitch angle distributions on their own. Dose rates are linear in J0 and B, so this gives
+        the same result, and with cache_components runs that differ only in J0 and B reuse the same two component runs.
+    - cache_components: bool, optional
+        Whether to cache the component runs when use_linear_components is True.
     - **kwargs: additional keyword arguments
         Additional arguments to pass to run_from_spectra.
 
@@ -244,7 +490,31 @@ def run_from_double_power_law_gaussian_distribution(
     - output_dose_rate_DF: DoseRateFrame
         DataFrame containing the calculated dose rates.
     """
-    spec_to_use = CommonModifiedPowerLawSpectrumSplit if use_split_spectrum else lambda J0,gamma,deltaGamma:CommonModifiedPowerLawSpectrum(J0,gamma,deltaGamma, lowerLimit=0.814529,upperLimit=21.084584)
+    spec_to_use = lambda J0,gamma,deltaGamma:get_double_power_law_spectrum(J0,gamma,deltaGamma,use_split_spectrum)
+
+    if use_linear_components:
+        output_dose_rate_DF = run_linear_components(
+            [{"proton_pitch_angle_distribution": gaussianPitchAngleDistribution(normFactor=1,sigma=sigma_1)},
+             {"proton_pitch_angle_distribution": gaussianPitchAngleDistribution(normFactor=1,sigma=sigma_2,alpha=alpha_prime)}],
+            [J0, J0 * B],
+            cache_components=cache_components,
+            proton_rigidity_spectrum=spec_to_use(1.0, gamma, deltaGamma),
+            reference_pitch_angle_latitude=reference_pitch_angle_latitude,
+            reference_pitch_angle_longitude=reference_pitch_angle_longitude,
+            Kp_index=Kp_index,date_and_time=date_and_time,
+            asymp_dir_file=asymp_dir_file,
+            **kwargs,
+        )
+        proton_rigidity_spectrum = spec_to_use(J0, gamma, deltaGamma)
+        proton_pitch_angle_distribution = gaussianPitchAngleDistribution(normFactor=1,sigma=sigma_1) + (B * gaussianPitchAngleDistribution(normFactor=1,sigma=sigma_2,alpha=alpha_prime))
+        output_dose_rate_DF.particle_distributions = get_correctly_formatted_particle_dist_list(proton_rigidity_spectrum, None,
+                                                                                               reference_pitch_angle_latitude, reference_pitch_angle_longitude,
+                                                                                               proton_pitch_angle_distribution, isotropicPitchAngleDistribution())
+        output_dose_rate_DF.run_parameters = {**(output_dose_rate_DF.run_parameters or {}),
+                                              "proton_rigidity_spectrum": proton_rigidity_spectrum,
+                                              "proton_pitch_angle_distribution": proton_pitch_angle_distribution,
+                                              "linear_components": {"J0": J0, "B": B}}
+        return output_dose_rate_DF
 
     return run_from_spectra(
         proton_rigidity_spectrum=spec_to_use(J0, gamma, deltaGamma),
@@ -362,6 +632,8 @@ def run_maireplus_spectrum(
     neutron_monitor_2_location: Tuple[float, float, float] = (50.0, 5.0, 0.0),
     normalisation_monitor_location: Tuple[float, float, float] = (65.0, 25.0, 0.0),
     use_fast_calculation: bool = True,
+    use_linear_components: bool = False,
+    cache_components: bool = True,
     **kwargs: Any
 ) -> DoseRateFrame:
     """
@@ -391,6 +663,12 @@ def run_maireplus_spectrum(
         List of [latitude, longitude] pairs for calculation
     use_fast_calculation : bool
         Whether to use fast calculation mode for pitch angle distribution
+    use_linear_components : bool
+        Whether to calculate the GLE dose rates from a power law spectrum with a normalisation of 1, scaled by the
+        normalisation factor of the MAIREPLUS spectrum, so that timestamps with the same spectral index reuse the same run.
+        The output still records the MAIREPLUS spectrum, with the normalisation factor in run_parameters["linear_components"]
+    cache_components : bool
+        Whether to cache the unit normalisation run when use_linear_components is True
     **kwargs : dict
         Additional arguments to pass to AniMAIRE.run_from_spectra
         
@@ -436,14 +714,33 @@ def run_maireplus_spectrum(
     )
     
     # Run AniMAIRE with the spectrum
-    GLE_dose_rate_frame = run_from_spectra(
-        spectrum,
-        proton_pitch_angle_distribution=IsotropicPitchAngleDistribution(use_fast_calculation=use_fast_calculation),
-        date_and_time=datetime,
-        Kp_index=kp_index,
-        #array_of_lats_and_longs=array_of_lats_and_longs,
-        **kwargs
-    )
+    if use_linear_components:
+        proton_pitch_angle_distribution = IsotropicPitchAngleDistribution(use_fast_calculation=use_fast_calculation)
+        GLE_dose_rate_frame = run_linear_components(
+            [{"proton_rigidity_spectrum": PowerLawSpectrum(1.0, -spectrum.MAIREPLUS_spectral_index)}],
+            [spectrum.normalisation_factor],
+            cache_components=cache_components,
+            proton_pitch_angle_distribution=proton_pitch_angle_distribution,
+            date_and_time=datetime,
+            Kp_index=kp_index,
+            **kwargs
+        )
+        GLE_dose_rate_frame.particle_distributions = get_correctly_formatted_particle_dist_list(spectrum, None,
+                                                                                               kwargs.get("reference_pitch_angle_latitude", 0.0),
+                                                                                               kwargs.get("reference_pitch_angle_longitude", 45.0),
+                                                                                               proton_pitch_angle_distribution, isotropicPitchAngleDistribution())
+        GLE_dose_rate_frame.run_parameters = {**(GLE_dose_rate_frame.run_parameters or {}),
+                                              "proton_rigidity_spectrum": spectrum,
+                                              "linear_components": {"normalisation_factor": spectrum.normalisation_factor}}
+    else:
+        GLE_dose_rate_frame = run_from_spectra(
+            spectrum,
+            proton_pitch_angle_distribution=IsotropicPitchAngleDistribution(use_fast_calculation=use_fast_calculation),
+            date_and_time=datetime,
+            Kp_index=kp_index,
+            #array_of_lats_and_longs=array_of_lats_and_longs,
+            **kwargs
+        )
 
     return GLE_dose_rate_frame + GCR_dose_rate_frame
 
@@ -7,7 +7,7 @@ pitch-angle distributions of cosmic rays.
 """
 
 # Import necessary libraries
-from AniMAIRE.AniMAIRE import run_from_double_power_law_gaussian_distribution
+from AniMAIRE.AniMAIRE import run_from_double_power_law_gaussian_distribution, get_double_power_law_spectrum
 from AniMAIRE.DoseRateFrame import DoseRateFrame
 from AniMAIRE.dose_plotting import create_gle_globe_animation, create_gle_map_animation, plot_dose_map, plot_on_spherical_globe
 import pandas as pd
@@ -17,6 +17,8 @@ from scipy.spatial import cKDTree
 import datetime as dt
 from tqdm.auto import tqdm  # Progress bar for long-running operations
 from joblib import Memory  # For caching computation results
+from AniMAIRE.anisotropic_MAIRE_engine.cacheManager import get_cache_directory
+from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import memoize_by_fingerprint
 from typing import Union, Sequence, Optional, Dict, Any, Tuple, List
 
 import math
@@ -28,9 +30,83 @@ from IPython.display import HTML
 import netCDF4  # For exporting data to NetCDF format
 
 import copy
+from dataclasses import dataclass, field
 
 # Set up caching to avoid recomputing expensive operations
-memory = Memory(location='./.AniMAIRE_event_cache')
+memory = Memory(location=get_cache_directory("event"))
+
+class AltitudeLayerInterpolator:
+    """
+    Linear interpolator for dose rates on irregular latitude/longitude grids, such as equal-area grids, calculated at a shared set of altitudes.
+
+    Each altitude is interpolated in latitude and longitude separately, with locations near longitude 0 repeated a full turn
+    either side so that interpolation wraps around the globe, and the results are interpolated linearly in altitude.
+    If there are no locations at a pole, the pole is given the mean value of the locations closest to it.
+    """
+
+    longitude_wrap_margin = 30.0
+
+    def __init__(self, points: np.ndarray, values: np.ndarray) -> None:
+        """
+        Initialize the interpolator.
+
+        Args:
+            points (np.ndarray): Array of shape (N, 3) of [latitude, longitude, altitude] points
+            values (np.ndarray): Array of shape (N,) of values at the points
+        """
+        points, values = np.asarray(points, dtype=float), np.asarray(values, dtype=float)
+        latitudes, longitudes = points[:, 0], points[:, 1] % 360.0
+        self.altitudes = np.unique(points[:, 2])
+        self.layer_interpolators = []
+        for altitude in self.altitudes:
+            in_layer = points[:, 2] == altitude
+            near_east_edge = in_layer & (longitudes > 360.0 - self.longitude_wrap_margin)
+            near_west_edge = in_layer & (longitudes < self.longitude_wrap_margin)
+            layer_points = np.concatenate([np.column_stack([latitudes[in_layer], longitudes[in_layer]]),
+                                           np.column_stack([latitudes[near_east_edge], longitudes[near_east_edge] - 360.0]),
+                                           np.column_stack([latitudes[near_west_edge], longitudes[near_west_edge] + 360.0])])
+            layer_values = np.concatenate([values[in_layer], values[near_east_edge], values[near_west_edge]])
+            for pole_latitude in [-90.0, 90.0]:
+                if not np.any(layer_points[:, 0] == pole_latitude):
+                    closest_latitude = layer_points[np.argmin(np.abs(layer_points[:, 0] - pole_latitude)), 0]
+                    pole_longitudes = np.linspace(-self.longitude_wrap_margin, 360.0 + self.longitude_wrap_margin, 15)
+                    layer_points = np.concatenate([layer_points, np.column_stack([np.full(len(pole_longitudes), pole_latitude), pole_longitudes])])
+                    layer_values = np.concatenate([layer_values, np.full(len(pole_longitudes), np.mean(layer_values[layer_points[:len(layer_values), 0] == closest_latitude]))])
+            self.layer_interpolators.append((LinearNDInterpolator(layer_points, layer_values, fill_value=np.nan),
+                                             NearestNDInterpolator(layer_points, layer_values)))
+
+    def _interpolate_layer(self, layer_index: int, latitudes_and_longitudes: np.ndarray) -> np.ndarray:
+        linear_interpolator, nearest_interpolator = self.layer_interpolators[layer_index]
+        layer_values = linear_interpolator(latitudes_and_longitudes)
+        outside_locations = np.isnan(layer_values)
+        layer_values[outside_locations] = nearest_interpolator(latitudes_and_longitudes[outside_locations])
+        return layer_values
+
+    def __call__(self, xi: Sequence) -> np.ndarray:
+        """
+        Interpolate values at one or more [latitude, longitude, altitude] points.
+
+        Args:
+            xi (Sequence): A point or an array of shape (M, 3) of points
+
+        Returns:
+            np.ndarray: Array of shape (M,) of interpolated values, NaN for altitudes outside the calculated range
+        """
+        xi = np.asarray(xi, dtype=float).reshape(-1, 3)
+        latitudes_and_longitudes = np.column_stack([xi[:, 0], xi[:, 1] % 360.0])
+        interpolated_values = np.full(len(xi), np.nan)
+        upper_layer_indices = np.clip(np.searchsorted(self.altitudes, xi[:, 2]), 1, max(1, len(self.altitudes) - 1))
+        within_altitude_range = (xi[:, 2] >= self.altitudes[0]) & (xi[:, 2] <= self.altitudes[-1])
+        for upper_layer_index in np.unique(upper_layer_indices[within_altitude_range]):
+            at_points = within_altitude_range & (upper_layer_indices == upper_layer_index)
+            if len(self.altitudes) == 1:
+                interpolated_values[at_points] = self._interpolate_layer(0, latitudes_and_longitudes[at_points])
+                continue
+            lower_altitude, upper_altitude = self.altitudes[upper_layer_index - 1], self.altitudes[upper_layer_index]
+            upper_weights = (xi[at_points, 2] - lower_altitude) / (upper_altitude - lower_altitude)
+            interpolated_values[at_points] = (((1.0 - upper_weights) * self._interpolate_layer(upper_layer_index - 1, latitudes_and_longitudes[at_points])) +
+                                              (upper_weights * self._interpolate_layer(upper_layer_index, latitudes_and_longitudes[at_points])))
+        return interpolated_values
 
 class BaseAniMAIREEvent:
     """
@@ -165,6 +241,11 @@ class BaseAniMAIREEvent:
             points = data[['latitude', 'longitude', 'altitude (km)']].values
             values = data[dose_type].values
             
+            locations_per_altitude = data.groupby('altitude (km)').size()
+            if (interpolation_method in ['linear', 'slinear']) and (locations_per_altitude >= 3).all() and (locations_per_altitude.nunique() == 1):
+                # locations on an irregular grid, such as an equal-area grid, that share the same altitudes
+                return AltitudeLayerInterpolator(points, values)
+
             if interpolation_method == 'nearest':
                 return NearestNDInterpolator(points, values)
             elif interpolation_method in ['linear', 'slinear']:
@@ -1370,6 +1451,118 @@ class BaseAniMAIREEvent:
         """
         self._interpolator_cache.clear()
 
+@dataclass(frozen=True)
+class ParameterQuantizationPolicy:
+    """
+    Policy for mapping nearly identical spectrum parameter sets onto the same cached AniMAIRE run.
+
+    Each parameter with a relative tolerance is rounded to the nearest value on a logarithmic ladder whose neighbouring
+    values differ by that fraction, so parameters that differ by much less than the tolerance usually share a cache
+    entry and the rounding changes a parameter by at most about half the tolerance. The reference pitch angle latitude
+    and longitude are angles rather than scales, so they are instead rounded to multiples of an absolute tolerance in
+    degrees, after wrapping the longitude into [0, 360) so that equivalent longitudes such as -1 and 359 round alike.
+    Parameters without a tolerance are used exactly. As dose rates are proportional to J0, J0 is not rounded: when
+    rescale_J0 is True, runs are calculated for J0 = 1 and the dose rates and recorded spectrum rescaled to J0 exactly,
+    so spectra that differ only in J0 share one cache entry.
+
+    The date and time of each spectrum sets the magnetospheric conditions and is part of every cache key, so consecutive
+    timestamps only share cache entries if time_resolution is set, rounding each date and time to a multiple of it.
+
+    Attributes:
+        relative_tolerances (Dict[str, float]): Relative tolerance of each quantized parameter, out of "gamma", "deltaGamma",
+                                                "sigma_1", "sigma_2", "B" and "alpha_prime"
+        angle_tolerances_degrees (Dict[str, float]): Absolute tolerance in degrees of each quantized reference direction angle,
+                                                     out of "reference_pitch_angle_latitude" and "reference_pitch_angle_longitude"
+        rescale_J0 (bool): Whether to calculate runs for J0 = 1 and rescale the dose rates by J0
+        time_resolution (Optional[dt.timedelta]): Resolution to round the date and time of each run to, or None to use it exactly
+    """
+    relative_tolerances: Dict[str, float] = field(default_factory=lambda: {"gamma": 1e-3, "deltaGamma": 1e-3, "sigma_1": 1e-3,
+                                                                           "sigma_2": 1e-3, "B": 1e-3, "alpha_prime": 1e-3})
+    rescale_J0: bool = True
+    time_resolution: Optional[dt.timedelta] = None
+    angle_tolerances_degrees: Dict[str, float] = field(default_factory=dict)
+
+    quantizable_parameter_names = ("gamma", "deltaGamma", "sigma_1", "sigma_2", "B", "alpha_prime")
+    quantizable_angle_names = ("reference_pitch_angle_latitude", "reference_pitch_angle_longitude")
+
+    def __post_init__(self) -> None:
+        unknown_parameter_names = set(self.relative_tolerances) - set(self.quantizable_parameter_names)
+        if unknown_parameter_names:
+            raise ValueError(f"Error: relative tolerances can only be set for {list(self.quantizable_parameter_names)}, not {sorted(unknown_parameter_names)}.")
+        if any(tolerance <= 0.0 for tolerance in self.relative_tolerances.values()):
+            raise ValueError("Error: relative tolerances must be positive.")
+        unknown_angle_names = set(self.angle_tolerances_degrees) - set(self.quantizable_angle_names)
+        if unknown_angle_names:
+            raise ValueError(f"Error: angle tolerances can only be set for {list(self.quantizable_angle_names)}, not {sorted(unknown_angle_names)}.")
+        if any(tolerance <= 0.0 for tolerance in self.angle_tolerances_degrees.values()):
+            raise ValueError("Error: angle tolerances must be positive.")
+
+    @staticmethod
+    def quantize_value(value: float, relative_tolerance: float) -> float:
+        """
+        Round a value to the nearest value on a logarithmic ladder with steps of the relative tolerance.
+
+        Args:
+            value (float): The value to round
+            relative_tolerance (float): The fractional difference between neighbouring values of the ladder
+
+        Returns:
+            float: The rounded value, which has the same sign as the value and is zero for a value of zero
+        """
+        if value == 0.0:
+            return 0.0
+        log_step = math.log1p(relative_tolerance)
+        return math.copysign(math.exp(round(math.log(abs(value)) / log_step) * log_step), value)
+
+    @staticmethod
+    def quantize_angle(angle_name: str, value: float, tolerance_degrees: float) -> float:
+        """
+        Round a reference direction angle to the nearest multiple of an absolute tolerance.
+
+        Args:
+            angle_name (str): "reference_pitch_angle_latitude" or "reference_pitch_angle_longitude"
+            value (float): The angle in degrees
+            tolerance_degrees (float): The spacing in degrees of the values the angle is rounded to
+
+        Returns:
+            float: The rounded angle, with longitudes in [0, 360) and latitudes in [-90, 90]
+        """
+        if angle_name == "reference_pitch_angle_longitude":
+            return (round((value % 360.0) / tolerance_degrees) * tolerance_degrees) % 360.0
+        return min(90.0, max(-90.0, round(value / tolerance_degrees) * tolerance_degrees))
+
+    def quantize(self, spectrum_parameters: Dict[str, float]) -> Tuple[Dict[str, float], float, Dict[str, Any]]:
+        """
+        Quantize a set of spectrum parameters.
+
+        Args:
+            spectrum_parameters (Dict[str, float]): The spectrum parameters, including J0 and date_and_time
+
+        Returns:
+            Tuple[Dict[str, float], float, Dict[str, Any]]: The parameters to run AniMAIRE with, the factor to multiply
+                                                            the resulting dose rates by, and a record of the quantization
+        """
+        quantized_parameters = {name: (self.quantize_value(float(value), self.relative_tolerances[name]) if name in self.relative_tolerances else value)
+                                for name, value in spectrum_parameters.items()}
+        for angle_name, tolerance_degrees in self.angle_tolerances_degrees.items():
+            if angle_name in spectrum_parameters:
+                quantized_parameters[angle_name] = self.quantize_angle(angle_name, float(spectrum_parameters[angle_name]), tolerance_degrees)
+        quantized_parameter_names = list(self.relative_tolerances) + list(self.angle_tolerances_degrees)
+        if self.time_resolution is not None:
+            quantized_parameters["date_and_time"] = pd.Timestamp(spectrum_parameters["date_and_time"]).round(pd.Timedelta(self.time_resolution))
+            quantized_parameter_names.append("date_and_time")
+        dose_rate_scale_factor = 1.0
+        if self.rescale_J0:
+            dose_rate_scale_factor = float(spectrum_parameters["J0"])
+            quantized_parameters["J0"] = 1.0
+        quantization_record = {"relative_tolerances": dict(self.relative_tolerances),
+                               "angle_tolerances_degrees": dict(self.angle_tolerances_degrees),
+                               "time_resolution": self.time_resolution,
+                               "requested_parameters": {name: spectrum_parameters[name] for name in quantized_parameter_names if name in spectrum_parameters},
+                               "quantized_parameters": {name: quantized_parameters[name] for name in quantized_parameter_names if name in quantized_parameters},
+                               "J0_rescale_factor": dose_rate_scale_factor if self.rescale_J0 else None}
+        return quantized_parameters, dose_rate_scale_factor, quantization_record
+
 class DoublePowerLawGaussianEvent(BaseAniMAIREEvent):
     """
     Event class for modeling solar particle events using double power-law rigidity spectrum and Gaussian pitch-angle distribution.
@@ -1464,6 +1657,7 @@ class DoublePowerLawGaussianEvent(BaseAniMAIREEvent):
         return self.spectra
     
     def run_AniMAIRE(self, n_timestamps: Optional[int] = None, use_cache: bool = True, 
+                    quantization_policy: Optional[ParameterQuantizationPolicy] = None,
                     **kwargs: Any) -> Dict[dt.datetime, DoseRateFrame]:
         """
         Run AniMAIRE simulation for each timestamp in the spectral data.
@@ -1476,6 +1670,10 @@ class DoublePowerLawGaussianEvent(BaseAniMAIREEvent):
                                                    Useful for testing. Defaults to None (all timestamps).
             use_cache (bool, optional): Whether to use cached results for identical parameter sets. 
                                        Defaults to True.
+            quantization_policy (Optional[ParameterQuantizationPolicy], optional): Policy for rounding spectrum parameters
+                                       so that nearly identical spectra share cached runs, and for rescaling runs by J0.
+                                       The quantization is recorded under "parameter_quantization" in the run_parameters
+                                       of each dose rate frame. Defaults to None (parameters are used exactly).
             **kwargs: Additional keyword arguments passed to run_from_double_power_law_gaussian_distribution
             
         Returns:
@@ -1503,40 +1701,28 @@ class DoublePowerLawGaussianEvent(BaseAniMAIREEvent):
             if 'KpIndex' in spectrum:
                 kp_kwargs['Kp_index'] = spectrum['KpIndex']
             
-            if use_cache:
-                # Use cached function to avoid recomputing identical parameter sets
-                output_dose_rate = run_animaire_cached(
-                    J0=spectrum['J0'],
-                    gamma=spectrum['gamma'],
-                    deltaGamma=spectrum['deltaGamma'],
-                    sigma_1=spectrum['sigma_1'],
-                    sigma_2=spectrum['sigma_2'],
-                    B=spectrum['B'],
-                    alpha_prime=spectrum['alpha_prime'],
-                    reference_pitch_angle_latitude=spectrum['reference_pitch_angle_latitude'],
-                    reference_pitch_angle_longitude=spectrum['reference_pitch_angle_longitude'],
-                    date_and_time=spectrum['datetime'],
-                    use_split_spectrum=True,
-                    **kp_kwargs,
-                    **kwargs
-                )
-            else:
-                # Use the function directly without caching
-                output_dose_rate = run_from_double_power_law_gaussian_distribution(
-                    J0=spectrum['J0'],
-                    gamma=spectrum['gamma'],
-                    deltaGamma=spectrum['deltaGamma'],
-                    sigma_1=spectrum['sigma_1'],
-                    sigma_2=spectrum['sigma_2'],
-                    B=spectrum['B'],
-                    alpha_prime=spectrum['alpha_prime'],
-                    reference_pitch_angle_latitude=spectrum['reference_pitch_angle_latitude'],
-                    reference_pitch_angle_longitude=spectrum['reference_pitch_angle_longitude'],
-                    date_and_time=spectrum['datetime'],
-                    use_split_spectrum=True,
-                    **kp_kwargs,
-                    **kwargs
-                )
+            spectrum_parameters = {parameter_name: spectrum[parameter_name] for parameter_name in
+                                   ['J0', 'gamma', 'deltaGamma', 'sigma_1', 'sigma_2', 'B', 'alpha_prime',
+                                    'reference_pitch_angle_latitude', 'reference_pitch_angle_longitude']}
+            spectrum_parameters['date_and_time'] = spectrum['datetime']
+            dose_rate_scale_factor = 1.0
+            if quantization_policy is not None:
+                spectrum_parameters, dose_rate_scale_factor, quantization_record = quantization_policy.quantize(spectrum_parameters)
+
+            # Use the cached function to avoid recomputing identical parameter sets, or the function directly without caching
+            run_function = run_animaire_cached if use_cache else run_from_double_power_law_gaussian_distribution
+            output_dose_rate = run_function(
+                **spectrum_parameters,
+                use_split_spectrum=True,
+                **kp_kwargs,
+                **kwargs
+            )
+
+            if quantization_policy is not None:
+                output_dose_rate = (rescale_dose_rate_frame_by_J0(output_dose_rate, dose_rate_scale_factor, spectrum_parameters['gamma'],
+                                                                  spectrum_parameters['deltaGamma'], use_split_spectrum=True)
+                                    if quantization_policy.rescale_J0 else output_dose_rate.copy())
+                output_dose_rate.run_parameters = {**(output_dose_rate.run_parameters or {}), "parameter_quantization": quantization_record}
             
             # Store dose rate with datetime as key
             self.dose_rates[spectrum['datetime']] = output_dose_rate
@@ -1553,7 +1739,45 @@ class DoublePowerLawGaussianEvent(BaseAniMAIREEvent):
 # Legacy alias for backward compatibility
 AniMAIRE_event = DoublePowerLawGaussianEvent
 
-@memory.cache
+def rescale_dose_rate_frame_by_J0(dose_rate_frame: DoseRateFrame, J0: float, gamma: float, deltaGamma: float,
+                                  use_split_spectrum: bool) -> DoseRateFrame:
+    """
+    Rescale a DoseRateFrame calculated for a double power law spectrum with J0 = 1 to the spectrum with the given J0.
+
+    The dose rates are multiplied by J0, and the proton rigidity spectrum recorded in the particle distributions and
+    run parameters of the frame is replaced by the spectrum with the given J0.
+
+    Args:
+        dose_rate_frame (DoseRateFrame): Dose rates calculated with J0 = 1
+        J0 (float): Normalization constant to rescale to (particles/cm²/s/sr/GV)
+        gamma (float): Spectral index the dose rates were calculated with
+        deltaGamma (float): Change in spectral index the dose rates were calculated with
+        use_split_spectrum (bool): Whether the dose rates were calculated with a split spectrum
+
+    Returns:
+        DoseRateFrame: The rescaled dose rates
+    """
+    rescaled_dose_rate_frame = dose_rate_frame.multiply(J0)
+    proton_rigidity_spectrum = get_double_power_law_spectrum(J0, gamma, deltaGamma, use_split_spectrum)
+
+    rescaled_particle_distributions = []
+    for particle_distribution in dose_rate_frame.particle_distributions:
+        particle_distribution = copy.deepcopy(particle_distribution)
+        if particle_distribution.particle_species.particleName == "proton":
+            particle_distribution.momentum_distribution.setRigiditySpectrum(proton_rigidity_spectrum)
+        rescaled_particle_distributions.append(particle_distribution)
+    rescaled_dose_rate_frame.particle_distributions = rescaled_particle_distributions
+
+    run_parameters = dict(dose_rate_frame.run_parameters or {})
+    run_parameters["proton_rigidity_spectrum"] = proton_rigidity_spectrum
+    if "J0" in run_parameters:
+        run_parameters["J0"] = J0
+    if "linear_components" in run_parameters:
+        run_parameters["linear_components"] = {**run_parameters["linear_components"], "J0": J0}
+    rescaled_dose_rate_frame.run_parameters = run_parameters
+    return rescaled_dose_rate_frame
+
+@memoize_by_fingerprint(memory, "event")
 def run_animaire_cached(
     J0: float,
     gamma: float,
@@ -1572,7 +1796,9 @@ def run_animaire_cached(
     Cached version of run_from_double_power_law_gaussian_distribution function.
     
     This function provides a caching wrapper around the main AniMAIRE calculation
-    function to avoid recomputing results for identical parameter sets.
+    function to avoid recomputing results for identical parameter sets. Results are
+    keyed by the fingerprints of the arguments, so equal parameter sets hit the
+    cache across processes without hashing large arguments on every call.
     
     Args:
         J0 (float): Normalization constant (particles/cm²/s/sr/GV)
@@ -20,13 +20,13 @@ class DoseRateFrame(pd.DataFrame):
     """
 
     # Required for pandas subclassing
-    _metadata = ['timestamp', 'particle_distributions', 'run_parameters']
+    _metadata = ['timestamp', 'particle_distributions', 'run_parameters', 'asymptotic_direction_set', 'asymptotic_direction_set_fingerprint']
 
     @property
     def _constructor(self):
         return DoseRateFrame
 
-    def __init__(self, data=None, timestamp=None, particle_distributions=None, run_parameters=None, *args, **kwargs):
+    def __init__(self, data=None, timestamp=None, particle_distributions=None, run_parameters=None, asymptotic_direction_set=None, *args, **kwargs):
         """
         Initialize a DoseRateFrame with data and optional timestamp.
 
@@ -41,12 +41,35 @@ class DoseRateFrame(pd.DataFrame):
             Expected format: [(atomic_number, charge_number, spectrum_callable, pad_object), ...]
         run_parameters : dict, optional
             Dictionary containing the input parameters used in run_from_spectra
+        asymptotic_direction_set : AsymptoticDirectionSet, optional
+            The asymptotic directions used to generate this dose rate data, which can be passed to further runs.
+            The set is only kept in memory: pickled frames store its fingerprint instead
         *args, **kwargs : additional arguments passed to pandas.DataFrame constructor
         """
         super().__init__(data, *args, **kwargs)
         self.timestamp = timestamp
         self.particle_distributions = particle_distributions if particle_distributions is not None else []
         self.run_parameters = run_parameters
+        self.asymptotic_direction_set = asymptotic_direction_set
+        self.asymptotic_direction_set_fingerprint = None
+
+    def __getstate__(self):
+        """
+        Get the state used to pickle the frame, replacing the asymptotic direction set by its fingerprint.
+
+        Asymptotic direction sets for a full planet can take hundreds of megabytes, so they are not stored
+        with pickled or cached frames.
+
+        Returns:
+        --------
+        dict
+            The pickled state of the frame.
+        """
+        state = super().__getstate__()
+        if state.get('asymptotic_direction_set') is not None:
+            state['asymptotic_direction_set_fingerprint'] = state['asymptotic_direction_set'].fingerprint()
+        state['asymptotic_direction_set'] = None
+        return state
 
     def __add__(self, other):
         """
@@ -205,7 +228,8 @@ class DoseRateFrame(pd.DataFrame):
                 data=result,
                 timestamp=self.timestamp,
                 particle_distributions=self.particle_distributions,
-                run_parameters=self.run_parameters
+                run_parameters=self.run_parameters,
+                asymptotic_direction_set=self.asymptotic_direction_set
             )
             
             return scaled
@@ -223,13 +247,58 @@ class DoseRateFrame(pd.DataFrame):
                 data=result,
                 timestamp=self.timestamp,
                 particle_distributions=self.particle_distributions,
-                run_parameters=self.run_parameters
+                run_parameters=self.run_parameters,
+                asymptotic_direction_set=self.asymptotic_direction_set
             )
             
             return scaled
         else:
             raise TypeError(f"Multiplication is only supported with numeric types, arrays of length {len(self)}, or DoseRateFrame, got {type(factor)}")
 
+    @classmethod
+    def from_linear_combination(cls, dose_rate_frames, weights, particle_distributions=None, run_parameters=None):
+        """
+        Combine DoseRateFrames calculated at the same locations and altitudes into their weighted sum.
+
+        As dose rates are linear in the spectrum, the dose rates of a spectrum that is a weighted sum of component spectra
+        are the same weighted sum of the dose rates of each component.
+
+        Parameters:
+        -----------
+        dose_rate_frames : list of DoseRateFrame
+            The component dose rates, with the same latitude, longitude and altitude (km) columns in the same order
+        weights : list of float
+            The weight of each component
+        particle_distributions : list, optional
+            The particle distributions of the combined dose rates. Defaults to those of the first component.
+        run_parameters : dict, optional
+            The run parameters of the combined dose rates. Defaults to those of the first component.
+
+        Returns:
+        --------
+        DoseRateFrame
+            The weighted sum, with the timestamp and asymptotic direction set of the first component
+        """
+        if len(dose_rate_frames) != len(weights) or len(dose_rate_frames) == 0:
+            raise ValueError("Error: one weight must be given for each of at least one DoseRateFrame.")
+        coordinate_columns = [col for col in ['latitude', 'longitude', 'altitude (km)'] if col in dose_rate_frames[0].columns]
+        for dose_rate_frame in dose_rate_frames[1:]:
+            if not all(np.array_equal(dose_rate_frame[col].to_numpy(), dose_rate_frames[0][col].to_numpy()) for col in coordinate_columns):
+                raise ValueError("Error: DoseRateFrames can only be combined when they have the same locations and altitudes in the same order.")
+
+        result = pd.DataFrame(dose_rate_frames[0]).copy()
+        for col in result.columns:
+            if pd.api.types.is_numeric_dtype(result[col]) and col not in coordinate_columns:
+                result[col] = sum(weight * dose_rate_frame[col].to_numpy() for weight, dose_rate_frame in zip(weights, dose_rate_frames))
+
+        return cls(
+            data=result,
+            timestamp=dose_rate_frames[0].timestamp,
+            particle_distributions=particle_distributions if particle_distributions is not None else dose_rate_frames[0].particle_distributions,
+            run_parameters=run_parameters if run_parameters is not None else dose_rate_frames[0].run_parameters,
+            asymptotic_direction_set=dose_rate_frames[0].asymptotic_direction_set
+        )
+
     def get_altitudes(self):
         """
         Get the unique altitude values available in this DoseRateFrame.
@@ -2,6 +2,7 @@ import re
 import copy
 from AniMAIRE.AniMAIRE import run_maireplus_spectrum
 from AniMAIRE.AniMAIRE_event import BaseAniMAIREEvent, memory
+from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import memoize_by_fingerprint
 from AniMAIRE.DoseRateFrame import DoseRateFrame
 
 
@@ -14,7 +15,7 @@ from typing import Any, Dict, Optional, Sequence, Union, List
 
 # Add a subclass for MAIREPLUS spectrum based events
 # Define a cached version of the MAIREPLUS run function
-@memory.cache
+@memoize_by_fingerprint(memory, "event")
 def run_maireplus_cached(
         neutron_monitor_1_percentage_increase,
         neutron_monitor_2_percentage_increase,
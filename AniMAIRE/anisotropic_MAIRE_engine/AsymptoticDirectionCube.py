@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from .AsymptoticDirectionProcessing import get_pitch_angles_for_asymptotic_directions
+
+def get_index_dtype(number_of_rows: int) -> type:
+    """
+    Get the smallest integer dtype of int32 and int64 that can index a table with the given number of rows.
+    """
+    return np.int32 if number_of_rows < np.iinfo(np.int32).max else np.int64
+
+class AsymptoticDirectionCube:
+    """
+    Traced asymptotic directions stored as dense arrays indexed by (location, arrival direction, rigidity).
+
+    Asymptotic latitudes and longitudes are stored as float32 by default and Filter flags as int8, and each location and rigidity is
+    only stored once rather than once per trajectory, so a cube takes several times less memory than the equivalent
+    long-format DataFrame. Averaging over arrival directions is a mean over the middle axis rather than a groupby.
+    """
+
+    key_column_names = ["initialLatitude", "initialLongitude", "Rigidity"]
+    direction_column_names = ["zenith", "azimuth"]
+
+    def __init__(self,
+                 location_latitudes: np.ndarray,
+                 location_longitudes: np.ndarray,
+                 rigidities: np.ndarray,
+                 asymptotic_latitudes: np.ndarray,
+                 asymptotic_longitudes: np.ndarray,
+                 filter_flags: np.ndarray,
+                 direction_labels: Optional[dict] = None,
+                 trajectory_indices: Optional[np.ndarray] = None,
+                 coordinate_dtype: type = np.float32):
+        """
+        Initialize the asymptotic direction cube.
+
+        Parameters:
+        - location_latitudes: np.ndarray
+            The latitudes of the P locations the trajectories were traced from.
+        - location_longitudes: np.ndarray
+            The longitudes of the P locations the trajectories were traced from.
+        - rigidities: np.ndarray
+            The R rigidities of the traced trajectories in GV, in ascending order.
+        - asymptotic_latitudes: np.ndarray
+            Array of shape (P, Z, R) of asymptotic latitudes, where Z is the number of arrival directions at each location.
+        - asymptotic_longitudes: np.ndarray
+            Array of shape (P, Z, R) of asymptotic longitudes.
+        - filter_flags: np.ndarray
+            Array of shape (P, Z, R), 1 where the trajectory is allowed and 0 or -1 where it is forbidden.
+        - direction_labels: dict, optional
+            Arrays of length Z labelling each arrival direction, such as zenith and azimuth, keyed by column name.
+        - trajectory_indices: np.ndarray, optional
+            Array of shape (P, Z, R) giving the row of the long-format table that each trajectory was taken from, used by gather.
+            If not given, the long-format table is taken to be in the order of to_dataframe.
+        - coordinate_dtype: type
+            The dtype the asymptotic latitudes and longitudes are stored as.
+        """
+        self.location_latitudes = np.asarray(location_latitudes, dtype=float)
+        self.location_longitudes = np.asarray(location_longitudes, dtype=float)
+        self.rigidities = np.asarray(rigidities, dtype=float)
+        self.asymptotic_latitudes = np.asarray(asymptotic_latitudes, dtype=coordinate_dtype)
+        self.asymptotic_longitudes = np.asarray(asymptotic_longitudes, dtype=coordinate_dtype)
+        self.filter_flags = np.asarray(filter_flags, dtype=np.int8)
+        self.direction_labels = {label_name: np.asarray(label_values) for label_name, label_values in (direction_labels or {}).items()}
+        self.trajectory_indices = None if trajectory_indices is None else np.asarray(trajectory_indices, dtype=get_index_dtype(np.size(trajectory_indices)))
+
+        if self.asymptotic_latitudes.ndim != 3:
+            raise ValueError("Error: asymptotic direction cube arrays must have shape (locations, directions, rigidities).")
+        expected_shape = (len(self.location_latitudes), self.asymptotic_latitudes.shape[1], len(self.rigidities))
+        for array in [self.asymptotic_latitudes, self.asymptotic_longitudes, self.filter_flags] + ([] if self.trajectory_indices is None else [self.trajectory_indices]):
+            if array.shape != expected_shape:
+                raise ValueError(f"Error: asymptotic direction cube arrays must have shape (locations, directions, rigidities) = {expected_shape}, not {array.shape}.")
+        if any(len(label_values) != self.shape[1] for label_values in self.direction_labels.values()):
+            raise ValueError("Error: direction labels must have one value per arrival direction.")
+
+    @classmethod
+    def from_dataframe(cls, asymptotic_direction_DF: pd.DataFrame, coordinate_dtype: type = np.float32) -> "AsymptoticDirectionCube":
+        """
+        Create an asymptotic direction cube from a long-format asymptotic direction DataFrame.
+
+        Arrival directions are ordered by zenith and azimuth where these columns exist, and otherwise by the order
+        in which they appear for each location and rigidity.
+
+        Parameters:
+        - asymptotic_direction_DF: pd.DataFrame
+            DataFrame with initialLatitude, initialLongitude, Rigidity, Lat, Long and Filter columns.
+        - coordinate_dtype: type
+            The dtype the asymptotic latitudes and longitudes are stored as.
+
+        Returns:
+        - AsymptoticDirectionCube
+            The asymptotic direction cube.
+
+        Raises:
+        - ValueError
+            If every location does not have the same number of arrival directions at every rigidity.
+        """
+        location_codes, locations = pd.MultiIndex.from_arrays([asymptotic_direction_DF["initialLatitude"].to_numpy(dtype=float),
+                                                               asymptotic_direction_DF["initialLongitude"].to_numpy(dtype=float)]).factorize(sort=True)
+        rigidities, rigidity_codes = np.unique(asymptotic_direction_DF["Rigidity"].to_numpy(dtype=float), return_inverse=True)
+        rigidity_codes = rigidity_codes.reshape(-1)
+        number_of_locations, number_of_rigidities = len(locations), len(rigidities)
+
+        trajectories_per_cell = np.bincount(location_codes * number_of_rigidities + rigidity_codes, minlength=number_of_locations * number_of_rigidities)
+        number_of_directions = trajectories_per_cell[0] if len(trajectories_per_cell) > 0 else 0
+        if (number_of_directions == 0) or np.any(trajectories_per_cell != number_of_directions):
+            raise ValueError("Error: asymptotic directions do not form a dense cube: every location must have the same number of arrival directions at every rigidity.")
+
+        direction_column_names = [column_name for column_name in cls.direction_column_names if column_name in asymptotic_direction_DF.columns]
+        sort_keys = [asymptotic_direction_DF[column_name].to_numpy() for column_name in reversed(direction_column_names)] + [rigidity_codes, location_codes]
+        row_order = np.lexsort(sort_keys)
+        # after sorting, each (location, rigidity) cell is a contiguous block of its arrival directions
+        direction_codes = np.empty(len(row_order), dtype=np.int64)
+        direction_codes[row_order] = np.arange(len(row_order)) % number_of_directions
+
+        trajectory_indices = np.empty((number_of_locations, number_of_directions, number_of_rigidities), dtype=get_index_dtype(len(asymptotic_direction_DF)))
+        trajectory_indices[location_codes, direction_codes, rigidity_codes] = np.arange(len(asymptotic_direction_DF))
+
+        direction_labels = {}
+        for column_name in direction_column_names:
+            direction_values = asymptotic_direction_DF[column_name].to_numpy()[trajectory_indices]
+            if np.any(direction_values != direction_values[:1, :, :1]):
+                raise ValueError("Error: asymptotic directions do not form a dense cube: locations do not share the same arrival directions.")
+            direction_labels[column_name] = direction_values[0, :, 0]
+
+        return cls(location_latitudes=locations.get_level_values(0).to_numpy(),
+                   location_longitudes=locations.get_level_values(1).to_numpy(),
+                   rigidities=rigidities,
+                   asymptotic_latitudes=asymptotic_direction_DF["Lat"].to_numpy()[trajectory_indices],
+                   asymptotic_longitudes=asymptotic_direction_DF["Long"].to_numpy()[trajectory_indices],
+                   filter_flags=asymptotic_direction_DF["Filter"].to_numpy()[trajectory_indices],
+                   direction_labels=direction_labels,
+                   trajectory_indices=trajectory_indices,
+                   coordinate_dtype=coordinate_dtype)
+
+    @property
+    def shape(self) -> tuple:
+        """
+        The (locations, arrival directions, rigidities) shape of the cube.
+        """
+        return self.filter_flags.shape
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes used by all of the arrays in the cube, including direction labels and trajectory indices.
+        """
+        return sum(array.nbytes for array in [self.location_latitudes, self.location_longitudes, self.rigidities,
+                                              self.asymptotic_latitudes, self.asymptotic_longitudes, self.filter_flags,
+                                              *self.direction_labels.values()]
+                   + ([] if self.trajectory_indices is None else [self.trajectory_indices]))
+
+    @property
+    def location_index(self) -> pd.MultiIndex:
+        """
+        The (initialLatitude, initialLongitude) index of the locations in the cube.
+        """
+        return pd.MultiIndex.from_arrays([self.location_latitudes, self.location_longitudes], names=["initialLatitude", "initialLongitude"])
+
+    def gather(self, values: np.ndarray, rigidity_indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rearrange per-trajectory values from the long-format table the cube was built from into cube form.
+
+        Cubes without trajectory indices take the table to be in the order of to_dataframe, so values are reshaped rather than indexed.
+
+        Parameters:
+        - values: np.ndarray
+            Array whose last axis has one entry per row of the original long-format table.
+        - rigidity_indices: np.ndarray, optional
+            The indices of the rigidities to gather. By default every rigidity in the cube is gathered.
+
+        Returns:
+        - np.ndarray
+            Array of shape values.shape[:-1] + (P, Z, R), where R is the number of gathered rigidities.
+        """
+        if self.trajectory_indices is None:
+            values = np.asarray(values)
+            if values.shape[-1] != np.prod(self.shape):
+                raise ValueError(f"Error: expected {np.prod(self.shape)} values per set to gather into the asymptotic direction cube, not {values.shape[-1]}.")
+            cube_values = values.reshape(values.shape[:-1] + self.shape)
+            return cube_values if rigidity_indices is None else cube_values[..., rigidity_indices]
+        trajectory_indices = self.trajectory_indices if rigidity_indices is None else self.trajectory_indices[..., rigidity_indices]
+        return np.asarray(values)[..., trajectory_indices]
+
+    @staticmethod
+    def mean_over_directions(cube_values: np.ndarray) -> np.ndarray:
+        """
+        Average values in cube form over the arrival direction axis.
+
+        Parameters:
+        - cube_values: np.ndarray
+            Array whose last three axes are (locations, arrival directions, rigidities).
+
+        Returns:
+        - np.ndarray
+            Array whose last two axes are (locations, rigidities).
+        """
+        return np.mean(cube_values, axis=-2)
+
+    def get_pitch_angles(self, reference_latitude: float, reference_longitude: float) -> np.ndarray:
+        """
+        Calculate the pitch angles of every trajectory in the cube relative to a reference direction.
+
+        Returns:
+        - np.ndarray
+            Array of shape (P, Z, R) of pitch angles in radians.
+        """
+        return get_pitch_angles_for_asymptotic_directions(reference_latitude, reference_longitude,
+                                                          self.asymptotic_latitudes.reshape(-1),
+                                                          self.asymptotic_longitudes.reshape(-1)).reshape(self.shape)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Export the cube as a long-format asymptotic direction DataFrame, ordered by location, arrival direction and then rigidity.
+
+        Returns:
+        - pd.DataFrame
+            DataFrame with initialLatitude, initialLongitude, Rigidity, Lat, Long and Filter columns, followed by any direction labels.
+        """
+        number_of_locations, number_of_directions, number_of_rigidities = self.shape
+        return pd.DataFrame({"initialLatitude": np.repeat(self.location_latitudes, number_of_directions * number_of_rigidities),
+                             "initialLongitude": np.repeat(self.location_longitudes, number_of_directions * number_of_rigidities),
+                             "Rigidity": np.tile(self.rigidities, number_of_locations * number_of_directions),
+                             "Lat": self.asymptotic_latitudes.reshape(-1),
+                             "Long": self.asymptotic_longitudes.reshape(-1),
+                             "Filter": self.filter_flags.reshape(-1),
+                             **{label_name: np.tile(np.repeat(label_values, number_of_rigidities), number_of_locations)
+                                for label_name, label_values in self.direction_labels.items()}})
+
+    def __repr__(self) -> str:
+        number_of_locations, number_of_directions, number_of_rigidities = self.shape
+        return (f"AsymptoticDirectionCube({number_of_locations} locations, {number_of_directions} arrival directions, "
+                f"{number_of_rigidities} rigidities)")
@@ -4,9 +4,7 @@
 import numpy as np
 import pandas as pd
 import datetime as dt
-import sys
 import ParticleRigidityCalculationTools as PRCT
-from joblib import Memory
 import tqdm
 tqdm.tqdm.pandas()
 
@@ -17,36 +15,13 @@ import numba
 from .spectralCalculations.particleDistribution import particleDistribution
 from .spectralCalculations.momentaDistribution import momentaDistribution
 from .spectralCalculations.pitchAngleDistribution import IsotropicPitchAngleDistribution
-
-memory_asymp_dirs = Memory("./cacheAsymptoticDirectionOutputs", verbose=0)
+from .stageCache import get_stage_cache
 
 m0 = 1.67262192e-27 #kg
 c = 299792458.0 #m/s
 protonCharge = 1.60217663e-19 #C
 protonRestEnergy = m0 * (c**2)
 
-global get_apply_method
-def get_apply_method(DF_or_Series: pd.DataFrame) -> callable:
-    """
-    Determine the appropriate apply method based on the debugging state.
-
-    Parameters:
-    - DF_or_Series: pd.DataFrame
-        The DataFrame or Series to apply the method to.
-
-    Returns:
-    - callable
-        The appropriate apply method.
-    """
-    if hasattr(sys, 'gettrace') and sys.gettrace() is not None:
-        print("debug mode being used: setting AniMAIRE to use progress_apply rather than running in parallel!")
-        apply_method = DF_or_Series.progress_apply
-    else:
-        #print("not in debug mode: setting AniMAIRE to use parallel_apply!")
-        apply_method = DF_or_Series.parallel_apply
-        
-    return apply_method
-
 def generate_asymp_dir_DF(dataframeToFillFrom: pd.DataFrame, IMFlatitude: float, IMFlongitude: float, datetime_to_run_across_UTC: dt.datetime, cache: bool) -> pd.DataFrame:
     """
     Generate a DataFrame of asymptotic directions with pitch angles.
@@ -61,7 +36,7 @@ def generate_asymp_dir_DF(dataframeToFillFrom: pd.DataFrame, IMFlatitude: float,
     - datetime_to_run_across_UTC: dt.datetime
         The datetime to run across in UTC.
     - cache: bool
-        Whether to cache the results.
+        Whether to keep the pitch angles in the in-process pitch angle stage cache, keyed by the fingerprints of the inputs.
 
     Returns:
     - pd.DataFrame
@@ -75,8 +50,11 @@ def generate_asymp_dir_DF(dataframeToFillFrom: pd.DataFrame, IMFlatitude: float,
     if cache == False:
         asymptoticDirectionList = convertAsymptoticDirectionsToPitchAngle(dataframeToFillFrom, IMFlatitude, IMFlongitude, datetime_to_run_across_UTC)
     else:
-        cachedConvertAsympDirFunc = memory_asymp_dirs.cache(convertAsymptoticDirectionsToPitchAngle)
-        asymptoticDirectionList = cachedConvertAsympDirFunc(dataframeToFillFrom, IMFlatitude, IMFlongitude, datetime_to_run_across_UTC)
+        pitch_angle_inputs = {"asymptotic_directions": dataframeToFillFrom[["Lat", "Long"]],
+                              "reference_latitude": IMFlatitude,
+                              "reference_longitude": IMFlongitude}
+        asymptoticDirectionList = get_stage_cache("pitch_angles").get_or_compute(pitch_angle_inputs,
+                                                                                 lambda: convertAsymptoticDirectionsToPitchAngle(dataframeToFillFrom, IMFlatitude, IMFlongitude, datetime_to_run_across_UTC))
 
     print("successfully converted asymptotic directions")
 
@@ -103,12 +81,85 @@ def convertAsymptoticDirectionsToPitchAngle(dataframeToFillFrom: pd.DataFrame, I
         The Series with pitch angles.
     """
     print("acquiring pitch angles...")
-    from pandarallel import pandarallel
-    pandarallel.initialize(progress_bar=True)
-    pitch_angle_list = get_apply_method(dataframeToFillFrom)(lambda dataframe_row: get_pitch_angle_for_DF_analytic(IMFlatitude, IMFlongitude, dataframe_row["Lat"], dataframe_row["Long"]), axis=1)
+    pitch_angle_list = pd.Series(get_pitch_angles_for_asymptotic_directions(IMFlatitude,
+                                                                            IMFlongitude,
+                                                                            dataframeToFillFrom["Lat"].to_numpy(dtype=float),
+                                                                            dataframeToFillFrom["Long"].to_numpy(dtype=float)),
+                                 index=dataframeToFillFrom.index)
 
     return pitch_angle_list
 
+def get_unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Convert latitudes and longitudes into Cartesian unit vectors.
+
+    Parameters:
+    - latitudes: np.ndarray
+        The latitudes in degrees.
+    - longitudes: np.ndarray
+        The longitudes in degrees.
+
+    Returns:
+    - np.ndarray
+        The unit vectors, with a final axis of length 3 added to the broadcast shape of the inputs.
+    """
+    latitudes_rad = np.radians(latitudes)
+    longitudes_rad = np.radians(longitudes)
+    cos_latitudes = np.cos(latitudes_rad)
+    return np.stack([cos_latitudes * np.cos(longitudes_rad),
+                     cos_latitudes * np.sin(longitudes_rad),
+                     np.sin(latitudes_rad)], axis=-1)
+
+def get_pitch_angles_for_asymptotic_directions(IMFlatitude: float, IMFlongitude: float, asymptotic_dir_latitudes: np.ndarray, asymptotic_dir_longitudes: np.ndarray) -> np.ndarray:
+    """
+    Calculate the pitch angles of a whole array of asymptotic directions relative to the IMF in one call.
+
+    Parameters:
+    - IMFlatitude: float
+        The latitude of the Interplanetary Magnetic Field (IMF).
+    - IMFlongitude: float
+        The longitude of the Interplanetary Magnetic Field (IMF).
+    - asymptotic_dir_latitudes: np.ndarray
+        The latitudes of the asymptotic directions.
+    - asymptotic_dir_longitudes: np.ndarray
+        The longitudes of the asymptotic directions.
+
+    Returns:
+    - np.ndarray
+        The pitch angles in radians.
+    """
+    return get_pitch_angle_matrix([IMFlatitude], [IMFlongitude], asymptotic_dir_latitudes, asymptotic_dir_longitudes)[:, 0]
+
+def get_pitch_angle_matrix(reference_latitudes: np.ndarray, reference_longitudes: np.ndarray, asymptotic_dir_latitudes: np.ndarray, asymptotic_dir_longitudes: np.ndarray) -> np.ndarray:
+    """
+    Calculate the pitch angles of an array of asymptotic directions relative to several IMF reference directions at once.
+
+    Parameters:
+    - reference_latitudes: np.ndarray
+        The latitudes of the N reference directions.
+    - reference_longitudes: np.ndarray
+        The longitudes of the N reference directions.
+    - asymptotic_dir_latitudes: np.ndarray
+        The latitudes of the asymptotic directions.
+    - asymptotic_dir_longitudes: np.ndarray
+        The longitudes of the asymptotic directions.
+
+    Returns:
+    - np.ndarray
+        Array of shape (asymptotic directions, N) of pitch angles in radians.
+    """
+    reference_latitudes = np.atleast_1d(np.asarray(reference_latitudes, dtype=float))
+    reference_longitudes = np.atleast_1d(np.asarray(reference_longitudes, dtype=float))
+    if reference_latitudes.shape != reference_longitudes.shape:
+        raise ValueError("Error: reference_latitudes and reference_longitudes must have the same length.")
+
+    reference_unit_vectors = get_unit_vectors(reference_latitudes, reference_longitudes)
+    cos_pitch_angles = get_unit_vectors(np.asarray(asymptotic_dir_latitudes, dtype=float),
+                                        np.asarray(asymptotic_dir_longitudes, dtype=float)) @ reference_unit_vectors.T
+
+    # rounding can push the dot product of parallel unit vectors just outside [-1, 1]
+    return np.arccos(np.clip(cos_pitch_angles, -1.0, 1.0))
+
 @numba.jit(nopython=True)
 def get_pitch_angle_for_DF_analytic(IMFlatitude: float, IMFlongitude: float, asymptotic_dir_latitude: float, asymptotic_dir_longitude: float) -> float:
     """
@@ -136,83 +187,167 @@ def get_pitch_angle_for_DF_analytic(IMFlatitude: float, IMFlongitude: float, asy
     cos_pitch_angle = (np.sin(asymptotic_dir_latitude_rad) * np.sin(IMFlatitude_rad)) + \
                       (np.cos(asymptotic_dir_latitude_rad) * np.cos(IMFlatitude_rad) * np.cos(asymptotic_dir_longitude_rad - IMFlongitude_rad))
     
-    pitch_angle = np.arccos(cos_pitch_angle)
+    pitch_angle = np.arccos(min(1.0, max(-1.0, cos_pitch_angle)))
 
     return pitch_angle
 
-def acquireWeightingFactors(asymptotic_direction_DF: pd.DataFrame, particle_dist: particleDistribution) -> pd.DataFrame:
+def get_rigidity_support_mask(rigidity_spectrum: callable, rigidities: np.ndarray) -> np.ndarray:
     """
-    Acquire weighting factors for asymptotic directions.
+    Find the rigidities that lie within the support of a rigidity spectrum, outside of which the spectrum is zero.
+
+    Parameters:
+    - rigidity_spectrum: callable
+        The rigidity spectrum. Spectra without a support interval are treated as non-zero at every rigidity.
+    - rigidities: np.ndarray
+        The rigidities in GV.
+
+    Returns:
+    - np.ndarray
+        Boolean array with the same shape as rigidities.
+    """
+    lower_rigidity, upper_rigidity = getattr(rigidity_spectrum, "support", (-np.inf, np.inf))
+    rigidities = np.asarray(rigidities, dtype=float)
+    return (rigidities >= lower_rigidity) & (rigidities <= upper_rigidity)
+
+def evaluate_rigidity_spectrum_over_array(rigidity_spectrum: callable, rigidities: np.ndarray) -> np.ndarray:
+    """
+    Evaluate a rigidity spectrum once per unique rigidity and broadcast the values back over the full array.
+
+    The spectrum is only evaluated within its support, and is set to zero at every other rigidity.
+
+    Parameters:
+    - rigidity_spectrum: callable
+        The rigidity spectrum to evaluate.
+    - rigidities: np.ndarray
+        The rigidities in GV at which the spectrum is required.
+
+    Returns:
+    - np.ndarray
+        The spectrum values, with the same shape as rigidities.
+    """
+    unique_rigidities, inverse_indices = np.unique(rigidities, return_inverse=True)
+    unique_spectrum_values = np.zeros(len(unique_rigidities), dtype=float)
+    for rigidity_index in np.flatnonzero(get_rigidity_support_mask(rigidity_spectrum, unique_rigidities)):
+        unique_spectrum_values[rigidity_index] = float(rigidity_spectrum(unique_rigidities[rigidity_index]))
+    return unique_spectrum_values[inverse_indices].reshape(np.shape(rigidities))
+
+def evaluate_pitch_angle_distribution_over_arrays(pitch_angle_distribution: callable, pitch_angles: np.ndarray, rigidities: np.ndarray) -> np.ndarray:
+    """
+    Evaluate a pitch angle distribution over whole arrays of pitch angles and rigidities in a single call.
+
+    Distributions that cannot accept arrays (for example user-supplied functions containing
+    scalar branching) are evaluated element by element instead.
+
+    Parameters:
+    - pitch_angle_distribution: callable
+        The pitch angle distribution, called as pitch_angle_distribution(pitch_angle, rigidity).
+    - pitch_angles: np.ndarray
+        The pitch angles in radians.
+    - rigidities: np.ndarray
+        The rigidities in GV, with a shape that broadcasts against pitch_angles.
+
+    Returns:
+    - np.ndarray
+        The pitch angle distribution values, with the same shape as pitch_angles.
+    """
+    try:
+        pitch_angle_values = np.asarray(pitch_angle_distribution(pitch_angles, rigidities), dtype=float)
+        return np.broadcast_to(pitch_angle_values, np.shape(pitch_angles)).copy()
+    except Exception:
+        broadcast_rigidities = np.broadcast_to(rigidities, np.shape(pitch_angles))
+        return np.array([pitch_angle_distribution(pitch_angle, rigidity) for pitch_angle, rigidity in zip(np.ravel(pitch_angles), np.ravel(broadcast_rigidities))], 
+                        dtype=float).reshape(np.shape(pitch_angles))
+
+def calculate_weighting_factor_arrays(asymptotic_direction_DF: pd.DataFrame, particle_dist: particleDistribution, pitch_angles: np.ndarray = None) -> tuple:
+    """
+    Calculate the pitch angle, rigidity and combined weighting factors for each asymptotic direction as arrays.
 
     Parameters:
     - asymptotic_direction_DF: pd.DataFrame
         The DataFrame with asymptotic directions.
     - particle_dist: particleDistribution
         The particle distribution.
+    - pitch_angles: np.ndarray, optional
+        Pitch angles to use instead of the angleBetweenIMFinRadians column. A matrix of shape (asymptotic directions, N),
+        such as one from get_pitch_angle_matrix, gives weighting factors for N reference directions at once.
 
     Returns:
-    - pd.DataFrame
-        The DataFrame with weighting factors.
+    - tuple
+        The pitch angle weighting factors, the rigidity weighting factors, the allowed trajectory flags
+        and the combined rigidity and pitch angle weighting factors. The pitch angle and combined weighting
+        factors have the same shape as the pitch angles, and are 0 for forbidden trajectories
+        and for rigidities outside the support of the rigidity spectrum.
     """
-
-    from pandarallel import pandarallel
-    pandarallel.initialize(progress_bar=True)
-    
     momentaDist = particle_dist.momentum_distribution
-    new_asymptotic_direction_DF = asymptotic_direction_DF.copy()
 
     # Check if we have an isotropic pitch angle distribution with fast mode
     is_isotropic_fast = (isinstance(momentaDist.getPitchAngleDistribution(), IsotropicPitchAngleDistribution) and 
                         getattr(momentaDist.getPitchAngleDistribution(), 'use_fast_calculation', False))
 
-    if not is_isotropic_fast:
-        # find weighting factors from the angles and rigidities
-        def pitchAngleFunctionToUse(row):
-            """
-            Calculate the pitch angle distribution value for a given row.
-            
-            Args:
-                row: DataFrame row containing angleBetweenIMFinRadians and Rigidity
-                
-            Returns:
-                The pitch angle distribution value
-            """
-            return momentaDist.getPitchAngleDistribution()(row["angleBetweenIMFinRadians"], row["Rigidity"])
-        
-        def fullRigidityPitchWeightingFactorFunctionToUse(row):
-            """
-            Calculate the combined rigidity and pitch angle weighting factor for a given row.
-            
-            Args:
-                row: DataFrame row containing angleBetweenIMFinRadians and Rigidity
-                
-            Returns:
-                The combined rigidity and pitch angle weighting factor
-            """
-            return momentaDist(row["angleBetweenIMFinRadians"], row["Rigidity"])
-
-        print("calculating pitch angle weighting factors...")
-        new_asymptotic_direction_DF["PitchAngleWeightingFactor"] = get_apply_method(new_asymptotic_direction_DF)(pitchAngleFunctionToUse, axis=1)
+    rigidities = asymptotic_direction_DF["Rigidity"].to_numpy(dtype=float)
+    allowed_trajectories = (asymptotic_direction_DF["Filter"].to_numpy() == 1)
+    # trajectories outside the support of the rigidity spectrum carry no flux whatever their pitch angle
+    contributing_trajectories = allowed_trajectories & get_rigidity_support_mask(momentaDist.getRigiditySpectrum(), rigidities)
 
-        new_asymptotic_direction_DF["Filter"] = (new_asymptotic_direction_DF["Filter"] == 1) * 1
+    if pitch_angles is None:
+        pitch_angles = asymptotic_direction_DF["angleBetweenIMFinRadians"].to_numpy(dtype=float)
+    pitch_angles = np.asarray(pitch_angles, dtype=float)
+    # per-direction values are broadcast along any extra axes of the pitch angles
+    per_direction_shape = (len(rigidities),) + (1,) * (pitch_angles.ndim - 1)
 
-        print("calculating rigidity weighting factors...")
-        new_asymptotic_direction_DF["RigidityWeightingFactor"] = get_apply_method(new_asymptotic_direction_DF["Rigidity"])(momentaDist.getRigiditySpectrum())
-
-        print("calculating rigidity + pitch combined weighting factors...")
-        all_weighted_asymp_dirs = get_apply_method(new_asymptotic_direction_DF)(fullRigidityPitchWeightingFactorFunctionToUse, axis=1)
-        new_asymptotic_direction_DF["fullRigidityPitchWeightingFactor"] = all_weighted_asymp_dirs * (new_asymptotic_direction_DF["Filter"] == 1)
+    if not is_isotropic_fast:
+        print("calculating pitch angle weighting factors...")
+        # forbidden trajectories contribute no flux, so the pitch angle distribution is only evaluated for allowed trajectories
+        # within the support of the rigidity spectrum
+        pitch_angle_weighting_factors = np.zeros_like(pitch_angles)
+        if contributing_trajectories.any():
+            pitch_angle_weighting_factors[contributing_trajectories] = evaluate_pitch_angle_distribution_over_arrays(momentaDist.getPitchAngleDistribution(),
+                                                                                                                     pitch_angles[contributing_trajectories],
+                                                                                                                     rigidities.reshape(per_direction_shape)[contributing_trajectories])
     else:
         # For isotropic fast mode, set pitch angle factor to 1 and full rigidity pitch factor to rigidity factor
         print("using isotropic fast mode: setting pitch angle weighting factors to 1")
-        new_asymptotic_direction_DF["PitchAngleWeightingFactor"] = 1.0
-        new_asymptotic_direction_DF["Filter"] = (new_asymptotic_direction_DF["Filter"] == 1) * 1
-        
-        print("calculating rigidity weighting factors...")
-        new_asymptotic_direction_DF["RigidityWeightingFactor"] = get_apply_method(new_asymptotic_direction_DF["Rigidity"])(momentaDist.getRigiditySpectrum())
-        
-        print("setting full rigidity pitch weighting factors equal to rigidity weighting factors...")
-        new_asymptotic_direction_DF["fullRigidityPitchWeightingFactor"] = new_asymptotic_direction_DF["RigidityWeightingFactor"] * (new_asymptotic_direction_DF["Filter"] == 1)
+        pitch_angle_weighting_factors = np.ones_like(pitch_angles)
+
+    print("calculating rigidity weighting factors...")
+    rigidity_weighting_factors = evaluate_rigidity_spectrum_over_array(momentaDist.getRigiditySpectrum(), rigidities)
+
+    print("calculating rigidity + pitch combined weighting factors...")
+    # only contributing trajectories are multiplied out, so the work scales with the fraction of allowed trajectories
+    full_rigidity_pitch_weighting_factors = np.zeros(np.shape(pitch_angles))
+    full_rigidity_pitch_weighting_factors[contributing_trajectories] = (pitch_angle_weighting_factors[contributing_trajectories] *
+                                                                        rigidity_weighting_factors.reshape(per_direction_shape)[contributing_trajectories])
+
+    return pitch_angle_weighting_factors, rigidity_weighting_factors, allowed_trajectories, full_rigidity_pitch_weighting_factors
+
+def acquireWeightingFactors(asymptotic_direction_DF: pd.DataFrame, particle_dist: particleDistribution) -> pd.DataFrame:
+    """
+    Acquire weighting factors for asymptotic directions.
+
+    The pitch angle, rigidity and combined weighting factors are calculated in a single pass over 
+    the column arrays, with the rigidity spectrum evaluated only once per unique rigidity.
+
+    Parameters:
+    - asymptotic_direction_DF: pd.DataFrame
+        The DataFrame with asymptotic directions.
+    - particle_dist: particleDistribution
+        The particle distribution.
+
+    Returns:
+    - pd.DataFrame
+        The DataFrame with weighting factors.
+    """
+    new_asymptotic_direction_DF = asymptotic_direction_DF.copy()
+
+    (pitch_angle_weighting_factors,
+     rigidity_weighting_factors,
+     allowed_trajectories,
+     full_rigidity_pitch_weighting_factors) = calculate_weighting_factor_arrays(new_asymptotic_direction_DF, particle_dist)
+
+    new_asymptotic_direction_DF["PitchAngleWeightingFactor"] = pitch_angle_weighting_factors
+    new_asymptotic_direction_DF["Filter"] = allowed_trajectories * 1
+    new_asymptotic_direction_DF["RigidityWeightingFactor"] = rigidity_weighting_factors
+    new_asymptotic_direction_DF["fullRigidityPitchWeightingFactor"] = full_rigidity_pitch_weighting_factors
     
     print("calculating energy + pitch combined weighting factors...")
     print("converting rigidities to energies...")
@@ -0,0 +1,426 @@
+import numpy as np
+import pandas as pd
+import datetime as dt
+from typing import Optional
+
+from .AsymptoticDirectionProcessing import get_pitch_angles_for_asymptotic_directions, get_pitch_angle_matrix
+from .AsymptoticDirectionCube import AsymptoticDirectionCube
+from .fingerprints import get_object_fingerprint
+
+class AsymptoticDirectionSet:
+    """
+    A set of traced asymptotic directions, their Filter flags and their pitch angles relative to a reference direction,
+    stored as compact arrays so that they can be reused across runs with many different spectra.
+
+    Where every location has the same arrival directions at every rigidity, the set is carried as an AsymptoticDirectionCube,
+    with its pitch angles and any other per-trajectory columns in the same (location, arrival direction, rigidity) shape,
+    and the long-format arrays are rebuilt from the cube when they are requested, ordered by location, arrival direction and
+    then rigidity. Other sets are stored as long-format arrays in the order they were given.
+
+    Sets are immutable: arrays are read-only, and a set with a different reference direction is obtained using with_reference_direction.
+    """
+
+    core_column_names = ["initialLatitude", "initialLongitude", "Rigidity", "Lat", "Long", "Filter", "angleBetweenIMFinRadians"]
+
+    def __init__(self,
+                 initial_latitudes: np.ndarray,
+                 initial_longitudes: np.ndarray,
+                 rigidities: np.ndarray,
+                 asymptotic_latitudes: np.ndarray,
+                 asymptotic_longitudes: np.ndarray,
+                 filter_flags: np.ndarray,
+                 pitch_angles: np.ndarray,
+                 reference_latitude: float,
+                 reference_longitude: float,
+                 date_and_time: Optional[dt.datetime] = None,
+                 Kp_index: Optional[int] = None,
+                 extra_columns: Optional[dict] = None):
+        """
+        Initialize the asymptotic direction set.
+
+        Parameters:
+        - initial_latitudes: np.ndarray
+            The latitudes of the locations the trajectories were traced from.
+        - initial_longitudes: np.ndarray
+            The longitudes of the locations the trajectories were traced from.
+        - rigidities: np.ndarray
+            The rigidities of the traced trajectories in GV.
+        - asymptotic_latitudes: np.ndarray
+            The latitudes of the asymptotic directions.
+        - asymptotic_longitudes: np.ndarray
+            The longitudes of the asymptotic directions.
+        - filter_flags: np.ndarray
+            1 where the trajectory is allowed and 0 where it is forbidden.
+        - pitch_angles: np.ndarray
+            The angles between the asymptotic directions and the reference direction in radians.
+        - reference_latitude: float
+            The latitude of the reference direction used for the pitch angles.
+        - reference_longitude: float
+            The longitude of the reference direction used for the pitch angles.
+        - date_and_time: dt.datetime, optional
+            The date and time the directions were traced for.
+        - Kp_index: int, optional
+            The Kp index the directions were traced for.
+        - extra_columns: dict, optional
+            Any further per-trajectory arrays, such as zenith and azimuth, keyed by column name.
+        """
+        columns = {"initialLatitude": np.asarray(initial_latitudes, dtype=float),
+                   "initialLongitude": np.asarray(initial_longitudes, dtype=float),
+                   "Rigidity": np.asarray(rigidities, dtype=float),
+                   "Lat": np.asarray(asymptotic_latitudes, dtype=float),
+                   "Long": np.asarray(asymptotic_longitudes, dtype=float),
+                   "Filter": np.asarray(filter_flags, dtype=np.int8),
+                   **{column_name: np.asarray(column_values) for column_name, column_values in (extra_columns or {}).items()},
+                   "angleBetweenIMFinRadians": np.asarray(pitch_angles, dtype=float)}
+
+        if len({len(column_values) for column_values in columns.values()}) != 1:
+            raise ValueError("All arrays in an AsymptoticDirectionSet must have the same length.")
+
+        try:
+            cube = AsymptoticDirectionCube.from_dataframe(pd.DataFrame({column_name: column_values for column_name, column_values in columns.items()
+                                                                        if column_name != "angleBetweenIMFinRadians"}),
+                                                          coordinate_dtype=float)
+        except ValueError:
+            cube = None
+
+        if cube is not None:
+            # the remaining columns are rearranged into cube form, after which the set is exported in the cube's own order
+            trajectory_indices, cube.trajectory_indices = cube.trajectory_indices, None
+            columns = {column_name: column_values[trajectory_indices] for column_name, column_values in columns.items()
+                       if (column_name not in AsymptoticDirectionCube.key_column_names + ["Lat", "Long", "Filter"]) and (column_name not in cube.direction_labels)}
+
+        self._store(cube, columns, list(extra_columns or {}), reference_latitude, reference_longitude, date_and_time, Kp_index)
+
+    def _store(self,
+               cube: Optional[AsymptoticDirectionCube],
+               columns: dict,
+               extra_column_names: list,
+               reference_latitude: float,
+               reference_longitude: float,
+               date_and_time: Optional[dt.datetime],
+               Kp_index: Optional[int]):
+        self._cube = cube
+        self._columns = columns
+        self._extra_column_names = extra_column_names
+        self.reference_latitude = reference_latitude
+        self.reference_longitude = reference_longitude
+        self.date_and_time = date_and_time
+        self.Kp_index = Kp_index
+        self._fingerprint = None
+        self._set_arrays_read_only()
+
+    def _get_stored_arrays(self) -> list:
+        cube_arrays = [] if self._cube is None else [self._cube.location_latitudes, self._cube.location_longitudes, self._cube.rigidities,
+                                                     self._cube.asymptotic_latitudes, self._cube.asymptotic_longitudes, self._cube.filter_flags,
+                                                     *self._cube.direction_labels.values()]
+        return cube_arrays + list(self._columns.values())
+
+    def _set_arrays_read_only(self):
+        for array in self._get_stored_arrays():
+            array.setflags(write=False)
+
+    @staticmethod
+    def _as_read_only_array(values) -> np.ndarray:
+        array = np.asarray(values).view()
+        array.setflags(write=False)
+        return array
+
+    def _get_column(self, column_name: str) -> np.ndarray:
+        """
+        Get one column of the set as a long-format array, rebuilding it from the cube if the set is carried as a cube.
+        """
+        cube = self._cube
+        if column_name in self._columns:
+            column_values = self._columns[column_name].reshape(-1)
+        elif column_name in ["initialLatitude", "initialLongitude"]:
+            location_values = cube.location_latitudes if column_name == "initialLatitude" else cube.location_longitudes
+            column_values = np.repeat(location_values, cube.shape[1] * cube.shape[2])
+        elif column_name == "Rigidity":
+            column_values = np.tile(cube.rigidities, cube.shape[0] * cube.shape[1])
+        elif column_name in ["Lat", "Long", "Filter"]:
+            column_values = {"Lat": cube.asymptotic_latitudes, "Long": cube.asymptotic_longitudes, "Filter": cube.filter_flags}[column_name].reshape(-1)
+        else:
+            column_values = np.tile(np.repeat(cube.direction_labels[column_name], cube.shape[2]), cube.shape[0])
+        return self._as_read_only_array(column_values)
+
+    @property
+    def initial_latitudes(self) -> np.ndarray:
+        return self._get_column("initialLatitude")
+
+    @property
+    def initial_longitudes(self) -> np.ndarray:
+        return self._get_column("initialLongitude")
+
+    @property
+    def rigidities(self) -> np.ndarray:
+        return self._get_column("Rigidity")
+
+    @property
+    def asymptotic_latitudes(self) -> np.ndarray:
+        return self._get_column("Lat")
+
+    @property
+    def asymptotic_longitudes(self) -> np.ndarray:
+        return self._get_column("Long")
+
+    @property
+    def filter_flags(self) -> np.ndarray:
+        return self._get_column("Filter")
+
+    @property
+    def pitch_angles(self) -> np.ndarray:
+        return self._get_column("angleBetweenIMFinRadians")
+
+    @property
+    def extra_columns(self) -> dict:
+        return {column_name: self._get_column(column_name) for column_name in self._extra_column_names}
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes used by all of the arrays stored in the set.
+        """
+        return sum(array.nbytes for array in self._get_stored_arrays())
+
+    @classmethod
+    def from_dataframe(cls,
+                       asymptotic_direction_DF: pd.DataFrame,
+                       reference_latitude: float,
+                       reference_longitude: float,
+                       date_and_time: Optional[dt.datetime] = None,
+                       Kp_index: Optional[int] = None) -> "AsymptoticDirectionSet":
+        """
+        Create an asymptotic direction set from a processed asymptotic direction DataFrame.
+
+        Parameters:
+        - asymptotic_direction_DF: pd.DataFrame
+            DataFrame with initialLatitude, initialLongitude, Rigidity, Lat, Long, Filter and angleBetweenIMFinRadians columns.
+        - reference_latitude: float
+            The latitude of the reference direction used for the pitch angles.
+        - reference_longitude: float
+            The longitude of the reference direction used for the pitch angles.
+        - date_and_time: dt.datetime, optional
+            The date and time the directions were traced for.
+        - Kp_index: int, optional
+            The Kp index the directions were traced for.
+
+        Returns:
+        - AsymptoticDirectionSet
+            The asymptotic direction set.
+        """
+        missing_columns = [column_name for column_name in cls.core_column_names if column_name not in asymptotic_direction_DF.columns]
+        if missing_columns:
+            raise ValueError(f"Asymptotic direction DataFrame is missing required columns: {missing_columns}")
+
+        return cls(initial_latitudes=asymptotic_direction_DF["initialLatitude"].to_numpy(),
+                   initial_longitudes=asymptotic_direction_DF["initialLongitude"].to_numpy(),
+                   rigidities=asymptotic_direction_DF["Rigidity"].to_numpy(),
+                   asymptotic_latitudes=asymptotic_direction_DF["Lat"].to_numpy(),
+                   asymptotic_longitudes=asymptotic_direction_DF["Long"].to_numpy(),
+                   filter_flags=asymptotic_direction_DF["Filter"].to_numpy(),
+                   pitch_angles=asymptotic_direction_DF["angleBetweenIMFinRadians"].to_numpy(),
+                   reference_latitude=reference_latitude,
+                   reference_longitude=reference_longitude,
+                   date_and_time=date_and_time,
+                   Kp_index=Kp_index,
+                   extra_columns={column_name: asymptotic_direction_DF[column_name].to_numpy()
+                                  for column_name in asymptotic_direction_DF.columns if column_name not in cls.core_column_names})
+
+    @classmethod
+    def from_cutoff_rigidities(cls,
+                               latitudes: np.ndarray,
+                               longitudes: np.ndarray,
+                               cutoff_rigidities: np.ndarray,
+                               rigidities: np.ndarray,
+                               reference_latitude: float,
+                               reference_longitude: float,
+                               date_and_time: Optional[dt.datetime] = None,
+                               Kp_index: Optional[int] = None) -> "AsymptoticDirectionSet":
+        """
+        Create an asymptotic direction set from the cutoff rigidity at each location, where each location's asymptotic direction
+        is taken to be the location itself and trajectories are allowed at and above the cutoff rigidity.
+
+        The set is built by broadcasting the (location x rigidity) arrays, and is carried as a cube with one arrival direction per location.
+
+        Parameters:
+        - latitudes: np.ndarray
+            The latitudes of the locations.
+        - longitudes: np.ndarray
+            The longitudes of the locations.
+        - cutoff_rigidities: np.ndarray
+            The cutoff rigidity at each location in GV.
+        - rigidities: np.ndarray
+            The rigidities in GV to include for every location.
+        - reference_latitude: float
+            The latitude of the reference direction used for the pitch angles.
+        - reference_longitude: float
+            The longitude of the reference direction used for the pitch angles.
+        - date_and_time: dt.datetime, optional
+            The date and time the cutoff rigidities were calculated for.
+        - Kp_index: int, optional
+            The Kp index the cutoff rigidities were calculated for.
+
+        Returns:
+        - AsymptoticDirectionSet
+            The asymptotic direction set.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        cutoff_rigidities = np.asarray(cutoff_rigidities, dtype=float)
+        rigidities = np.asarray(rigidities, dtype=float)
+        number_of_rigidities = len(rigidities)
+
+        location_pitch_angles = get_pitch_angles_for_asymptotic_directions(reference_latitude, reference_longitude, latitudes, longitudes)
+        trajectory_rigidities = np.repeat(rigidities, len(latitudes))
+
+        return cls(initial_latitudes=np.tile(latitudes, number_of_rigidities),
+                   initial_longitudes=np.tile(longitudes, number_of_rigidities),
+                   rigidities=trajectory_rigidities,
+                   asymptotic_latitudes=np.tile(latitudes, number_of_rigidities),
+                   asymptotic_longitudes=np.tile(longitudes, number_of_rigidities),
+                   filter_flags=trajectory_rigidities >= np.tile(cutoff_rigidities, number_of_rigidities),
+                   pitch_angles=np.tile(location_pitch_angles, number_of_rigidities),
+                   reference_latitude=reference_latitude,
+                   reference_longitude=reference_longitude,
+                   date_and_time=date_and_time,
+                   Kp_index=Kp_index)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the asymptotic directions as a DataFrame in the format used by the engine.
+
+        Returns:
+        - pd.DataFrame
+            DataFrame with initialLatitude, initialLongitude, Rigidity, Lat, Long, Filter and angleBetweenIMFinRadians columns,
+            followed by any extra columns.
+        """
+        return pd.DataFrame({"initialLatitude": self.initial_latitudes,
+                             "initialLongitude": self.initial_longitudes,
+                             "Rigidity": self.rigidities,
+                             "Lat": self.asymptotic_latitudes,
+                             "Long": self.asymptotic_longitudes,
+                             "Filter": self.filter_flags,
+                             **self.extra_columns,
+                             "angleBetweenIMFinRadians": self.pitch_angles})
+
+    def to_cube(self) -> Optional[AsymptoticDirectionCube]:
+        """
+        Get the asymptotic directions as a dense (location, arrival direction, rigidity) cube.
+
+        The cube is shared with sets obtained using with_reference_direction. Per-row arrays in the order of to_dataframe,
+        such as weighting factors, can be gathered into it.
+
+        Returns:
+        - AsymptoticDirectionCube or None
+            The cube, or None if the locations do not all have the same number of arrival directions at every rigidity.
+        """
+        return self._cube
+
+    def has_reference_direction(self, reference_latitude: float, reference_longitude: float) -> bool:
+        """
+        Check whether the pitch angles in this set were calculated for a given reference direction.
+        """
+        return (self.reference_latitude == reference_latitude) and (self.reference_longitude == reference_longitude)
+
+    def get_pitch_angle_matrix(self, reference_latitudes: np.ndarray, reference_longitudes: np.ndarray, allowed_only: bool = False) -> np.ndarray:
+        """
+        Calculate the pitch angles of every asymptotic direction in this set relative to several reference directions at once.
+
+        Parameters:
+        - reference_latitudes: np.ndarray
+            The latitudes of the N reference directions.
+        - reference_longitudes: np.ndarray
+            The longitudes of the N reference directions.
+        - allowed_only: bool, optional
+            Whether to only calculate pitch angles for allowed trajectories, which are the only ones that contribute flux.
+            The pitch angles of forbidden trajectories are then NaN.
+
+        Returns:
+        - np.ndarray
+            Array of shape (len(self), N) of pitch angles in radians.
+        """
+        if not allowed_only:
+            return get_pitch_angle_matrix(reference_latitudes, reference_longitudes, self.asymptotic_latitudes, self.asymptotic_longitudes)
+
+        allowed_trajectories = (self.filter_flags == 1)
+        pitch_angle_matrix = np.full((len(self), len(np.atleast_1d(reference_latitudes))), np.nan)
+        pitch_angle_matrix[allowed_trajectories] = get_pitch_angle_matrix(reference_latitudes, reference_longitudes,
+                                                                          self.asymptotic_latitudes[allowed_trajectories],
+                                                                          self.asymptotic_longitudes[allowed_trajectories])
+        return pitch_angle_matrix
+
+    def with_reference_direction(self, reference_latitude: float, reference_longitude: float) -> "AsymptoticDirectionSet":
+        """
+        Get an asymptotic direction set with pitch angles relative to a different reference direction, reusing the traced directions.
+
+        Parameters:
+        - reference_latitude: float
+            The latitude of the new reference direction.
+        - reference_longitude: float
+            The longitude of the new reference direction.
+
+        Returns:
+        - AsymptoticDirectionSet
+            This set if the reference direction is unchanged, otherwise a new set with recalculated pitch angles.
+        """
+        if self.has_reference_direction(reference_latitude, reference_longitude):
+            return self
+
+        new_pitch_angles = get_pitch_angles_for_asymptotic_directions(reference_latitude,
+                                                                     reference_longitude,
+                                                                     self.asymptotic_latitudes,
+                                                                     self.asymptotic_longitudes)
+
+        new_asymptotic_direction_set = AsymptoticDirectionSet.__new__(AsymptoticDirectionSet)
+        new_asymptotic_direction_set._store(self._cube,
+                                            {**self._columns, "angleBetweenIMFinRadians": np.asarray(new_pitch_angles, dtype=float).reshape(self._columns["angleBetweenIMFinRadians"].shape)},
+                                            self._extra_column_names,
+                                            reference_latitude,
+                                            reference_longitude,
+                                            self.date_and_time,
+                                            self.Kp_index)
+        return new_asymptotic_direction_set
+
+    def __len__(self) -> int:
+        return len(self._columns["angleBetweenIMFinRadians"].reshape(-1))
+
+    def fingerprint(self) -> dict:
+        """
+        Get a fingerprint of the set from hashes of its arrays and its reference direction, date and time and Kp index.
+        As sets are immutable, the fingerprint is only calculated once.
+
+        Returns:
+        - dict
+            The fingerprint.
+        """
+        if getattr(self, "_fingerprint", None) is None:
+            cube = self._cube
+            cube_parameters = None if cube is None else {"location_latitudes": cube.location_latitudes,
+                                                         "location_longitudes": cube.location_longitudes,
+                                                         "rigidities": cube.rigidities,
+                                                         "asymptotic_latitudes": cube.asymptotic_latitudes,
+                                                         "asymptotic_longitudes": cube.asymptotic_longitudes,
+                                                         "filter_flags": cube.filter_flags,
+                                                         "direction_labels": cube.direction_labels}
+            self._fingerprint = get_object_fingerprint(self, {"cube": cube_parameters,
+                                                              "columns": self._columns,
+                                                              "extra_column_names": self._extra_column_names,
+                                                              "reference_latitude": self.reference_latitude,
+                                                              "reference_longitude": self.reference_longitude,
+                                                              "date_and_time": self.date_and_time,
+                                                              "Kp_index": self.Kp_index})
+        return self._fingerprint
+
+    def __deepcopy__(self, memo: dict) -> "AsymptoticDirectionSet":
+        # the set is immutable, so copies of DoseRateFrames can safely share it
+        return self
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._set_arrays_read_only()
+
+    def __repr__(self) -> str:
+        number_of_rigidities = len(np.unique(self._columns["Rigidity"])) if self._cube is None else self._cube.shape[2]
+        return (f"AsymptoticDirectionSet({len(self)} trajectories, {number_of_rigidities} rigidities, "
+                f"reference direction ({self.reference_latitude}, {self.reference_longitude}), "
+                f"date and time {self.date_and_time}, Kp {self.Kp_index})")
@@ -0,0 +1,295 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import datetime as dt
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .cacheManager import (cache_directory_names, get_cache_directory, record_cache_hit,
+                           record_cache_miss, record_cache_write, time_calculation)
+
+asymptotic_direction_store_directory = cache_directory_names["asymptotic_directions"]
+
+def get_grid_id(array_of_lats_and_longs: np.ndarray) -> str:
+    """
+    Get an identifier for a grid of [latitude, longitude] locations that only changes when the locations or their order change.
+
+    Parameters:
+    - array_of_lats_and_longs: np.ndarray
+        Array of [latitude, longitude] locations.
+
+    Returns:
+    - str
+        A hexadecimal identifier of the grid.
+    """
+    canonical_locations = np.round(np.asarray(array_of_lats_and_longs, dtype=np.float64).reshape(-1, 2), 9) + 0.0
+    return hashlib.sha256(np.ascontiguousarray(canonical_locations).tobytes()).hexdigest()[:32]
+
+def get_canonical_date_and_time(date_and_time: dt.datetime) -> str:
+    """
+    Get the date and time a trajectory tracer is run for as an ISO 8601 string to the nearest second.
+
+    The calendar fields are taken as they are passed to the tracers, which treat them as UTC.
+    """
+    return date_and_time.replace(tzinfo=None, microsecond=0).isoformat()
+
+def get_asymptotic_direction_descriptor(tracer: str,
+                                        array_of_lats_and_longs: np.ndarray,
+                                        Kp_index: int,
+                                        date_and_time: dt.datetime,
+                                        array_of_zeniths_and_azimuths: list,
+                                        rigidity_levels_GV: Optional[list[float]] = None,
+                                        field_models: Optional[dict] = None,
+                                        **tracer_options) -> dict:
+    """
+    Describe an asymptotic direction calculation by the inputs that determine its result.
+
+    Parameters:
+    - tracer: str
+        The name and version of the trajectory tracer, such as "OTSO 1.2.5".
+    - array_of_lats_and_longs: np.ndarray
+        The [latitude, longitude] locations traced from, which are identified by get_grid_id.
+    - Kp_index: int
+        The Kp index of the magnetic field model.
+    - date_and_time: dt.datetime
+        The date and time of the magnetic field model.
+    - array_of_zeniths_and_azimuths: list
+        The [zenith, azimuth] arrival directions traced.
+    - rigidity_levels_GV: list[float], optional
+        The rigidity levels traced in GV.
+    - field_models: dict, optional
+        The magnetic field models and their settings.
+    - **tracer_options: additional options that change the traced trajectories.
+
+    Returns:
+    - dict
+        A JSON-serialisable descriptor of the calculation.
+    """
+    return {"tracer": tracer,
+            "date_and_time": get_canonical_date_and_time(date_and_time),
+            "Kp_index": int(Kp_index),
+            "field_models": field_models or {},
+            "grid_id": get_grid_id(array_of_lats_and_longs),
+            "number_of_locations": int(np.asarray(array_of_lats_and_longs).reshape(-1, 2).shape[0]),
+            "rigidity_levels_GV": None if rigidity_levels_GV is None else [round(float(rigidity), 9) for rigidity in rigidity_levels_GV],
+            "zeniths_and_azimuths": [[float(zenith), float(azimuth)] for zenith, azimuth in np.asarray(array_of_zeniths_and_azimuths, dtype=float).reshape(-1, 2)],
+            "tracer_options": tracer_options}
+
+def _get_smallest_integer_dtype(values: np.ndarray) -> np.dtype:
+    for integer_dtype in [np.int8, np.int16, np.int32]:
+        if (len(values) == 0) or ((values.min() >= np.iinfo(integer_dtype).min) and (values.max() <= np.iinfo(integer_dtype).max)):
+            return np.dtype(integer_dtype)
+    return np.dtype(np.int64)
+
+def _get_smallest_code_dtype(number_of_unique_values: int) -> np.dtype:
+    for unsigned_dtype in [np.uint8, np.uint16, np.uint32]:
+        if number_of_unique_values <= np.iinfo(unsigned_dtype).max:
+            return np.dtype(unsigned_dtype)
+    return np.dtype(np.uint64)
+
+class AsymptoticDirectionStore:
+    """
+    On-disk store of traced asymptotic directions, keyed by a descriptor of the calculation rather than by the arguments of the function that traced them.
+
+    Each entry is a directory named after the SHA-256 hash of its descriptor, so a lookup is a single path check. Columns are
+    stored as separate .npy files: columns with many repeated values, such as locations, rigidities and arrival directions,
+    are dictionary-encoded as their unique values and small integer codes, and integer columns such as Filter are stored in
+    the smallest integer type that holds them. Files are memory-mapped when read.
+
+    Entries are written to a temporary directory and renamed into place, so concurrent processes only ever see complete
+    entries, and when two processes write the same entry the first one to finish is kept.
+    """
+
+    manifest_file_name = "manifest.json"
+
+    def __init__(self, root_directory: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Parameters:
+        - root_directory: str, optional
+            The directory the store is kept in. It is created when the first entry is saved. Defaults to
+            cachedAsymptoticDirections in the cache root set by ANIMAIRE_CACHE_DIR.
+        """
+        self.root_directory = root_directory if root_directory is not None else get_cache_directory("asymptotic_directions")
+
+    @staticmethod
+    def get_key(descriptor: dict) -> str:
+        """
+        Get the key of the entry for a descriptor.
+        """
+        return hashlib.sha256(json.dumps(descriptor, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get_entry_directory(self, descriptor: dict) -> str:
+        """
+        Get the directory that the entry for a descriptor is stored in.
+        """
+        key = self.get_key(descriptor)
+        return os.path.join(self.root_directory, key[:2], key)
+
+    def contains(self, descriptor: dict) -> bool:
+        """
+        Check whether the store has an entry for a descriptor.
+        """
+        return os.path.exists(os.path.join(self.get_entry_directory(descriptor), self.manifest_file_name))
+
+    def load(self, descriptor: dict) -> Optional[pd.DataFrame]:
+        """
+        Load the asymptotic directions stored for a descriptor.
+
+        Parameters:
+        - descriptor: dict
+            The descriptor of the calculation.
+
+        Returns:
+        - pd.DataFrame or None
+            The stored asymptotic directions, or None if the store has no entry for the descriptor.
+        """
+        entry_directory = self.get_entry_directory(descriptor)
+        try:
+            with open(os.path.join(entry_directory, self.manifest_file_name), "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+        # mark the entry as recently used for least recently used eviction
+        try:
+            os.utime(os.path.join(entry_directory, self.manifest_file_name))
+        except OSError:
+            pass
+
+        columns = {}
+        for column_index, column in enumerate(manifest["columns"]):
+            if column["encoding"] == "dictionary":
+                unique_values = np.load(os.path.join(entry_directory, f"column_{column_index}_values.npy"), mmap_mode="r", allow_pickle=False)
+                codes = np.load(os.path.join(entry_directory, f"column_{column_index}_codes.npy"), mmap_mode="r", allow_pickle=False)
+                column_values = unique_values[codes]
+            else:
+                column_values = np.load(os.path.join(entry_directory, f"column_{column_index}.npy"), mmap_mode="r", allow_pickle=False)
+            columns[column["name"]] = column_values.astype(column["dtype"])
+        return pd.DataFrame(columns, index=pd.RangeIndex(manifest["number_of_rows"]))
+
+    def save(self, descriptor: dict, asymptotic_direction_DF: pd.DataFrame, compute_seconds: float = 0.0):
+        """
+        Save asymptotic directions for a descriptor, unless the store already has an entry for it.
+
+        Parameters:
+        - descriptor: dict
+            The descriptor of the calculation.
+        - asymptotic_direction_DF: pd.DataFrame
+            The asymptotic directions. Only DataFrames whose columns are all numeric are stored.
+        - compute_seconds: float, optional
+            How long the asymptotic directions took to calculate, which is counted as time saved whenever the entry is loaded.
+        """
+        entry_directory = self.get_entry_directory(descriptor)
+        if self.contains(descriptor):
+            return
+        non_numeric_column_names = [column_name for column_name in asymptotic_direction_DF.columns if asymptotic_direction_DF[column_name].dtype.kind not in "biuf"]
+        if non_numeric_column_names:
+            print(f"Warning: asymptotic directions with non-numeric columns {non_numeric_column_names} cannot be stored, continuing without storing them.")
+            return
+        os.makedirs(os.path.dirname(entry_directory), exist_ok=True)
+
+        temporary_directory = tempfile.mkdtemp(dir=os.path.dirname(entry_directory), prefix=".tmp_")
+        try:
+            manifest = {"descriptor": descriptor, "number_of_rows": len(asymptotic_direction_DF), "columns": [],
+                        "created": dt.datetime.now(dt.timezone.utc).isoformat(), "compute_seconds": float(compute_seconds)}
+            for column_index, column_name in enumerate(asymptotic_direction_DF.columns):
+                column_values = asymptotic_direction_DF[column_name].to_numpy()
+                column = {"name": str(column_name), "dtype": column_values.dtype.str}
+
+                codes, unique_values = pd.factorize(column_values, use_na_sentinel=False)
+                if len(unique_values) <= len(column_values) // 2:
+                    column["encoding"] = "dictionary"
+                    np.save(os.path.join(temporary_directory, f"column_{column_index}_values.npy"), np.asarray(unique_values, dtype=column_values.dtype))
+                    np.save(os.path.join(temporary_directory, f"column_{column_index}_codes.npy"), codes.astype(_get_smallest_code_dtype(len(unique_values))))
+                else:
+                    column["encoding"] = "plain"
+                    if column_values.dtype.kind in "iu":
+                        column_values = column_values.astype(_get_smallest_integer_dtype(column_values))
+                    np.save(os.path.join(temporary_directory, f"column_{column_index}.npy"), column_values)
+                manifest["columns"].append(column)
+
+            # the manifest is written last, so an entry is only ever read once all of its columns exist
+            with open(os.path.join(temporary_directory, self.manifest_file_name), "w") as manifest_file:
+                json.dump(manifest, manifest_file, default=str)
+            os.chmod(temporary_directory, 0o755)
+            os.rename(temporary_directory, entry_directory)
+        except OSError:
+            if not self.contains(descriptor):
+                print("Warning: could not write to the asymptotic direction store, continuing without storing these asymptotic directions.")
+        finally:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    def get_or_compute(self, descriptor: dict, compute_asymptotic_directions: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Load the asymptotic directions stored for a descriptor, or calculate and store them if the store has no entry for it.
+
+        Parameters:
+        - descriptor: dict
+            The descriptor of the calculation.
+        - compute_asymptotic_directions: callable
+            Function with no arguments that calculates the asymptotic directions.
+
+        Returns:
+        - pd.DataFrame
+            The asymptotic directions.
+        """
+        asymptotic_direction_DF = self.load(descriptor)
+        if asymptotic_direction_DF is not None:
+            self.record_hit(descriptor)
+            return asymptotic_direction_DF
+
+        record_cache_miss("asymptotic_directions")
+        asymptotic_direction_DF, compute_seconds = time_calculation(compute_asymptotic_directions)
+        self.save(descriptor, asymptotic_direction_DF, compute_seconds)
+        record_cache_write("asymptotic_directions")
+        return asymptotic_direction_DF
+
+    def record_hit(self, descriptor: dict):
+        """
+        Count a load of the entry for a descriptor in the cache statistics.
+        """
+        entry_directory = self.get_entry_directory(descriptor)
+        try:
+            with open(os.path.join(entry_directory, self.manifest_file_name), "r") as manifest_file:
+                compute_seconds = json.load(manifest_file).get("compute_seconds", 0.0)
+            bytes_read = sum(entry_file.stat().st_size for entry_file in os.scandir(entry_directory))
+        except (OSError, ValueError):
+            compute_seconds, bytes_read = 0.0, 0
+        record_cache_hit("asymptotic_directions", bytes_read, compute_seconds)
+
+    def clear(self):
+        """
+        Delete every entry in the store.
+        """
+        shutil.rmtree(self.root_directory, ignore_errors=True)
+
+_configured_store = None
+
+def configure_asymptotic_direction_store(root_directory: Optional[str] = None) -> AsymptoticDirectionStore:
+    """
+    Configure the asymptotic direction store used by AniMAIRE for the rest of the process.
+
+    Parameters:
+    - root_directory: str, optional
+        The directory the store is kept in. Defaults to cachedAsymptoticDirections in the cache root set by ANIMAIRE_CACHE_DIR.
+
+    Returns:
+    - AsymptoticDirectionStore
+        The configured store.
+    """
+    global _configured_store
+    _configured_store = AsymptoticDirectionStore(root_directory)
+    return _configured_store
+
+def get_asymptotic_direction_store() -> AsymptoticDirectionStore:
+    """
+    Get the asymptotic direction store configured for this process, configuring the default store if none has been configured yet.
+    """
+    if _configured_store is None:
+        configure_asymptotic_direction_store()
+    return _configured_store
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import argparse
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+cache_root_environment_variable = "ANIMAIRE_CACHE_DIR"
+
+# directory of each cache within the cache root, and the file that marks each entry of the cache. The pitch_angles cache
+# is no longer written, but is listed so that entries left by earlier versions of AniMAIRE can be evicted and cleared
+cache_directory_names = {"asymptotic_directions": "cachedAsymptoticDirections",
+                         "dose_response_kernels": "cachedDoseResponseKernels",
+                         "event": ".AniMAIRE_event_cache",
+                         "OTSO": "cachedOTSOData",
+                         "pitch_angles": "cacheAsymptoticDirectionOutputs",
+                         "MAGNETOCOSMICS": "cachedMagnetocosmicsRunData"}
+cache_entry_marker_files = {"asymptotic_directions": "manifest.json",
+                            "dose_response_kernels": None,
+                            "event": "output.pkl",
+                            "OTSO": "output.pkl",
+                            "pitch_angles": "output.pkl",
+                            "MAGNETOCOSMICS": "output.pkl"}
+
+statistics_directory_name = ".AniMAIRE_cache_statistics"
+statistics_file_name = "statistics.json"
+statistic_names = ["hits", "misses", "bytes_read", "compute_seconds_saved"]
+
+# enforcing a budget lists every entry of the cache, so after writes each cache's budget is checked at most this often
+budget_enforcement_interval_seconds = 30.0
+# a lock on the statistics file older than this is taken to be left behind by a process that was killed while saving
+stale_lock_seconds = 60.0
+
+def get_empty_cache_statistics() -> dict:
+    """
+    Get zero counts for every cache.
+    """
+    return {cache_name: dict.fromkeys(statistic_names, 0) for cache_name in cache_directory_names}
+
+_cache_budgets = {}
+_last_budget_enforcement_times = {}
+_cache_statistics = get_empty_cache_statistics()
+# the counts of this process that have already been added to the saved statistics file
+_saved_cache_statistics = get_empty_cache_statistics()
+
+def get_cache_root() -> str:
+    """
+    Get the directory that AniMAIRE's caches are kept in.
+
+    This is set with the ANIMAIRE_CACHE_DIR environment variable before AniMAIRE is imported, and defaults to the current
+    working directory. MAGNETOCOSMICS runs are always cached in the current working directory by AsympDirsCalculator.
+    """
+    return os.environ.get(cache_root_environment_variable) or "."
+
+def get_cache_directory(cache_name: str, cache_root: Optional[str] = None) -> str:
+    """
+    Get the directory of one of AniMAIRE's caches.
+
+    Parameters:
+    - cache_name: str
+        One of the names in cache_directory_names.
+    - cache_root: str, optional
+        The cache root to use. Defaults to get_cache_root().
+
+    Returns:
+    - str
+        The cache directory.
+    """
+    if cache_name not in cache_directory_names:
+        raise ValueError(f"Error: cache_name must be one of {list(cache_directory_names)}, not '{cache_name}'.")
+    if cache_name == "MAGNETOCOSMICS":
+        cache_root = os.getcwd()
+    return os.path.join(cache_root or get_cache_root(), cache_directory_names[cache_name])
+
+def record_cache_hit(cache_name: str, bytes_read: int = 0, compute_seconds_saved: float = 0.0):
+    """
+    Count a result that was loaded from a cache rather than calculated.
+    """
+    _cache_statistics[cache_name]["hits"] += 1
+    _cache_statistics[cache_name]["bytes_read"] += int(bytes_read)
+    _cache_statistics[cache_name]["compute_seconds_saved"] += float(compute_seconds_saved)
+
+def record_cache_miss(cache_name: str):
+    """
+    Count a result that was not found in a cache and had to be calculated.
+    """
+    _cache_statistics[cache_name]["misses"] += 1
+
+def get_directory_size(directory: str) -> int:
+    """
+    Get the total size in bytes of the files in a directory and its subdirectories.
+    """
+    return sum(os.path.getsize(os.path.join(directory_path, file_name))
+               for directory_path, _, file_names in os.walk(directory) for file_name in file_names)
+
+def call_with_joblib_cache(cache_name: str, memorized_function, *args, **kwargs) -> Any:
+    """
+    Call a function cached with joblib.Memory, counting whether the result was loaded from the cache.
+
+    Parameters:
+    - cache_name: str
+        The name of the cache the function is stored in.
+    - memorized_function: joblib.memory.MemorizedFunc
+        The cached function.
+    - *args, **kwargs: the arguments to call the function with.
+
+    Returns:
+    - Any
+        The function's result.
+    """
+    if not memorized_function.check_call_in_cache(*args, **kwargs):
+        record_cache_miss(cache_name)
+        result = memorized_function(*args, **kwargs)
+        record_cache_write(cache_name)
+        return result
+
+    bytes_read, compute_seconds_saved = 0, 0.0
+    try:
+        item_path = [memorized_function.func_id, memorized_function._get_args_id(*args, **kwargs)]
+        bytes_read = get_directory_size(os.path.join(memorized_function.store_backend.location, *item_path))
+        compute_seconds_saved = memorized_function.store_backend.get_metadata(item_path).get("duration", 0.0)
+    except Exception:
+        pass
+    record_cache_hit(cache_name, bytes_read, compute_seconds_saved)
+    return memorized_function(*args, **kwargs)
+
+def time_calculation(calculate: Callable[[], Any]) -> tuple[Any, float]:
+    """
+    Run a calculation, returning its result and the number of seconds it took.
+    """
+    start_time = time.perf_counter()
+    result = calculate()
+    return result, time.perf_counter() - start_time
+
+def get_cache_entries(cache_name: str, cache_root: Optional[str] = None) -> pd.DataFrame:
+    """
+    List the entries of a cache.
+
+    An entry is a directory holding one cached result, or a single file for caches that store one file per result.
+    An entry was last used when any of its files was last read or written, so how precisely reads are tracked depends
+    on how the file system records access times.
+
+    Parameters:
+    - cache_name: str
+        One of the names in cache_directory_names.
+    - cache_root: str, optional
+        The cache root to use. Defaults to get_cache_root().
+
+    Returns:
+    - pd.DataFrame
+        DataFrame with path, size_bytes and last_used (seconds since the epoch) columns, one row per entry.
+    """
+    cache_directory = get_cache_directory(cache_name, cache_root)
+    marker_file_name = cache_entry_marker_files[cache_name]
+    entries = []
+    for directory_path, directory_names, file_names in os.walk(cache_directory):
+        if (marker_file_name is not None) and (marker_file_name not in file_names):
+            continue
+        entry_paths = [directory_path] if marker_file_name is not None else [os.path.join(directory_path, file_name) for file_name in file_names]
+        for entry_path in entry_paths:
+            file_paths = ([os.path.join(walk_path, file_name) for walk_path, _, walk_file_names in os.walk(entry_path) for file_name in walk_file_names]
+                          if os.path.isdir(entry_path) else [entry_path])
+            try:
+                file_stats = [os.stat(file_path) for file_path in file_paths]
+            except FileNotFoundError:
+                # removed by another process while being listed
+                continue
+            entries.append({"path": entry_path,
+                            "size_bytes": sum(file_stat.st_size for file_stat in file_stats),
+                            "last_used": max([max(file_stat.st_atime, file_stat.st_mtime) for file_stat in file_stats], default=0.0)})
+        if marker_file_name is not None:
+            directory_names.clear()
+    return pd.DataFrame(entries, columns=["path", "size_bytes", "last_used"])
+
+def evict_cache_entries(cache_name: str,
+                        max_bytes: Optional[int] = None,
+                        max_age_seconds: Optional[float] = None,
+                        cache_root: Optional[str] = None) -> int:
+    """
+    Delete cache entries that have not been used for longer than max_age_seconds, and then the least recently used
+    entries until the cache is no larger than max_bytes.
+
+    Parameters:
+    - cache_name: str
+        One of the names in cache_directory_names.
+    - max_bytes: int, optional
+        The largest allowed size of the cache in bytes.
+    - max_age_seconds: float, optional
+        The longest time in seconds that an entry can go unused before it is deleted.
+    - cache_root: str, optional
+        The cache root to use. Defaults to get_cache_root().
+
+    Returns:
+    - int
+        The number of bytes freed.
+    """
+    entries = get_cache_entries(cache_name, cache_root).sort_values("last_used", ignore_index=True)
+    to_evict = pd.Series(False, index=entries.index)
+    if max_age_seconds is not None:
+        to_evict |= entries["last_used"] < (time.time() - max_age_seconds)
+    if max_bytes is not None:
+        # entries are ordered from least to most recently used, so evict from the start until the rest fit in the budget
+        bytes_in_more_recent_entries = entries["size_bytes"][::-1].cumsum()[::-1]
+        to_evict |= bytes_in_more_recent_entries > max_bytes
+
+    for entry_path in entries.loc[to_evict, "path"]:
+        if os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+    return int(entries.loc[to_evict, "size_bytes"].sum())
+
+def configure_cache_budget(cache_name: str, max_bytes: Optional[int] = None, max_age_seconds: Optional[float] = None):
+    """
+    Set limits on the size of a cache and the age of its entries, which are enforced after entries are added to the
+    cache (at most once every budget_enforcement_interval_seconds), when enforce_cache_budgets is called and when the process exits.
+
+    Parameters:
+    - cache_name: str
+        One of the names in cache_directory_names.
+    - max_bytes: int, optional
+        The largest allowed size of the cache in bytes. None removes the limit.
+    - max_age_seconds: float, optional
+        The longest time in seconds that an entry can go unused before it is deleted. None removes the limit.
+    """
+    get_cache_directory(cache_name)
+    if (max_bytes is None) and (max_age_seconds is None):
+        _cache_budgets.pop(cache_name, None)
+    else:
+        _cache_budgets[cache_name] = {"max_bytes": max_bytes, "max_age_seconds": max_age_seconds}
+
+def record_cache_write(cache_name: str):
+    """
+    Note that an entry was added to a cache, enforcing the cache's budget if it has one and it has not been enforced
+    within the last budget_enforcement_interval_seconds.
+    """
+    if cache_name not in _cache_budgets:
+        return
+    current_time = time.monotonic()
+    last_enforcement_time = _last_budget_enforcement_times.get(cache_name)
+    if (last_enforcement_time is not None) and ((current_time - last_enforcement_time) < budget_enforcement_interval_seconds):
+        return
+    _last_budget_enforcement_times[cache_name] = current_time
+    enforce_cache_budgets([cache_name])
+
+def enforce_cache_budgets(cache_names: Optional[list[str]] = None) -> int:
+    """
+    Evict entries from caches that are over the budgets set with configure_cache_budget.
+
+    Parameters:
+    - cache_names: list[str], optional
+        The caches to check. By default every cache with a budget.
+
+    Returns:
+    - int
+        The number of bytes freed.
+    """
+    return sum(evict_cache_entries(cache_name, **_cache_budgets[cache_name])
+               for cache_name in (cache_names if cache_names is not None else list(_cache_budgets)) if cache_name in _cache_budgets)
+
+def get_unsaved_cache_statistics() -> dict:
+    """
+    Get the counts of this process that have not yet been added to the saved statistics file.
+    """
+    return {cache_name: {statistic_name: cache_statistics[statistic_name] - _saved_cache_statistics.get(cache_name, {}).get(statistic_name, 0)
+                         for statistic_name in statistic_names}
+            for cache_name, cache_statistics in _cache_statistics.items()}
+
+def add_cache_statistics(statistics: dict, statistics_to_add: dict):
+    for cache_name, cache_statistics in statistics_to_add.items():
+        for statistic_name in statistic_names:
+            statistics.setdefault(cache_name, dict.fromkeys(statistic_names, 0))[statistic_name] += cache_statistics.get(statistic_name, 0)
+
+def read_saved_cache_statistics(statistics_directory: str) -> dict:
+    """
+    Read the counts saved in a statistics directory, or empty counts if none have been saved.
+    """
+    try:
+        with open(os.path.join(statistics_directory, statistics_file_name), "r") as statistics_file:
+            return json.load(statistics_file)
+    except (OSError, ValueError):
+        return {}
+
+def acquire_statistics_lock(lock_file_path: str, timeout_seconds: float = 5.0) -> bool:
+    """
+    Create a lock file so that only one process updates the statistics file at a time.
+
+    Returns:
+    - bool
+        Whether the lock was acquired within timeout_seconds.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        try:
+            os.close(os.open(lock_file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if (time.time() - os.path.getmtime(lock_file_path)) > stale_lock_seconds:
+                    os.remove(lock_file_path)
+                    continue
+            except OSError:
+                continue
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+
+def get_cache_statistics(cache_root: Optional[str] = None, include_other_processes: bool = True) -> pd.DataFrame:
+    """
+    Get hit and miss counts, the bytes read from each cache and the calculation time saved by cache hits, along with
+    the current size of each cache.
+
+    Parameters:
+    - cache_root: str, optional
+        The cache root to use. Defaults to get_cache_root().
+    - include_other_processes: bool, optional
+        Whether to include the counts saved by earlier and concurrent processes using the same cache root, which
+        are added to a single statistics file when each process exits. Otherwise only this process' counts are included.
+
+    Returns:
+    - pd.DataFrame
+        One row per cache with hits, misses, hit_rate, bytes_read, compute_seconds_saved, entries and size_bytes columns.
+    """
+    if include_other_processes:
+        statistics = read_saved_cache_statistics(os.path.join(cache_root or get_cache_root(), statistics_directory_name))
+        add_cache_statistics(statistics, get_unsaved_cache_statistics())
+    else:
+        statistics = {cache_name: dict(cache_statistics) for cache_name, cache_statistics in _cache_statistics.items()}
+
+    statistics_DF = pd.DataFrame.from_dict(statistics, orient="index")[statistic_names]
+    lookups = statistics_DF["hits"] + statistics_DF["misses"]
+    statistics_DF.insert(2, "hit_rate", (statistics_DF["hits"] / lookups.where(lookups > 0)).fillna(0.0))
+    cache_entries = {cache_name: get_cache_entries(cache_name, cache_root) for cache_name in statistics_DF.index if cache_name in cache_directory_names}
+    statistics_DF["entries"] = [len(cache_entries.get(cache_name, [])) for cache_name in statistics_DF.index]
+    statistics_DF["size_bytes"] = [int(cache_entries[cache_name]["size_bytes"].sum()) if cache_name in cache_entries else 0 for cache_name in statistics_DF.index]
+    statistics_DF.index.name = "cache"
+    return statistics_DF
+
+def reset_cache_statistics(cache_root: Optional[str] = None):
+    """
+    Reset the counts of this process and delete the counts saved by other processes.
+    """
+    for cache_statistics in list(_cache_statistics.values()) + list(_saved_cache_statistics.values()):
+        cache_statistics.update(dict.fromkeys(statistic_names, 0))
+    shutil.rmtree(os.path.join(cache_root or get_cache_root(), statistics_directory_name), ignore_errors=True)
+
+def save_cache_statistics():
+    """
+    Add this process' counts since it last saved them to the statistics file in the cache root, so that they are
+    included in get_cache_statistics in other processes. Every process adds to the same file, so it does not grow
+    with the number of processes.
+    """
+    unsaved_statistics = get_unsaved_cache_statistics()
+    if not any(any(cache_statistics.values()) for cache_statistics in unsaved_statistics.values()):
+        return
+    statistics_directory = os.path.join(get_cache_root(), statistics_directory_name)
+    lock_file_path = os.path.join(statistics_directory, f"{statistics_file_name}.lock")
+    try:
+        os.makedirs(statistics_directory, exist_ok=True)
+        if not acquire_statistics_lock(lock_file_path):
+            return
+        try:
+            statistics = read_saved_cache_statistics(statistics_directory)
+            add_cache_statistics(statistics, unsaved_statistics)
+            temporary_file_path = os.path.join(statistics_directory, f".{statistics_file_name}.tmp")
+            with open(temporary_file_path, "w") as statistics_file:
+                json.dump(statistics, statistics_file)
+            os.replace(temporary_file_path, os.path.join(statistics_directory, statistics_file_name))
+            add_cache_statistics(_saved_cache_statistics, unsaved_statistics)
+        finally:
+            os.remove(lock_file_path)
+    except OSError:
+        pass
+
+def _save_statistics_and_enforce_budgets():
+    save_cache_statistics()
+    enforce_cache_budgets()
+
+atexit.register(_save_statistics_and_enforce_budgets)
+
+def parse_byte_count(byte_count: str) -> int:
+    """
+    Parse a number of bytes such as "500000", "200M" or "1.5G".
+    """
+    byte_count = byte_count.strip().upper().removesuffix("B")
+    multipliers = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    if byte_count and (byte_count[-1] in multipliers):
+        return int(float(byte_count[:-1]) * multipliers[byte_count[-1]])
+    return int(float(byte_count))
+
+def main(argv: Optional[list[str]] = None):
+    """
+    Command line entry point for inspecting and evicting AniMAIRE's caches.
+    """
+    parser = argparse.ArgumentParser(prog="animaire-cache", description="Inspect and limit the size of AniMAIRE's caches.")
+    parser.add_argument("--root", default=None, help=f"cache root directory (default: ${cache_root_environment_variable} or the current directory)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="show hit and miss counts and the size of each cache")
+    stats_parser.add_argument("--reset", action="store_true", help="delete the saved counts after showing them")
+
+    evict_parser = subparsers.add_parser("evict", help="delete old or least recently used cache entries")
+    evict_parser.add_argument("--cache", action="append", choices=list(cache_directory_names), help="cache to evict from (default: all caches)")
+    evict_parser.add_argument("--max-bytes", type=parse_byte_count, default=None, help="largest allowed size of each cache, such as 500M or 20G")
+    evict_parser.add_argument("--max-age-days", type=float, default=None, help="delete entries that have not been used for this many days")
+
+    clear_parser = subparsers.add_parser("clear", help="delete every entry of a cache")
+    clear_parser.add_argument("--cache", action="append", choices=list(cache_directory_names), help="cache to clear (default: all caches)")
+
+    arguments = parser.parse_args(argv)
+    cache_names = getattr(arguments, "cache", None) or list(cache_directory_names)
+
+    if arguments.command == "stats":
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(get_cache_statistics(arguments.root))
+        if arguments.reset:
+            reset_cache_statistics(arguments.root)
+    elif arguments.command == "evict":
+        if (arguments.max_bytes is None) and (arguments.max_age_days is None):
+            parser.error("evict requires --max-bytes and/or --max-age-days")
+        for cache_name in cache_names:
+            freed_bytes = evict_cache_entries(cache_name, arguments.max_bytes,
+                                              None if arguments.max_age_days is None else arguments.max_age_days * 24.0 * 60.0 * 60.0,
+                                              arguments.root)
+            print(f"{cache_name}: freed {freed_bytes} bytes")
+    else:
+        for cache_name in cache_names:
+            freed_bytes = evict_cache_entries(cache_name, max_bytes=0, cache_root=arguments.root)
+            print(f"{cache_name}: freed {freed_bytes} bytes")
+
+if __name__ == "__main__":
+    sys.exit(main())
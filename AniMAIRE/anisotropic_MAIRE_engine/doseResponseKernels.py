@@ -0,0 +1,345 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from importlib.metadata import version, PackageNotFoundError
+
+from atmosphericRadiationDoseAndFlux import particleResponse
+from atmosphericRadiationDoseAndFlux import Particle as DAFparticle
+from atmosphericRadiationDoseAndFlux import Distance as DAFdistance
+from atmosphericRadiationDoseAndFlux.responseFileParameters import calculate_altitude_layer_params
+import ParticleRigidityCalculationTools as PRCT
+
+from .cacheManager import get_cache_directory, record_cache_hit, record_cache_miss, record_cache_write
+
+kernel_cache_directory = get_cache_directory("dose_response_kernels")
+
+try:
+    DAF_library_version = version("atmosphericRadiationDoseAndFlux")
+except PackageNotFoundError:
+    DAF_library_version = "unknown"
+
+# increase this whenever the layout or contents of the tabulated kernels change, so that stale kernel caches are not loaded
+kernel_format_version = 1
+
+# atmosphericRadiationDoseAndFlux tabulates responses up to this altitude, and uses the top layer for any altitude above it
+top_atmospheric_layer_altitude_in_km = 97.5
+
+# Output columns produced by atmosphericRadiationDoseAndFlux, in the order that library returns them
+list_of_dose_rate_names = ["edose", "adose", "dosee", "tn1", "tn2", "tn3", "SEU", "SEL"]
+
+def validate_dose_types(dose_types: list[str] = None) -> list[str]:
+    """
+    Check a selection of dose rate types and put it into the order used by list_of_dose_rate_names.
+
+    Parameters:
+    - dose_types: list[str], optional
+        The dose rate types to calculate. By default every dose rate type is calculated.
+
+    Returns:
+    - list[str]
+        The selected dose rate types, ordered as in list_of_dose_rate_names.
+    """
+    if dose_types is None:
+        return list(list_of_dose_rate_names)
+    if isinstance(dose_types, str):
+        dose_types = [dose_types]
+
+    unknown_dose_types = [dose_type for dose_type in dose_types if dose_type not in list_of_dose_rate_names]
+    if unknown_dose_types:
+        raise ValueError(f"Error: unknown dose types {unknown_dose_types}, dose types must be chosen from {list_of_dose_rate_names}.")
+    if len(dose_types) == 0:
+        raise ValueError("Error: at least one dose type must be selected.")
+    return [dose_rate_name for dose_rate_name in list_of_dose_rate_names if dose_rate_name in dose_types]
+
+# Default energy bin edges (MeV) used by atmosphericRadiationDoseAndFlux.doseAndFluxCalculator.calculate_from_rigidity_spec
+default_energy_bins_MeV = 10**(0.1*(np.array(range(1,52))-1)+1)
+
+def get_response_rigidity_bins(particle_name: str) -> np.ndarray:
+    """
+    Get the rigidity bin edges used by atmosphericRadiationDoseAndFlux for a given particle.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+
+    Returns:
+    - np.ndarray
+        The rigidity bin edges in GV.
+    """
+    particle_for_calculations = DAFparticle(particle_name)
+    return np.array(PRCT.convertParticleEnergyToRigidity(default_energy_bins_MeV,
+                                                         particleMassAU=particle_for_calculations.atomicMass,
+                                                         particleChargeAU=particle_for_calculations.atomicCharge))
+
+def get_response_rigidity_midpoints(particle_name: str) -> np.ndarray:
+    """
+    Get the rigidities in GV at which atmosphericRadiationDoseAndFlux samples an input rigidity spectrum.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+
+    Returns:
+    - np.ndarray
+        The rigidity bin midpoints in GV.
+    """
+    rigidity_bins = get_response_rigidity_bins(particle_name)
+    return (rigidity_bins[1:] + rigidity_bins[:-1])/2
+
+def get_kernel_cache_file_path(particle_name: str) -> str:
+    """
+    Get the path of the on-disk layer response kernel for a particle, the kernel format version and the installed atmosphericRadiationDoseAndFlux version.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+
+    Returns:
+    - str
+        The path to the .npy file the kernel is stored in.
+    """
+    return os.path.join(kernel_cache_directory, f"{particle_name}_layer_response_kernel_v{kernel_format_version}_{DAF_library_version}.npy")
+
+def tabulate_layer_response_kernel(particle_name: str) -> np.ndarray:
+    """
+    Tabulate the response of each atmospheric layer used by atmosphericRadiationDoseAndFlux to a unit rigidity spectrum value
+    at each of the library's rigidity midpoints.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+
+    Returns:
+    - np.ndarray
+        Array of shape (atmospheric layers, dose rate types, rigidity midpoints), with dose rate types ordered as in list_of_dose_rate_names.
+    """
+    particle_for_calculations = DAFparticle(particle_name)
+    rigidity_bins = get_response_rigidity_bins(particle_name)
+    rigidity_midpoints = (rigidity_bins[1:] + rigidity_bins[:-1])/2
+    energy_bins = np.array(PRCT.convertParticleRigidityToEnergy(rigidity_bins,
+                                                                particleMassAU=particle_for_calculations.atomicMass,
+                                                                particleChargeAU=particle_for_calculations.atomicCharge))
+
+    # integrated flux in each energy bin produced by a unit rigidity spectrum value at the bin's rigidity midpoint
+    unit_energy_spectrum_values = np.array(PRCT.convertParticleRigiditySpecToEnergySpec(rigidity_midpoints,
+                                                                                         np.ones(len(rigidity_midpoints)),
+                                                                                         particleMassAU=particle_for_calculations.atomicMass,
+                                                                                         particleChargeAU=particle_for_calculations.atomicCharge)["Energy distribution values"])
+    unit_integrated_fluxes = unit_energy_spectrum_values * np.diff(energy_bins) * np.pi
+
+    layer_response_columns = []
+    for dose_type in particleResponse.fullListOfDoseResponseTypes:
+        dose_response_for_particle = particleResponse.fullDoseResponseDict[dose_type](particle_for_calculations, dose_type)
+        energy_index_offset = getattr(dose_response_for_particle, "energyIndexTranslationDict", {}).get(dose_type, 0)
+        layer_response_columns.append(dose_response_for_particle.particleResponseArray[:, energy_index_offset:energy_index_offset + len(rigidity_midpoints)] * unit_integrated_fluxes)
+
+    layer_response_kernel = np.stack(layer_response_columns, axis=1)
+    tn2_layer_response = layer_response_kernel[:, list_of_dose_rate_names.index("tn2"), :]
+    return np.concatenate([layer_response_kernel, (tn2_layer_response * 1e-13)[:, np.newaxis, :], (tn2_layer_response * 1e-8)[:, np.newaxis, :]], axis=1)
+
+@lru_cache(maxsize=None)
+def load_layer_response_kernel(particle_name: str) -> np.ndarray:
+    """
+    Load the layer response kernel for a particle, tabulating it and saving it to disk if it has not been cached yet.
+
+    The kernel is memory-mapped read-only, so worker processes share the same cached tables rather than rebuilding them.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+
+    Returns:
+    - np.ndarray
+        Array of shape (atmospheric layers, dose rate types, rigidity midpoints).
+    """
+    kernel_file_path = get_kernel_cache_file_path(particle_name)
+    try:
+        layer_response_kernel = np.load(kernel_file_path, mmap_mode="r")
+        record_cache_hit("dose_response_kernels", layer_response_kernel.nbytes)
+        return layer_response_kernel
+    except (FileNotFoundError, ValueError, OSError):
+        pass
+
+    record_cache_miss("dose_response_kernels")
+    layer_response_kernel = tabulate_layer_response_kernel(particle_name)
+    try:
+        os.makedirs(kernel_cache_directory, exist_ok=True)
+        file_descriptor, temporary_file_path = tempfile.mkstemp(dir=kernel_cache_directory, suffix=".npy.tmp")
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            np.save(temporary_file, layer_response_kernel)
+        os.chmod(temporary_file_path, 0o644)
+        # the rename is atomic, so other processes never see a partially written kernel
+        os.replace(temporary_file_path, kernel_file_path)
+        record_cache_write("dose_response_kernels")
+        return np.load(kernel_file_path, mmap_mode="r")
+    except OSError:
+        print("Warning: could not write the dose response kernel cache, continuing with an in-memory kernel.")
+        layer_response_kernel.setflags(write=False)
+        return layer_response_kernel
+
+def get_altitude_layer_weights(altitudes_in_km: list[float], number_of_layers: int) -> np.ndarray:
+    """
+    Get the matrix that interpolates atmospheric layer responses to a set of altitudes, in the same way as atmosphericRadiationDoseAndFlux.
+
+    Altitudes above the top atmospheric layer (97.5 km) are given the response of the top layer, and a warning is printed.
+
+    Parameters:
+    - altitudes_in_km: list[float]
+        The altitudes in km.
+    - number_of_layers: int
+        The number of atmospheric layers the responses are tabulated on.
+
+    Returns:
+    - np.ndarray
+        Array of shape (altitudes, atmospheric layers).
+    """
+    altitudes_above_top_layer = [altitude_in_km for altitude_in_km in altitudes_in_km if top_atmospheric_layer_altitude_in_km < altitude_in_km <= 100.0]
+    if len(altitudes_above_top_layer) > 0:
+        print(f"Warning: altitudes {altitudes_above_top_layer} km are above the top atmospheric layer at {top_atmospheric_layer_altitude_in_km} km, "
+              "so the dose rates of the top layer are used for them.")
+
+    altitude_layer_weights = np.zeros((len(altitudes_in_km), number_of_layers))
+    for altitude_index, altitude_in_km in enumerate(altitudes_in_km):
+        altitude = DAFdistance(altitude_in_km * 1000.0)
+        altitude_layer_index, f1 = calculate_altitude_layer_params(altitude.meters, altitude.km)
+        if altitude_layer_index == -1:
+            raise Exception("altitude.km has to be less than 100 km!")
+        altitude_layer_weights[altitude_index, altitude_layer_index] += f1
+        altitude_layer_weights[altitude_index, min(altitude_layer_index + 1, number_of_layers - 1)] += 1.0 - f1
+    return altitude_layer_weights
+
+def get_dose_response_kernel(particle_name: str, altitudes_in_km: list[float], dose_types: list[str] = None) -> np.ndarray:
+    """
+    Get the atmospheric dose and flux responses of a particle species at a set of altitudes.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+    - altitudes_in_km: list[float]
+        The altitudes in km.
+    - dose_types: list[str], optional
+        The dose rate types to return responses for. By default responses are returned for every dose rate type.
+
+    Returns:
+    - np.ndarray
+        Array of shape (altitudes, dose rate types, rigidity midpoints), such that the dose rates for a spectrum
+        sampled at get_response_rigidity_midpoints(particle_name) are given by the kernel multiplied by the spectrum values.
+        The dose rate types are ordered as in list_of_dose_rate_names.
+    """
+    layer_response_kernel = load_layer_response_kernel(particle_name)
+    if dose_types is not None:
+        layer_response_kernel = layer_response_kernel[:, [list_of_dose_rate_names.index(dose_type) for dose_type in validate_dose_types(dose_types)], :]
+    altitude_layer_weights = get_altitude_layer_weights(np.atleast_1d(np.array(altitudes_in_km, dtype=float)), len(layer_response_kernel))
+    return np.einsum("al,ldr->adr", altitude_layer_weights, layer_response_kernel)
+
+def linear_interpolation_matrix(knots: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Build the matrix that linearly interpolates values defined at a set of knots onto a set of target points.
+
+    Values outside the range of the knots are set to zero, matching scipy's interp1d with bounds_error=False and fill_value=0.0.
+
+    Parameters:
+    - knots: np.ndarray
+        The sorted points at which values are defined.
+    - targets: np.ndarray
+        The points at which interpolated values are required.
+
+    Returns:
+    - np.ndarray
+        Array of shape (targets, knots).
+    """
+    knots = np.asarray(knots, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    interpolation_matrix = np.zeros((len(targets), len(knots)))
+
+    if len(knots) == 1:
+        interpolation_matrix[targets == knots[0], 0] = 1.0
+        return interpolation_matrix
+
+    inside_knot_range = np.where((targets >= knots[0]) & (targets <= knots[-1]))[0]
+    lower_knot_indices = np.clip(np.searchsorted(knots, targets[inside_knot_range], side="right") - 1, 0, len(knots) - 2)
+    fractions = (targets[inside_knot_range] - knots[lower_knot_indices]) / (knots[lower_knot_indices + 1] - knots[lower_knot_indices])
+
+    interpolation_matrix[inside_knot_range, lower_knot_indices] = 1.0 - fractions
+    interpolation_matrix[inside_knot_range, lower_knot_indices + 1] += fractions
+    return interpolation_matrix
+
+def trapezoid_weights(x: np.ndarray) -> np.ndarray:
+    """
+    Get the weights w such that np.dot(w, y) equals scipy.integrate.trapezoid(y, x).
+
+    Parameters:
+    - x: np.ndarray
+        The sample points.
+
+    Returns:
+    - np.ndarray
+        The trapezoid rule weights for each sample point.
+    """
+    x = np.asarray(x, dtype=float)
+    weights = np.zeros(len(x))
+    if len(x) < 2:
+        return weights
+    interval_widths = np.diff(x)
+    weights[:-1] += interval_widths / 2
+    weights[1:] += interval_widths / 2
+    return weights
+
+def get_dose_response_kernel_on_rigidity_grid(particle_name: str, altitudes_in_km: list[float], rigidity_grid: np.ndarray, rigidity_column_indices: np.ndarray = None,
+                                              dose_types: list[str] = None) -> np.ndarray:
+    """
+    Get the dose response kernel for weighting factors tabulated on an arbitrary sorted rigidity grid.
+
+    The weighting factors are linearly interpolated onto the response rigidities before integration,
+    so this is equivalent to building an interp1d spectrum from the weighting factors and passing it to
+    DAFcalc.calculate_from_rigidity_spec.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+    - altitudes_in_km: list[float]
+        The altitudes in km.
+    - rigidity_grid: np.ndarray
+        The sorted rigidities in GV that weighting factors are tabulated on.
+    - rigidity_column_indices: np.ndarray, optional
+        Indices of the rigidity grid points to return kernel columns for. By default columns are returned for the whole grid.
+    - dose_types: list[str], optional
+        The dose rate types to return responses for. By default responses are returned for every dose rate type.
+
+    Returns:
+    - np.ndarray
+        Array of shape (altitudes, dose rate types, rigidity grid), or (altitudes, dose rate types, rigidity_column_indices) if given.
+    """
+    interpolation_matrix = linear_interpolation_matrix(rigidity_grid, get_response_rigidity_midpoints(particle_name))
+    if rigidity_column_indices is not None:
+        interpolation_matrix = interpolation_matrix[:, rigidity_column_indices]
+    return get_dose_response_kernel(particle_name, altitudes_in_km, dose_types) @ interpolation_matrix
+
+def calculate_from_rigidity_spec(inputRigidityDistributionFunctionGV, altitudesInkm: float | list[float], particleName: str = "proton", dose_types: list[str] = None) -> pd.DataFrame:
+    """
+    Calculate dose rates from a rigidity spectrum using the cached response kernels.
+
+    This gives the same output as atmosphericRadiationDoseAndFlux.doseAndFluxCalculator.calculate_from_rigidity_spec.
+
+    Parameters:
+    - inputRigidityDistributionFunctionGV: callable
+        Function describing the rigidity spectrum in units of cm-2 s-1 sr-1 (GV/n)-1.
+    - altitudesInkm: float or list[float]
+        The altitudes in km.
+    - particleName: str
+        The name of the particle ("proton" or "alpha").
+    - dose_types: list[str], optional
+        The dose rate types to calculate. By default every dose rate type is calculated.
+
+    Returns:
+    - pd.DataFrame
+        DataFrame with an "altitude (km)" column and a column for each dose rate type.
+    """
+    altitudes_in_km = np.atleast_1d(np.array(altitudesInkm, dtype=float))
+    spectrum_values = np.array([float(inputRigidityDistributionFunctionGV(rigidity)) for rigidity in get_response_rigidity_midpoints(particleName)])
+
+    output_dose_rates = pd.DataFrame(get_dose_response_kernel(particleName, altitudes_in_km, dose_types) @ spectrum_values, columns=validate_dose_types(dose_types))
+    output_dose_rates.insert(0, "altitude (km)", altitudes_in_km)
+    return output_dose_rates
@@ -0,0 +1,256 @@
+import json
+import hashlib
+import inspect
+import types
+import threading
+import datetime as dt
+import dataclasses
+import functools
+from importlib.metadata import version, PackageNotFoundError
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from .cacheManager import call_with_joblib_cache
+
+try:
+    AniMAIRE_version = version("AniMAIRE")
+except PackageNotFoundError:
+    AniMAIRE_version = "unknown"
+
+def get_class_name(value: Any) -> str:
+    """
+    Get the fully qualified name of the class of a value.
+    """
+    return f"{type(value).__module__}.{type(value).__qualname__}"
+
+def get_array_hash(array: np.ndarray) -> str:
+    """
+    Get a hexadecimal hash of the contents of an array.
+    """
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()[:32]
+
+_functions_being_fingerprinted = threading.local()
+
+def get_code_fingerprint(code: types.CodeType) -> dict:
+    """
+    Get a fingerprint of a compiled code object from its bytecode, constants and the names it uses, including the code of
+    any nested functions, lambdas and comprehensions.
+    """
+    return {"code": hashlib.sha256(code.co_code).hexdigest()[:32],
+            "constants": [get_constant_fingerprint(constant) for constant in code.co_consts],
+            "names": list(code.co_names)}
+
+def get_constant_fingerprint(constant: Any) -> Any:
+    """
+    Get a fingerprint of a constant of a code object, which can be nested code or any value the compiler folds into a constant.
+    """
+    if inspect.iscode(constant):
+        return get_code_fingerprint(constant)
+    if isinstance(constant, tuple):
+        return {"tuple": [get_constant_fingerprint(item) for item in constant]}
+    if isinstance(constant, (frozenset, bytes, complex)) or (constant is Ellipsis):
+        return {"constant": repr(sorted(constant, key=repr)) if isinstance(constant, frozenset) else repr(constant)}
+    # the type is included so that constants such as 1 and 1.0 give different bytecode fingerprints
+    return {"type": type(constant).__name__, "value": get_fingerprint(constant)}
+
+def get_code_names(code: types.CodeType) -> set:
+    """
+    Get the names used by a code object and the code objects nested in it.
+    """
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= get_code_names(constant)
+    return names
+
+def get_function_fingerprint(function: Callable, include_closure: bool = True) -> dict:
+    """
+    Get a fingerprint of a plain Python function or lambda from its bytecode and constants, its default arguments, the values it
+    closes over and the current values of the module globals it uses.
+
+    Functions used as globals from other modules are identified by name, while those from the same module are fingerprinted
+    in full, so that a change to a helper function or to a module-level parameter changes the fingerprint.
+
+    Parameters:
+    - function: callable
+        The function to fingerprint.
+    - include_closure: bool, optional
+        Whether to include the values the function closes over.
+
+    Raises:
+    - TypeError
+        If a default, closed over value or global used by the function cannot be fingerprinted.
+    """
+    in_progress = getattr(_functions_being_fingerprinted, "codes", None)
+    if in_progress is None:
+        in_progress = _functions_being_fingerprinted.codes = set()
+    function_name = f"{function.__module__}.{function.__qualname__}"
+    if function.__code__ in in_progress:
+        # recursive functions are identified by name inside their own fingerprint
+        return {"function": function_name}
+
+    in_progress.add(function.__code__)
+    try:
+        global_values = {}
+        for name in sorted(get_code_names(function.__code__)):
+            if name not in function.__globals__:
+                continue
+            global_value = function.__globals__[name]
+            if inspect.isfunction(global_value) and (global_value.__module__ != function.__module__):
+                global_values[name] = {"function": f"{global_value.__module__}.{global_value.__qualname__}"}
+            else:
+                global_values[name] = get_fingerprint(global_value)
+        return {"function": function_name,
+                "code": get_code_fingerprint(function.__code__),
+                "defaults": get_fingerprint(function.__defaults__ or ()),
+                "keyword_defaults": get_fingerprint(function.__kwdefaults__ or {}),
+                "closure": [get_fingerprint(cell.cell_contents) for cell in (function.__closure__ or ())] if include_closure else None,
+                "globals": global_values}
+    finally:
+        in_progress.discard(function.__code__)
+
+def get_fingerprint(value: Any) -> Any:
+    """
+    Get a fingerprint of a value: a small JSON-serialisable description that is equal for equal values, in any process.
+
+    Objects describe themselves through a fingerprint() method, which spectra, pitch angle distributions, particle distributions
+    and the functions they are built from provide. Arrays and DataFrames are described by a hash of their contents, and
+    functions, including lambdas and numba functions, by their bytecode and constants, the values they close over and the module
+    globals they use.
+
+    Parameters:
+    - value: Any
+        The value to fingerprint.
+
+    Returns:
+    - Any
+        The fingerprint.
+
+    Raises:
+    - TypeError
+        If the value cannot be fingerprinted.
+    """
+    if (value is None) or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if np.isfinite(value) else repr(value)
+    if isinstance(value, np.generic):
+        return get_fingerprint(value.item())
+    if isinstance(value, (dt.datetime, dt.date, np.datetime64)):
+        return {"datetime": pd.Timestamp(value).isoformat()}
+    if isinstance(value, (list, tuple)):
+        return [get_fingerprint(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): get_fingerprint(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return {"object_array": get_fingerprint(value.tolist()), "shape": list(value.shape)}
+        return {"array": get_array_hash(value), "dtype": value.dtype.str, "shape": list(value.shape)}
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        return {"class": get_class_name(value), "columns": get_fingerprint(columns),
+                "values": get_array_hash(pd.util.hash_pandas_object(value, index=True).to_numpy())}
+    if hasattr(value, "fingerprint") and callable(value.fingerprint) and not inspect.isclass(value):
+        return value.fingerprint()
+    if dataclasses.is_dataclass(value) and not inspect.isclass(value):
+        return {"class": get_class_name(value), "parameters": get_fingerprint({field.name: getattr(value, field.name) for field in dataclasses.fields(value)})}
+    if inspect.ismethod(value):
+        return {"method": value.__func__.__qualname__, "of": get_fingerprint(value.__self__)}
+    if hasattr(value, "py_func"):
+        # numba dispatchers
+        return get_function_fingerprint(value.py_func)
+    if inspect.isfunction(value):
+        return get_function_fingerprint(value)
+    if inspect.isclass(value):
+        return {"type": f"{value.__module__}.{value.__qualname__}"}
+    if inspect.ismodule(value):
+        return {"module": value.__name__}
+    if inspect.isbuiltin(value) or isinstance(value, np.ufunc):
+        return {"function": f"{getattr(value, '__module__', None)}.{value.__name__}"}
+    if hasattr(value, "_y") and hasattr(value, "x") and hasattr(value, "fill_value"):
+        # scipy.interpolate.interp1d
+        return {"class": get_class_name(value), "x": get_fingerprint(np.asarray(value.x)), "y": get_fingerprint(np.asarray(value.y)),
+                "kind": value._kind, "fill_value": get_fingerprint(value.fill_value), "bounds_error": bool(value.bounds_error)}
+    raise TypeError(f"Error: cannot fingerprint a value of type {get_class_name(value)}.")
+
+def get_fingerprint_key(value: Any) -> str:
+    """
+    Get a hexadecimal key from the fingerprint of a value.
+
+    Raises:
+    - TypeError
+        If the value cannot be fingerprinted.
+    """
+    return hashlib.sha256(json.dumps(get_fingerprint(value), sort_keys=True).encode("utf-8")).hexdigest()
+
+def get_object_fingerprint(value: Any, parameters: dict) -> dict:
+    """
+    Get the fingerprint of an object from its class, the installed AniMAIRE version and the parameters that determine its behaviour.
+
+    Parameters:
+    - value: Any
+        The object.
+    - parameters: dict
+        The parameters of the object.
+
+    Returns:
+    - dict
+        The fingerprint.
+    """
+    return {"class": get_class_name(value), "version": AniMAIRE_version, "parameters": get_fingerprint(parameters)}
+
+def call_memoized_function(key: str, calculate: Callable[[], Any]) -> Any:
+    return calculate()
+
+def memoize_by_fingerprint(memory, cache_name: str) -> Callable[[Callable], Callable]:
+    """
+    Cache a function's results with joblib.Memory, keyed by the fingerprints of its arguments rather than by hashing the arguments themselves.
+
+    Fingerprinting is much cheaper than joblib's hashing of large arguments, and it gives equal keys for equal spectra and
+    pitch angle distributions even when they hold lambdas or numba functions. Calls with arguments that cannot be
+    fingerprinted are calculated without the cache.
+
+    Parameters:
+    - memory: joblib.Memory
+        The joblib cache to store results in.
+    - cache_name: str
+        The name of the cache in the cache manager, used to count hits and misses.
+
+    Returns:
+    - callable
+        Decorator for the function to cache.
+    """
+    cached_call = memory.cache(call_memoized_function, ignore=["calculate"])
+
+    def decorator(function: Callable) -> Callable:
+        function_signature = inspect.signature(function)
+        # the values the cached function closes over are taken when it is decorated, while its code and the module globals
+        # it uses are fingerprinted on every call, as the globals may have changed
+        try:
+            closure_fingerprint = get_fingerprint([cell.cell_contents for cell in (function.__closure__ or ())])
+        except TypeError as fingerprint_error:
+            closure_fingerprint = fingerprint_error
+
+        def get_cache_key(*args, **kwargs) -> str:
+            if isinstance(closure_fingerprint, TypeError):
+                raise closure_fingerprint
+            bound_arguments = function_signature.bind(*args, **kwargs)
+            bound_arguments.apply_defaults()
+            return get_fingerprint_key({"function": get_function_fingerprint(function, include_closure=False), "closure": closure_fingerprint,
+                                        "version": AniMAIRE_version, "arguments": bound_arguments.arguments})
+
+        @functools.wraps(function)
+        def memoized_function(*args, **kwargs):
+            try:
+                key = get_cache_key(*args, **kwargs)
+            except TypeError as fingerprint_error:
+                print(f"Warning: {fingerprint_error} Calculating {function.__qualname__} without the cache.")
+                return function(*args, **kwargs)
+            return call_with_joblib_cache(cache_name, cached_call, key, lambda: function(*args, **kwargs))
+
+        memoized_function.get_cache_key = get_cache_key
+        return memoized_function
+
+    return decorator
@@ -2,29 +2,62 @@
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
-from joblib import Memory
 import datetime as dt
-from typing import Optional
+from typing import Any, Callable, Optional
 
 #from rigidity_predictor import RigidityPredictor
 from .rigidityPredictor.rigidity_predictor import RigidityPredictor
 
-from .singleParticleEngineInstance import singleParticleEngineInstance
+from .singleParticleEngineInstance import singleParticleEngineInstance, get_mean_weighting_factor_tensor, build_output_dose_rate_DF, integrate_weighting_factors_over_NM64_kernel, get_unique_location_profiles, get_contributing_rigidity_indices, multiply_by_location_blocks
+from .doseResponseKernels import get_dose_response_kernel_on_rigidity_grid, validate_dose_types
 from AsympDirsCalculator import AsympDirsTools
-from .AsymptoticDirectionProcessing import generate_asymp_dir_DF
+from .AsymptoticDirectionProcessing import generate_asymp_dir_DF, calculate_weighting_factor_arrays, get_rigidity_support_mask
+from .AsymptoticDirectionSet import AsymptoticDirectionSet
 from .otso_planet_processing import create_and_convert_full_planet
+from .spatialGrids import collapse_degenerate_locations, get_location_keys
+from .AsymptoticDirectionStore import get_asymptotic_direction_store, get_asymptotic_direction_descriptor
+from .stageCache import get_stage_cache
+from importlib.metadata import version
 import os
 from .spectralCalculations.pitchAngleDistribution import IsotropicPitchAngleDistribution
 # Initialize tqdm for progress bars
 tqdm.pandas()
 
-# Set up caching for Magnetocosmics run data
-MAGCOScachedir = 'cachedMagnetocosmicsRunData'
-MAGCOSmemory = Memory(MAGCOScachedir, verbose=0)
-
 # Default array of latitudes and longitudes
 default_array_of_lats_and_longs = np.array(np.meshgrid(np.linspace(-90.0, 90.0, 37), np.linspace(0.0, 355.0, 72))).T.reshape(-1, 2)
 
+def get_magcos_asymp_dirs_with_store(array_of_lats_and_longs: np.ndarray, KpIndex: int, dateAndTime: dt.datetime, cache: bool, **magneto_kwargs) -> pd.DataFrame:
+    """
+    Calculate asymptotic directions with MAGNETOCOSMICS, reusing them from the asymptotic direction store when cache is True.
+
+    Parameters:
+    - array_of_lats_and_longs: np.ndarray
+        Array of latitudes and longitudes.
+    - KpIndex: int
+        Kp index for the calculations.
+    - dateAndTime: dt.datetime
+        Date and time for the calculations.
+    - cache: bool
+        Whether to use the asymptotic direction store.
+    - **magneto_kwargs: additional keyword arguments for AsympDirsTools.get_magcos_asymp_dirs.
+
+    Returns:
+    - pd.DataFrame
+        DataFrame of asymptotic directions.
+    """
+    def run_magnetocosmics():
+        return AsympDirsTools.get_magcos_asymp_dirs(array_of_lats_and_longs=array_of_lats_and_longs, KpIndex=KpIndex, dateAndTime=dateAndTime,
+                                                    cache=cache, **magneto_kwargs)
+    if not cache:
+        return run_magnetocosmics()
+
+    tracer_options = dict(magneto_kwargs)
+    array_of_zeniths_and_azimuths = tracer_options.pop("array_of_zeniths_and_azimuths", [[0.0, 0.0]])
+    descriptor = get_asymptotic_direction_descriptor(f"MAGNETOCOSMICS AsympDirsCalculator {version('AsympDirsCalculator')}",
+                                                     array_of_lats_and_longs, KpIndex, dateAndTime, array_of_zeniths_and_azimuths,
+                                                     **tracer_options)
+    return get_asymptotic_direction_store().get_or_compute(descriptor, run_magnetocosmics)
+
 def get_default_set_of_rigidities(
                             max_rigidity_1=1010.0, 
                             min_rigidity_1=20.0, 
@@ -52,6 +85,41 @@ def get_default_set_of_rigidities(
 
 default_rigidity_list = get_default_set_of_rigidities()
 
+# Default set of 9 [zenith, azimuth] arrival directions averaged over when use_default_9_zeniths_azimuths is set
+default_9_zeniths_and_azimuths = [
+    [0.0, 0.0],
+    [16.0, 0.0],
+    [16.0, 90.0],
+    [16.0, 180.0],
+    [16.0, 270.0],
+    [32.0, 0.0],
+    [32.0, 90.0],
+    [32.0, 180.0],
+    [32.0, 270.0],
+]
+
+# Dose rates that are summed across particle species: the remaining outputs (tn1, tn2, tn3 and NM64 count rates) are taken from the first species
+list_of_summed_dose_rate_names = ["adose", "edose", "dosee", "SEU", "SEL"]
+
+def traces_only_vertical_direction(use_default_9_zeniths_and_azimuths: bool, magneto_kwargs: dict) -> bool:
+    """
+    Check whether only vertically arriving particles are traced at each location.
+
+    Parameters:
+    - use_default_9_zeniths_and_azimuths: bool
+        Whether the default 9 zeniths and azimuths are traced.
+    - magneto_kwargs: dict
+        The keyword arguments for the trajectory tracer, which may include array_of_zeniths_and_azimuths.
+
+    Returns:
+    - bool
+        True if every traced arrival direction has a zenith angle of 0.
+    """
+    if use_default_9_zeniths_and_azimuths:
+        return False
+    zeniths_and_azimuths = np.asarray(magneto_kwargs.get("array_of_zeniths_and_azimuths", [[0.0, 0.0]]), dtype=float).reshape(-1, 2)
+    return bool(np.all(zeniths_and_azimuths[:, 0] == 0.0))
+
 class generalEngineInstance:
     """
     General engine instance for running dose rate calculations.
@@ -68,7 +136,13 @@ class generalEngineInstance:
                  array_of_lats_and_longs: np.ndarray = default_array_of_lats_and_longs,
                  cache_magnetocosmics_runs: bool = True,
                  generate_NM_count_rates: bool = False,
-                 asymp_dir_file: Optional[str] = None):
+                 asymp_dir_file: Optional[str] = None,
+                 integration_mode: str = "matrix",
+                 asymptotic_direction_set: Optional[AsymptoticDirectionSet] = None,
+                 cutoff_rigidity_bin_width_GV: Optional[float] = None,
+                 dose_types: Optional[list[str]] = None,
+                 rigidity_levels: Optional[list[float]] = None,
+                 memoize_stages: bool = True):
         """
         Initialize the general engine instance with necessary parameters.
 
@@ -86,13 +160,33 @@ class generalEngineInstance:
         - reference_longitude: float, optional
             Reference longitude for pitch angle distribution.
         - array_of_lats_and_longs: np.ndarray, optional
-            Array of latitudes and longitudes.
+            Array of latitudes and longitudes. Any grid can be used, such as an equal-area grid from spatialGrids. Repeated
+            locations, such as the same point at longitudes 0 and 360, are only calculated once and copied to every repeat in the output.
+            A pole given at several longitudes is also only calculated once when only the vertical direction is traced.
         - cache_magnetocosmics_runs: bool, optional
             Whether to cache Magnetocosmics runs.
         - generate_NM_count_rates: bool, optional
             Whether to generate neutron monitor count rates.
         - asymp_dir_file: str, optional
             File path to read asymptotic directions from.
+        - integration_mode: str, optional
+            Either "matrix" to calculate dose rates for all locations with a single product against tabulated response kernels,
+            or "quadrature" to integrate each location's spectrum separately.
+        - asymptotic_direction_set: AsymptoticDirectionSet, optional
+            Previously acquired asymptotic directions to reuse instead of tracing them again.
+        - cutoff_rigidity_bin_width_GV: float, optional
+            For isotropic fast calculations, round predicted cutoff rigidities to multiples of this width, so that more locations share
+            a cutoff profile and fewer distinct dose integrations are needed. By default cutoff rigidities are not rounded.
+        - dose_types: list[str], optional
+            The dose rate types to calculate, such as ["edose"] or ["SEU", "SEL"]. Only the response kernels for these types are
+            integrated and only these columns are output. By default every dose rate type is calculated.
+        - rigidity_levels: list[float], optional
+            The rigidities in GV that isotropic fast calculations are evaluated at. Defaults to default_rigidity_list.
+        - memoize_stages: bool, optional
+            Whether to reuse the outputs of earlier runs in this process for the stages whose inputs have not changed: the raw
+            asymptotic directions, their pitch angles, the weighting factors and the dose integration. For example, a rerun that
+            only changes the spectrum reuses the pitch angles, and one that only changes the altitudes also reuses the weighting
+            factors. The caches are configured with stageCache.configure_stage_caches.
         """
         self.rigiditySpectrumParamDict = {}
         self.pitchAngleDistributionParamDict = {}
@@ -105,10 +199,41 @@ class generalEngineInstance:
         self.reference_latitude = reference_latitude
         self.reference_longitude = reference_longitude
         self.array_of_lats_and_longs = array_of_lats_and_longs
+        self.input_array_of_lats_and_longs = array_of_lats_and_longs
+        self.requested_array_of_lats_and_longs = None
+        self.merge_poles = True
 
         self.cache_magnetocosmics_runs = cache_magnetocosmics_runs
         self.generate_NM_count_rates = generate_NM_count_rates
         self.asymp_dir_file = asymp_dir_file
+        self.integration_mode = integration_mode
+        self.asymptotic_direction_set = asymptotic_direction_set
+        self.cutoff_rigidity_bin_width_GV = cutoff_rigidity_bin_width_GV
+        self.dose_types = validate_dose_types(dose_types)
+        self.rigidity_levels = rigidity_levels if rigidity_levels is not None else default_rigidity_list
+        self.memoize_stages = memoize_stages
+
+    def get_stage_output(self, stage_name: str, stage_inputs: dict, calculate: Callable[[], Any], memoize: bool = True) -> Any:
+        """
+        Get the output of a stage of the engine, reusing it from the stage's in-process cache if a run with the same inputs has already calculated it.
+
+        Parameters:
+        - stage_name: str
+            One of stageCache.engine_stage_names.
+        - stage_inputs: dict
+            Every input the output of the stage depends on.
+        - calculate: callable
+            Function with no arguments that calculates the output.
+        - memoize: bool, optional
+            Whether the output may be cached, in addition to self.memoize_stages.
+
+        Returns:
+        - Any
+            The output of the stage.
+        """
+        if not (self.memoize_stages and memoize):
+            return calculate()
+        return get_stage_cache(stage_name).get_or_compute(stage_inputs, calculate)
 
     def getAsymptoticDirsAndRun(self, use_default_9_zeniths_azimuths: bool, record_full_output: bool = False, **mag_cos_kwargs) -> pd.DataFrame:
         """
@@ -125,25 +250,225 @@ class generalEngineInstance:
         - pd.DataFrame
             DataFrame containing the dose rate calculations.
         """
+        self.collapse_repeated_locations(merge_poles=traces_only_vertical_direction(use_default_9_zeniths_azimuths, mag_cos_kwargs))
         self.acquireDFofAllAsymptoticDirections(use_default_9_zeniths_azimuths, **mag_cos_kwargs)
 
+        if (self.integration_mode == "matrix") and (not record_full_output):
+            summedDoseRateDF = self.runFusedSpeciesPass()
+            if summedDoseRateDF is not None:
+                return self.expand_to_requested_locations(summedDoseRateDF)
+
         fullDoseRateList = []
 
         for incoming_particle_distribution in self.list_of_particle_distributions:
             singleParticleEngine = singleParticleEngineInstance(incoming_particle_distribution, 
                                                                 self.df_of_asymptotic_directions,
                                                                 self.list_of_altitudes_km,
-                                                                self.generate_NM_count_rates)
+                                                                self.generate_NM_count_rates,
+                                                                integration_mode=self.integration_mode,
+                                                                dose_types=self.dose_types)
             
             doseRateDFforParticleSpecies = singleParticleEngine.runOverSpecifiedAltitudes(record_full_output=record_full_output)
             fullDoseRateList.append(doseRateDFforParticleSpecies)
 
         summedDoseRateDF = fullDoseRateList[0]
         for doseRateDF in fullDoseRateList[1:]:
-            for doseRateName in ["adose", "edose", "dosee", "SEU", "SEL"]:
+            for doseRateName in self.get_summed_dose_types():
                 summedDoseRateDF[doseRateName] += doseRateDF[doseRateName]
 
-        return summedDoseRateDF
+        return self.expand_to_requested_locations(summedDoseRateDF)
+
+    def collapse_repeated_locations(self, merge_poles: bool):
+        """
+        Set the locations to acquire asymptotic directions for to the distinct locations in the requested array of latitudes and longitudes.
+        Locations are left unchanged when asymptotic directions are read from a file or reused from an asymptotic direction set,
+        including one acquired by an earlier run of this engine.
+
+        Parameters:
+        - merge_poles: bool
+            Whether every longitude at each pole is the same location, which is only the case when just the vertical direction is traced.
+        """
+        if (self.asymp_dir_file is not None) or (self.asymptotic_direction_set is not None):
+            return
+
+        self.array_of_lats_and_longs = self.input_array_of_lats_and_longs
+        self.requested_array_of_lats_and_longs = None
+        self.merge_poles = merge_poles
+
+        distinct_array_of_lats_and_longs, _ = collapse_degenerate_locations(self.input_array_of_lats_and_longs, merge_poles=merge_poles)
+        if len(distinct_array_of_lats_and_longs) < len(self.input_array_of_lats_and_longs):
+            # arrays without repeated locations are passed on unchanged, so that cached asymptotic direction runs are reused
+            self.requested_array_of_lats_and_longs = np.asarray(self.input_array_of_lats_and_longs, dtype=float).reshape(-1, 2)
+            self.array_of_lats_and_longs = distinct_array_of_lats_and_longs
+
+    def expand_to_requested_locations(self, dose_rate_DF: pd.DataFrame) -> pd.DataFrame:
+        """
+        Copy the dose rates calculated at each distinct location to every requested location that repeats it.
+
+        Parameters:
+        - dose_rate_DF: pd.DataFrame
+            Dose rates at the distinct locations, with latitude, longitude and altitude (km) columns.
+
+        Returns:
+        - pd.DataFrame
+            Dose rates at every requested location, with the coordinates it was requested with, sorted by latitude, longitude and altitude.
+        """
+        if self.requested_array_of_lats_and_longs is None:
+            return dose_rate_DF
+
+        calculated_location_keys = get_location_keys(dose_rate_DF[["latitude", "longitude"]].to_numpy(), merge_poles=self.merge_poles)
+        indexed_dose_rate_DF = dose_rate_DF.set_index([calculated_location_keys.get_level_values(0),
+                                                       calculated_location_keys.get_level_values(1),
+                                                       dose_rate_DF["altitude (km)"].to_numpy()])
+
+        number_of_altitudes = len(self.list_of_altitudes_km)
+        requested_location_keys = get_location_keys(self.requested_array_of_lats_and_longs, merge_poles=self.merge_poles)
+        requested_rows = pd.MultiIndex.from_arrays([np.repeat(requested_location_keys.get_level_values(0), number_of_altitudes),
+                                                    np.repeat(requested_location_keys.get_level_values(1), number_of_altitudes),
+                                                    np.tile(np.array(self.list_of_altitudes_km, dtype=float), len(requested_location_keys))])
+        expanded_dose_rate_DF = indexed_dose_rate_DF.loc[requested_rows].reset_index(drop=True)
+        expanded_dose_rate_DF["latitude"] = np.repeat(self.requested_array_of_lats_and_longs[:, 0], number_of_altitudes)
+        expanded_dose_rate_DF["longitude"] = np.repeat(self.requested_array_of_lats_and_longs[:, 1], number_of_altitudes)
+        return expanded_dose_rate_DF.sort_values(["latitude", "longitude", "altitude (km)"], ignore_index=True)
+
+    def runFusedSpeciesPass(self) -> Optional[pd.DataFrame]:
+        """
+        Calculate the summed dose rates of all particle species in one pass over the asymptotic directions.
+
+        The weighting factors of every species are averaged over directions together, and each species' response kernel
+        is applied along an extra species axis, giving the same output as running each species separately and summing.
+
+        Returns:
+        - pd.DataFrame or None
+            DataFrame containing the dose rate calculations, or None if the locations do not share a common rigidity grid.
+        """
+        def calculate_weighting_factors():
+            print("Assigning pitch angle weighting factors for all particle species...")
+            weighting_factors_per_species = np.array([calculate_weighting_factor_arrays(self.df_of_asymptotic_directions, particle_distribution)[3]
+                                                      for particle_distribution in self.list_of_particle_distributions])
+            weighting_factors_per_species.setflags(write=False)
+            return weighting_factors_per_species
+
+        weighting_factor_inputs = {"asymptotic_directions": self.asymptotic_direction_set,
+                                   "particle_distributions": self.list_of_particle_distributions}
+        weighting_factors_per_species = self.get_stage_output("weighting_factors", weighting_factor_inputs, calculate_weighting_factors)
+
+        dose_integration_inputs = {"weighting_factors": weighting_factor_inputs,
+                                   "altitudes_km": list(self.list_of_altitudes_km),
+                                   "dose_types": self.dose_types,
+                                   "generate_NM_count_rates": self.generate_NM_count_rates}
+        list_of_dose_rate_DFs = self.get_stage_output("dose_integration", dose_integration_inputs,
+                                                      lambda: self.calculate_summed_dose_rates(weighting_factors_per_species[:, :, np.newaxis]))
+        if list_of_dose_rate_DFs is None:
+            print("Locations do not share a common rigidity grid: calculating each particle species separately...")
+            return None
+        return list_of_dose_rate_DFs[0].copy()
+
+    def runOverReferenceDirections(self, reference_latitudes: list[float], reference_longitudes: list[float]) -> list[pd.DataFrame]:
+        """
+        Calculate the summed dose rates for many IMF reference directions, reusing the asymptotic directions already acquired by this engine.
+
+        The pitch angles for every reference direction are found with a single unit vector matrix product, and the weighting factors
+        and dose rates for all reference directions are then calculated together along an extra axis.
+
+        Parameters:
+        - reference_latitudes: list[float]
+            The latitudes of the N reference directions.
+        - reference_longitudes: list[float]
+            The longitudes of the N reference directions.
+
+        Returns:
+        - list[pd.DataFrame]
+            The dose rate DataFrames for each reference direction, in the same format as getAsymptoticDirsAndRun.
+        """
+        if self.asymptotic_direction_set is None:
+            raise Exception("ERROR: asymptotic directions must be acquired with getAsymptoticDirsAndRun before running over reference directions.")
+
+        pitch_angle_matrix = self.asymptotic_direction_set.get_pitch_angle_matrix(reference_latitudes, reference_longitudes, allowed_only=True)
+
+        print(f"Assigning pitch angle weighting factors for {pitch_angle_matrix.shape[1]} reference directions...")
+        weighting_factors_per_species = np.array([calculate_weighting_factor_arrays(self.df_of_asymptotic_directions, particle_distribution, pitch_angles=pitch_angle_matrix)[3]
+                                                  for particle_distribution in self.list_of_particle_distributions])
+
+        list_of_dose_rate_DFs = self.calculate_summed_dose_rates(weighting_factors_per_species)
+        if list_of_dose_rate_DFs is None:
+            raise Exception("ERROR: locations do not share a common rigidity grid, so dose rates cannot be calculated for several reference directions at once.")
+        return [self.expand_to_requested_locations(dose_rate_DF) for dose_rate_DF in list_of_dose_rate_DFs]
+
+    def calculate_summed_dose_rates(self, weighting_factors_per_species: np.ndarray) -> Optional[list[pd.DataFrame]]:
+        """
+        Calculate the dose rates summed over particle species for one or more sets of weighting factors.
+
+        Parameters:
+        - weighting_factors_per_species: np.ndarray
+            Array of shape (species, asymptotic directions, N) of combined rigidity and pitch angle weighting factors,
+            where N is, for example, the number of reference directions.
+
+        Returns:
+        - list[pd.DataFrame] or None
+            The N dose rate DataFrames, or None if the locations do not share a common rigidity grid.
+        """
+        number_of_species, number_of_directions, number_of_sets = weighting_factors_per_species.shape
+        weighting_factors_per_set = weighting_factors_per_species.transpose(0, 2, 1).reshape(-1, number_of_directions)
+
+        asymptotic_direction_cube = self.asymptotic_direction_set.to_cube() if self.asymptotic_direction_set is not None else None
+        if asymptotic_direction_cube is not None:
+            location_index, rigidity_grid = asymptotic_direction_cube.location_index, asymptotic_direction_cube.rigidities
+            # weighting factors are zero outside the support of every species' spectrum, so only rigidities within a support are averaged
+            supported_rigidity_indices = np.flatnonzero(np.any([get_rigidity_support_mask(particle_distribution.momentum_distribution.getRigiditySpectrum(), rigidity_grid)
+                                                                for particle_distribution in self.list_of_particle_distributions], axis=0))
+            weighting_factor_tensor = np.zeros((len(weighting_factors_per_set), len(location_index), len(rigidity_grid)))
+            weighting_factor_tensor[..., supported_rigidity_indices] = asymptotic_direction_cube.mean_over_directions(asymptotic_direction_cube.gather(weighting_factors_per_set,
+                                                                                                                                                     rigidity_indices=supported_rigidity_indices))
+        else:
+            location_index, rigidity_grid, weighting_factor_tensor = get_mean_weighting_factor_tensor(self.df_of_asymptotic_directions, weighting_factors_per_set)
+            if np.isnan(weighting_factor_tensor).any():
+                return None
+        weighting_factor_tensor = weighting_factor_tensor.reshape(number_of_species, number_of_sets, len(location_index), len(rigidity_grid))
+
+        location_to_profile_indices = np.arange(len(location_index))
+        if all(isinstance(particle_distribution.momentum_distribution.pitch_angle_distribution, IsotropicPitchAngleDistribution)
+               for particle_distribution in self.list_of_particle_distributions):
+            # for isotropic distributions, locations with the same cutoff profile have identical weighting factors for every species
+            unique_profiles, location_to_profile_indices = get_unique_location_profiles(weighting_factor_tensor.transpose(2, 0, 1, 3))
+            weighting_factor_tensor = unique_profiles.transpose(1, 2, 0, 3)
+            print(f"Evaluating dose rates for {weighting_factor_tensor.shape[2]} distinct cutoff profiles across {len(location_to_profile_indices)} locations...")
+
+        print("Converting spectra and asymptotic directions to particle fluxes and dose rates...")
+        particle_names = [particle_distribution.particle_species.particleName for particle_distribution in self.list_of_particle_distributions]
+        contributing_rigidity_indices = get_contributing_rigidity_indices(weighting_factor_tensor)
+        dose_response_kernels = np.stack([get_dose_response_kernel_on_rigidity_grid(particle_name, self.list_of_altitudes_km, rigidity_grid, contributing_rigidity_indices, self.dose_types)
+                                          for particle_name in particle_names])
+        number_of_altitudes, number_of_dose_types = dose_response_kernels.shape[1:3]
+        dose_rates_per_species = np.stack([multiply_by_location_blocks(species_weighting_factors[..., contributing_rigidity_indices],
+                                                                       species_kernel.reshape(number_of_altitudes * number_of_dose_types, len(contributing_rigidity_indices)))
+                                           for species_weighting_factors, species_kernel in zip(weighting_factor_tensor, dose_response_kernels)])
+        dose_rates_per_species = dose_rates_per_species.reshape(dose_rates_per_species.shape[:3] + (number_of_altitudes, number_of_dose_types))
+
+        dose_rates = dose_rates_per_species[0].copy()
+        summed_dose_rate_indices = [self.dose_types.index(dose_rate_name) for dose_rate_name in self.get_summed_dose_types()]
+        dose_rates[..., summed_dose_rate_indices] = dose_rates_per_species[..., summed_dose_rate_indices].sum(axis=0)
+
+        NM64_count_rates = [None] * number_of_sets
+        if self.generate_NM_count_rates:
+            print("Calculating neutron monitor count rates...")
+            NM64_count_rates = [integrate_weighting_factors_over_NM64_kernel(weighting_factors, particle_names[0], self.list_of_altitudes_km, rigidity_grid)[location_to_profile_indices]
+                                for weighting_factors in weighting_factor_tensor[0]]
+            print("Neutron monitor count rates successfully determined.")
+
+        print("Output dose rates calculated successfully!")
+        return [build_output_dose_rate_DF(dose_rates[set_index][location_to_profile_indices], location_index, self.list_of_altitudes_km, NM64_count_rates[set_index], self.dose_types)
+                for set_index in range(number_of_sets)]
+
+    def get_summed_dose_types(self) -> list[str]:
+        """
+        Get the selected dose rate types that are summed across particle species.
+
+        Returns:
+        - list[str]
+            The dose rate types in both self.dose_types and list_of_summed_dose_rate_names.
+        """
+        return [dose_rate_name for dose_rate_name in self.dose_types if dose_rate_name in list_of_summed_dose_rate_names]
     
     def acquireDFofAllAsymptoticDirections(self, use_default_9_zeniths_and_azimuths: bool, **magneto_kwargs):
         """
@@ -154,79 +479,134 @@ class generalEngineInstance:
             Whether to use the default 9 zeniths and azimuths.
         - **magneto_kwargs: additional keyword arguments for Magnetocosmics.
         """
-        if self.use_OTSOpy:
-            asymptotic_directions_function = create_and_convert_full_planet
-        else:
-            asymptotic_directions_function = AsympDirsTools.get_magcos_asymp_dirs
+        if self.asymptotic_direction_set is not None:
+            print("Reusing previously acquired asymptotic directions...")
+            self.asymptotic_direction_set = self.asymptotic_direction_set.with_reference_direction(self.reference_latitude, self.reference_longitude)
+            self.df_of_asymptotic_directions = self.asymptotic_direction_set.to_dataframe()
+            return
+
         list_of_pads = [dist.momentum_distribution.pitch_angle_distribution for dist in self.list_of_particle_distributions]
+        use_cutoff_rigidity_predictor = (not self.asymp_dir_file) and all(isinstance(dist, IsotropicPitchAngleDistribution) and dist.use_fast_calculation for dist in list_of_pads)
 
         if self.asymp_dir_file:
-            raw_asymp_df = self.get_raw_asymp_DF_from_file(self.asymp_dir_file)
-        # # Check if all particle distributions are isotropic with fast mode enabled
-        elif all(isinstance(dist, IsotropicPitchAngleDistribution) and dist.use_fast_calculation for dist in list_of_pads):
-        #   initialLatitude  initialLongitude  Rigidity      Lat     Long  Filter
-            
+            asymp_dir_files = self.asymp_dir_file if isinstance(self.asymp_dir_file, list) else [self.asymp_dir_file]
+            # the files' sizes and modification times are included so that edited files are read again
+            raw_direction_inputs = {"source": "file", "files": [[file_path, os.path.getsize(file_path), os.path.getmtime(file_path)] for file_path in asymp_dir_files]}
+        elif use_cutoff_rigidity_predictor:
+            raw_direction_inputs = {"source": "cutoff rigidity predictor",
+                                    "array_of_lats_and_longs": np.asarray(self.array_of_lats_and_longs, dtype=float),
+                                    "Kp_index": self.Kp_index,
+                                    "date_and_time": self.date_and_time,
+                                    "cutoff_rigidity_bin_width_GV": self.cutoff_rigidity_bin_width_GV}
+        else:
+            if use_default_9_zeniths_and_azimuths and "array_of_zeniths_and_azimuths" in magneto_kwargs:
+                raise Exception("Error: Both use_default_9_zeniths_and_azimuths is True and 'array_of_zeniths_and_azimuths' is specified.")
+            raw_direction_inputs = {"source": "OTSO" if self.use_OTSOpy else "MAGNETOCOSMICS",
+                                    "array_of_lats_and_longs": np.asarray(self.array_of_lats_and_longs, dtype=float),
+                                    "Kp_index": self.Kp_index,
+                                    "date_and_time": self.date_and_time,
+                                    "use_default_9_zeniths_and_azimuths": use_default_9_zeniths_and_azimuths,
+                                    "magneto_kwargs": magneto_kwargs}
+        pitch_angle_inputs = {"raw_directions": raw_direction_inputs,
+                              "reference_latitude": self.reference_latitude,
+                              "reference_longitude": self.reference_longitude,
+                              "date_and_time": self.date_and_time,
+                              "Kp_index": self.Kp_index,
+                              "rigidity_levels": list(self.rigidity_levels) if use_cutoff_rigidity_predictor else None}
+        # traced asymptotic directions are only reused when caching of trajectory tracer runs is enabled
+        memoize_directions = self.cache_magnetocosmics_runs or (raw_direction_inputs["source"] in ["file", "cutoff rigidity predictor"])
+
+        def calculate_asymptotic_direction_set() -> AsymptoticDirectionSet:
+            raw_directions = self.get_stage_output("raw_directions", raw_direction_inputs,
+                                                   lambda: self.get_raw_asymptotic_directions(use_cutoff_rigidity_predictor, use_default_9_zeniths_and_azimuths, **magneto_kwargs),
+                                                   memoize=memoize_directions)
+            if use_cutoff_rigidity_predictor:
+                # Broadcast a row for each lat/lon and rigidity combination straight into an asymptotic direction set,
+                # which is handed directly to the weighting and integration stages
+                return AsymptoticDirectionSet.from_cutoff_rigidities(raw_directions['latitude'].to_numpy(),
+                                                                     raw_directions['longitude'].to_numpy(),
+                                                                     raw_directions['Rc'].to_numpy(dtype=float),
+                                                                     self.rigidity_levels,
+                                                                     self.reference_latitude,
+                                                                     self.reference_longitude,
+                                                                     date_and_time=self.date_and_time,
+                                                                     Kp_index=self.Kp_index)
+
+            processed_df = generate_asymp_dir_DF(
+                raw_directions.copy(),
+                self.reference_latitude,
+                self.reference_longitude,
+                self.date_and_time,
+                cache=False
+            )
+            processed_df.to_csv("self_df_of_asymptotic_directions.csv", index=False)
+            return AsymptoticDirectionSet.from_dataframe(processed_df,
+                                                         self.reference_latitude,
+                                                         self.reference_longitude,
+                                                         date_and_time=self.date_and_time,
+                                                         Kp_index=self.Kp_index)
+
+        self.asymptotic_direction_set = self.get_stage_output("pitch_angles", pitch_angle_inputs, calculate_asymptotic_direction_set, memoize=memoize_directions)
+        self.df_of_asymptotic_directions = self.asymptotic_direction_set.to_dataframe()
+
+    def get_raw_asymptotic_directions(self, use_cutoff_rigidity_predictor: bool, use_default_9_zeniths_and_azimuths: bool, **magneto_kwargs) -> pd.DataFrame:
+        """
+        Read or trace the asymptotic directions of every location, or for isotropic fast calculations predict the cutoff rigidity of every location.
+
+        Parameters:
+        - use_cutoff_rigidity_predictor: bool
+            Whether to predict cutoff rigidities rather than read or trace asymptotic directions.
+        - use_default_9_zeniths_and_azimuths: bool
+            Whether to use the default 9 zeniths and azimuths.
+        - **magneto_kwargs: additional keyword arguments for Magnetocosmics.
+
+        Returns:
+        - pd.DataFrame
+            The raw asymptotic directions, or the cutoff rigidity predictions with latitude, longitude and Rc columns.
+        """
+        if use_cutoff_rigidity_predictor:
+            #   initialLatitude  initialLongitude  Rigidity      Lat     Long  Filter
+            array_of_lats_and_longs = np.asarray(self.array_of_lats_and_longs, dtype=float)
             cutoff_rigidity_predictions = RigidityPredictor.load().batch_predict(pd.DataFrame( {
-                'latitude': [lat for lat, _ in self.array_of_lats_and_longs],
-                'longitude': [lon for _, lon in self.array_of_lats_and_longs],
+                'latitude': array_of_lats_and_longs[:, 0],
+                'longitude': array_of_lats_and_longs[:, 1],
                 'kp': self.Kp_index,
                 'datetime': self.date_and_time,
             })) # output DF columns: latitude, longitude, kp, datetime, Ru, Rc, Rl
-            
-            # Create expanded dataframe with a row for each lat/lon and rigidity combination
-            raw_asymp_df = pd.DataFrame([
-                {'initialLatitude': row['latitude'], 'initialLongitude': row['longitude'], 
-                 'Rigidity': rig, 'Lat': row['latitude'], 'Long': row['longitude'], 
-                 'Filter': 1 if rig >= row['Rc'] else 0}
-                for rig in default_rigidity_list
-                for _, row in cutoff_rigidity_predictions.iterrows() 
-            ])
 
+            if self.cutoff_rigidity_bin_width_GV:
+                cutoff_rigidity_predictions['Rc'] = np.round(cutoff_rigidity_predictions['Rc'].to_numpy(dtype=float) / self.cutoff_rigidity_bin_width_GV) * self.cutoff_rigidity_bin_width_GV
+            return cutoff_rigidity_predictions
+
+        if self.use_OTSOpy:
+            asymptotic_directions_function = create_and_convert_full_planet
         else:
-            if use_default_9_zeniths_and_azimuths and "array_of_zeniths_and_azimuths" in magneto_kwargs:
-                raise Exception("Error: Both use_default_9_zeniths_and_azimuths is True and 'array_of_zeniths_and_azimuths' is specified.")
-            
-            if use_default_9_zeniths_and_azimuths:
-                default_zeniths_azimuths = [
-                    [0.0, 0.0],
-                    [16.0, 0.0],
-                    [16.0, 90.0],
-                    [16.0, 180.0],
-                    [16.0, 270.0],
-                    [32.0, 0.0],
-                    [32.0, 90.0],
-                    [32.0, 180.0],
-                    [32.0, 270.0],
-                ]
-                raw_asymp_df = asymptotic_directions_function(
-                    array_of_lats_and_longs=self.array_of_lats_and_longs,
-                    KpIndex=self.Kp_index,
-                    dateAndTime=self.date_and_time,
-                    cache=self.cache_magnetocosmics_runs,
-                    full_output=True,
-                    array_of_zeniths_and_azimuths=default_zeniths_azimuths,
-                    **magneto_kwargs,
-                )
-            else:
-                raw_asymp_df = asymptotic_directions_function(
-                    array_of_lats_and_longs=self.array_of_lats_and_longs,
-                    KpIndex=self.Kp_index,
-                    dateAndTime=self.date_and_time,
-                    cache=self.cache_magnetocosmics_runs,
-                    full_output=True,
-                    **magneto_kwargs,
-                )
-                
+            asymptotic_directions_function = get_magcos_asymp_dirs_with_store
+
+        if self.asymp_dir_file:
+            raw_asymp_df = self.get_raw_asymp_DF_from_file(self.asymp_dir_file)
+        elif use_default_9_zeniths_and_azimuths:
+            raw_asymp_df = asymptotic_directions_function(
+                array_of_lats_and_longs=self.array_of_lats_and_longs,
+                KpIndex=self.Kp_index,
+                dateAndTime=self.date_and_time,
+                cache=self.cache_magnetocosmics_runs,
+                full_output=True,
+                array_of_zeniths_and_azimuths=default_9_zeniths_and_azimuths,
+                **magneto_kwargs,
+            )
+        else:
+            raw_asymp_df = asymptotic_directions_function(
+                array_of_lats_and_longs=self.array_of_lats_and_longs,
+                KpIndex=self.Kp_index,
+                dateAndTime=self.date_and_time,
+                cache=self.cache_magnetocosmics_runs,
+                full_output=True,
+                **magneto_kwargs,
+            )
+
         raw_asymp_df.to_pickle("raw_asymp_dir_DF.pkl")
-        processed_df = generate_asymp_dir_DF(
-            raw_asymp_df,
-            self.reference_latitude,
-            self.reference_longitude,
-            self.date_and_time,
-            cache=False
-        )
-        processed_df.to_csv("self_df_of_asymptotic_directions.csv", index=False)
-        self.df_of_asymptotic_directions = processed_df
+        return raw_asymp_df
 
     def get_raw_asymp_DF_from_file(self,file_path):
         if isinstance(file_path, list):
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from scipy.interpolate import RegularGridInterpolator
+
+from .generalEngineInstance import get_default_set_of_rigidities, default_9_zeniths_and_azimuths
+from .singleParticleEngineInstance import integrate_weighting_factors_over_kernel, get_unique_location_profiles
+from .spatialGrids import get_equal_area_array_of_lats_and_longs
+from .spectralCalculations.rigiditySpectrum import CommonModifiedPowerLawSpectrum, DLRmodelSpectrum
+
+@dataclass(frozen=True)
+class GridQualityPreset:
+    """
+    A named combination of rigidity levels, arrival directions and spatial grid spacing for asymptotic direction calculations.
+
+    The error bounds are the largest edose errors found by benchmark_grid_quality_presets when each preset is compared with
+    the "precise" preset, as a fraction of the largest edose in the benchmark, rounded up. They cover the rigidity and spatial
+    discretisation only: the effect of averaging over fewer arrival directions depends on the traced trajectories and is not included.
+    """
+    name: str
+    nIncrements_high: int
+    nIncrements_low: int
+    grid_spacing_degrees: float
+    array_of_zeniths_and_azimuths: tuple
+    max_rigidity_grid_error: float
+    max_spatial_grid_error: float
+
+    @property
+    def max_error(self) -> float:
+        """
+        The combined bound on the rigidity and spatial discretisation error relative to the "precise" preset.
+        """
+        return self.max_rigidity_grid_error + self.max_spatial_grid_error
+
+    def get_rigidity_levels(self) -> list[float]:
+        """
+        Get the rigidity levels in GV of this preset, from 1010 GV down to 0.1 GV.
+
+        Returns:
+        - list[float]
+            The rigidity levels in descending order.
+        """
+        return get_default_set_of_rigidities(n_increments_1=self.nIncrements_high, n_increments_2=self.nIncrements_low)
+
+    def get_array_of_lats_and_longs(self, equal_area: bool = False) -> np.ndarray:
+        """
+        Get the [latitude, longitude] grid of this preset, covering latitudes -90 to 90 and longitudes 0 to 360 at the preset spacing.
+
+        Parameters:
+        - equal_area: bool, optional
+            Whether to return an equal-area HEALPix grid with the preset spacing instead of a regular latitude/longitude grid.
+
+        Returns:
+        - np.ndarray
+            Array of shape (locations, 2).
+        """
+        if equal_area:
+            return get_equal_area_array_of_lats_and_longs(self.grid_spacing_degrees)
+        latitudes = np.linspace(-90.0, 90.0, int(round(180.0 / self.grid_spacing_degrees)) + 1)
+        longitudes = np.linspace(0.0, 360.0, int(round(360.0 / self.grid_spacing_degrees)), endpoint=False)
+        return np.array(np.meshgrid(latitudes, longitudes)).T.reshape(-1, 2)
+
+    def get_asymptotic_direction_kwargs(self) -> dict:
+        """
+        Get the keyword arguments that apply this preset's rigidity levels and arrival directions to OTSO or MAGNETOCOSMICS runs.
+
+        Returns:
+        - dict
+            The nIncrements_high, nIncrements_low and array_of_zeniths_and_azimuths keyword arguments.
+        """
+        return {"nIncrements_high": self.nIncrements_high,
+                "nIncrements_low": self.nIncrements_low,
+                "array_of_zeniths_and_azimuths": [list(zenith_and_azimuth) for zenith_and_azimuth in self.array_of_zeniths_and_azimuths]}
+
+# Error bounds from benchmark_grid_quality_presets (draft: 0.210 rigidity, 0.221 spatial; standard: 0.093 rigidity, 0.113 spatial)
+grid_quality_presets = {
+    "draft": GridQualityPreset(name="draft",
+                               nIncrements_high=30,
+                               nIncrements_low=100,
+                               grid_spacing_degrees=10.0,
+                               array_of_zeniths_and_azimuths=((0.0, 0.0),),
+                               max_rigidity_grid_error=0.22,
+                               max_spatial_grid_error=0.23),
+    "standard": GridQualityPreset(name="standard",
+                                  nIncrements_high=60,
+                                  nIncrements_low=200,
+                                  grid_spacing_degrees=5.0,
+                                  array_of_zeniths_and_azimuths=((0.0, 0.0),),
+                                  max_rigidity_grid_error=0.10,
+                                  max_spatial_grid_error=0.12),
+    "precise": GridQualityPreset(name="precise",
+                                 nIncrements_high=120,
+                                 nIncrements_low=400,
+                                 grid_spacing_degrees=2.5,
+                                 array_of_zeniths_and_azimuths=tuple(tuple(zenith_and_azimuth) for zenith_and_azimuth in default_9_zeniths_and_azimuths),
+                                 max_rigidity_grid_error=0.0,
+                                 max_spatial_grid_error=0.0),
+}
+
+def get_grid_quality_preset(grid_quality: str | GridQualityPreset) -> GridQualityPreset:
+    """
+    Get a grid quality preset by name.
+
+    Parameters:
+    - grid_quality: str or GridQualityPreset
+        One of "draft", "standard" or "precise", or a preset, which is returned unchanged.
+
+    Returns:
+    - GridQualityPreset
+        The grid quality preset.
+    """
+    if isinstance(grid_quality, GridQualityPreset):
+        return grid_quality
+    if grid_quality not in grid_quality_presets:
+        raise ValueError(f"Error: grid_quality must be one of {list(grid_quality_presets)}, not '{grid_quality}'.")
+    return grid_quality_presets[grid_quality]
+
+def get_benchmark_spectra() -> list:
+    """
+    Get the spectra used in the benchmarks: a GLE-like modified power law limited to 0.81-21 GV, and a solar minimum galactic cosmic ray proton spectrum.
+    """
+    return [CommonModifiedPowerLawSpectrum(J0=1e5, gamma=4.0, deltaGamma=0.3, lowerLimit=0.814529, upperLimit=21.084584),
+            DLRmodelSpectrum(atomicNumber=1, W_parameter=0.0)]
+
+benchmark_altitudes_in_km = [0.0, 12.192]
+
+# North geomagnetic pole of the tilted dipole used to generate benchmark cutoff rigidity maps
+benchmark_geomagnetic_pole_latitude = 80.65
+benchmark_geomagnetic_pole_longitude = 287.6
+
+def get_dipole_cutoff_rigidities(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Get approximate vertical cutoff rigidities from a tilted dipole, Rc = 14.9 cos^4(geomagnetic latitude) GV.
+
+    Parameters:
+    - latitudes: np.ndarray
+        Geographic latitudes in degrees.
+    - longitudes: np.ndarray
+        Geographic longitudes in degrees.
+
+    Returns:
+    - np.ndarray
+        The vertical cutoff rigidities in GV.
+    """
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    pole_latitude, pole_longitude = np.radians(benchmark_geomagnetic_pole_latitude), np.radians(benchmark_geomagnetic_pole_longitude)
+    sin_geomagnetic_latitude = (np.sin(latitudes) * np.sin(pole_latitude) +
+                                np.cos(latitudes) * np.cos(pole_latitude) * np.cos(longitudes - pole_longitude))
+    return 14.9 * (1.0 - np.clip(sin_geomagnetic_latitude, -1.0, 1.0)**2)**2
+
+def get_edose_for_cutoff_rigidities(cutoff_rigidities: np.ndarray, rigidity_levels: list[float], rigidity_spectrum: callable) -> np.ndarray:
+    """
+    Calculate isotropic edose rates for locations with sharp vertical cutoffs, using weighting factors tabulated at a set of rigidity levels.
+
+    Returns:
+    - np.ndarray
+        Array of shape (locations, benchmark altitudes).
+    """
+    rigidity_grid = np.sort(np.asarray(rigidity_levels, dtype=float))
+    spectrum_values = np.array([float(rigidity_spectrum(rigidity)) for rigidity in rigidity_grid])
+    weighting_factors = spectrum_values * (rigidity_grid >= np.asarray(cutoff_rigidities, dtype=float)[:, np.newaxis])
+
+    unique_weighting_factors, location_to_profile_indices = get_unique_location_profiles(weighting_factors)
+    edose = integrate_weighting_factors_over_kernel(unique_weighting_factors, "proton", benchmark_altitudes_in_km, rigidity_grid, ["edose"])[..., 0]
+    return edose[location_to_profile_indices]
+
+def benchmark_rigidity_grid_error(grid_quality: str | GridQualityPreset, reference_grid_quality: str | GridQualityPreset = "precise") -> float:
+    """
+    Benchmark the edose error caused by a preset's rigidity levels, for cutoff rigidities from 0.1 to 20 GV and the benchmark spectra.
+
+    Parameters:
+    - grid_quality: str or GridQualityPreset
+        The preset to benchmark.
+    - reference_grid_quality: str or GridQualityPreset
+        The preset to compare against.
+
+    Returns:
+    - float
+        The largest absolute edose error, as a fraction of the largest reference edose for the same spectrum and altitude.
+    """
+    cutoff_rigidities = np.linspace(0.1, 20.0, 398)
+    relative_errors = []
+    for rigidity_spectrum in get_benchmark_spectra():
+        edose = get_edose_for_cutoff_rigidities(cutoff_rigidities, get_grid_quality_preset(grid_quality).get_rigidity_levels(), rigidity_spectrum)
+        reference_edose = get_edose_for_cutoff_rigidities(cutoff_rigidities, get_grid_quality_preset(reference_grid_quality).get_rigidity_levels(), rigidity_spectrum)
+        relative_errors.append(np.max(np.abs(edose - reference_edose) / np.max(reference_edose, axis=0)))
+    return float(np.max(relative_errors))
+
+def benchmark_spatial_grid_error(grid_quality: str | GridQualityPreset, reference_grid_quality: str | GridQualityPreset = "precise") -> float:
+    """
+    Benchmark the edose error caused by bilinearly interpolating a preset's spatial grid onto the reference preset's grid,
+    for a tilted dipole cutoff rigidity map and the benchmark spectra. Both grids use the reference preset's rigidity levels.
+
+    Parameters:
+    - grid_quality: str or GridQualityPreset
+        The preset to benchmark.
+    - reference_grid_quality: str or GridQualityPreset
+        The preset to compare against.
+
+    Returns:
+    - float
+        The largest absolute edose error, as a fraction of the largest reference edose for the same spectrum and altitude.
+    """
+    grid_quality, reference_grid_quality = get_grid_quality_preset(grid_quality), get_grid_quality_preset(reference_grid_quality)
+    rigidity_levels = reference_grid_quality.get_rigidity_levels()
+    reference_lats_and_longs = reference_grid_quality.get_array_of_lats_and_longs()
+    lats_and_longs = grid_quality.get_array_of_lats_and_longs()
+    latitudes, longitudes = np.unique(lats_and_longs[:, 0]), np.unique(lats_and_longs[:, 1])
+
+    relative_errors = []
+    for rigidity_spectrum in get_benchmark_spectra():
+        reference_edose = get_edose_for_cutoff_rigidities(get_dipole_cutoff_rigidities(reference_lats_and_longs[:, 0], reference_lats_and_longs[:, 1]),
+                                                          rigidity_levels, rigidity_spectrum)
+        edose = get_edose_for_cutoff_rigidities(get_dipole_cutoff_rigidities(lats_and_longs[:, 0], lats_and_longs[:, 1]),
+                                                rigidity_levels, rigidity_spectrum).reshape(len(latitudes), len(longitudes), -1)
+        # repeat the first longitude at 360 degrees so that interpolation wraps around the globe
+        interpolator = RegularGridInterpolator((latitudes, np.append(longitudes, 360.0)), np.concatenate([edose, edose[:, :1]], axis=1))
+        interpolated_edose = interpolator(reference_lats_and_longs)
+        relative_errors.append(np.max(np.abs(interpolated_edose - reference_edose) / np.max(reference_edose, axis=0)))
+    return float(np.max(relative_errors))
+
+def benchmark_grid_quality_presets() -> pd.DataFrame:
+    """
+    Benchmark every grid quality preset against the "precise" preset.
+
+    Returns:
+    - pd.DataFrame
+        The benchmarked rigidity and spatial grid errors of each preset alongside its stated error bounds.
+    """
+    return pd.DataFrame([{"grid_quality": name,
+                          "rigidity_grid_error": benchmark_rigidity_grid_error(preset),
+                          "max_rigidity_grid_error": preset.max_rigidity_grid_error,
+                          "spatial_grid_error": benchmark_spatial_grid_error(preset),
+                          "max_spatial_grid_error": preset.max_spatial_grid_error}
+                         for name, preset in grid_quality_presets.items()]).set_index("grid_quality")
@@ -6,11 +6,14 @@ from typing import Optional
 import OTSO
 import logging
 import ParticleRigidityCalculationTools as PRCT
+from importlib.metadata import version
 from joblib import Memory
-import psutil
+from .resourceGovernor import get_OTSO_core_count
+from .AsymptoticDirectionStore import get_asymptotic_direction_store, get_asymptotic_direction_descriptor
+from .cacheManager import call_with_joblib_cache, get_cache_directory
 
-# Set up caching for OTSO calculations
-OTSOcachedir = 'cachedOTSOData'
+# Calculations cached by earlier versions of AniMAIRE, which are read from and moved into the asymptotic direction store
+OTSOcachedir = get_cache_directory("OTSO")
 OTSOmemory = Memory(OTSOcachedir, verbose=0)
 
 def convert_planet_df_to_asymp_format(planet_df):
@@ -202,7 +205,11 @@ def create_and_convert_full_planet(array_of_lats_and_longs:list[list[float,float
                             minRigValue=0.1,
                             nIncrements_high=60,
                             nIncrements_low=200,
-                            corenum=max(1, (psutil.cpu_count(logical=False) or 2) - 2),
+                            corenum=None,
+                            adaptive_rigidity_refinement=False,
+                            coarse_rigidity_stride=8,
+                            refinement_tolerance_degrees=5.0,
+                            penumbra_lower_fraction=0.5,
                             **kwargs):
     """
     Calculate asymptotic directions for a wide range of rigidities by combining high and low rigidity ranges.
@@ -235,7 +242,20 @@ def create_and_convert_full_planet(array_of_lats_and_longs:list[list[float,float
     nIncrements_low : int, optional
         Number of rigidity increments for low rigidity range, default 200
     corenum : int, optional
-        Number of CPU cores to use for calculation, default is number of physical cores minus 2
+        Number of CPU cores to use for calculation, default is the OTSO core count from resourceGovernor
+    adaptive_rigidity_refinement : bool, optional
+        If True, trace every coarse_rigidity_stride-th rigidity level first, and only trace the remaining levels in intervals
+        where Filter flips, that lie within a location's penumbra, or where the asymptotic direction changes by more than
+        refinement_tolerance_degrees. Elsewhere asymptotic directions are interpolated between the traced levels. The returned
+        DataFrame has the same rigidity levels as the non-adaptive calculation. Default False
+    coarse_rigidity_stride : int, optional
+        Spacing of the coarse rigidity ladder in units of the fine rigidity step, default 8
+    refinement_tolerance_degrees : float, optional
+        Largest change in asymptotic direction in degrees between neighbouring coarse rigidity levels for which the levels
+        in between are interpolated rather than traced, default 5.0
+    penumbra_lower_fraction : float, optional
+        Intervals are also refined from the highest forbidden coarse level down to this fraction of the lowest allowed coarse
+        level, to catch allowed bands in the penumbra that fall between coarse levels, default 0.5
     **kwargs : dict
         Additional parameters to pass to OTSO.planet()
         
@@ -245,6 +265,8 @@ def create_and_convert_full_planet(array_of_lats_and_longs:list[list[float,float
         Combined DataFrame containing asymptotic directions for both high and low rigidity ranges
     """
 
+    if corenum is None:
+        corenum = get_OTSO_core_count()
     print(f"Using {corenum} cores for OTSO.planet calculation")
     
     # Calculate step sizes for high and low rigidity ranges
@@ -252,7 +274,25 @@ def create_and_convert_full_planet(array_of_lats_and_longs:list[list[float,float
     low_rigidity_step = (maxRigValue - minRigValue) / (nIncrements_low - 1)
 
     # Use cached or non-cached function based on cache parameter
-    create_convert_func = OTSOmemory.cache(create_and_convert_planet) if cache else create_and_convert_planet
+    create_convert_func = create_and_convert_planet_with_store if cache else create_and_convert_planet
+
+    if adaptive_rigidity_refinement:
+        if coarse_rigidity_stride < 1:
+            raise ValueError("Error: coarse_rigidity_stride must be at least 1.")
+        rigidity_ladders = [get_rigidity_ladder(highestMaxRigValue, maxRigValue, high_rigidity_step),
+                            get_rigidity_ladder(maxRigValue - low_rigidity_step, minRigValue, low_rigidity_step)]
+        create_convert_at_rigidities_func = create_and_convert_planet_at_rigidities_with_store if cache else create_and_convert_planet_at_rigidities
+        return trace_asymptotic_directions_adaptively(create_convert_at_rigidities_func,
+                                                      array_of_lats_and_longs,
+                                                      KpIndex,
+                                                      dateAndTime,
+                                                      corenum,
+                                                      array_of_zeniths_and_azimuths,
+                                                      sum(rigidity_ladders, []),
+                                                      get_coarse_level_indices([len(rigidity_ladder) for rigidity_ladder in rigidity_ladders], coarse_rigidity_stride),
+                                                      refinement_tolerance_degrees,
+                                                      penumbra_lower_fraction,
+                                                      **kwargs)
     
     # Calculate high rigidity range asymptotic directions
     high_rigidity_planet_results = create_convert_func(array_of_lats_and_longs, 
@@ -277,4 +317,406 @@ def create_and_convert_full_planet(array_of_lats_and_longs:list[list[float,float
                                                      **kwargs)
 
     # Combine results from both rigidity ranges
-    return pd.concat([high_rigidity_planet_results, low_rigidity_planet_results], ignore_index=True) 
\ No newline at end of file
+    return pd.concat([high_rigidity_planet_results, low_rigidity_planet_results], ignore_index=True) 
+
+def get_OTSO_descriptor(array_of_lats_and_longs:list[list[float,float]],
+                        kpIndex:int,
+                        dateAndTime:dt.datetime,
+                        array_of_zeniths_and_azimuths:list[list[float,float]],
+                        rigidity_levels_GV:list[float],
+                        **kwargs) -> dict:
+    """
+    Describe an OTSO.planet() calculation for the asymptotic direction store.
+
+    Parameters:
+    -----------
+    array_of_lats_and_longs : list[list[float,float]]
+        List of [latitude, longitude] coordinates to calculate asymptotic directions for
+    kpIndex : int
+        Kp index value for the magnetic field model
+    dateAndTime : dt.datetime
+        Date and time for the calculation
+    array_of_zeniths_and_azimuths : list[list[float,float]]
+        List of [zenith, azimuth] pairs for viewing directions
+    rigidity_levels_GV : list[float]
+        Rigidity levels in GV to trace
+    **kwargs : dict
+        Additional parameters to pass to OTSO.planet()
+
+    Returns:
+    --------
+    dict
+        The descriptor of the calculation. The number of cores used is not included, as it does not change the result.
+    """
+    field_models = {"internalmag": kwargs.pop('internalmag', "IGRF"),
+                    "externalmag": kwargs.pop('externalmag', "TSY89c"),
+                    "boberg": kwargs.pop('boberg', True),
+                    "bobergtype": kwargs.pop('bobergtype', "EXTENSION")}
+    return get_asymptotic_direction_descriptor(f"OTSO {version('OTSO')}",
+                                               array_of_lats_and_longs,
+                                               kpIndex,
+                                               dateAndTime,
+                                               array_of_zeniths_and_azimuths,
+                                               rigidity_levels_GV,
+                                               field_models,
+                                               **kwargs)
+
+def call_with_asymptotic_direction_store(planet_function, descriptor:dict, *args, **kwargs) -> pd.DataFrame:
+    """
+    Load asymptotic directions from the asymptotic direction store, or calculate and store them if they are not in it.
+
+    Calculations cached by earlier versions of AniMAIRE in cachedOTSOData are loaded from there rather than traced again,
+    and are deleted from cachedOTSOData once they have been written to the asymptotic direction store.
+
+    Parameters:
+    -----------
+    planet_function : callable
+        The function that calculates the asymptotic directions
+    descriptor : dict
+        The descriptor of the calculation
+    *args, **kwargs :
+        The arguments to call planet_function with
+
+    Returns:
+    --------
+    pd.DataFrame
+        The asymptotic directions
+    """
+    legacy_planet_function = OTSOmemory.cache(planet_function)
+    asymptotic_direction_store = get_asymptotic_direction_store()
+    loaded_from_legacy_cache = False
+
+    def trace_or_load_legacy_cache():
+        nonlocal loaded_from_legacy_cache
+        if legacy_planet_function.check_call_in_cache(*args, **kwargs):
+            loaded_from_legacy_cache = True
+            return call_with_joblib_cache("OTSO", legacy_planet_function, *args, **kwargs)
+        return planet_function(*args, **kwargs)
+
+    asymptotic_direction_DF = asymptotic_direction_store.get_or_compute(descriptor, trace_or_load_legacy_cache)
+    if loaded_from_legacy_cache and asymptotic_direction_store.contains(descriptor):
+        # the entry has been moved into the store, so the original copy is no longer needed
+        legacy_planet_function.store_backend.clear_item([legacy_planet_function.func_id,
+                                                         legacy_planet_function._get_args_id(*args, **kwargs)])
+    return asymptotic_direction_DF
+
+def create_and_convert_planet_with_store(array_of_lats_and_longs:list[list[float,float]],
+                                         kpIndex:int,
+                                         dateAndTime:dt.datetime,
+                                         corenum:int,
+                                         array_of_zeniths_and_azimuths=[[0.0,0.0]],
+                                         max_rigidity=1010,
+                                         min_rigidity=20,
+                                         rigidity_step=16,
+                                         **kwargs) -> pd.DataFrame:
+    """
+    Version of create_and_convert_planet() that reuses asymptotic directions from the asymptotic direction store.
+    """
+    descriptor = get_OTSO_descriptor(array_of_lats_and_longs, kpIndex, dateAndTime, array_of_zeniths_and_azimuths,
+                                     get_rigidity_ladder(max_rigidity, min_rigidity, rigidity_step), **kwargs)
+    return call_with_asymptotic_direction_store(create_and_convert_planet, descriptor, array_of_lats_and_longs, kpIndex, dateAndTime, corenum,
+                                                array_of_zeniths_and_azimuths, max_rigidity, min_rigidity, rigidity_step, **kwargs)
+
+def create_and_convert_planet_at_rigidities_with_store(array_of_lats_and_longs:list[list[float,float]],
+                                                       kpIndex:int,
+                                                       dateAndTime:dt.datetime,
+                                                       corenum:int,
+                                                       zenith:float,
+                                                       azimuth:float,
+                                                       rigidity_levels_GV:list[float],
+                                                       **kwargs) -> pd.DataFrame:
+    """
+    Version of create_and_convert_planet_at_rigidities() that reuses asymptotic directions from the asymptotic direction store.
+    """
+    descriptor = get_OTSO_descriptor(array_of_lats_and_longs, kpIndex, dateAndTime, [[zenith, azimuth]], rigidity_levels_GV, **kwargs)
+    return call_with_asymptotic_direction_store(create_and_convert_planet_at_rigidities, descriptor, array_of_lats_and_longs, kpIndex, dateAndTime, corenum,
+                                                zenith, azimuth, rigidity_levels_GV, **kwargs)
+
+def get_rigidity_ladder(max_rigidity:float, min_rigidity:float, rigidity_step:float) -> list[float]:
+    """
+    Get the descending rigidity levels that create_and_convert_planet traces for a given range and step.
+
+    Returns:
+    --------
+    list[float]
+        Rigidity levels in GV, from max_rigidity down to the last level that is at least min_rigidity
+    """
+    rigidity_levels_GV = []
+    current_rigidity = max_rigidity
+    while current_rigidity >= min_rigidity:
+        rigidity_levels_GV.append(current_rigidity)
+        current_rigidity -= rigidity_step
+    return rigidity_levels_GV
+
+def create_and_convert_planet_at_rigidities(array_of_lats_and_longs:list[list[float,float]],
+                                           kpIndex:int,
+                                           dateAndTime:dt.datetime,
+                                           corenum:int,
+                                           zenith:float,
+                                           azimuth:float,
+                                           rigidity_levels_GV:list[float],
+                                           **kwargs) -> pd.DataFrame:
+    """
+    Create asymptotic directions using OTSO.planet() at an arbitrary list of rigidity levels for a single arrival direction,
+    and convert to a DataFrame format.
+
+    Parameters:
+    -----------
+    array_of_lats_and_longs : list[list[float,float]]
+        List of [latitude, longitude] coordinates to calculate asymptotic directions for
+    kpIndex : int
+        Kp index value for the magnetic field model
+    dateAndTime : dt.datetime
+        Date and time for the calculation
+    corenum : int
+        Number of CPU cores to use for calculation
+    zenith : float
+        Zenith angle of the arrival direction in degrees
+    azimuth : float
+        Azimuth angle of the arrival direction in degrees
+    rigidity_levels_GV : list[float]
+        Rigidity levels in GV to trace
+    **kwargs : dict
+        Additional parameters to pass to OTSO.planet()
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with the same columns as the output of create_and_convert_planet
+    """
+    magfield_params = {"internalmag": kwargs.pop('internalmag', "IGRF"),
+                       "externalmag": kwargs.pop('externalmag', "TSY89c"),
+                       "boberg": kwargs.pop('boberg', True),
+                       "bobergtype": kwargs.pop('bobergtype', "EXTENSION")}
+
+    planet_result = OTSO.planet(
+        grid_params={"array_of_lats_and_longs": array_of_lats_and_longs},
+        computation_params={"corenum": corenum},
+        asymptotic_params={"asymptotic": "YES", "asymlevels": PRCT.convertParticleRigidityToEnergy(list(rigidity_levels_GV))/1000.0},
+        magfield_params=magfield_params,
+        geomagnetic={"kp": kpIndex},
+        datetime_params={"year": dateAndTime.year,
+                         "month": dateAndTime.month,
+                         "day": dateAndTime.day,
+                         "hour": dateAndTime.hour,
+                         "minute": dateAndTime.minute,
+                         "second": dateAndTime.second},
+        particle_params={"zenith": zenith, "azimuth": azimuth},
+        integration_params={"gyropercent": 15, "betaerror": 0.01},
+        **kwargs
+    )
+
+    result_df = convert_planet_df_to_asymp_format(planet_result)
+    result_df['zenith'] = zenith
+    result_df['azimuth'] = azimuth
+    return result_df
+
+def get_coarse_level_indices(ladder_lengths:list[int], coarse_rigidity_stride:int) -> np.ndarray:
+    """
+    Get the indices of the coarse rigidity levels within consecutive fine rigidity ladders: every coarse_rigidity_stride-th level
+    of each ladder, always including the first and last level of each ladder.
+    """
+    ladder_offsets = np.cumsum([0] + list(ladder_lengths[:-1]))
+    return np.unique(np.concatenate([ladder_offset + np.union1d(np.arange(0, ladder_length, coarse_rigidity_stride), [ladder_length - 1])
+                                     for ladder_offset, ladder_length in zip(ladder_offsets, ladder_lengths) if ladder_length > 0]))
+
+def get_unit_vectors(latitudes:np.ndarray, longitudes:np.ndarray) -> np.ndarray:
+    """
+    Convert latitudes and longitudes in degrees to unit vectors, stacked along a new last axis.
+    """
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    return np.stack([np.cos(latitudes) * np.cos(longitudes),
+                     np.cos(latitudes) * np.sin(longitudes),
+                     np.sin(latitudes)], axis=-1)
+
+def get_intervals_to_refine(rigidity_levels_GV:np.ndarray,
+                            filter_flags:np.ndarray,
+                            latitudes:np.ndarray,
+                            longitudes:np.ndarray,
+                            refinement_tolerance_degrees:float,
+                            penumbra_lower_fraction:float=0.5) -> np.ndarray:
+    """
+    Find the intervals between neighbouring coarse rigidity levels that need to be traced at the fine rigidity levels.
+
+    An interval is refined if it may lie within a location's penumbra, or if it has an allowed end and the asymptotic direction
+    changes by more than refinement_tolerance_degrees across it. The penumbra is taken to run from the highest coarse level at
+    which the trajectory is forbidden down to penumbra_lower_fraction times the lowest coarse level at which it is allowed, as
+    allowed bands can lie between coarse levels that are both forbidden. This includes every interval where Filter flips.
+
+    Parameters:
+    -----------
+    rigidity_levels_GV : np.ndarray
+        The descending coarse rigidity levels in GV
+    filter_flags : np.ndarray
+        Array of shape (locations, coarse levels) of Filter values, 1 where allowed
+    latitudes : np.ndarray
+        Array of shape (locations, coarse levels) of asymptotic latitudes in degrees
+    longitudes : np.ndarray
+        Array of shape (locations, coarse levels) of asymptotic longitudes in degrees
+    refinement_tolerance_degrees : float
+        Largest change in asymptotic direction across an interval for it to be interpolated
+    penumbra_lower_fraction : float, optional
+        Lower edge of the penumbra as a fraction of the lowest allowed coarse rigidity, default 0.5
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean array of shape (locations, coarse levels - 1), True for intervals to refine
+    """
+    rigidity_levels_GV = np.asarray(rigidity_levels_GV, dtype=float)
+    allowed = (np.asarray(filter_flags) == 1)
+    interval_indices = np.arange(allowed.shape[1] - 1)
+
+    # index of the highest forbidden coarse level and of the lowest allowed coarse level at each location
+    first_forbidden_index = np.where((~allowed).any(axis=1), np.argmax(~allowed, axis=1), allowed.shape[1])
+    last_allowed_index = allowed.shape[1] - 1 - np.argmax(allowed[:, ::-1], axis=1)
+    penumbra_lower_rigidity = np.where(allowed.any(axis=1), penumbra_lower_fraction * rigidity_levels_GV[last_allowed_index], np.inf)
+    within_penumbra = ((interval_indices >= (first_forbidden_index[:, np.newaxis] - 1)) &
+                       (rigidity_levels_GV[:-1] >= penumbra_lower_rigidity[:, np.newaxis]))
+
+    # the directions of forbidden trajectories do not contribute to dose, so are only checked where at least one end is allowed
+    unit_vectors = get_unit_vectors(latitudes, longitudes)
+    cos_direction_change = np.clip(np.sum(unit_vectors[:, :-1] * unit_vectors[:, 1:], axis=-1), -1.0, 1.0)
+    direction_changes_quickly = ((np.degrees(np.arccos(cos_direction_change)) > refinement_tolerance_degrees) &
+                                 (allowed[:, :-1] | allowed[:, 1:]))
+
+    return within_penumbra | direction_changes_quickly
+
+def interpolate_asymptotic_directions(upper_latitudes:np.ndarray,
+                                      upper_longitudes:np.ndarray,
+                                      lower_latitudes:np.ndarray,
+                                      lower_longitudes:np.ndarray,
+                                      interpolation_fractions:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolate asymptotic directions between two rigidity levels along the great circle joining them.
+
+    Parameters:
+    -----------
+    upper_latitudes, upper_longitudes : np.ndarray
+        Asymptotic directions in degrees at the upper rigidity level, of shape (N,)
+    lower_latitudes, lower_longitudes : np.ndarray
+        Asymptotic directions in degrees at the lower rigidity level, of shape (N,)
+    interpolation_fractions : np.ndarray
+        Array of shape (N, M) of fractions of the way from the upper to the lower level
+
+    Returns:
+    --------
+    tuple[np.ndarray, np.ndarray]
+        Interpolated latitudes and longitudes (between 0 and 360) in degrees, each of shape (N, M)
+    """
+    upper_vectors = get_unit_vectors(upper_latitudes, upper_longitudes)[:, np.newaxis, :]
+    lower_vectors = get_unit_vectors(lower_latitudes, lower_longitudes)[:, np.newaxis, :]
+    fractions = np.asarray(interpolation_fractions)[..., np.newaxis]
+    interpolated_vectors = ((1.0 - fractions) * upper_vectors) + (fractions * lower_vectors)
+    interpolated_vectors /= np.linalg.norm(interpolated_vectors, axis=-1, keepdims=True)
+    latitudes = np.degrees(np.arcsin(np.clip(interpolated_vectors[..., 2], -1.0, 1.0)))
+    longitudes = np.degrees(np.arctan2(interpolated_vectors[..., 1], interpolated_vectors[..., 0])) % 360.0
+    # small negative longitudes wrap round to exactly 360.0
+    longitudes[longitudes >= 360.0] -= 360.0
+    return latitudes, longitudes
+
+def snap_to_rigidity_levels(rigidities:np.ndarray, rigidity_levels_GV:np.ndarray) -> np.ndarray:
+    """
+    Get the index of the nearest rigidity level to each rigidity.
+    """
+    return np.abs(np.asarray(rigidities, dtype=float)[:, np.newaxis] - np.asarray(rigidity_levels_GV)[np.newaxis, :]).argmin(axis=1)
+
+def trace_asymptotic_directions_adaptively(create_convert_at_rigidities_func,
+                                           array_of_lats_and_longs:list[list[float,float]],
+                                           kpIndex:int,
+                                           dateAndTime:dt.datetime,
+                                           corenum:int,
+                                           array_of_zeniths_and_azimuths:list[list[float,float]],
+                                           rigidity_levels_GV:list[float],
+                                           coarse_level_indices:np.ndarray,
+                                           refinement_tolerance_degrees:float=5.0,
+                                           penumbra_lower_fraction:float=0.5,
+                                           **kwargs) -> pd.DataFrame:
+    """
+    Calculate asymptotic directions at every one of a descending set of rigidity levels, tracing the coarse levels for every location
+    first and then tracing the remaining levels only in the intervals found by get_intervals_to_refine. Levels in the other intervals
+    are given the Filter value of the coarse levels either side of them and an asymptotic direction interpolated between them.
+
+    Parameters:
+    -----------
+    create_convert_at_rigidities_func : callable
+        create_and_convert_planet_at_rigidities, or a cached version of it
+    rigidity_levels_GV : list[float]
+        The descending rigidity levels in GV to return asymptotic directions at
+    coarse_level_indices : np.ndarray
+        The indices of the levels in rigidity_levels_GV that are traced for every location, including the first and last levels
+    refinement_tolerance_degrees : float, optional
+        Largest change in asymptotic direction between neighbouring coarse levels for the levels in between to be interpolated, default 5.0
+    penumbra_lower_fraction : float, optional
+        Lower edge of the region refined around each location's penumbra as a fraction of its lowest allowed coarse rigidity, default 0.5
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame in the same format as create_and_convert_planet, with Rigidity set to the nominal rigidity levels
+    """
+    rigidity_levels_GV = np.asarray(rigidity_levels_GV, dtype=float)
+    array_of_lats_and_longs = np.asarray(array_of_lats_and_longs, dtype=float)
+    location_index = pd.MultiIndex.from_arrays([array_of_lats_and_longs[:, 0], array_of_lats_and_longs[:, 1]])
+    coarse_shape = (len(location_index), len(coarse_level_indices))
+
+    all_results = []
+    number_of_traced_trajectories = 0
+    for zenith, azimuth in array_of_zeniths_and_azimuths:
+        coarse_DF = create_convert_at_rigidities_func(array_of_lats_and_longs.tolist(), kpIndex, dateAndTime, corenum, zenith, azimuth,
+                                                      list(rigidity_levels_GV[coarse_level_indices]), **kwargs)
+        location_codes = location_index.get_indexer(pd.MultiIndex.from_arrays([coarse_DF["initialLatitude"].to_numpy(dtype=float),
+                                                                               coarse_DF["initialLongitude"].to_numpy(dtype=float)]))
+        coarse_codes = np.searchsorted(coarse_level_indices, snap_to_rigidity_levels(coarse_DF["Rigidity"], rigidity_levels_GV))
+        coarse_filter_flags, coarse_latitudes, coarse_longitudes = np.zeros(coarse_shape), np.zeros(coarse_shape), np.zeros(coarse_shape)
+        coarse_filter_flags[location_codes, coarse_codes] = coarse_DF["Filter"].to_numpy()
+        coarse_latitudes[location_codes, coarse_codes] = coarse_DF["Lat"].to_numpy()
+        coarse_longitudes[location_codes, coarse_codes] = coarse_DF["Long"].to_numpy()
+
+        intervals_to_refine = get_intervals_to_refine(rigidity_levels_GV[coarse_level_indices], coarse_filter_flags, coarse_latitudes, coarse_longitudes,
+                                                      refinement_tolerance_degrees, penumbra_lower_fraction)
+        interior_level_indices = [np.arange(upper_index + 1, lower_index) for upper_index, lower_index in zip(coarse_level_indices[:-1], coarse_level_indices[1:])]
+
+        # locations that need the same intervals refining are traced together in a single OTSO run
+        traced_results = [coarse_DF]
+        refinement_patterns, location_pattern_codes = np.unique(intervals_to_refine, axis=0, return_inverse=True)
+        for pattern_code, refinement_pattern in enumerate(refinement_patterns):
+            refined_level_indices = np.concatenate([interior_level_indices[interval_index] for interval_index in np.flatnonzero(refinement_pattern)] + [np.array([], dtype=int)])
+            if len(refined_level_indices) > 0:
+                traced_results.append(create_convert_at_rigidities_func(array_of_lats_and_longs[location_pattern_codes.reshape(-1) == pattern_code].tolist(),
+                                                                        kpIndex, dateAndTime, corenum, zenith, azimuth,
+                                                                        list(rigidity_levels_GV[refined_level_indices]), **kwargs))
+
+        interpolated_results = []
+        for interval_index, interior_indices in enumerate(interior_level_indices):
+            interpolated_locations = np.flatnonzero(~intervals_to_refine[:, interval_index])
+            if (len(interior_indices) == 0) or (len(interpolated_locations) == 0):
+                continue
+            upper_rigidity, lower_rigidity = rigidity_levels_GV[coarse_level_indices[interval_index]], rigidity_levels_GV[coarse_level_indices[interval_index + 1]]
+            interior_levels = rigidity_levels_GV[interior_indices]
+            interpolation_fractions = np.tile((upper_rigidity - interior_levels) / (upper_rigidity - lower_rigidity), (len(interpolated_locations), 1))
+            interpolated_latitudes, interpolated_longitudes = interpolate_asymptotic_directions(coarse_latitudes[interpolated_locations, interval_index],
+                                                                                                coarse_longitudes[interpolated_locations, interval_index],
+                                                                                                coarse_latitudes[interpolated_locations, interval_index + 1],
+                                                                                                coarse_longitudes[interpolated_locations, interval_index + 1],
+                                                                                                interpolation_fractions)
+            interpolated_results.append(pd.DataFrame({"initialLatitude": np.repeat(array_of_lats_and_longs[interpolated_locations, 0], len(interior_levels)),
+                                                      "initialLongitude": np.repeat(array_of_lats_and_longs[interpolated_locations, 1], len(interior_levels)),
+                                                      "Energy": np.tile(PRCT.convertParticleRigidityToEnergy(list(interior_levels)) / 1000.0, len(interpolated_locations)),
+                                                      "Lat": interpolated_latitudes.reshape(-1),
+                                                      "Long": interpolated_longitudes.reshape(-1),
+                                                      "Filter": np.repeat(coarse_filter_flags[interpolated_locations, interval_index], len(interior_levels)).astype(int),
+                                                      "Rigidity": np.tile(interior_levels, len(interpolated_locations)),
+                                                      "zenith": zenith,
+                                                      "azimuth": azimuth}))
+
+        traced_DF = pd.concat(traced_results, ignore_index=True)
+        number_of_traced_trajectories += len(traced_DF)
+        traced_DF["Rigidity"] = rigidity_levels_GV[snap_to_rigidity_levels(traced_DF["Rigidity"], rigidity_levels_GV)]
+
+        zenith_results = pd.concat([traced_DF] + interpolated_results, ignore_index=True)
+        all_results.append(zenith_results.sort_values(by=["initialLatitude", "initialLongitude", "Rigidity"], ascending=[True, True, False]))
+
+    number_of_trajectories = len(location_index) * len(rigidity_levels_GV) * len(array_of_zeniths_and_azimuths)
+    print(f"Adaptive rigidity refinement traced {number_of_traced_trajectories} of {number_of_trajectories} trajectories")
+    return pd.concat(all_results, ignore_index=True)
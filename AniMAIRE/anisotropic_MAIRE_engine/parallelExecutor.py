@@ -0,0 +1,194 @@
+import math
+import atexit
+import itertools
+import concurrent.futures
+from typing import Callable, Iterable, Optional
+
+import cloudpickle
+import pandas as pd
+from tqdm import tqdm
+
+from .resourceGovernor import get_executor_worker_count, get_threads_per_worker, limit_thread_pools
+
+available_backends = ["serial", "thread", "process", "joblib", "dask"]
+
+def _apply_function_to_chunk(function: Callable, chunk: list) -> list:
+    return [function(item) for item in chunk]
+
+def _apply_pickled_function_to_chunk(pickled_function: bytes, chunk: list) -> list:
+    return _apply_function_to_chunk(cloudpickle.loads(pickled_function), chunk)
+
+class ParallelExecutor:
+    """
+    Executor used to apply a function across many independent items, such as the rows of an asymptotic direction DataFrame.
+
+    Worker pools are created the first time they are needed and then reused for every later call, so repeated runs
+    do not pay to spin up new workers. Items are sent to workers in chunks to keep pickling overheads low.
+    """
+
+    def __init__(self, backend: str = "process", n_workers: Optional[int] = None, chunk_size: Optional[int] = None, progress_bar: bool = False):
+        """
+        Initialize the executor.
+
+        Parameters:
+        - backend: str
+            One of "serial", "thread", "process", "joblib" or "dask".
+        - n_workers: int, optional
+            The number of workers to use. Defaults to the CPU budget set in resourceGovernor, which is read again
+            each time the executor is used, so that later changes to the budget are followed.
+        - chunk_size: int, optional
+            The number of items sent to a worker at once. Defaults to splitting the items into four chunks per worker.
+        - progress_bar: bool
+            Whether to display a progress bar for serial execution.
+        """
+        if backend not in available_backends:
+            raise ValueError(f"Executor backend must be one of {available_backends}, not '{backend}'.")
+        if (n_workers is not None) and (n_workers < 1):
+            raise ValueError("n_workers must be at least 1.")
+        if (chunk_size is not None) and (chunk_size < 1):
+            raise ValueError("chunk_size must be at least 1.")
+
+        self.backend = backend
+        self.requested_n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.progress_bar = progress_bar
+        self._pool = None
+        self._pool_settings = None
+
+    @property
+    def n_workers(self) -> int:
+        """
+        The number of workers, which is the CPU budget at the time of the call unless a number was given when the executor was created.
+        """
+        return self.requested_n_workers if self.requested_n_workers is not None else get_executor_worker_count()
+
+    def _get_pool(self) -> concurrent.futures.Executor:
+        n_workers = self.n_workers
+        pool_settings = (n_workers, get_threads_per_worker(n_workers))
+        if (self._pool is not None) and (self._pool_settings != pool_settings):
+            # the CPU budget has changed since the pool was created
+            self.shutdown()
+        if self._pool is None:
+            if self.backend == "thread":
+                self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=n_workers)
+            else:
+                # stop numba and BLAS threads inside each worker from oversubscribing the CPU budget
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers,
+                                                                    initializer=limit_thread_pools,
+                                                                    initargs=(pool_settings[1],))
+            self._pool_settings = pool_settings
+        return self._pool
+
+    def _split_into_chunks(self, items: list) -> list:
+        chunk_size = self.chunk_size if self.chunk_size is not None else max(1, math.ceil(len(items) / (4 * self.n_workers)))
+        return [items[chunk_start:chunk_start + chunk_size] for chunk_start in range(0, len(items), chunk_size)]
+
+    def map(self, function: Callable, items: Iterable) -> list:
+        """
+        Apply a function to each item.
+
+        Parameters:
+        - function: callable
+            The function to apply. Functions sent to process, joblib and dask workers are pickled with cloudpickle, so lambdas can be used.
+        - items: iterable
+            The items to apply the function to.
+
+        Returns:
+        - list
+            The results, in the same order as the items.
+        """
+        items = list(items)
+        if (self.backend == "serial") or (self.n_workers == 1) or (len(items) <= 1):
+            return [function(item) for item in tqdm(items, disable=not self.progress_bar)]
+
+        chunks = self._split_into_chunks(items)
+
+        if self.backend == "thread":
+            chunk_results = list(self._get_pool().map(_apply_function_to_chunk, itertools.repeat(function), chunks))
+        elif self.backend == "process":
+            chunk_results = list(self._get_pool().map(_apply_pickled_function_to_chunk, itertools.repeat(cloudpickle.dumps(function)), chunks))
+        elif self.backend == "joblib":
+            from joblib import Parallel, delayed
+            # the loky backend reuses the same worker processes across calls
+            chunk_results = Parallel(n_jobs=self.n_workers, backend="loky")(delayed(_apply_function_to_chunk)(function, chunk) for chunk in chunks)
+        else:
+            import dask.bag
+            chunk_results = dask.bag.from_sequence(chunks, npartitions=len(chunks)).map(lambda chunk: _apply_function_to_chunk(function, chunk)).compute(scheduler="processes", pool=self._get_pool())
+
+        return [result for chunk_result in chunk_results for result in chunk_result]
+
+    def apply(self, DF_or_Series: pd.DataFrame | pd.Series, function: Callable, axis: Optional[int] = None) -> pd.Series:
+        """
+        Apply a function over the elements of a Series or the rows of a DataFrame.
+
+        Parameters:
+        - DF_or_Series: pd.DataFrame or pd.Series
+            The Series or DataFrame to apply the function over.
+        - function: callable
+            The function to apply. DataFrame rows are passed as dictionaries keyed by column name.
+        - axis: int, optional
+            Must be 1 when a DataFrame is supplied.
+
+        Returns:
+        - pd.Series
+            The results, with the same index as DF_or_Series.
+        """
+        if isinstance(DF_or_Series, pd.DataFrame):
+            if axis != 1:
+                raise ValueError("Functions can only be applied over the rows (axis=1) of a DataFrame.")
+            items = DF_or_Series.to_dict("records")
+        else:
+            items = DF_or_Series.tolist()
+
+        results = pd.Series(index=DF_or_Series.index, dtype=object, name=DF_or_Series.name if isinstance(DF_or_Series, pd.Series) else None)
+        results[:] = self.map(function, items)
+        return results.infer_objects()
+
+    def shutdown(self):
+        """
+        Shut down any worker pool held by the executor.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._pool_settings = None
+
+_configured_executor = None
+
+def configure_executor(backend: str = "process", n_workers: Optional[int] = None, chunk_size: Optional[int] = None, progress_bar: bool = False) -> ParallelExecutor:
+    """
+    Configure the executor used by AniMAIRE for the rest of the process, shutting down any previously configured executor.
+
+    Parameters:
+    - backend: str
+        One of "serial", "thread", "process", "joblib" or "dask".
+    - n_workers: int, optional
+        The number of workers to use. Defaults to the CPU budget set in resourceGovernor.
+    - chunk_size: int, optional
+        The number of items sent to a worker at once.
+    - progress_bar: bool
+        Whether to display a progress bar for serial execution.
+
+    Returns:
+    - ParallelExecutor
+        The configured executor.
+    """
+    global _configured_executor
+    if _configured_executor is not None:
+        _configured_executor.shutdown()
+    _configured_executor = ParallelExecutor(backend=backend, n_workers=n_workers, chunk_size=chunk_size, progress_bar=progress_bar)
+    return _configured_executor
+
+def get_executor() -> ParallelExecutor:
+    """
+    Get the executor configured for this process, configuring the default process pool executor if none has been configured yet.
+    """
+    if _configured_executor is None:
+        configure_executor()
+    return _configured_executor
+
+def _shutdown_configured_executor():
+    if _configured_executor is not None:
+        _configured_executor.shutdown()
+
+atexit.register(_shutdown_configured_executor)
@@ -0,0 +1,136 @@
+import os
+from typing import Optional
+
+import numba
+import psutil
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+cpu_budget_environment_variable = "ANIMAIRE_CPU_BUDGET"
+
+# number of cores left free for the rest of the machine when no budget has been set
+default_reserved_cores = 2
+
+_configured_cpu_budget = None
+# the ANIMAIRE_CPU_BUDGET value whose thread limits have been applied to this process
+_applied_environment_budget = None
+
+def get_available_core_count() -> int:
+    """
+    Get the number of physical cores that this process is allowed to run on.
+
+    Returns:
+    - int
+        The number of available cores.
+    """
+    logical_core_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    physical_core_count = psutil.cpu_count(logical=False) or logical_core_count
+    return max(1, min(logical_core_count, physical_core_count))
+
+def configure_cpu_budget(total_cores: Optional[int]) -> Optional[int]:
+    """
+    Set the total number of cores that AniMAIRE may use in this process, and apply the matching numba and BLAS thread limits.
+
+    The budget can also be set with the ANIMAIRE_CPU_BUDGET environment variable, which is useful when several jobs are run on the same node.
+    Its thread limits are applied when it is first read. Executors that were created without a fixed number of workers
+    follow changes to the budget.
+
+    Parameters:
+    - total_cores: int or None
+        The core budget. None removes any budget set previously.
+
+    Returns:
+    - int or None
+        The configured core budget.
+    """
+    global _configured_cpu_budget
+    if (total_cores is not None) and (total_cores < 1):
+        raise ValueError("Error: the CPU budget must be at least 1 core.")
+    _configured_cpu_budget = total_cores
+    limit_thread_pools(get_cpu_budget())
+    return _configured_cpu_budget
+
+def cpu_budget_is_set() -> bool:
+    """
+    Check whether a core budget has been set, either with configure_cpu_budget or the ANIMAIRE_CPU_BUDGET environment variable.
+    """
+    return (_configured_cpu_budget is not None) or bool(os.environ.get(cpu_budget_environment_variable))
+
+def get_cpu_budget() -> int:
+    """
+    Get the total number of cores that AniMAIRE may use in this process.
+
+    Returns:
+    - int
+        The budget set with configure_cpu_budget, then the ANIMAIRE_CPU_BUDGET environment variable, then the number of available cores.
+    """
+    if _configured_cpu_budget is not None:
+        return _configured_cpu_budget
+
+    environment_budget = os.environ.get(cpu_budget_environment_variable)
+    if environment_budget:
+        try:
+            cpu_budget = int(environment_budget)
+        except ValueError:
+            raise ValueError(f"Error: {cpu_budget_environment_variable} must be an integer, not '{environment_budget}'.")
+        if cpu_budget < 1:
+            raise ValueError(f"Error: {cpu_budget_environment_variable} must be at least 1.")
+        apply_environment_budget(cpu_budget)
+        return cpu_budget
+
+    return get_available_core_count()
+
+def apply_environment_budget(cpu_budget: int):
+    """
+    Apply the numba and BLAS thread limits for a budget read from the ANIMAIRE_CPU_BUDGET environment variable,
+    the first time that budget is read.
+    """
+    global _applied_environment_budget
+    if _applied_environment_budget != cpu_budget:
+        _applied_environment_budget = cpu_budget
+        limit_thread_pools(cpu_budget)
+
+def get_OTSO_core_count() -> int:
+    """
+    Get the number of cores OTSO should trace trajectories across.
+
+    OTSO runs on its own, so it is given the whole budget. When no budget has been set, a couple of cores are left free for the rest of the machine.
+    """
+    if cpu_budget_is_set():
+        return get_cpu_budget()
+    return max(1, get_cpu_budget() - default_reserved_cores)
+
+def get_executor_worker_count() -> int:
+    """
+    Get the number of workers that the parallel executor should use.
+    """
+    return get_cpu_budget()
+
+def get_threads_per_worker(n_workers: int) -> int:
+    """
+    Get the number of numba and BLAS threads each executor worker may use, so that the workers together stay within the budget.
+
+    Parameters:
+    - n_workers: int
+        The number of executor workers.
+
+    Returns:
+    - int
+        The number of threads per worker.
+    """
+    return max(1, get_cpu_budget() // max(1, n_workers))
+
+def limit_thread_pools(n_threads: int):
+    """
+    Limit the number of threads used by numba and, if threadpoolctl is installed, by BLAS/OpenMP libraries in this process.
+
+    Parameters:
+    - n_threads: int
+        The maximum number of threads.
+    """
+    numba.set_num_threads(max(1, min(n_threads, numba.config.NUMBA_NUM_THREADS)))
+    if threadpool_limits is not None:
+        threadpool_limits(limits=n_threads)
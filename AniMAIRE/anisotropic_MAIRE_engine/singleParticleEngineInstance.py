@@ -7,12 +7,13 @@ from scipy.integrate import trapezoid
 import ParticleRigidityCalculationTools as PRCT
 
 from .data.NM64_responses import get_NM64_response_value_altitude, response_value_epns
-from .AsymptoticDirectionProcessing import acquireWeightingFactors, get_apply_method
+from .AsymptoticDirectionProcessing import acquireWeightingFactors
+from .AsymptoticDirectionCube import AsymptoticDirectionCube
 from .spectralCalculations.particleDistribution import particleDistribution
+from .spectralCalculations.pitchAngleDistribution import IsotropicPitchAngleDistribution
+from .doseResponseKernels import get_dose_response_kernel_on_rigidity_grid, linear_interpolation_matrix, trapezoid_weights, validate_dose_types
 import dask.dataframe as dd
-
-# from pandarallel import pandarallel
-# pandarallel.initialize(progress_bar=True)
+from .parallelExecutor import get_executor
 
 class singleParticleEngineInstance:
     """
@@ -23,14 +24,27 @@ class singleParticleEngineInstance:
                  particle_distribution: particleDistribution, 
                  dfofAsymptoticDirections: pd.DataFrame, 
                  list_of_altitudes_in_km: list[float],
-                 generate_NM_count_rates: bool):
+                 generate_NM_count_rates: bool,
+                 integration_mode: str = "matrix",
+                 dose_types: list[str] = None):
         """
         Initialize the instance with necessary parameters.
+
+        integration_mode can be "matrix", where dose rates for all locations are obtained as a single matrix product with
+        tabulated atmospheric response kernels, or "quadrature", where each location's spectrum is passed separately to
+        atmosphericRadiationDoseAndFlux.
+
+        dose_types selects which of the dose rate types in list_of_dose_rate_names are calculated and output, by default all of them.
         """
+        if integration_mode not in ["matrix", "quadrature"]:
+            raise Exception(f"ERROR: integration_mode must be either 'matrix' or 'quadrature', not '{integration_mode}'!")
+
         self.particle_distribution = particle_distribution
         self.list_of_altitudes_in_km = list_of_altitudes_in_km
         self.dfOfAllAsymptoticDirections = dfofAsymptoticDirections
         self.generate_NM_count_rates = generate_NM_count_rates
+        self.integration_mode = integration_mode
+        self.dose_types = validate_dose_types(dose_types)
         self.rigiditySpectrumParamDict = {}
         self.pitchAngleDistributionParamDict = {}
 
@@ -86,18 +100,25 @@ class singleParticleEngineInstance:
         """
         Calculate output dose and flux.
         """
+        if self.integration_mode == "matrix":
+            weighting_factor_matrix = get_weighting_factor_matrix(asymp_dir_DF_with_weighting_factors)
+            if weighting_factor_matrix.isna().values.any():
+                print("Locations do not share a common rigidity grid: falling back to quadrature dose rate integration...")
+            else:
+                return self.calc_output_dose_flux_matrix(weighting_factor_matrix, list_of_altitudes_in_km, particle_name)
+
         spectrum_to_function_conversion_function = lambda row: interp1d(x=np.array(row["Rigidity"]),
                                                                         y=np.array(row["fullRigidityPitchWeightingFactor"]),
                                                                         bounds_error=False,
                                                                         fill_value=0.0)
 
         DFofSpectraForEachCoord = asymp_dir_DF_with_weighting_factors.groupby(["initialLatitude","initialLongitude"]).apply(spectrum_to_function_conversion_function)
-        outputDoseRatesForAltitudeRange = get_apply_method(DFofSpectraForEachCoord)(lambda spectrum: DAFcalc.calculate_from_rigidity_spec(
+        outputDoseRatesForAltitudeRange = get_executor().apply(DFofSpectraForEachCoord, lambda spectrum: DAFcalc.calculate_from_rigidity_spec(
                                                                                                 inputRigidityDistributionFunctionGV=lambda x: float(spectrum(x)),
                                                                                                 altitudesInkm=list_of_altitudes_in_km,
                                                                                                 particleName=particle_name))
 
-        outputDoseRatesOnlyDF = pd.concat(outputDoseRatesForAltitudeRange.tolist(), ignore_index=True)
+        outputDoseRatesOnlyDF = pd.concat(outputDoseRatesForAltitudeRange.tolist(), ignore_index=True)[["altitude (km)"] + self.dose_types]
 
         if self.generate_NM_count_rates:
             print("Calculating neutron monitor count rates...")
@@ -108,6 +129,41 @@ class singleParticleEngineInstance:
         sortedOutputDoseRates = outputDoseRatesOnlyDF_with_lats_and_longs.sort_values(["latitude", "longitude", "altitude (km)"], ignore_index=True)
         return sortedOutputDoseRates
 
+    def calc_output_dose_flux_matrix(self, weighting_factor_matrix: pd.DataFrame, list_of_altitudes_in_km: list[float], particle_name: str) -> pd.DataFrame:
+        """
+        Calculate output dose and flux for all locations at once using tabulated atmospheric response kernels.
+
+        Parameters:
+        - weighting_factor_matrix: pd.DataFrame
+            Weighting factors indexed by (initialLatitude, initialLongitude) with one column per rigidity, as produced by get_weighting_factor_matrix.
+        - list_of_altitudes_in_km: list[float]
+            The altitudes in km.
+        - particle_name: str
+            The name of the particle.
+
+        Returns:
+        - pd.DataFrame
+            The sorted output dose rates, in the same format as the quadrature calculation.
+        """
+        rigidity_grid = weighting_factor_matrix.columns.to_numpy(dtype=float)
+        weighting_factors = weighting_factor_matrix.to_numpy(dtype=float)
+
+        location_to_profile_indices = np.arange(len(weighting_factors))
+        if isinstance(self.particle_distribution.momentum_distribution.pitch_angle_distribution, IsotropicPitchAngleDistribution):
+            # for isotropic distributions, locations with the same cutoff profile have identical weighting factors
+            weighting_factors, location_to_profile_indices = get_unique_location_profiles(weighting_factors)
+            print(f"Evaluating dose rates for {len(weighting_factors)} distinct cutoff profiles across {len(location_to_profile_indices)} locations...")
+
+        dose_rates = integrate_weighting_factors_over_kernel(weighting_factors, particle_name, list_of_altitudes_in_km, rigidity_grid, self.dose_types)
+
+        NM64_count_rates = None
+        if self.generate_NM_count_rates:
+            print("Calculating neutron monitor count rates...")
+            NM64_count_rates = integrate_weighting_factors_over_NM64_kernel(weighting_factors, particle_name, list_of_altitudes_in_km, rigidity_grid)[location_to_profile_indices]
+            print("Neutron monitor count rates successfully determined.")
+
+        return build_output_dose_rate_DF(dose_rates[location_to_profile_indices], weighting_factor_matrix.index, list_of_altitudes_in_km, NM64_count_rates, self.dose_types)
+
     def get_neutron_monitor_count_rates(self, list_of_altitudes_in_km: list[float], particle_name: str, DFofSpectraForEachCoord: pd.Series) -> np.ndarray:
         """
         Get neutron monitor count rates.
@@ -115,7 +171,7 @@ class singleParticleEngineInstance:
         NM64_values_list = []
 
         for altitude_in_km in list_of_altitudes_in_km:
-            NM64_vals_DF = get_apply_method(DFofSpectraForEachCoord)(lambda x: self.calculate_unnormed_NM64_cr(x, particle_name=particle_name, altitude_in_km=altitude_in_km)).values
+            NM64_vals_DF = get_executor().apply(DFofSpectraForEachCoord, lambda x: self.calculate_unnormed_NM64_cr(x, particle_name=particle_name, altitude_in_km=altitude_in_km)).values
             NM64_values_list.append(NM64_vals_DF)
 
         new_cr_unnorm_list = np.array(NM64_values_list).T.flatten()
@@ -125,26 +181,7 @@ class singleParticleEngineInstance:
         """
         Calculate unnormalized NM64 count rates.
         """
-        response_values = get_NM64_response_value_altitude(particle_name, response_value_epns, altitude_in_km)
-        NM64_response_tabulated_2020_functional_epn = pd.DataFrame({"Energy_per_nucleon_GeV_per_n": response_value_epns,
-                                                                    "Yield_per_m2_per_sr": response_values})
-
-        if particle_name == "proton":
-            NM64_response_tabulated_2020_functional = PRCT.convertParticleEnergySpecToRigiditySpec(
-                NM64_response_tabulated_2020_functional_epn["Energy_per_nucleon_GeV_per_n"] * 1000,
-                fluxInEnergyMeVform=NM64_response_tabulated_2020_functional_epn["Yield_per_m2_per_sr"],
-                particleMassAU=1,
-                particleChargeAU=1)
-        elif particle_name == "alpha":
-            NM64_response_tabulated_2020_functional = PRCT.convertParticleEnergySpecToRigiditySpec(
-                NM64_response_tabulated_2020_functional_epn["Energy_per_nucleon_GeV_per_n"] * 1000 * 4,
-                fluxInEnergyMeVform=NM64_response_tabulated_2020_functional_epn["Yield_per_m2_per_sr"],
-                particleMassAU=4,
-                particleChargeAU=2)
-        else:
-            raise Exception("ERROR: particle name did not match either proton or alpha!")
-
-        NM64_response_to_use = NM64_response_tabulated_2020_functional
+        NM64_response_to_use = get_NM64_rigidity_response(particle_name, altitude_in_km)
         spectra_weighting_factors_across_NM = NM64_response_to_use["Rigidity"].apply(interpolated_spectra_row)
         full_NM64_spectra_weighting_factor = spectra_weighting_factors_across_NM * NM64_response_to_use["Rigidity distribution values"]
         output_unnormalised_NM64_cr = trapezoid(full_NM64_spectra_weighting_factor, NM64_response_to_use["Rigidity"])
@@ -180,6 +217,277 @@ def get_max_weighting_factors_for_multi_angle_magcos_runs(multi_angle_DF: pd.Dat
 def get_mean_weighting_factors_for_multi_angle_magcos_runs(multi_angle_DF: pd.DataFrame) -> pd.DataFrame:
     """
     Get mean weighting factors for multi-angle Magnetocosmics runs.
+
+    Where every location has the same number of arrival directions at every rigidity, the directions are arranged into
+    an AsymptoticDirectionCube and averaged along its direction axis; otherwise they are averaged with a groupby.
+    """
+    try:
+        asymptotic_direction_cube = AsymptoticDirectionCube.from_dataframe(multi_angle_DF)
+    except ValueError:
+        mean_weighting_factor_DF = multi_angle_DF.groupby(["Rigidity", "initialLatitude", "initialLongitude"], group_keys=False).mean()
+        return mean_weighting_factor_DF.reset_index()
+
+    value_column_names = [column_name for column_name in multi_angle_DF.columns if column_name not in AsymptoticDirectionCube.key_column_names]
+    # (columns, locations, rigidities) -> (columns, rigidities, locations) to match the (Rigidity, initialLatitude, initialLongitude) ordering of a groupby
+    mean_values = asymptotic_direction_cube.mean_over_directions(asymptotic_direction_cube.gather(multi_angle_DF[value_column_names].to_numpy(dtype=float).T))
+    mean_values = mean_values.transpose(0, 2, 1).reshape(len(value_column_names), -1)
+
+    number_of_locations, _, number_of_rigidities = asymptotic_direction_cube.shape
+    key_columns = {"Rigidity": np.repeat(asymptotic_direction_cube.rigidities, number_of_locations),
+                   "initialLatitude": np.tile(asymptotic_direction_cube.location_latitudes, number_of_rigidities),
+                   "initialLongitude": np.tile(asymptotic_direction_cube.location_longitudes, number_of_rigidities)}
+    return pd.DataFrame({**{column_name: key_values.astype(multi_angle_DF[column_name].dtype) for column_name, key_values in key_columns.items()},
+                         **dict(zip(value_column_names, mean_values))})
+
+def integrate_weighting_factors_over_kernel(weighting_factors: np.ndarray, particle_name: str, list_of_altitudes_in_km: list[float], rigidity_grid: np.ndarray,
+                                            dose_types: list[str] = None) -> np.ndarray:
+    """
+    Calculate dose rates for a (locations x rigidities) matrix of weighting factors with a single matrix product.
+
+    Parameters:
+    - weighting_factors: np.ndarray
+        Array of shape (locations, rigidities).
+    - particle_name: str
+        The name of the particle.
+    - list_of_altitudes_in_km: list[float]
+        The altitudes in km.
+    - rigidity_grid: np.ndarray
+        The sorted rigidities in GV that the weighting factors are tabulated on.
+    - dose_types: list[str], optional
+        The dose rate types to calculate. By default every dose rate type is calculated.
+
+    Returns:
+    - np.ndarray
+        Array of shape (locations, altitudes, dose rate types), with dose rate types ordered as in list_of_dose_rate_names.
+    """
+    dose_types = validate_dose_types(dose_types)
+    contributing_rigidity_indices = get_contributing_rigidity_indices(weighting_factors)
+    dose_response_kernel = get_dose_response_kernel_on_rigidity_grid(particle_name, list_of_altitudes_in_km, rigidity_grid, contributing_rigidity_indices, dose_types)
+    dose_rates = multiply_by_location_blocks(weighting_factors[:, contributing_rigidity_indices],
+                                             dose_response_kernel.reshape(len(list_of_altitudes_in_km) * len(dose_types), len(contributing_rigidity_indices)))
+    return dose_rates.reshape(len(weighting_factors), len(list_of_altitudes_in_km), len(dose_types))
+
+def get_contributing_rigidity_indices(weighting_factors: np.ndarray) -> np.ndarray:
+    """
+    Find the rigidities at which at least one weighting factor is non-zero.
+
+    Forbidden trajectories have zero weighting factors, so at low rigidities whole rigidity columns often contribute
+    no dose at any location and can be left out of the integration without changing the result.
+
+    Parameters:
+    - weighting_factors: np.ndarray
+        Array whose last axis is the rigidity grid.
+
+    Returns:
+    - np.ndarray
+        The indices of the contributing rigidities.
+    """
+    return np.flatnonzero(np.any(weighting_factors.reshape(-1, weighting_factors.shape[-1]) != 0.0, axis=0))
+
+def multiply_by_location_blocks(weighting_factors: np.ndarray, kernel: np.ndarray, maximum_number_of_blocks: int = 16) -> np.ndarray:
+    """
+    Multiply weighting factors by a kernel over rigidity, leaving out the rigidities below each location's lowest contributing rigidity.
+
+    Trajectories below a location's cutoff rigidity are forbidden, so most zero weighting factors lie at the low rigidity end
+    of each location's row. Locations are sorted by their lowest contributing rigidity and split into blocks, and each block
+    is only multiplied over the rigidities from the lowest contributing rigidity in the block, so the work scales with the
+    fraction of (location, rigidity) entries that are allowed rather than with the whole grid. The result is unchanged.
+
+    Parameters:
+    - weighting_factors: np.ndarray
+        Array of shape (..., locations, rigidities).
+    - kernel: np.ndarray
+        Array of shape (outputs, rigidities).
+    - maximum_number_of_blocks: int, optional
+        The largest number of blocks to split the locations into.
+
+    Returns:
+    - np.ndarray
+        Array of shape (..., locations, outputs).
+    """
+    number_of_locations, number_of_rigidities = weighting_factors.shape[-2:]
+    products = np.zeros(weighting_factors.shape[:-1] + (kernel.shape[0],))
+    if (number_of_locations == 0) or (number_of_rigidities == 0):
+        return products
+
+    contributing_entries = np.any(weighting_factors.reshape(-1, number_of_locations, number_of_rigidities) != 0.0, axis=0)
+    lowest_contributing_indices = np.where(contributing_entries.any(axis=1), contributing_entries.argmax(axis=1), number_of_rigidities)
+    location_order = np.argsort(lowest_contributing_indices, kind="stable")
+
+    for location_indices in np.array_split(location_order, min(maximum_number_of_blocks, number_of_locations)):
+        # locations are sorted, so the first location in the block has the block's lowest contributing rigidity
+        first_rigidity_index = lowest_contributing_indices[location_indices[0]]
+        if first_rigidity_index < number_of_rigidities:
+            products[..., location_indices, :] = weighting_factors[..., location_indices, first_rigidity_index:] @ kernel[:, first_rigidity_index:].T
+    return products
+
+def integrate_weighting_factors_over_NM64_kernel(weighting_factors: np.ndarray, particle_name: str, list_of_altitudes_in_km: list[float], rigidity_grid: np.ndarray) -> np.ndarray:
+    """
+    Calculate unnormalised NM64 count rates for a (locations x rigidities) matrix of weighting factors with a single matrix product.
+
+    Parameters:
+    - weighting_factors: np.ndarray
+        Array of shape (locations, rigidities).
+    - particle_name: str
+        The name of the particle.
+    - list_of_altitudes_in_km: list[float]
+        The altitudes of the neutron monitors in km.
+    - rigidity_grid: np.ndarray
+        The sorted rigidities in GV that the weighting factors are tabulated on.
+
+    Returns:
+    - np.ndarray
+        Array of shape (locations, altitudes).
+    """
+    NM64_kernel = np.array([get_NM64_count_rate_kernel_on_rigidity_grid(particle_name, altitude_in_km, rigidity_grid) for altitude_in_km in list_of_altitudes_in_km])
+    contributing_rigidity_indices = get_contributing_rigidity_indices(weighting_factors)
+    return multiply_by_location_blocks(weighting_factors[:, contributing_rigidity_indices], NM64_kernel[:, contributing_rigidity_indices])
+
+def build_output_dose_rate_DF(dose_rates: np.ndarray, location_index: pd.MultiIndex, list_of_altitudes_in_km: list[float], NM64_count_rates: np.ndarray = None,
+                              dose_types: list[str] = None) -> pd.DataFrame:
+    """
+    Build a sorted output dose rate DataFrame from an array of dose rates.
+
+    Parameters:
+    - dose_rates: np.ndarray
+        Array of shape (locations, altitudes, dose rate types), with dose rate types ordered as in list_of_dose_rate_names.
+    - location_index: pd.MultiIndex
+        The (initialLatitude, initialLongitude) of each location.
+    - list_of_altitudes_in_km: list[float]
+        The altitudes in km.
+    - NM64_count_rates: np.ndarray, optional
+        Array of shape (locations, altitudes) of unnormalised NM64 count rates.
+    - dose_types: list[str], optional
+        The dose rate types along the last axis of dose_rates. By default every dose rate type.
+
+    Returns:
+    - pd.DataFrame
+        The output dose rates sorted by latitude, longitude and altitude.
+    """
+    number_of_locations, number_of_altitudes = dose_rates.shape[0], dose_rates.shape[1]
+
+    outputDoseRatesOnlyDF = pd.DataFrame(dose_rates.reshape(number_of_locations * number_of_altitudes, -1),
+                                         columns=validate_dose_types(dose_types))
+    outputDoseRatesOnlyDF.insert(0, "altitude (km)", np.tile(np.array(list_of_altitudes_in_km, dtype=float), number_of_locations))
+    outputDoseRatesOnlyDF.insert(0, "longitude", np.repeat(location_index.get_level_values("initialLongitude").to_numpy(), number_of_altitudes))
+    outputDoseRatesOnlyDF.insert(0, "latitude", np.repeat(location_index.get_level_values("initialLatitude").to_numpy(), number_of_altitudes))
+
+    if NM64_count_rates is not None:
+        outputDoseRatesOnlyDF["NM64_cr_unnorm"] = NM64_count_rates.flatten()
+
+    return outputDoseRatesOnlyDF.sort_values(["latitude", "longitude", "altitude (km)"], ignore_index=True)
+
+def get_mean_weighting_factor_tensor(asymptotic_direction_DF: pd.DataFrame, weighting_factors_per_species: np.ndarray) -> tuple:
+    """
+    Average the weighting factors of several particle species over the asymptotic directions at each location and rigidity in a single pass.
+
+    Parameters:
+    - asymptotic_direction_DF: pd.DataFrame
+        DataFrame with initialLatitude, initialLongitude and Rigidity columns.
+    - weighting_factors_per_species: np.ndarray
+        Array of shape (species, asymptotic directions) of combined rigidity and pitch angle weighting factors.
+
+    Returns:
+    - tuple
+        The (initialLatitude, initialLongitude) index of the locations, the sorted rigidity grid, and an array of shape
+        (species, locations, rigidities) of mean weighting factors that contains NaN where a location has no directions at a rigidity.
+    """
+    species_columns = [f"species_{species_index}" for species_index in range(len(weighting_factors_per_species))]
+    weighting_factor_DF = pd.DataFrame({"initialLatitude": asymptotic_direction_DF["initialLatitude"].to_numpy(),
+                                        "initialLongitude": asymptotic_direction_DF["initialLongitude"].to_numpy(),
+                                        "Rigidity": asymptotic_direction_DF["Rigidity"].to_numpy(),
+                                        **dict(zip(species_columns, weighting_factors_per_species))})
+
+    mean_weighting_factors = weighting_factor_DF.groupby(["initialLatitude", "initialLongitude", "Rigidity"])[species_columns].mean().unstack("Rigidity")
+    mean_weighting_factors = mean_weighting_factors.sort_index(axis=0).sort_index(axis=1)
+
+    rigidity_grid = mean_weighting_factors[species_columns[0]].columns.to_numpy(dtype=float)
+    weighting_factor_tensor = np.stack([mean_weighting_factors[species_column].to_numpy(dtype=float) for species_column in species_columns])
+    return mean_weighting_factors.index, rigidity_grid, weighting_factor_tensor
+
+def get_unique_location_profiles(weighting_factors: np.ndarray) -> tuple:
+    """
+    Find the distinct weighting factor profiles among a set of locations, so that each distinct profile only needs to be integrated once.
+
+    Parameters:
+    - weighting_factors: np.ndarray
+        Array whose first axis is the location, such as a (locations x rigidities) weighting factor matrix.
+
+    Returns:
+    - tuple
+        The array of distinct profiles, and the index of each location's profile within that array.
+    """
+    unique_profiles, location_to_profile_indices = np.unique(weighting_factors.reshape(len(weighting_factors), -1), axis=0, return_inverse=True)
+    return unique_profiles.reshape((-1,) + weighting_factors.shape[1:]), location_to_profile_indices.reshape(-1)
+
+def get_weighting_factor_matrix(asymp_dir_DF_with_weighting_factors: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivot weighting factors into a (locations x rigidities) matrix.
+
+    Parameters:
+    - asymp_dir_DF_with_weighting_factors: pd.DataFrame
+        DataFrame with initialLatitude, initialLongitude, Rigidity and fullRigidityPitchWeightingFactor columns, with one row per location and rigidity.
+
+    Returns:
+    - pd.DataFrame
+        Weighting factors indexed by (initialLatitude, initialLongitude) with sorted rigidities as columns.
+        Entries are NaN where a location has no weighting factor at a rigidity.
+    """
+    weighting_factor_matrix = asymp_dir_DF_with_weighting_factors.groupby(["initialLatitude", "initialLongitude", "Rigidity"])["fullRigidityPitchWeightingFactor"].mean().unstack("Rigidity")
+    return weighting_factor_matrix.sort_index(axis=0).sort_index(axis=1)
+
+def get_NM64_rigidity_response(particle_name: str, altitude_in_km: float = 0.0) -> pd.DataFrame:
+    """
+    Get the NM64 neutron monitor yield function as a function of rigidity.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+    - altitude_in_km: float
+        The altitude of the neutron monitor in km.
+
+    Returns:
+    - pd.DataFrame
+        DataFrame with "Rigidity" and "Rigidity distribution values" columns.
+    """
+    response_values = get_NM64_response_value_altitude(particle_name, response_value_epns, altitude_in_km)
+    NM64_response_tabulated_2020_functional_epn = pd.DataFrame({"Energy_per_nucleon_GeV_per_n": response_value_epns,
+                                                                "Yield_per_m2_per_sr": response_values})
+
+    if particle_name == "proton":
+        NM64_response_tabulated_2020_functional = PRCT.convertParticleEnergySpecToRigiditySpec(
+            NM64_response_tabulated_2020_functional_epn["Energy_per_nucleon_GeV_per_n"] * 1000,
+            fluxInEnergyMeVform=NM64_response_tabulated_2020_functional_epn["Yield_per_m2_per_sr"],
+            particleMassAU=1,
+            particleChargeAU=1)
+    elif particle_name == "alpha":
+        NM64_response_tabulated_2020_functional = PRCT.convertParticleEnergySpecToRigiditySpec(
+            NM64_response_tabulated_2020_functional_epn["Energy_per_nucleon_GeV_per_n"] * 1000 * 4,
+            fluxInEnergyMeVform=NM64_response_tabulated_2020_functional_epn["Yield_per_m2_per_sr"],
+            particleMassAU=4,
+            particleChargeAU=2)
+    else:
+        raise Exception("ERROR: particle name did not match either proton or alpha!")
+
+    return NM64_response_tabulated_2020_functional
+
+def get_NM64_count_rate_kernel_on_rigidity_grid(particle_name: str, altitude_in_km: float, rigidity_grid: np.ndarray) -> np.ndarray:
+    """
+    Get the vector that maps weighting factors tabulated on a rigidity grid to an unnormalised NM64 count rate.
+
+    Parameters:
+    - particle_name: str
+        The name of the particle ("proton" or "alpha").
+    - altitude_in_km: float
+        The altitude of the neutron monitor in km.
+    - rigidity_grid: np.ndarray
+        The sorted rigidities in GV that weighting factors are tabulated on.
+
+    Returns:
+    - np.ndarray
+        Array with one entry per rigidity in rigidity_grid.
     """
-    mean_weighting_factor_DF = multi_angle_DF.groupby(["Rigidity", "initialLatitude", "initialLongitude"], group_keys=False).mean()
-    return mean_weighting_factor_DF.reset_index()
\ No newline at end of file
+    NM64_response_to_use = get_NM64_rigidity_response(particle_name, altitude_in_km)
+    NM64_rigidities = NM64_response_to_use["Rigidity"].to_numpy(dtype=float)
+    NM64_response_values = NM64_response_to_use["Rigidity distribution values"].to_numpy(dtype=float)
+    return (trapezoid_weights(NM64_rigidities) * NM64_response_values) @ linear_interpolation_matrix(rigidity_grid, NM64_rigidities)
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+def get_regular_grid_cells(grid_spacing_degrees: float) -> np.ndarray:
+    """
+    Split the globe into square latitude/longitude cells of a given size.
+
+    Parameters:
+    - grid_spacing_degrees: float
+        The side length of each cell in degrees. 180 must be a whole multiple of it.
+
+    Returns:
+    - np.ndarray
+        Array of shape (cells, 3) of the southern latitude, western longitude and side length of each cell in degrees.
+    """
+    number_of_latitude_cells = int(round(180.0 / grid_spacing_degrees))
+    if not np.isclose(number_of_latitude_cells * grid_spacing_degrees, 180.0):
+        raise ValueError(f"Error: 180 degrees must be a whole multiple of the grid spacing, not {grid_spacing_degrees}.")
+    southern_latitudes = -90.0 + (grid_spacing_degrees * np.arange(number_of_latitude_cells))
+    western_longitudes = grid_spacing_degrees * np.arange(2 * number_of_latitude_cells)
+    southern_latitude_mesh, western_longitude_mesh = np.meshgrid(southern_latitudes, western_longitudes, indexing="ij")
+    return np.column_stack([southern_latitude_mesh.reshape(-1), western_longitude_mesh.reshape(-1),
+                            np.full(southern_latitude_mesh.size, float(grid_spacing_degrees))])
+
+def get_cell_corners(cells: np.ndarray) -> np.ndarray:
+    """
+    Get the four corners of each cell, with longitudes wrapped into [0, 360).
+
+    Parameters:
+    - cells: np.ndarray
+        Array of shape (cells, 3) of southern latitudes, western longitudes and side lengths in degrees.
+
+    Returns:
+    - np.ndarray
+        Array of shape (cells, 4, 2) of [latitude, longitude] corners, ordered south-west, south-east, north-west, north-east.
+    """
+    cells = np.asarray(cells, dtype=float).reshape(-1, 3)
+    southern_latitudes, western_longitudes, cell_sizes = cells[:, 0], cells[:, 1], cells[:, 2]
+    corner_latitudes = southern_latitudes[:, np.newaxis] + (cell_sizes[:, np.newaxis] * np.array([0.0, 0.0, 1.0, 1.0]))
+    corner_longitudes = western_longitudes[:, np.newaxis] + (cell_sizes[:, np.newaxis] * np.array([0.0, 1.0, 0.0, 1.0]))
+    return np.stack([corner_latitudes, corner_longitudes % 360.0], axis=-1)
+
+def subdivide_cells(cells: np.ndarray) -> np.ndarray:
+    """
+    Split each cell into four cells with half the side length.
+
+    Parameters:
+    - cells: np.ndarray
+        Array of shape (cells, 3) of southern latitudes, western longitudes and side lengths in degrees.
+
+    Returns:
+    - np.ndarray
+        Array of shape (4 * cells, 3) of the subdivided cells.
+    """
+    cells = np.asarray(cells, dtype=float).reshape(-1, 3)
+    half_sizes = cells[:, 2] / 2.0
+    subdivided_cells = [np.column_stack([cells[:, 0] + (latitude_offset * half_sizes), cells[:, 1] + (longitude_offset * half_sizes), half_sizes])
+                        for latitude_offset, longitude_offset in [(0, 0), (0, 1), (1, 0), (1, 1)]]
+    return np.stack(subdivided_cells, axis=1).reshape(-1, 3)
+
+def get_location_keys(array_of_lats_and_longs: np.ndarray, merge_poles: bool = True) -> pd.MultiIndex:
+    """
+    Get an index of [latitude, longitude] locations that is unaffected by rounding errors in the coordinates or by longitude wrapping,
+    and in which, if merge_poles is True, every longitude at each pole is the same location.
+    """
+    array_of_lats_and_longs = np.asarray(array_of_lats_and_longs, dtype=float).reshape(-1, 2)
+    latitude_keys = np.round(array_of_lats_and_longs[:, 0], 9)
+    longitude_keys = np.round(array_of_lats_and_longs[:, 1] % 360.0, 9) % 360.0
+    if merge_poles:
+        longitude_keys = np.where(np.abs(latitude_keys) == 90.0, 0.0, longitude_keys)
+    return pd.MultiIndex.from_arrays([latitude_keys, longitude_keys])
+
+def collapse_degenerate_locations(array_of_lats_and_longs: np.ndarray, merge_poles: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Remove repeated locations, such as the same pole at several longitudes or the same point at longitudes 0 and 360.
+
+    A pole given at several longitudes is only the same location for vertically arriving particles: the azimuths of
+    other arrival directions are measured from a north that depends on the longitude the pole is given at.
+
+    Parameters:
+    - array_of_lats_and_longs: np.ndarray
+        Array of [latitude, longitude] locations.
+    - merge_poles: bool, optional
+        Whether every longitude at each pole is the same location. Only set this when just the vertical direction is traced.
+
+    Returns:
+    - tuple[np.ndarray, np.ndarray]
+        The distinct locations, each given by the coordinates of its first appearance, and the index into them of every input location.
+    """
+    array_of_lats_and_longs = np.asarray(array_of_lats_and_longs, dtype=float).reshape(-1, 2)
+    location_codes, unique_location_keys = get_location_keys(array_of_lats_and_longs, merge_poles=merge_poles).factorize()
+    first_appearances = np.full(len(unique_location_keys), len(location_codes))
+    np.minimum.at(first_appearances, location_codes, np.arange(len(location_codes)))
+    return array_of_lats_and_longs[first_appearances], location_codes
+
+def get_healpix_array_of_lats_and_longs(nside: int) -> np.ndarray:
+    """
+    Get the centres of the pixels of a HEALPix grid, in which every pixel covers the same area and pixels lie on rings of constant latitude.
+
+    Parameters:
+    - nside: int
+        The HEALPix resolution parameter. The grid has 12 * nside**2 pixels, about 58.6 / nside degrees apart.
+
+    Returns:
+    - np.ndarray
+        Array of shape (12 * nside**2, 2) of [latitude, longitude] pixel centres in degrees, ordered by ring from north to south.
+    """
+    if nside < 1:
+        raise ValueError("Error: nside must be at least 1.")
+
+    rings = []
+    for ring_index in range(1, (4 * nside)):
+        northern_ring_index = min(ring_index, (4 * nside) - ring_index)
+        if northern_ring_index < nside:
+            # polar cap rings
+            cos_colatitude = 1.0 - (northern_ring_index**2 / (3.0 * nside**2))
+            pixels_in_ring = 4 * northern_ring_index
+            longitudes = (np.arange(pixels_in_ring) + 0.5) * (360.0 / pixels_in_ring)
+        else:
+            # equatorial belt rings, alternately shifted by half a pixel
+            cos_colatitude = (4.0 / 3.0) - ((2.0 * northern_ring_index) / (3.0 * nside))
+            pixels_in_ring = 4 * nside
+            longitudes = (np.arange(pixels_in_ring) + (0.5 * ((ring_index - nside + 1) % 2))) * (360.0 / pixels_in_ring)
+        latitude = np.degrees(np.arcsin(cos_colatitude))
+        rings.append(np.column_stack([np.full(pixels_in_ring, latitude if ring_index <= 2 * nside else -latitude), longitudes]))
+    return np.concatenate(rings)
+
+def get_equal_area_array_of_lats_and_longs(grid_spacing_degrees: float) -> np.ndarray:
+    """
+    Get an equal-area HEALPix grid whose locations are at most about grid_spacing_degrees apart.
+
+    Compared with a regular latitude/longitude grid of the same spacing, this needs about a third fewer locations, as it does not
+    crowd locations together towards the poles.
+
+    Parameters:
+    - grid_spacing_degrees: float
+        The largest typical spacing between neighbouring locations in degrees.
+
+    Returns:
+    - np.ndarray
+        Array of [latitude, longitude] locations in degrees.
+    """
+    healpix_spacing_at_nside_1 = np.degrees(np.sqrt(4.0 * np.pi / 12.0))
+    return get_healpix_array_of_lats_and_longs(int(np.ceil(healpix_spacing_at_nside_1 / grid_spacing_degrees)))
+
+def get_cells_to_refine(cells: np.ndarray,
+                        dose_rates_at_locations: pd.DataFrame,
+                        refinement_tolerance: float,
+                        minimum_cell_size_degrees: float) -> np.ndarray:
+    """
+    Find the cells whose dose rates vary too much across their corners to be interpolated, and that can still be subdivided.
+
+    A cell is refined if, at any altitude, the difference between the largest and smallest dose rate at its corners is more
+    than refinement_tolerance times the largest dose rate found at that altitude, and halving the cell would not take it below
+    minimum_cell_size_degrees.
+
+    Parameters:
+    - cells: np.ndarray
+        Array of shape (cells, 3) of southern latitudes, western longitudes and side lengths in degrees.
+    - dose_rates_at_locations: pd.DataFrame
+        Dose rates indexed by the location keys from get_location_keys, with one column per altitude.
+    - refinement_tolerance: float
+        The largest allowed variation across a cell, as a fraction of the largest dose rate.
+    - minimum_cell_size_degrees: float
+        The smallest allowed cell size in degrees.
+
+    Returns:
+    - np.ndarray
+        Boolean array with one entry per cell, True for cells to refine.
+    """
+    cells = np.asarray(cells, dtype=float).reshape(-1, 3)
+    corners = get_cell_corners(cells)
+    corner_dose_rates = dose_rates_at_locations.loc[get_location_keys(corners.reshape(-1, 2))].to_numpy().reshape(len(cells), 4, -1)
+    largest_dose_rates = np.maximum(dose_rates_at_locations.max(axis=0).to_numpy(), np.finfo(float).tiny)
+    relative_variation = (corner_dose_rates.max(axis=1) - corner_dose_rates.min(axis=1)) / largest_dose_rates
+    can_be_subdivided = (cells[:, 2] / 2.0) >= (minimum_cell_size_degrees * (1.0 - 1e-9))
+    return (relative_variation > refinement_tolerance).any(axis=1) & can_be_subdivided
@@ -4,6 +4,7 @@ from matplotlib.gridspec import GridSpec
 
 from .pitchAngleDistribution import pitchAngleDistribution
 from .rigiditySpectrum import rigiditySpectrum
+from ..fingerprints import get_object_fingerprint
 
 def jacobian_function_to_use(pitch_angle_in_radians: float) -> float:
     try:
@@ -121,6 +122,17 @@ class momentaDistribution():
 
     # other Methods
 
+    def fingerprint(self) -> dict:
+        """
+        Get a fingerprint of the momenta distribution from the fingerprints of its rigidity spectrum and pitch angle distribution.
+
+        Returns:
+        - dict
+            The fingerprint.
+        """
+        return get_object_fingerprint(self, {"rigidity_spectrum": self.rigidity_spectrum,
+                                             "pitch_angle_distribution": self.pitch_angle_distribution})
+
     def __call__(self, pitchAngle: float, rigidity: float) -> float:
         """
         Evaluate the momenta distribution.
@@ -2,6 +2,7 @@ from .particleSpecies import particleSpecies
 from .momentaDistribution import momentaDistribution
 from .rigiditySpectrum import rigiditySpectrum
 from .pitchAngleDistribution import pitchAngleDistribution
+from ..fingerprints import get_object_fingerprint
 
 class particleDistribution():
     """
@@ -25,4 +26,15 @@ class particleDistribution():
         """
         self.particle_species = particleSpecies(particle_name)
         self.momentum_distribution = momentaDistribution(rigidity_spectrum,
-                                                         pitch_angle_distribution)
\ No newline at end of file
+                                                         pitch_angle_distribution)
+
+    def fingerprint(self) -> dict:
+        """
+        Get a fingerprint of the particle distribution, which is equal for equal particle distributions in any process.
+
+        Returns:
+        - dict
+            The fingerprint.
+        """
+        return get_object_fingerprint(self, {"particle_species": self.particle_species,
+                                             "momentum_distribution": self.momentum_distribution})
\ No newline at end of file
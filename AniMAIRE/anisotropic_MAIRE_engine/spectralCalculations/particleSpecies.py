@@ -1,3 +1,5 @@
+from ..fingerprints import get_object_fingerprint
+
 class particleSpecies():
     """
     Class representing a particle species.
@@ -21,4 +23,14 @@ class particleSpecies():
             atomicNumber = self.particle_atomic_number_dict[particleName]
         
         self.atomicNumber = atomicNumber
-        self.atomicMass = self.particle_atomic_mass_dict[particleName]
\ No newline at end of file
+        self.atomicMass = self.particle_atomic_mass_dict[particleName]
+
+    def fingerprint(self) -> dict:
+        """
+        Get a fingerprint of the particle species.
+
+        Returns:
+        - dict
+            The fingerprint.
+        """
+        return get_object_fingerprint(self, vars(self))
\ No newline at end of file
@@ -86,6 +86,17 @@ class PitchAngleDistribution(Distribution):
             The value of the pitch angle distribution.
         """
         return self.pitchAngleDistFunction(pitchAngle, rigidity)
+
+    def get_fingerprint_parameters(self) -> dict:
+        """
+        Get the attributes that determine the values of the pitch angle distribution, with the reference direction as GSM coordinates.
+
+        Returns:
+            dict: The attributes of the pitch angle distribution
+        """
+        fingerprint_parameters = super().get_fingerprint_parameters()
+        fingerprint_parameters["interplanetary_mag_field"] = np.asarray(self.interplanetary_mag_field.data, dtype=float)
+        return fingerprint_parameters
     
     def __add__(self, right: 'PitchAngleDistribution') -> 'PitchAngleDistribution':
         """
@@ -67,15 +67,42 @@ class RigiditySpectrum(Distribution):
     Base class for rigidity spectra.
     """
 
-    def __init__(self, rigiditySpec: Optional[Callable[[float], float]] = None):
+    def __init__(self, rigiditySpec: Optional[Callable[[float], float]] = None, support: Optional[tuple] = None):
         """
         Initialize the rigidity spectrum.
         
         Args:
             rigiditySpec: Callable function for evaluating the spectrum, if None,
                           the subclass evaluate method will be used
+            support: The (lowest, highest) rigidities in GV outside of which the spectrum is zero,
+                     if None, the spectrum is assumed to be non-zero at all rigidities
         """
         self.rigiditySpec = rigiditySpec or self.evaluate
+        self._support = support
+
+    @property
+    def support(self) -> tuple:
+        """
+        The closed interval of rigidities in GV outside of which the spectrum is zero.
+
+        Returns:
+            tuple: The (lowest, highest) rigidities in GV
+        """
+        return self._support if self._support is not None else (-np.inf, np.inf)
+
+    def is_within_support(self, rigidities: np.ndarray) -> np.ndarray:
+        """
+        Check which rigidities lie within the support of the spectrum.
+
+        Args:
+            rigidities: The rigidities in GV
+
+        Returns:
+            np.ndarray: True where the spectrum may be non-zero
+        """
+        lower_rigidity, upper_rigidity = self.support
+        rigidities = np.asarray(rigidities, dtype=float)
+        return (rigidities >= lower_rigidity) & (rigidities <= upper_rigidity)
 
     def evaluate(self, x: float) -> float:
         """
@@ -111,7 +138,8 @@ class RigiditySpectrum(Distribution):
         Returns:
             A new rigidity spectrum representing the sum
         """
-        summed_spectrum = RigiditySpectrum()
+        (left_lower, left_upper), (right_lower, right_upper) = self.support, right.support
+        summed_spectrum = RigiditySpectrum(support=(min(left_lower, right_lower), max(left_upper, right_upper)))
         summed_spectrum.rigiditySpec = SummedFunction(self.rigiditySpec, right.rigiditySpec)
         return summed_spectrum
     
@@ -125,7 +153,7 @@ class RigiditySpectrum(Distribution):
         Returns:
             A new scaled rigidity spectrum
         """
-        scaled_spectrum = RigiditySpectrum()
+        scaled_spectrum = RigiditySpectrum(support=self.support)
         scaled_spectrum.rigiditySpec = ScaledFunction(self.rigiditySpec, scalar)
         return scaled_spectrum
         
@@ -205,7 +233,8 @@ class InterpolatedInputFileSpectrum(RigiditySpectrum):
         """
         self.inputFilename = inputFileName
         interp_func = self.readSpecFromCSV(self.inputFilename)
-        super().__init__(interp_func)
+        # the interpolated spectrum is zero outside the tabulated rigidities
+        super().__init__(interp_func, support=(float(np.min(interp_func.x)), float(np.max(interp_func.x))))
 
     def readSpecFromCSV(self, inputFileName: str) -> Callable[[float], float]:
         """
@@ -267,7 +296,7 @@ class DLRmodelSpectrum(RigiditySpectrum):
                               bounds_error=False,
                               fill_value=(0.0, 0.0))
         
-        super().__init__(interp_func)
+        super().__init__(interp_func, support=(float(np.min(x_values)), float(np.max(x_values))))
 
 class CommonModifiedPowerLawSpectrum(RigiditySpectrum):
     """
@@ -293,6 +322,16 @@ class CommonModifiedPowerLawSpectrum(RigiditySpectrum):
         self.gamma = gamma
         self.deltaGamma = deltaGamma
 
+    @property
+    def support(self) -> tuple:
+        """
+        The closed interval of rigidities in GV outside of which the spectrum is zero.
+
+        Returns:
+            tuple: The lower and upper rigidity limits of the spectrum
+        """
+        return (self.lowerLimit, self.upperLimit)
+
     def specIndexModification(self, P: float) -> float:
         """
         Calculate the spectral index modification.
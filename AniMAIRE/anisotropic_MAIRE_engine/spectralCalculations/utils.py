@@ -1,6 +1,7 @@
 import numpy as np
 from abc import ABC, abstractmethod
 from typing import Callable, TypeVar, Generic, Any
+from ..fingerprints import get_object_fingerprint
 
 T = TypeVar('T')
 U = TypeVar('U')
@@ -14,6 +15,10 @@ class SummedFunction:
         
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
         return self.func1(*args, **kwargs) + self.func2(*args, **kwargs)
+
+    def fingerprint(self) -> dict:
+        """Get a fingerprint of the summed functions."""
+        return get_object_fingerprint(self, {"func1": self.func1, "func2": self.func2})
         
 class ScaledFunction:
     """Callable class that scales a function by a factor."""
@@ -24,6 +29,10 @@ class ScaledFunction:
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
         return self.scale * self.func(*args, **kwargs)
 
+    def fingerprint(self) -> dict:
+        """Get a fingerprint of the scaled function."""
+        return get_object_fingerprint(self, {"func": self.func, "scale": self.scale})
+
 # Base distribution interface
 class Distribution(): #ABC, Generic[T]):
     """
@@ -67,5 +76,26 @@ class Distribution(): #ABC, Generic[T]):
         """Plot the distribution"""
         pass
 
+    def get_fingerprint_parameters(self) -> dict:
+        """
+        Get the attributes that determine the values of the distribution.
+
+        The distribution's own evaluate method is described by name, as it is identified by the class of the distribution.
+
+        Returns:
+            dict: The attributes of the distribution
+        """
+        return {name: ("evaluate" if getattr(value, "__self__", None) is self else value) for name, value in vars(self).items()}
+
+    def fingerprint(self) -> dict:
+        """
+        Get a fingerprint of the distribution from its class, the AniMAIRE version and its parameters, which is equal for
+        equal distributions in any process and is used to key cached calculations.
+
+        Returns:
+            dict: The fingerprint
+        """
+        return get_object_fingerprint(self, self.get_fingerprint_parameters())
+
 # For backward compatibility
 Spectrum = Distribution 
\ No newline at end of file
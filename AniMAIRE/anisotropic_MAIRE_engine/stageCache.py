@@ -0,0 +1,182 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from .fingerprints import get_fingerprint_key
+
+engine_stage_names = ["raw_directions", "pitch_angles", "weighting_factors", "dose_integration"]
+
+# outputs for a full planet can take hundreds of megabytes each, so each stage keeps at most this many bytes of outputs by default
+default_max_bytes = 512 * 1024**2
+
+def get_output_nbytes(output: Any) -> int:
+    """
+    Estimate the number of bytes of memory used by the output of a stage.
+
+    Parameters:
+    - output: Any
+        The output, such as an array, a DataFrame, an object with an nbytes attribute, or a list, tuple or dict of these.
+
+    Returns:
+    - int
+        The estimated number of bytes.
+    """
+    if isinstance(output, pd.DataFrame):
+        return int(output.memory_usage(index=True).sum())
+    if isinstance(output, pd.Series):
+        return int(output.memory_usage(index=True))
+    if isinstance(output, (list, tuple)):
+        return sum(get_output_nbytes(item) for item in output)
+    if isinstance(output, dict):
+        return sum(get_output_nbytes(item) for item in output.values())
+    if hasattr(output, "nbytes"):
+        return int(output.nbytes)
+    return sys.getsizeof(output)
+
+class StageCache:
+    """
+    In-process least recently used cache of the outputs of one stage of the engine, keyed by the fingerprints of the stage's inputs.
+
+    The cache is limited both by the number of outputs and by their total size in memory, estimated with get_output_nbytes.
+    Outputs are kept in memory as they are, so stages must not modify a cached output after it is returned.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: Optional[int] = default_max_bytes):
+        """
+        Initialize the cache.
+
+        Parameters:
+        - max_entries: int
+            The number of outputs to keep. A value of 0 disables the cache.
+        - max_bytes: int, optional
+            The largest total size in bytes of the outputs to keep. Outputs larger than this are not kept. None removes the limit.
+        """
+        if max_entries < 0:
+            raise ValueError("Error: max_entries must be at least 0.")
+        if (max_bytes is not None) and (max_bytes < 0):
+            raise ValueError("Error: max_bytes must be at least 0.")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._entry_nbytes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, inputs: Any, calculate: Callable[[], Any]) -> Any:
+        """
+        Get the output for the given inputs, calculating and storing it if it is not in the cache.
+
+        Parameters:
+        - inputs: Any
+            Everything the output depends on. Inputs that cannot be fingerprinted are calculated without the cache.
+        - calculate: callable
+            Function with no arguments that calculates the output.
+
+        Returns:
+        - Any
+            The output.
+        """
+        if self.max_entries == 0:
+            return calculate()
+        try:
+            key = get_fingerprint_key(inputs)
+        except TypeError:
+            return calculate()
+
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        output = calculate()
+        output_nbytes = get_output_nbytes(output)
+        if (self.max_bytes is not None) and (output_nbytes > self.max_bytes):
+            return output
+
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entry_nbytes[key]
+            self._entries[key] = output
+            self._entries.move_to_end(key)
+            self._entry_nbytes[key] = output_nbytes
+            self.nbytes += output_nbytes
+            while (len(self._entries) > self.max_entries) or ((self.max_bytes is not None) and (self.nbytes > self.max_bytes)):
+                evicted_key, _ = self._entries.popitem(last=False)
+                self.nbytes -= self._entry_nbytes.pop(evicted_key)
+        return output
+
+    def clear(self):
+        """
+        Remove every output from the cache and reset its hit and miss counts.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._entry_nbytes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+engine_stage_caches = {stage_name: StageCache() for stage_name in engine_stage_names}
+
+def get_stage_cache(stage_name: str) -> StageCache:
+    """
+    Get the in-process cache of one stage of the engine.
+
+    Parameters:
+    - stage_name: str
+        One of engine_stage_names.
+
+    Returns:
+    - StageCache
+        The cache of the stage.
+    """
+    if stage_name not in engine_stage_caches:
+        raise ValueError(f"Error: unknown engine stage '{stage_name}'. Engine stages are {engine_stage_names}.")
+    return engine_stage_caches[stage_name]
+
+def configure_stage_caches(max_entries: int = 8, stage_names: Optional[list[str]] = None, max_bytes: Optional[int] = default_max_bytes):
+    """
+    Set the number and total size of the outputs kept by the in-process caches of the engine stages, clearing their current contents.
+
+    Asymptotic direction and weighting factor outputs for a full planet can take hundreds of megabytes each, so lower
+    max_bytes when memory is limited, or set max_entries to 0 to disable the caches.
+
+    Parameters:
+    - max_entries: int
+        The number of outputs each stage keeps.
+    - stage_names: list[str], optional
+        The stages to configure. Defaults to every stage.
+    - max_bytes: int, optional
+        The largest total size in bytes of the outputs each stage keeps. None removes the limit.
+    """
+    for stage_name in (stage_names if stage_names is not None else engine_stage_names):
+        get_stage_cache(stage_name)
+        engine_stage_caches[stage_name] = StageCache(max_entries, max_bytes)
+
+def clear_stage_caches():
+    """
+    Remove every output from the in-process caches of the engine stages.
+    """
+    for stage_cache in engine_stage_caches.values():
+        stage_cache.clear()
+
+def get_stage_cache_statistics() -> dict:
+    """
+    Get the hit and miss counts and the number and size of stored outputs of each engine stage cache.
+
+    Returns:
+    - dict
+        Dictionary of {stage name: {"hits": int, "misses": int, "entries": int, "nbytes": int}}.
+    """
+    return {stage_name: {"hits": stage_cache.hits, "misses": stage_cache.misses, "entries": len(stage_cache), "nbytes": stage_cache.nbytes}
+            for stage_name, stage_cache in engine_stage_caches.items()}
@@ -14,6 +14,37 @@ import imageio
 
 pd.options.mode.chained_assignment = None
 
+def get_plotting_mesh(longitudes, latitudes):
+    """
+    Get a regular longitude/latitude mesh to draw gridded plots of dose rates on.
+
+    If the locations form a complete regular grid, the mesh is that grid. Otherwise, such as for equal-area grids, the mesh is a
+    regular grid with about the same number of points per unit area as the locations, covering their longitude range.
+
+    Parameters:
+    -----------
+    longitudes : array-like
+        Longitudes of the locations
+    latitudes : array-like
+        Latitudes of the locations
+
+    Returns:
+    --------
+    lon_mesh, lat_mesh : numpy.ndarray
+        2D arrays of mesh longitudes and latitudes
+    """
+    longitudes, latitudes = np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float)
+    unique_longitudes, unique_latitudes = np.unique(longitudes), np.unique(latitudes)
+    number_of_locations = len(np.unique(np.column_stack([longitudes, latitudes]), axis=0))
+    if len(unique_longitudes) * len(unique_latitudes) == number_of_locations:
+        return np.meshgrid(unique_longitudes, unique_latitudes)
+
+    mesh_spacing = np.degrees(np.sqrt(4.0 * np.pi / number_of_locations))
+    mesh_longitudes = np.linspace(unique_longitudes.min(), unique_longitudes.max(), max(2, int(np.ceil((unique_longitudes.max() - unique_longitudes.min()) / mesh_spacing)) + 1))
+    mesh_latitudes = np.linspace(max(-90.0, unique_latitudes.min() - mesh_spacing), min(90.0, unique_latitudes.max() + mesh_spacing),
+                                 int(np.ceil(180.0 / mesh_spacing)) + 1)
+    return np.meshgrid(mesh_longitudes, mesh_latitudes)
+
 
 def plot_on_spherical_globe(data_df, color_column="adose", 
                            title=None, 
@@ -63,12 +94,16 @@ def plot_on_spherical_globe(data_df, color_column="adose",
     # Create a regular grid for the heatmap
     # lon_grid = np.linspace(data_df["longitude"].min(), data_df["longitude"].max(), 100)
     # lat_grid = np.linspace(data_df["latitude"].min(), data_df["latitude"].max(), 100)
-    lon_mesh, lat_mesh = np.meshgrid(data_df["longitude"].unique(), data_df["latitude"].unique())
+    lon_mesh, lat_mesh = get_plotting_mesh(data_df["longitude"], data_df["latitude"])
     
     # Interpolate the data onto the grid
     values = data_df[color_column].values
     grid_values = griddata((data_df["longitude"], data_df["latitude"]), values, 
                            (lon_mesh, lat_mesh), method='linear', fill_value=np.nan)
+    # fill the edges of irregular grids, which lie outside the convex hull of the locations
+    grid_values = np.where(np.isnan(grid_values),
+                           griddata((data_df["longitude"], data_df["latitude"]), values, (lon_mesh, lat_mesh), method='nearest'),
+                           grid_values)
     
     # Plot the heatmap
     scatter = ax.pcolormesh(lon_mesh, lat_mesh, grid_values, 
@@ -93,8 +128,8 @@ def plot_dose_map_contours(dose_map_to_plot, dose_type="edose", levels=3, **kwar
 
     dose_map_to_plot_sorted = dose_map_to_plot.sort_values(by=["longitudeTranslated","latitude"])
 
-    (contour_longs, contour_lats) = np.meshgrid(dose_map_to_plot_sorted["longitudeTranslated"].unique(),
-            dose_map_to_plot_sorted["latitude"].unique())
+    (contour_longs, contour_lats) = get_plotting_mesh(dose_map_to_plot_sorted["longitudeTranslated"],
+            dose_map_to_plot_sorted["latitude"])
 
     interp = NearestNDInterpolator(list(zip(dose_map_to_plot_sorted["longitudeTranslated"], dose_map_to_plot_sorted["latitude"])),
                                dose_map_to_plot_sorted[dose_type])
@@ -295,12 +330,16 @@ def plot_on_spherical_globe(heatmap_DF_to_Plot,
     # Create a regular grid for the heatmap
     # lon_grid = np.linspace(data_df["longitude"].min(), data_df["longitude"].max(), 100)
     # lat_grid = np.linspace(data_df["latitude"].min(), data_df["latitude"].max(), 100)
-    lon_mesh, lat_mesh = np.meshgrid(heatmap_DF_to_Plot["longitude"].unique(), heatmap_DF_to_Plot["latitude"].unique())
+    lon_mesh, lat_mesh = get_plotting_mesh(heatmap_DF_to_Plot["longitude"], heatmap_DF_to_Plot["latitude"])
     
     # Interpolate the data onto the grid
     values = heatmap_DF_to_Plot[dose_type].values
     grid_values = griddata((heatmap_DF_to_Plot["longitude"], heatmap_DF_to_Plot["latitude"]), values, 
                            (lon_mesh, lat_mesh), method='linear', fill_value=np.nan)
+    # fill the edges of irregular grids, which lie outside the convex hull of the locations
+    grid_values = np.where(np.isnan(grid_values),
+                           griddata((heatmap_DF_to_Plot["longitude"], heatmap_DF_to_Plot["latitude"]), values, (lon_mesh, lat_mesh), method='nearest'),
+                           grid_values)
     
     # Plot the heatmap
     scatter = ax.pcolormesh(lon_mesh, lat_mesh, grid_values, 
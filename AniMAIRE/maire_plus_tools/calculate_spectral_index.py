@@ -3,7 +3,7 @@ from scipy.optimize import curve_fit
 from pynverse import inversefunc
 from CosRayModifiedISO import CosRayModifiedISO
 from scipy.interpolate import interp1d
-from atmosphericRadiationDoseAndFlux import doseAndFluxCalculator as DAFcalc
+from ..anisotropic_MAIRE_engine import doseResponseKernels as DAFkernels
 import pandas as pd
 
 def calculate_GCR_total_doses(vertical_cut_off_rigidity: float, altitude_in_km: float | list[float], solar_modulation: float = 100.0, dose_label_to_use: str = "tn3") -> pd.DataFrame:
@@ -42,14 +42,14 @@ def calculate_GCR_total_doses(vertical_cut_off_rigidity: float, altitude_in_km:
     alpha_spectrum_interpolated_vcutoff = lambda x: alpha_spectrum_interpolated(x) if x >= vertical_cut_off_rigidity / 4.0 else 0.0
 
     # Calculate dose rates for protons
-    proton_doses = DAFcalc.calculate_from_rigidity_spec(
+    proton_doses = DAFkernels.calculate_from_rigidity_spec(
         proton_spectrum_interpolated_vcutoff, 
         particleName="proton",
         altitudesInkm=altitude_in_km
     )
 
     # Calculate dose rates for alpha particles
-    alpha_doses = DAFcalc.calculate_from_rigidity_spec(
+    alpha_doses = DAFkernels.calculate_from_rigidity_spec(
         alpha_spectrum_interpolated_vcutoff, 
         particleName="alpha",
         altitudesInkm=altitude_in_km
@@ -82,7 +82,7 @@ def determine_single_tn(spectral_index: float, vertical_cut_off_rigidity: float,
     A = 1
     rigiditySpectrum = lambda x: A * (x ** (-spectral_index)) if x >= vertical_cut_off_rigidity else 0.0
 
-    output_doses = DAFcalc.calculate_from_rigidity_spec(
+    output_doses = DAFkernels.calculate_from_rigidity_spec(
         rigiditySpectrum, 
         particleName="proton",
         altitudesInkm=altitude_in_km
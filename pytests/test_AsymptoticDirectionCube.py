@@ -0,0 +1,85 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionCube import AsymptoticDirectionCube
+from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionSet import AsymptoticDirectionSet
+from AniMAIRE.anisotropic_MAIRE_engine.singleParticleEngineInstance import get_mean_weighting_factors_for_multi_angle_magcos_runs
+
+@pytest.fixture
+def sample_multi_angle_DF():
+    rng = np.random.default_rng(0)
+    rows = []
+    for latitude, longitude in [(10.0, 5.0), (-20.0, 100.0), (10.0, 50.0)]:
+        for zenith, azimuth in [(16.0, 90.0), (0.0, 0.0), (16.0, 0.0)]:
+            for rigidity in [20.0, 1.0, 5.5, 400.0]:
+                rows.append({"initialLatitude": latitude, "initialLongitude": longitude, "Rigidity": rigidity,
+                             "Lat": rng.uniform(-90.0, 90.0), "Long": rng.uniform(0.0, 360.0), "Filter": int(rng.integers(2)),
+                             "zenith": zenith, "azimuth": azimuth, "fullRigidityPitchWeightingFactor": rng.uniform()})
+    return pd.DataFrame(rows).sample(frac=1.0, random_state=1).reset_index(drop=True)
+
+def test_cube_from_dataframe(sample_multi_angle_DF):
+    cube = AsymptoticDirectionCube.from_dataframe(sample_multi_angle_DF)
+
+    assert cube.shape == (3, 3, 4)
+    assert cube.asymptotic_latitudes.dtype == np.float32
+    assert cube.filter_flags.dtype == np.int8
+    assert list(cube.rigidities) == [1.0, 5.5, 20.0, 400.0]
+    assert list(cube.direction_labels["zenith"]) == [0.0, 16.0, 16.0]
+    assert list(cube.direction_labels["azimuth"]) == [0.0, 0.0, 90.0]
+    assert cube.nbytes < sample_multi_angle_DF.memory_usage(deep=True).sum() / 3
+
+    sort_columns = ["initialLatitude", "initialLongitude", "zenith", "azimuth", "Rigidity"]
+    exported_DF = cube.to_dataframe().sort_values(sort_columns, ignore_index=True)
+    expected_DF = sample_multi_angle_DF[exported_DF.columns].sort_values(sort_columns, ignore_index=True)
+    pd.testing.assert_frame_equal(exported_DF, expected_DF, check_dtype=False, rtol=1e-6)
+
+def test_gathered_mean_matches_groupby(sample_multi_angle_DF):
+    expected_DF = sample_multi_angle_DF.groupby(["Rigidity", "initialLatitude", "initialLongitude"]).mean().reset_index()
+    pd.testing.assert_frame_equal(get_mean_weighting_factors_for_multi_angle_magcos_runs(sample_multi_angle_DF), expected_DF)
+
+    # directions missing for one location cannot form a cube, so the groupby is used instead
+    sparse_DF = sample_multi_angle_DF.drop(index=sample_multi_angle_DF.index[0])
+    with pytest.raises(ValueError):
+        AsymptoticDirectionCube.from_dataframe(sparse_DF)
+    expected_DF = sparse_DF.groupby(["Rigidity", "initialLatitude", "initialLongitude"]).mean().reset_index()
+    pd.testing.assert_frame_equal(get_mean_weighting_factors_for_multi_angle_magcos_runs(sparse_DF), expected_DF)
+
+def test_gather_selected_rigidities(sample_multi_angle_DF):
+    cube = AsymptoticDirectionCube.from_dataframe(sample_multi_angle_DF)
+    weighting_factors = sample_multi_angle_DF["fullRigidityPitchWeightingFactor"].to_numpy()
+
+    np.testing.assert_array_equal(cube.gather(weighting_factors, rigidity_indices=[1, 3]), cube.gather(weighting_factors)[..., [1, 3]])
+
+def test_asymptotic_direction_set_cube_is_shared(sample_multi_angle_DF):
+    sample_multi_angle_DF["angleBetweenIMFinRadians"] = 0.0
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(sample_multi_angle_DF, 0.0, 45.0)
+
+    cube = asymptotic_direction_set.to_cube()
+    np.testing.assert_array_equal(cube.gather(asymptotic_direction_set.rigidities), np.broadcast_to(cube.rigidities, cube.shape))
+    assert asymptotic_direction_set.with_reference_direction(30.0, 100.0).to_cube() is cube
+
+def test_asymptotic_direction_set_is_carried_as_a_cube(sample_multi_angle_DF):
+    sample_multi_angle_DF["angleBetweenIMFinRadians"] = np.linspace(0.0, np.pi, len(sample_multi_angle_DF))
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(sample_multi_angle_DF, 0.0, 45.0)
+
+    # the long-format arrays are rebuilt from the cube, so the set holds little more than the cube and its pitch angles
+    cube = asymptotic_direction_set.to_cube()
+    assert cube.trajectory_indices is None
+    assert asymptotic_direction_set.nbytes < cube.nbytes + 3 * asymptotic_direction_set.pitch_angles.nbytes
+
+    sort_columns = ["initialLatitude", "initialLongitude", "zenith", "azimuth", "Rigidity"]
+    exported_DF = asymptotic_direction_set.to_dataframe()
+    pd.testing.assert_frame_equal(exported_DF.sort_values(sort_columns, ignore_index=True),
+                                  sample_multi_angle_DF[exported_DF.columns].sort_values(sort_columns, ignore_index=True), check_dtype=False)
+
+    rotated_set = asymptotic_direction_set.with_reference_direction(30.0, 100.0)
+    np.testing.assert_allclose(rotated_set.pitch_angles, AsymptoticDirectionSet.from_dataframe(exported_DF, 0.0, 45.0).with_reference_direction(30.0, 100.0).pitch_angles)
+    np.testing.assert_allclose(cube.get_pitch_angles(30.0, 100.0).reshape(-1), rotated_set.pitch_angles)
+
+def test_nbytes_counts_every_array(sample_multi_angle_DF):
+    cube = AsymptoticDirectionCube.from_dataframe(sample_multi_angle_DF)
+
+    assert cube.nbytes == sum(array.nbytes for array in [cube.location_latitudes, cube.location_longitudes, cube.rigidities,
+                                                         cube.asymptotic_latitudes, cube.asymptotic_longitudes, cube.filter_flags,
+                                                         cube.trajectory_indices, *cube.direction_labels.values()])
@@ -5,9 +5,17 @@ import datetime as dt
 from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionProcessing import (
     generate_asymp_dir_DF,
     acquireWeightingFactors,
-    get_pitch_angle_for_DF_analytic
+    get_pitch_angle_for_DF_analytic,
+    get_pitch_angles_for_asymptotic_directions,
+    get_pitch_angle_matrix,
+    calculate_weighting_factor_arrays,
+    get_rigidity_support_mask,
+    evaluate_rigidity_spectrum_over_array,
+    evaluate_pitch_angle_distribution_over_arrays
 )
 from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.particleDistribution import particleDistribution
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.pitchAngleDistribution import gaussianPitchAngleDistribution
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.rigiditySpectrum import CommonModifiedPowerLawSpectrum
 
 @pytest.fixture
 def sample_dataframe():
@@ -48,6 +56,21 @@ def test_generate_asymp_dir_DF(sample_dataframe):
     result = generate_asymp_dir_DF(sample_dataframe, IMFlatitude, IMFlongitude, datetime_to_run_across_UTC, cache)
     assert "angleBetweenIMFinRadians" in result.columns
 
+def test_generate_asymp_dir_DF_uses_pitch_angle_stage_cache(sample_dataframe):
+    from AniMAIRE.anisotropic_MAIRE_engine.stageCache import configure_stage_caches, get_stage_cache
+
+    configure_stage_caches()
+    try:
+        uncached_result = generate_asymp_dir_DF(sample_dataframe, 10.0, 20.0, dt.datetime.utcnow(), False)
+        first_result = generate_asymp_dir_DF(sample_dataframe, 10.0, 20.0, dt.datetime.utcnow(), True)
+        second_result = generate_asymp_dir_DF(sample_dataframe, 10.0, 20.0, dt.datetime.utcnow(), True)
+
+        pd.testing.assert_frame_equal(first_result, uncached_result)
+        pd.testing.assert_frame_equal(second_result, uncached_result)
+        assert (get_stage_cache("pitch_angles").hits, get_stage_cache("pitch_angles").misses) == (1, 1)
+    finally:
+        configure_stage_caches()
+
 def test_acquireWeightingFactors(sample_dataframe, sample_particle_distribution):
 
     IMFlatitude = 0.0
@@ -63,6 +86,74 @@ def test_acquireWeightingFactors(sample_dataframe, sample_particle_distribution)
     assert "fullRigidityPitchWeightingFactor" in result.columns
     assert "fullEnergyPitchWeightingFactor" in result.columns
 
+    expected_full_weighting_factors = [angle * rigidity * rigidity for angle, rigidity in zip(initial_result["angleBetweenIMFinRadians"], initial_result["Rigidity"])]
+    assert np.allclose(result["fullRigidityPitchWeightingFactor"], expected_full_weighting_factors)
+
+def test_acquireWeightingFactors_forbidden_trajectories(sample_dataframe, sample_particle_distribution):
+    sample_dataframe["Filter"] = [1, 0, 1]
+    initial_result = generate_asymp_dir_DF(sample_dataframe, 0.0, 0.0, dt.datetime.utcnow(), False)
+
+    result = acquireWeightingFactors(initial_result, sample_particle_distribution)
+    assert result["fullRigidityPitchWeightingFactor"].iloc[1] == 0.0
+    assert result["RigidityWeightingFactor"].iloc[1] == 2.0
+
+def test_pitch_angle_distribution_only_evaluated_for_allowed_trajectories(sample_dataframe):
+    evaluated_rigidities = []
+    def scalar_only_pad(pitch_angle, rigidity):
+        if pitch_angle > 10.0:
+            return 0.0
+        evaluated_rigidities.append(rigidity)
+        return 1.0
+
+    sample_dataframe["Filter"] = [1, 0, 1]
+    initial_result = generate_asymp_dir_DF(sample_dataframe, 0.0, 0.0, dt.datetime.utcnow(), False)
+    result = acquireWeightingFactors(initial_result, particleDistribution("proton", lambda rigidity: rigidity, scalar_only_pad))
+
+    assert evaluated_rigidities == [1.0, 3.0]
+    assert list(result["PitchAngleWeightingFactor"]) == [1.0, 0.0, 1.0]
+
+def test_weighting_factors_only_evaluated_within_spectrum_support(sample_dataframe):
+    evaluated_rigidities = []
+    def scalar_only_pad(pitch_angle, rigidity):
+        if pitch_angle > 10.0:
+            return 0.0
+        evaluated_rigidities.append(rigidity)
+        return 1.0
+
+    limited_spectrum = CommonModifiedPowerLawSpectrum(J0=1.0, gamma=2.7, deltaGamma=0.0, lowerLimit=1.5, upperLimit=2.5)
+    assert list(get_rigidity_support_mask(limited_spectrum, sample_dataframe["Rigidity"])) == [False, True, False]
+    assert list(get_rigidity_support_mask(lambda rigidity: rigidity, sample_dataframe["Rigidity"])) == [True, True, True]
+
+    initial_result = generate_asymp_dir_DF(sample_dataframe, 0.0, 0.0, dt.datetime.utcnow(), False)
+    result = acquireWeightingFactors(initial_result, particleDistribution("proton", limited_spectrum, scalar_only_pad))
+
+    assert evaluated_rigidities == [2.0]
+    assert list(result["PitchAngleWeightingFactor"]) == [0.0, 1.0, 0.0]
+    assert np.allclose(result["fullRigidityPitchWeightingFactor"], [0.0, limited_spectrum(2.0), 0.0])
+
+def test_evaluate_rigidity_spectrum_over_array():
+    calls = []
+    def spectrum(rigidity):
+        calls.append(rigidity)
+        return rigidity ** -2
+
+    rigidities = np.array([1.0, 2.0, 1.0, 4.0, 2.0])
+    result = evaluate_rigidity_spectrum_over_array(spectrum, rigidities)
+    assert np.allclose(result, rigidities ** -2)
+    assert len(calls) == 3
+
+def test_evaluate_pitch_angle_distribution_over_arrays():
+    pitch_angles = np.linspace(0.0, np.pi, 5)
+    rigidities = np.linspace(1.0, 5.0, 5)
+
+    gaussian_pad = gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.5)
+    expected = [gaussian_pad(angle, rigidity) for angle, rigidity in zip(pitch_angles, rigidities)]
+    assert np.allclose(evaluate_pitch_angle_distribution_over_arrays(gaussian_pad, pitch_angles, rigidities), expected)
+
+    scalar_only_pad = lambda angle, rigidity: 1.0 if angle < 1.0 else 0.0
+    expected = [scalar_only_pad(angle, rigidity) for angle, rigidity in zip(pitch_angles, rigidities)]
+    assert np.allclose(evaluate_pitch_angle_distribution_over_arrays(scalar_only_pad, pitch_angles, rigidities), expected)
+
 def test_get_pitch_angle_for_DF_analytic():
     IMFlatitude = 0.0
     IMFlongitude = 0.0
@@ -71,3 +162,41 @@ def test_get_pitch_angle_for_DF_analytic():
 
     result = get_pitch_angle_for_DF_analytic(IMFlatitude, IMFlongitude, asymptotic_dir_latitude, asymptotic_dir_longitude)
     assert isinstance(result, float)
+
+def test_get_pitch_angles_for_asymptotic_directions_matches_scalar_calculation():
+    rng = np.random.default_rng(0)
+    asymptotic_dir_latitudes = rng.uniform(-90.0, 90.0, 200)
+    asymptotic_dir_longitudes = rng.uniform(-180.0, 360.0, 200)
+
+    result = get_pitch_angles_for_asymptotic_directions(25.0, 300.0, asymptotic_dir_latitudes, asymptotic_dir_longitudes)
+    expected = [get_pitch_angle_for_DF_analytic(25.0, 300.0, latitude, longitude)
+                for latitude, longitude in zip(asymptotic_dir_latitudes, asymptotic_dir_longitudes)]
+    assert np.allclose(result, expected, rtol=0.0, atol=1e-7)
+
+def test_get_pitch_angles_for_asymptotic_directions_parallel_and_antiparallel():
+    result = get_pitch_angles_for_asymptotic_directions(30.0, 45.0, np.array([30.0, -30.0, 90.0]), np.array([45.0, 225.0, 45.0]))
+    assert not np.any(np.isnan(result))
+    assert np.allclose(result, [0.0, np.pi, np.radians(60.0)])
+
+def test_get_pitch_angle_matrix_matches_single_reference_directions():
+    asymptotic_dir_latitudes = np.array([10.0, -45.0, 80.0, 0.0])
+    asymptotic_dir_longitudes = np.array([100.0, 200.0, 10.0, 359.0])
+    reference_latitudes = [0.0, 30.0, -90.0]
+    reference_longitudes = [45.0, 120.0, 0.0]
+
+    result = get_pitch_angle_matrix(reference_latitudes, reference_longitudes, asymptotic_dir_latitudes, asymptotic_dir_longitudes)
+    assert result.shape == (4, 3)
+    for reference_index, (reference_latitude, reference_longitude) in enumerate(zip(reference_latitudes, reference_longitudes)):
+        assert np.allclose(result[:, reference_index],
+                           get_pitch_angles_for_asymptotic_directions(reference_latitude, reference_longitude, asymptotic_dir_latitudes, asymptotic_dir_longitudes))
+
+def test_calculate_weighting_factor_arrays_for_several_reference_directions(sample_dataframe):
+    particle_dist = particleDistribution("proton", lambda rigidity: rigidity ** -2.0, gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.5))
+    sample_dataframe["Filter"] = [1, 0, 1]
+    pitch_angle_matrix = get_pitch_angle_matrix([0.0, 20.0], [45.0, 110.0], sample_dataframe["Lat"], sample_dataframe["Long"])
+
+    full_weighting_factors = calculate_weighting_factor_arrays(sample_dataframe, particle_dist, pitch_angles=pitch_angle_matrix)[3]
+    assert full_weighting_factors.shape == (3, 2)
+    for reference_index in range(2):
+        expected = calculate_weighting_factor_arrays(sample_dataframe, particle_dist, pitch_angles=pitch_angle_matrix[:, reference_index])[3]
+        assert np.allclose(full_weighting_factors[:, reference_index], expected)
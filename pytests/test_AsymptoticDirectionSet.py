@@ -0,0 +1,86 @@
+import copy
+import pytest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionSet import AsymptoticDirectionSet
+
+@pytest.fixture
+def sample_asymptotic_direction_DF():
+    return pd.DataFrame({
+        "initialLatitude": [10.0, 10.0, 20.0],
+        "initialLongitude": [5.0, 5.0, 15.0],
+        "Rigidity": [1.0, 2.0, 1.0],
+        "Lat": [30.0, 40.0, -10.0],
+        "Long": [100.0, 120.0, 200.0],
+        "Filter": [0, 1, 1],
+        "angleBetweenIMFinRadians": [0.1, 0.2, 0.3],
+    })
+
+def test_dataframe_round_trip(sample_asymptotic_direction_DF):
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF, 0.0, 45.0,
+                                                                     date_and_time=dt.datetime(2006, 12, 13, 3, 0), Kp_index=3)
+
+    assert len(asymptotic_direction_set) == 3
+    assert asymptotic_direction_set.filter_flags.dtype == np.int8
+    pd.testing.assert_frame_equal(asymptotic_direction_set.to_dataframe(), sample_asymptotic_direction_DF, check_dtype=False)
+
+def test_set_is_immutable_and_shared_by_deepcopy(sample_asymptotic_direction_DF):
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF, 0.0, 45.0)
+
+    with pytest.raises(ValueError):
+        asymptotic_direction_set.pitch_angles[0] = 1.0
+    assert copy.deepcopy(asymptotic_direction_set) is asymptotic_direction_set
+    assert asymptotic_direction_set.with_reference_direction(0.0, 45.0) is asymptotic_direction_set
+
+def test_missing_columns(sample_asymptotic_direction_DF):
+    with pytest.raises(ValueError):
+        AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF.drop(columns=["angleBetweenIMFinRadians"]), 0.0, 45.0)
+
+def test_from_cutoff_rigidities_matches_row_by_row_construction():
+    latitudes = np.array([-30.0, 0.0, 60.0])
+    longitudes = np.array([10.0, 100.0, 250.0])
+    cutoff_rigidities = np.array([5.0, 14.2, 0.3])
+    rigidities = [20.0, 10.0, 5.0, 1.0, 0.1]
+
+    asymptotic_direction_set = AsymptoticDirectionSet.from_cutoff_rigidities(latitudes, longitudes, cutoff_rigidities, rigidities, 0.0, 45.0)
+
+    expected_DF = pd.DataFrame([
+        {'initialLatitude': latitude, 'initialLongitude': longitude,
+         'Rigidity': rigidity, 'Lat': latitude, 'Long': longitude,
+         'Filter': 1 if rigidity >= cutoff_rigidity else 0}
+        for rigidity in rigidities
+        for latitude, longitude, cutoff_rigidity in zip(latitudes, longitudes, cutoff_rigidities)
+    ])
+    # the set is carried as a cube, so it is exported ordered by location and then by ascending rigidity
+    sort_columns = ["initialLatitude", "initialLongitude", "Rigidity"]
+    pd.testing.assert_frame_equal(asymptotic_direction_set.to_dataframe()[expected_DF.columns], expected_DF.sort_values(sort_columns, ignore_index=True), check_dtype=False)
+    assert asymptotic_direction_set.to_cube().shape == (3, 1, 5)
+    assert np.all(asymptotic_direction_set.pitch_angles >= 0.0)
+
+def test_fingerprint(sample_asymptotic_direction_DF):
+    from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import get_fingerprint_key
+
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF, 0.0, 45.0, Kp_index=3)
+
+    assert get_fingerprint_key(asymptotic_direction_set) == get_fingerprint_key(AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF, 0.0, 45.0, Kp_index=3))
+    assert get_fingerprint_key(asymptotic_direction_set) != get_fingerprint_key(AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF.assign(Lat=[30.0, 40.0, -11.0]), 0.0, 45.0, Kp_index=3))
+
+def test_dose_rate_frames_pickle_the_set_fingerprint(sample_asymptotic_direction_DF):
+    import pickle
+    from AniMAIRE.DoseRateFrame import DoseRateFrame
+
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(sample_asymptotic_direction_DF, 0.0, 45.0)
+    dose_rate_frame = DoseRateFrame({"latitude": [10.0, 20.0], "edose": [1.0, 2.0]}, asymptotic_direction_set=asymptotic_direction_set)
+
+    frame_without_set = DoseRateFrame({"latitude": [10.0, 20.0], "edose": [1.0, 2.0]})
+    assert len(pickle.dumps(dose_rate_frame)) - len(pickle.dumps(frame_without_set)) < len(pickle.dumps(asymptotic_direction_set))
+    unpickled_frame = pickle.loads(pickle.dumps(dose_rate_frame))
+    pd.testing.assert_frame_equal(unpickled_frame, dose_rate_frame)
+    assert unpickled_frame.asymptotic_direction_set is None
+    assert unpickled_frame.asymptotic_direction_set_fingerprint == asymptotic_direction_set.fingerprint()
+
+    # the set is still kept in memory and passed on by pandas operations
+    assert dose_rate_frame.asymptotic_direction_set is asymptotic_direction_set
+    assert dose_rate_frame.copy().asymptotic_direction_set is asymptotic_direction_set
@@ -0,0 +1,110 @@
+import pytest
+import datetime as dt
+import numpy as np
+import pandas as pd
+from joblib import Memory
+
+from AniMAIRE.anisotropic_MAIRE_engine import cacheManager, otso_planet_processing
+from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionStore import (AsymptoticDirectionStore,
+                                                                        configure_asymptotic_direction_store,
+                                                                        get_asymptotic_direction_descriptor)
+from AniMAIRE.anisotropic_MAIRE_engine.otso_planet_processing import call_with_asymptotic_direction_store, get_OTSO_descriptor
+
+def get_sample_asymptotic_directions():
+    rigidities = np.linspace(20.0, 0.1, 50)
+    rows = []
+    for latitude, longitude in [(0.0, 0.0), (45.5, -92.7)]:
+        for rigidity in rigidities:
+            rows.append({"initialLatitude": latitude, "initialLongitude": longitude, "Energy": 0.9 * rigidity,
+                         "Lat": latitude - (30.0 / (1.0 + rigidity)), "Long": (longitude + (100.0 / (1.0 + rigidity))) % 360.0,
+                         "Filter": 1 if rigidity > 10.0 else -1, "Rigidity": rigidity, "zenith": 0.0, "azimuth": 0.0})
+    return pd.DataFrame(rows)
+
+@pytest.fixture
+def sample_descriptor():
+    return get_asymptotic_direction_descriptor("OTSO test", [[0.0, 0.0], [45.5, -92.7]], 3, dt.datetime(2006, 12, 13, 3, 0), [[0.0, 0.0]],
+                                               np.linspace(20.0, 0.1, 50), {"externalmag": "TSY89c"})
+
+def test_store_round_trip(tmp_path, sample_descriptor):
+    store = AsymptoticDirectionStore(str(tmp_path))
+    asymptotic_directions = get_sample_asymptotic_directions()
+
+    assert store.load(sample_descriptor) is None
+    store.save(sample_descriptor, asymptotic_directions)
+
+    assert store.contains(sample_descriptor)
+    pd.testing.assert_frame_equal(store.load(sample_descriptor), asymptotic_directions)
+    # a second save of the same entry, for example by another process, keeps the first entry
+    store.save(sample_descriptor, asymptotic_directions.iloc[:10])
+    pd.testing.assert_frame_equal(store.load(sample_descriptor), asymptotic_directions)
+
+def test_store_computes_each_entry_once(tmp_path, sample_descriptor):
+    store = AsymptoticDirectionStore(str(tmp_path))
+    number_of_calculations = []
+
+    def compute_asymptotic_directions():
+        number_of_calculations.append(1)
+        return get_sample_asymptotic_directions()
+
+    first_asymptotic_directions = store.get_or_compute(sample_descriptor, compute_asymptotic_directions)
+    second_asymptotic_directions = store.get_or_compute(sample_descriptor, compute_asymptotic_directions)
+
+    assert len(number_of_calculations) == 1
+    pd.testing.assert_frame_equal(first_asymptotic_directions, second_asymptotic_directions)
+
+def test_store_skips_non_numeric_columns(tmp_path, sample_descriptor):
+    store = AsymptoticDirectionStore(str(tmp_path))
+    store.save(sample_descriptor, get_sample_asymptotic_directions().assign(label="a"))
+
+    assert not store.contains(sample_descriptor)
+
+def test_OTSO_descriptor():
+    locations = [[46.2, 187.4], [-28.3, -92.7]]
+    descriptor = get_OTSO_descriptor(locations, 3, dt.datetime(2006, 12, 13, 3, 0), [[0.0, 0.0]], [20.0, 10.0])
+    key = AsymptoticDirectionStore.get_key(descriptor)
+
+    # the defaults applied by create_and_convert_planet and timezone labels do not change the key
+    assert AsymptoticDirectionStore.get_key(get_OTSO_descriptor(locations, 3, dt.datetime(2006, 12, 13, 3, 0, tzinfo=dt.timezone.utc), [[0.0, 0.0]],
+                                                                [20.0, 10.0], externalmag="TSY89c")) == key
+    for changed_descriptor in [get_OTSO_descriptor(locations[::-1], 3, dt.datetime(2006, 12, 13, 3, 0), [[0.0, 0.0]], [20.0, 10.0]),
+                               get_OTSO_descriptor(locations, 4, dt.datetime(2006, 12, 13, 3, 0), [[0.0, 0.0]], [20.0, 10.0]),
+                               get_OTSO_descriptor(locations, 3, dt.datetime(2006, 12, 13, 3, 1), [[0.0, 0.0]], [20.0, 10.0]),
+                               get_OTSO_descriptor(locations, 3, dt.datetime(2006, 12, 13, 3, 0), [[16.0, 90.0]], [20.0, 10.0]),
+                               get_OTSO_descriptor(locations, 3, dt.datetime(2006, 12, 13, 3, 0), [[0.0, 0.0]], [20.0, 9.0]),
+                               get_OTSO_descriptor(locations, 3, dt.datetime(2006, 12, 13, 3, 0), [[0.0, 0.0]], [20.0, 10.0], externalmag="TSY01")]:
+        assert AsymptoticDirectionStore.get_key(changed_descriptor) != key
+
+def test_legacy_joblib_cache_is_moved_into_store(tmp_path, monkeypatch, sample_descriptor):
+    monkeypatch.setattr(otso_planet_processing, "OTSOmemory", Memory(str(tmp_path / "legacy"), verbose=0))
+    configure_asymptotic_direction_store(str(tmp_path / "store"))
+    number_of_calculations = []
+
+    def trace_asymptotic_directions(Kp_index):
+        number_of_calculations.append(Kp_index)
+        return get_sample_asymptotic_directions()
+
+    try:
+        otso_planet_processing.OTSOmemory.cache(trace_asymptotic_directions)(3)
+        asymptotic_directions = call_with_asymptotic_direction_store(trace_asymptotic_directions, sample_descriptor, 3)
+        assert number_of_calculations == [3]
+        pd.testing.assert_frame_equal(AsymptoticDirectionStore(str(tmp_path / "store")).load(sample_descriptor), asymptotic_directions)
+        # the legacy entry is deleted once it has been moved into the store
+        assert not otso_planet_processing.OTSOmemory.cache(trace_asymptotic_directions).check_call_in_cache(3)
+
+        call_with_asymptotic_direction_store(trace_asymptotic_directions, {**sample_descriptor, "Kp_index": 4}, 4)
+        assert number_of_calculations == [3, 4]
+        assert not otso_planet_processing.OTSOmemory.cache(trace_asymptotic_directions).check_call_in_cache(4)
+    finally:
+        configure_asymptotic_direction_store()
+
+def test_store_counts_hits_and_misses(tmp_path, sample_descriptor):
+    store = AsymptoticDirectionStore(str(tmp_path))
+    cacheManager.reset_cache_statistics(str(tmp_path))
+
+    store.get_or_compute(sample_descriptor, get_sample_asymptotic_directions)
+    store.get_or_compute(sample_descriptor, get_sample_asymptotic_directions)
+
+    store_statistics = cacheManager.get_cache_statistics(str(tmp_path), include_other_processes=False).loc["asymptotic_directions"]
+    cacheManager.reset_cache_statistics(str(tmp_path))
+    assert (store_statistics["hits"], store_statistics["misses"]) == (1, 1)
+    assert store_statistics["bytes_read"] > 0
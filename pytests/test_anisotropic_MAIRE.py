@@ -3,6 +3,7 @@ import datetime as dt
 import numpy as np
 import pandas as pd
 from AniMAIRE import AniMAIRE
+from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionSet import AsymptoticDirectionSet
 
 import pytest
 
@@ -605,6 +606,296 @@ def test_anisotropic_dose_rates():
         rtol=1e-3,
     )
 
+def test_reuse_asymptotic_direction_set():
+    expected_anisotropic_dose_rates = [
+        [-90.0, 0.0, 0.0, 1.958363e-07, 2.008835e-07, 3.194697e-07, 1.265863e-08, 7.750545e-09, 5.312112e-09, 7.750545e-22, 7.750545e-17],
+        [-90.0, 0.0, 18.5928, 6.331126e-06, 4.786478e-06, 5.939813e-06, 6.880876e-07, 4.433038e-07, 3.156854e-07, 4.433038e-20, 4.433038e-15],
+        [90.0, 355.0, 0.0, 4.450449e-10, 5.469719e-10, 4.003600e-10, 2.162855e-10, 1.338287e-10, 8.975470e-11, 1.338287e-23, 1.338287e-18],
+        [90.0, 355.0, 18.5928, 1.153880e-06, 7.225398e-07, 5.927015e-07, 2.127123e-07, 1.340414e-07, 9.237959e-08, 1.340414e-20, 1.340414e-15]
+    ]
+    sigma = np.sqrt(0.19)
+    altitudes = [0.0, 18.5928]
+
+    isotropic_dose_rates = AniMAIRE.run_from_spectra(
+        proton_rigidity_spectrum=lambda x:x**-2.0,
+        Kp_index=3,
+        date_and_time=dt.datetime(2006, 12, 13, 3, 0),
+        array_of_lats_and_longs=[[-90.0, 0.0], [90.0, 355.0]],
+        altitudes_in_km=altitudes,
+        cache_asymptotic_directions=False,)
+
+    asymptotic_direction_set = isotropic_dose_rates.asymptotic_direction_set
+    assert isinstance(asymptotic_direction_set, AsymptoticDirectionSet)
+    assert asymptotic_direction_set.Kp_index == 3
+
+    # the traced directions are reused with a new spectrum and a new reference direction
+    anisotropic_dose_rates = AniMAIRE.run_from_spectra(
+        proton_rigidity_spectrum=lambda x:2.56*(x**-3.41),
+        proton_pitch_angle_distribution=lambda pitch_angle, rigidity: np.exp(-(pitch_angle**2)/(sigma**2)),
+        reference_pitch_angle_latitude=-17.0,reference_pitch_angle_longitude=148.0,
+        altitudes_in_km=altitudes,
+        asymptotic_direction_set=asymptotic_direction_set,)
+
+    assert anisotropic_dose_rates.asymptotic_direction_set.has_reference_direction(-17.0, 148.0)
+    assert_allclose_pandas(
+        anisotropic_dose_rates.values.tolist(),
+        expected_anisotropic_dose_rates,
+        rtol=1e-3,
+    )
+
+    with pytest.raises(ValueError):
+        AniMAIRE.run_from_spectra(proton_rigidity_spectrum=lambda x:1.0,
+                                  Kp_index=5,
+                                  altitudes_in_km=altitudes,
+                                  asymptotic_direction_set=asymptotic_direction_set)
+    with pytest.raises(ValueError):
+        AniMAIRE.run_from_spectra(proton_rigidity_spectrum=lambda x:1.0,
+                                  altitudes_in_km=altitudes,
+                                  asymptotic_direction_set=asymptotic_direction_set,
+                                  grid_quality="draft")
+
+def test_run_from_spectra_with_adaptive_grid(monkeypatch):
+    from AniMAIRE.DoseRateFrame import DoseRateFrame
+    from scipy.interpolate import LinearNDInterpolator
+
+    def get_synthetic_dose_rates(latitudes, longitudes):
+        # a sharp peak around (40N, 200E) on top of a flat background
+        longitude_differences = ((longitudes - 200.0 + 180.0) % 360.0) - 180.0
+        return 1.0 + 5.0 * np.exp(-((latitudes - 40.0)**2 + longitude_differences**2) / (2 * 5.0**2))
+
+    numbers_of_locations_run = []
+    def run_synthetic_spectra(array_of_lats_and_longs, **kwargs):
+        array_of_lats_and_longs = np.asarray(array_of_lats_and_longs)
+        numbers_of_locations_run.append(len(array_of_lats_and_longs))
+        return DoseRateFrame(pd.DataFrame({"latitude": array_of_lats_and_longs[:, 0],
+                                           "longitude": array_of_lats_and_longs[:, 1],
+                                           "altitude (km)": 12.192,
+                                           "edose": get_synthetic_dose_rates(array_of_lats_and_longs[:, 0], array_of_lats_and_longs[:, 1])}),
+                             timestamp=kwargs["date_and_time"],
+                             run_parameters={})
+
+    monkeypatch.setattr(AniMAIRE, "run_from_spectra", run_synthetic_spectra)
+    adaptive_dose_rates = AniMAIRE.run_from_spectra_with_adaptive_grid(initial_grid_spacing_degrees=20.0,
+                                                                        minimum_cell_size_degrees=1.25,
+                                                                        refinement_tolerance=0.05,
+                                                                        date_and_time=dt.datetime(2006, 12, 13, 3, 0, tzinfo=dt.timezone.utc))
+
+    assert isinstance(adaptive_dose_rates, DoseRateFrame)
+    assert len(numbers_of_locations_run) > 2
+    assert len(adaptive_dose_rates) == sum(numbers_of_locations_run)
+    assert not adaptive_dose_rates.duplicated(["latitude", "longitude"]).any()
+    # the full global grid at the minimum cell size would have 145 x 288 locations
+    assert len(adaptive_dose_rates) < (145 * 288) / 20
+    refined_locations = adaptive_dose_rates[(adaptive_dose_rates["latitude"] % 2.5) != 0]
+    assert np.all(np.abs(refined_locations["latitude"] - 40.0) < 25.0)
+
+    interpolator = LinearNDInterpolator(adaptive_dose_rates[["latitude", "longitude"]].to_numpy(), adaptive_dose_rates["edose"].to_numpy())
+    test_latitudes, test_longitudes = np.meshgrid(np.linspace(-80.0, 80.0, 161), np.linspace(0.0, 340.0, 69), indexing="ij")
+    interpolated_dose_rates = interpolator(np.column_stack([test_latitudes.reshape(-1), test_longitudes.reshape(-1)]))
+    assert np.max(np.abs(interpolated_dose_rates - get_synthetic_dose_rates(test_latitudes.reshape(-1), test_longitudes.reshape(-1)))) < 0.05 * 6.0
+
+    with pytest.raises(ValueError):
+        AniMAIRE.run_from_spectra_with_adaptive_grid(array_of_lats_and_longs=[[0.0, 0.0]])
+
+def test_event_interpolates_equal_area_grids():
+    from AniMAIRE.AniMAIRE_event import AltitudeLayerInterpolator, BaseAniMAIREEvent
+    from AniMAIRE.anisotropic_MAIRE_engine.spatialGrids import get_equal_area_array_of_lats_and_longs
+
+    def get_synthetic_dose_rates(latitudes, longitudes, altitudes):
+        return 1.0 + np.cos(np.radians(latitudes)) * np.cos(np.radians(longitudes)) + (altitudes / 12.0)
+
+    array_of_lats_and_longs = get_equal_area_array_of_lats_and_longs(5.0)
+    dose_rates = pd.DataFrame({"latitude": np.tile(array_of_lats_and_longs[:, 0], 2),
+                               "longitude": np.tile(array_of_lats_and_longs[:, 1], 2),
+                               "altitude (km)": np.repeat([0.0, 12.0], len(array_of_lats_and_longs))})
+    dose_rates["edose"] = get_synthetic_dose_rates(dose_rates["latitude"], dose_rates["longitude"], dose_rates["altitude (km)"])
+
+    interpolator = BaseAniMAIREEvent()._create_efficient_interpolator(dose_rates, "edose", "linear")
+    assert isinstance(interpolator, AltitudeLayerInterpolator)
+
+    rng = np.random.default_rng(0)
+    test_points = np.column_stack([np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, 1000))), rng.uniform(-180.0, 360.0, 1000), rng.uniform(0.0, 12.0, 1000)])
+    interpolated_dose_rates = interpolator(test_points)
+    assert np.max(np.abs(interpolated_dose_rates - get_synthetic_dose_rates(test_points[:, 0], test_points[:, 1], test_points[:, 2]))) < 0.02
+    assert np.isnan(interpolator([0.0, 0.0, 13.0])).all()
+
+def test_equal_area_grid_cannot_be_combined_with_locations():
+    with pytest.raises(ValueError):
+        AniMAIRE.run_from_spectra(proton_rigidity_spectrum=lambda x: x**-2.7, equal_area_grid=True, array_of_lats_and_longs=[[0.0, 0.0]])
+
+def test_event_parameter_quantization(tmp_path, monkeypatch):
+    from joblib import Memory
+    from AniMAIRE import AniMAIRE_event
+    from AniMAIRE.AniMAIRE_event import DoublePowerLawGaussianEvent, ParameterQuantizationPolicy
+    from AniMAIRE.DoseRateFrame import DoseRateFrame
+    from AniMAIRE.utils import get_correctly_formatted_particle_dist_list
+    from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import memoize_by_fingerprint
+    from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.pitchAngleDistribution import isotropicPitchAngleDistribution
+
+    number_of_runs = []
+
+    def run_synthetic_event(J0, gamma, deltaGamma, sigma_1, sigma_2, B, alpha_prime, reference_pitch_angle_latitude,
+                            reference_pitch_angle_longitude, date_and_time, use_split_spectrum, **kwargs):
+        number_of_runs.append(J0)
+        proton_rigidity_spectrum = AniMAIRE.get_double_power_law_spectrum(J0, gamma, deltaGamma, use_split_spectrum)
+        return DoseRateFrame({"latitude": [0.0, 10.0], "longitude": [0.0, 0.0], "altitude (km)": [12.0, 12.0],
+                              "edose": [J0 * gamma * (1.0 + B), 2.0 * J0 * gamma * (1.0 + B)]},
+                             particle_distributions=get_correctly_formatted_particle_dist_list(proton_rigidity_spectrum, None,
+                                                                                               reference_pitch_angle_latitude, reference_pitch_angle_longitude,
+                                                                                               isotropicPitchAngleDistribution(), None),
+                             run_parameters={"J0": J0, "proton_rigidity_spectrum": proton_rigidity_spectrum})
+
+    monkeypatch.setattr(AniMAIRE_event, "run_animaire_cached", memoize_by_fingerprint(Memory(str(tmp_path / "cache"), verbose=0), "event")(run_synthetic_event))
+    pd.DataFrame({"Time": ["2024-05-11 02:00", "2024-05-11 02:05", "2024-05-11 02:10"],
+                  "J_0": [1e5, 2e5, 2e5], "gamma": [5.0, 5.0001, 5.2], "d_gamma": [0.2, 0.2, 0.2],
+                  "Sigma1": [0.5, 0.5, 0.5], "Sigma2": [1.0, 1.0, 1.0], "B": [0.3, 0.3, 0.3],
+                  "SymLat": [10.0, 10.0, 10.0], "SymLong": [20.0, 20.0, 20.0]}).to_csv(tmp_path / "spectra.csv", index=False)
+
+    dose_rates = DoublePowerLawGaussianEvent(str(tmp_path / "spectra.csv")).run_AniMAIRE(quantization_policy=ParameterQuantizationPolicy(time_resolution=dt.timedelta(minutes=15)))
+
+    # the first two spectra differ in J0, in the fifth significant figure of gamma and by less than the time resolution, so they share one run
+    assert number_of_runs == [1.0, 1.0]
+    first_dose_rates, second_dose_rates, third_dose_rates = dose_rates.values()
+    np.testing.assert_allclose(first_dose_rates["edose"], [1e5 * 5.0 * 1.3, 2e5 * 5.0 * 1.3], rtol=1e-3)
+    np.testing.assert_allclose(second_dose_rates["edose"], 2.0 * first_dose_rates["edose"], rtol=1e-12)
+    np.testing.assert_allclose(third_dose_rates["edose"], [2e5 * 5.2 * 1.3, 4e5 * 5.2 * 1.3], rtol=1e-3)
+    np.testing.assert_array_equal(second_dose_rates["latitude"], [0.0, 10.0])
+
+    quantization_record = second_dose_rates.run_parameters["parameter_quantization"]
+    assert quantization_record["requested_parameters"]["gamma"] == 5.0001
+    assert quantization_record["quantized_parameters"]["gamma"] == pytest.approx(5.0, rel=1e-3)
+    assert quantization_record["J0_rescale_factor"] == 2e5
+    assert quantization_record["quantized_parameters"]["date_and_time"] == pd.Timestamp("2024-05-11 02:00", tz="UTC")
+
+    # the rescaled frames record the spectrum with the requested J0
+    expected_spectrum = AniMAIRE.get_double_power_law_spectrum(2e5, quantization_record["quantized_parameters"]["gamma"],
+                                                               quantization_record["quantized_parameters"]["deltaGamma"], use_split_spectrum=True)
+    recorded_spectrum = second_dose_rates.particle_distributions[0].momentum_distribution.getRigiditySpectrum()
+    for rigidity in [1.0, 5.0, 20.0]:
+        assert recorded_spectrum(rigidity) == pytest.approx(expected_spectrum(rigidity), rel=1e-12)
+        assert second_dose_rates.run_parameters["proton_rigidity_spectrum"](rigidity) == pytest.approx(expected_spectrum(rigidity), rel=1e-12)
+    assert second_dose_rates.run_parameters["J0"] == 2e5
+    assert first_dose_rates.run_parameters["J0"] == 1e5
+
+    with pytest.raises(ValueError):
+        ParameterQuantizationPolicy({"J1": 1e-3})
+    with pytest.raises(ValueError):
+        ParameterQuantizationPolicy({"reference_pitch_angle_longitude": 1e-3})
+
+def test_reference_direction_quantization_uses_absolute_tolerances():
+    from AniMAIRE.AniMAIRE_event import ParameterQuantizationPolicy
+
+    quantization_policy = ParameterQuantizationPolicy(angle_tolerances_degrees={"reference_pitch_angle_latitude": 0.5,
+                                                                                "reference_pitch_angle_longitude": 0.5})
+    spectrum_parameters = {"J0": 1e5, "gamma": 5.0, "reference_pitch_angle_latitude": 89.9, "date_and_time": None}
+
+    longitudes = [quantization_policy.quantize({**spectrum_parameters, "reference_pitch_angle_longitude": longitude})[0]["reference_pitch_angle_longitude"]
+                  for longitude in [-1.1, 358.9, 359.9, -0.1, 0.1, 180.2]]
+    assert longitudes == [359.0, 359.0, 0.0, 0.0, 0.0, 180.0]
+    quantized_parameters, _, quantization_record = quantization_policy.quantize({**spectrum_parameters, "reference_pitch_angle_longitude": 10.0})
+    assert quantized_parameters["reference_pitch_angle_latitude"] == 90.0
+    assert quantization_record["requested_parameters"]["reference_pitch_angle_latitude"] == 89.9
+
+def test_dose_rate_frame_linear_combination():
+    from AniMAIRE.DoseRateFrame import DoseRateFrame
+
+    first_dose_rates = DoseRateFrame({"latitude": [0.0, 10.0], "longitude": [0.0, 0.0], "altitude (km)": [12.0, 12.0], "edose": [1.0, 2.0]})
+    second_dose_rates = DoseRateFrame({"latitude": [0.0, 10.0], "longitude": [0.0, 0.0], "altitude (km)": [12.0, 12.0], "edose": [3.0, 5.0]})
+
+    combined_dose_rates = DoseRateFrame.from_linear_combination([first_dose_rates, second_dose_rates], [2.0, 0.5])
+
+    np.testing.assert_allclose(combined_dose_rates["edose"], [3.5, 6.5])
+    np.testing.assert_array_equal(combined_dose_rates["latitude"], [0.0, 10.0])
+    with pytest.raises(ValueError):
+        DoseRateFrame.from_linear_combination([first_dose_rates, second_dose_rates.iloc[::-1]], [1.0, 1.0])
+    with pytest.raises(ValueError):
+        DoseRateFrame.from_linear_combination([first_dose_rates], [1.0, 1.0])
+
+def test_linear_components_are_cached_and_combined(tmp_path, monkeypatch):
+    from joblib import Memory
+    from AniMAIRE.DoseRateFrame import DoseRateFrame
+    from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import memoize_by_fingerprint
+
+    component_runs = []
+
+    def run_synthetic_spectra(proton_rigidity_spectrum, proton_pitch_angle_distribution, **kwargs):
+        component_runs.append(proton_pitch_angle_distribution)
+        pitch_angles = np.array([0.0, 1.0])
+        return DoseRateFrame({"latitude": [0.0, 10.0], "longitude": [0.0, 0.0], "altitude (km)": [12.0, 12.0],
+                              "edose": proton_rigidity_spectrum(2.0) * proton_pitch_angle_distribution(pitch_angles, 2.0)})
+
+    monkeypatch.setattr(AniMAIRE, "run_from_spectra", run_synthetic_spectra)
+    monkeypatch.setattr(AniMAIRE, "run_from_spectra_cached", memoize_by_fingerprint(Memory(str(tmp_path), verbose=0), "event")(run_synthetic_spectra))
+    spectrum_parameters = dict(gamma=5.0, deltaGamma=0.2, sigma_1=0.5, sigma_2=1.0, alpha_prime=np.pi,
+                               reference_pitch_angle_latitude=10.0, reference_pitch_angle_longitude=20.0,
+                               date_and_time=dt.datetime(2024, 5, 11, 2, 0, tzinfo=dt.timezone.utc))
+
+    direct_dose_rates = AniMAIRE.run_from_double_power_law_gaussian_distribution(J0=1e5, B=0.3, **spectrum_parameters)
+    component_runs.clear()
+    first_dose_rates = AniMAIRE.run_from_double_power_law_gaussian_distribution(J0=1e5, B=0.3, use_linear_components=True, **spectrum_parameters)
+    second_dose_rates = AniMAIRE.run_from_double_power_law_gaussian_distribution(J0=3e5, B=0.7, use_linear_components=True, **spectrum_parameters)
+
+    # both runs are assembled from the same two component runs
+    assert len(component_runs) == 2
+    np.testing.assert_allclose(first_dose_rates["edose"], direct_dose_rates["edose"], rtol=1e-12)
+    expected_second_dose_rates = AniMAIRE.run_from_double_power_law_gaussian_distribution(J0=3e5, B=0.7, **spectrum_parameters)
+    np.testing.assert_allclose(second_dose_rates["edose"], expected_second_dose_rates["edose"], rtol=1e-12)
+    assert second_dose_rates.run_parameters["linear_components"] == {"J0": 3e5, "B": 0.7}
+
+    # a B of zero only needs the first component
+    component_runs.clear()
+    AniMAIRE.run_from_double_power_law_gaussian_distribution(J0=1e5, B=0.0, use_linear_components=True, **{**spectrum_parameters, "sigma_1": 0.6})
+    assert len(component_runs) == 1
+
+    # runs without a date and time share one reference time, so a sweep still reuses the same two component runs
+    component_runs.clear()
+    undated_spectrum_parameters = {**spectrum_parameters, "date_and_time": None, "Kp_index": 3}
+    for J0, B in [(1e5, 0.3), (2e5, 0.5), (4e5, 0.9)]:
+        AniMAIRE.run_from_double_power_law_gaussian_distribution(J0=J0, B=B, use_linear_components=True, **undated_spectrum_parameters)
+    assert len(component_runs) == 2
+
+def test_maireplus_linear_components_match_direct_run(tmp_path, monkeypatch):
+    from joblib import Memory
+    from AniMAIRE.DoseRateFrame import DoseRateFrame
+    from AniMAIRE.utils import get_correctly_formatted_particle_dist_list
+    from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import memoize_by_fingerprint
+    from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.rigiditySpectrum import PowerLawSpectrum
+
+    class SyntheticMAIREPLUSSpectrum(PowerLawSpectrum):
+        def __init__(self, **kwargs):
+            self.MAIREPLUS_spectral_index = 4.5
+            self.normalisation_factor = 2.5e4
+            super().__init__(normalisationFactor=self.normalisation_factor, spectralIndex=-self.MAIREPLUS_spectral_index)
+
+    def run_synthetic_spectra(proton_rigidity_spectrum, proton_pitch_angle_distribution, **kwargs):
+        return DoseRateFrame({"latitude": [0.0, 10.0], "longitude": [0.0, 0.0], "altitude (km)": [12.0, 12.0],
+                              "edose": proton_rigidity_spectrum(np.array([2.0, 3.0]))},
+                             particle_distributions=get_correctly_formatted_particle_dist_list(proton_rigidity_spectrum, None, 0.0, 45.0,
+                                                                                               proton_pitch_angle_distribution, None),
+                             run_parameters={"proton_rigidity_spectrum": proton_rigidity_spectrum})
+
+    def run_synthetic_GCR(**kwargs):
+        return DoseRateFrame({"latitude": [0.0, 10.0], "longitude": [0.0, 0.0], "altitude (km)": [12.0, 12.0], "edose": [1.0, 1.0]})
+
+    monkeypatch.setattr(AniMAIRE, "MAIREPLUS_spectrum", SyntheticMAIREPLUSSpectrum)
+    monkeypatch.setattr(AniMAIRE, "run_from_spectra", run_synthetic_spectra)
+    monkeypatch.setattr(AniMAIRE, "run_from_spectra_cached", memoize_by_fingerprint(Memory(str(tmp_path), verbose=0), "event")(run_synthetic_spectra))
+    monkeypatch.setattr(AniMAIRE, "run_from_DLR_cosmic_ray_model", run_synthetic_GCR)
+    event_parameters = dict(neutron_monitor_1_percentage_increase=50.0, neutron_monitor_2_percentage_increase=20.0,
+                            normalisation_monitor_percentage_increase=50.0, OULU_gcr_count_rate_in_seconds=100.0,
+                            datetime=dt.datetime(2024, 5, 11, 2, 0, tzinfo=dt.timezone.utc), kp_index=3)
+
+    direct_dose_rates = AniMAIRE.run_maireplus_spectrum(**event_parameters)
+    linear_dose_rates = AniMAIRE.run_maireplus_spectrum(use_linear_components=True, **event_parameters)
+
+    np.testing.assert_allclose(linear_dose_rates["edose"], direct_dose_rates["edose"], rtol=1e-12)
+    rigidities = np.array([1.0, 5.0, 20.0])
+    np.testing.assert_allclose(linear_dose_rates.particle_distributions[0].momentum_distribution.getRigiditySpectrum()(rigidities),
+                               direct_dose_rates.particle_distributions[0].momentum_distribution.getRigiditySpectrum()(rigidities), rtol=1e-12)
+    np.testing.assert_allclose(linear_dose_rates.run_parameters["proton_rigidity_spectrum"](rigidities),
+                               direct_dose_rates.run_parameters["proton_rigidity_spectrum"](rigidities), rtol=1e-12)
+    assert linear_dose_rates.run_parameters["linear_components"] == {"normalisation_factor": 2.5e4}
+
 # Precomputed asymp CSV path only (no OTSO.planet / not the default OTSO asymptotic engine).
 def test_run_from_OTSO_asymp_file(tmp_path):
     import pandas as pd
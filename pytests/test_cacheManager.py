@@ -0,0 +1,147 @@
+import os
+import time
+import pytest
+from joblib import Memory
+
+from AniMAIRE.anisotropic_MAIRE_engine import cacheManager
+from AniMAIRE.anisotropic_MAIRE_engine.cacheManager import (call_with_joblib_cache,
+                                                            evict_cache_entries,
+                                                            get_cache_directory,
+                                                            get_cache_entries,
+                                                            get_cache_statistics,
+                                                            main,
+                                                            parse_byte_count,
+                                                            reset_cache_statistics)
+
+def write_joblib_entry(cache_root, entry_name, size_bytes, last_used):
+    entry_directory = os.path.join(get_cache_directory("OTSO", str(cache_root)), "joblib", "module", "function", entry_name)
+    os.makedirs(entry_directory)
+    with open(os.path.join(entry_directory, "output.pkl"), "wb") as output_file:
+        output_file.write(b"0" * size_bytes)
+    with open(os.path.join(entry_directory, "metadata.json"), "w") as metadata_file:
+        metadata_file.write("{}")
+    for file_name in ["output.pkl", "metadata.json"]:
+        os.utime(os.path.join(entry_directory, file_name), (last_used, last_used))
+    return entry_directory
+
+@pytest.fixture
+def clean_statistics(tmp_path):
+    reset_cache_statistics(str(tmp_path))
+    yield
+    reset_cache_statistics(str(tmp_path))
+
+def test_get_cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv(cacheManager.cache_root_environment_variable, str(tmp_path))
+    assert get_cache_directory("event") == os.path.join(str(tmp_path), ".AniMAIRE_event_cache")
+    # AsympDirsCalculator always caches Magnetocosmics runs in the working directory
+    assert get_cache_directory("MAGNETOCOSMICS") == os.path.join(os.getcwd(), "cachedMagnetocosmicsRunData")
+    with pytest.raises(ValueError):
+        get_cache_directory("unknown")
+
+def test_evict_least_recently_used_entries(tmp_path):
+    now = time.time()
+    oldest_entry = write_joblib_entry(tmp_path, "a", 1000, now - 300)
+    middle_entry = write_joblib_entry(tmp_path, "b", 1000, now - 200)
+    newest_entry = write_joblib_entry(tmp_path, "c", 1000, now - 100)
+    assert len(get_cache_entries("OTSO", str(tmp_path))) == 3
+
+    freed_bytes = evict_cache_entries("OTSO", max_bytes=2500, cache_root=str(tmp_path))
+
+    assert freed_bytes == 1002
+    assert not os.path.exists(oldest_entry)
+    assert os.path.exists(middle_entry) and os.path.exists(newest_entry)
+
+def test_evict_old_entries(tmp_path):
+    now = time.time()
+    old_entry = write_joblib_entry(tmp_path, "a", 10, now - (10 * 24 * 3600))
+    new_entry = write_joblib_entry(tmp_path, "b", 10, now - 60)
+
+    evict_cache_entries("OTSO", max_age_seconds=24 * 3600, cache_root=str(tmp_path))
+
+    assert not os.path.exists(old_entry)
+    assert os.path.exists(new_entry)
+
+def test_joblib_cache_statistics(tmp_path, clean_statistics):
+    def add(a, b):
+        time.sleep(0.05)
+        return a + b
+    cached_add = Memory(get_cache_directory("event", str(tmp_path)), verbose=0).cache(add)
+
+    assert call_with_joblib_cache("event", cached_add, 1, 2) == 3
+    assert call_with_joblib_cache("event", cached_add, 1, 2) == 3
+    assert call_with_joblib_cache("event", cached_add, 1, b=2) == 3
+
+    event_statistics = get_cache_statistics(str(tmp_path)).loc["event"]
+    assert event_statistics["hits"] == 2
+    assert event_statistics["misses"] == 1
+    assert event_statistics["hit_rate"] == pytest.approx(2.0 / 3.0)
+    assert event_statistics["bytes_read"] > 0
+    assert event_statistics["compute_seconds_saved"] >= 0.1
+    assert event_statistics["entries"] == 1
+
+def test_statistics_saved_by_other_processes_are_included(tmp_path, monkeypatch, clean_statistics):
+    monkeypatch.setenv(cacheManager.cache_root_environment_variable, str(tmp_path))
+    cacheManager.record_cache_hit("OTSO", bytes_read=100, compute_seconds_saved=5.0)
+    cacheManager.save_cache_statistics()
+    # counts that were already saved are not added again
+    cacheManager.save_cache_statistics()
+
+    # another process starts with its own counts
+    monkeypatch.setattr(cacheManager, "_cache_statistics", cacheManager.get_empty_cache_statistics())
+    monkeypatch.setattr(cacheManager, "_saved_cache_statistics", cacheManager.get_empty_cache_statistics())
+    cacheManager.record_cache_hit("OTSO", bytes_read=100, compute_seconds_saved=5.0)
+
+    OTSO_statistics = get_cache_statistics(str(tmp_path)).loc["OTSO"]
+    assert OTSO_statistics["hits"] == 2
+    assert OTSO_statistics["compute_seconds_saved"] == pytest.approx(10.0)
+    assert get_cache_statistics(str(tmp_path), include_other_processes=False).loc["OTSO", "hits"] == 1
+
+    # every process adds its counts to the same file
+    cacheManager.save_cache_statistics()
+    assert os.listdir(os.path.join(str(tmp_path), cacheManager.statistics_directory_name)) == [cacheManager.statistics_file_name]
+    assert get_cache_statistics(str(tmp_path)).loc["OTSO", "hits"] == 2
+
+def test_budgets_are_enforced_after_writes(tmp_path, monkeypatch, clean_statistics):
+    monkeypatch.setenv(cacheManager.cache_root_environment_variable, str(tmp_path))
+    monkeypatch.setattr(cacheManager, "_cache_budgets", {})
+    monkeypatch.setattr(cacheManager, "_last_budget_enforcement_times", {})
+    monkeypatch.setattr(cacheManager, "budget_enforcement_interval_seconds", 0.0)
+    cached_multiply = Memory(get_cache_directory("event", str(tmp_path)), verbose=0).cache(lambda a, b: [a * b] * 1000)
+
+    call_with_joblib_cache("event", cached_multiply, 1, 2)
+    entry_size = int(get_cache_entries("event", str(tmp_path))["size_bytes"].sum())
+    cacheManager.configure_cache_budget("event", max_bytes=int(1.5 * entry_size))
+    time.sleep(0.05)
+    call_with_joblib_cache("event", cached_multiply, 3, 4)
+
+    assert len(get_cache_entries("event", str(tmp_path))) == 1
+    assert cached_multiply.check_call_in_cache(3, 4)
+
+    # checks are rate limited, so a write soon after the last check does not list the cache again
+    monkeypatch.setattr(cacheManager, "budget_enforcement_interval_seconds", 3600.0)
+    time.sleep(0.05)
+    call_with_joblib_cache("event", cached_multiply, 5, 6)
+    assert len(get_cache_entries("event", str(tmp_path))) == 2
+
+def test_parse_byte_count():
+    assert parse_byte_count("500") == 500
+    assert parse_byte_count("2K") == 2048
+    assert parse_byte_count("1.5GB") == int(1.5 * 1024**3)
+
+def test_command_line(tmp_path, capsys, clean_statistics):
+    now = time.time()
+    old_entry = write_joblib_entry(tmp_path, "a", 10, now - (10 * 24 * 3600))
+    new_entry = write_joblib_entry(tmp_path, "b", 10, now)
+
+    main(["--root", str(tmp_path), "stats"])
+    assert "OTSO" in capsys.readouterr().out
+
+    main(["--root", str(tmp_path), "evict", "--cache", "OTSO", "--max-age-days", "1"])
+    assert not os.path.exists(old_entry)
+    assert os.path.exists(new_entry)
+
+    main(["--root", str(tmp_path), "clear", "--cache", "OTSO"])
+    assert get_cache_entries("OTSO", str(tmp_path)).empty
+
+    with pytest.raises(SystemExit):
+        main(["--root", str(tmp_path), "evict"])
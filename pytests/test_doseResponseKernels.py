@@ -0,0 +1,87 @@
+import os
+import pytest
+import numpy as np
+from scipy.interpolate import interp1d
+from scipy.integrate import trapezoid
+from atmosphericRadiationDoseAndFlux import doseAndFluxCalculator as DAFcalc
+
+from AniMAIRE.anisotropic_MAIRE_engine import doseResponseKernels
+from AniMAIRE.anisotropic_MAIRE_engine.doseResponseKernels import (
+    calculate_from_rigidity_spec,
+    get_altitude_layer_weights,
+    get_kernel_cache_file_path,
+    linear_interpolation_matrix,
+    load_layer_response_kernel,
+    trapezoid_weights,
+    validate_dose_types,
+)
+
+@pytest.mark.parametrize("particle_name", ["proton", "alpha"])
+def test_kernel_doses_match_atmosphericRadiationDoseAndFlux(particle_name):
+    altitudes_in_km = [0.0, 0.5, 1.1, 5.2, 11.28, 15.5, 40.0, 70.0]
+    spectrum = lambda x: x**-2.5 if x > 0.7 else 0.0
+
+    expected_doses = DAFcalc.calculate_from_rigidity_spec(spectrum, altitudesInkm=altitudes_in_km, particleName=particle_name)
+    kernel_doses = calculate_from_rigidity_spec(spectrum, altitudes_in_km, particleName=particle_name)
+
+    assert list(kernel_doses.columns) == list(expected_doses.columns)
+    np.testing.assert_allclose(kernel_doses.values, expected_doses.values, rtol=1e-10)
+
+def test_selected_dose_types():
+    altitudes_in_km = [0.0, 11.28]
+    spectrum = lambda x: x**-2.5 if x > 0.7 else 0.0
+
+    all_doses = calculate_from_rigidity_spec(spectrum, altitudes_in_km)
+    selected_doses = calculate_from_rigidity_spec(spectrum, altitudes_in_km, dose_types=["SEL", "edose"])
+
+    assert list(selected_doses.columns) == ["altitude (km)", "edose", "SEL"]
+    np.testing.assert_allclose(selected_doses.values, all_doses[selected_doses.columns].values, rtol=1e-12)
+
+    assert validate_dose_types("SEU") == ["SEU"]
+    with pytest.raises(ValueError):
+        validate_dose_types(["edose", "ambient"])
+    with pytest.raises(ValueError):
+        validate_dose_types([])
+
+def test_kernel_cache_is_written_and_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(doseResponseKernels, "kernel_cache_directory", str(tmp_path))
+    load_layer_response_kernel.cache_clear()
+    try:
+        layer_response_kernel = load_layer_response_kernel("proton")
+        assert (tmp_path / os.path.basename(get_kernel_cache_file_path("proton"))).exists()
+        assert isinstance(layer_response_kernel, np.memmap)
+
+        load_layer_response_kernel.cache_clear()
+        reloaded_kernel = load_layer_response_kernel("proton")
+        np.testing.assert_array_equal(reloaded_kernel, layer_response_kernel)
+    finally:
+        load_layer_response_kernel.cache_clear()
+
+def test_kernel_cache_file_path_includes_kernel_format_version():
+    kernel_file_name = os.path.basename(get_kernel_cache_file_path("proton"))
+    assert f"_v{doseResponseKernels.kernel_format_version}_" in kernel_file_name
+    assert kernel_file_name.endswith(f"_{doseResponseKernels.DAF_library_version}.npy")
+
+def test_altitudes_above_top_layer_warn(capsys):
+    altitude_layer_weights = get_altitude_layer_weights([10.0, 98.0], 137)
+    assert "98.0" in capsys.readouterr().out
+    assert altitude_layer_weights[1, -1] == 1.0
+
+    get_altitude_layer_weights([10.0, 97.0], 137)
+    assert "Warning" not in capsys.readouterr().out
+
+    with pytest.raises(Exception):
+        get_altitude_layer_weights([101.0], 137)
+
+def test_linear_interpolation_matrix_matches_interp1d():
+    knots = np.array([0.5, 1.0, 2.0, 5.0, 20.0])
+    values = np.array([3.0, 2.0, 1.5, 0.2, 0.01])
+    targets = np.array([0.1, 0.5, 0.7, 2.0, 4.9, 20.0, 25.0])
+
+    expected_values = interp1d(knots, values, bounds_error=False, fill_value=0.0)(targets)
+    np.testing.assert_allclose(linear_interpolation_matrix(knots, targets) @ values, expected_values)
+
+def test_trapezoid_weights():
+    x = np.array([0.1, 0.3, 1.0, 4.0])
+    y = np.array([1.0, 4.0, 2.0, 0.5])
+    assert np.dot(trapezoid_weights(x), y) == pytest.approx(trapezoid(y, x))
@@ -1,7 +1,8 @@
 import pytest
 import pandas as pd
 import numpy as np
-from AniMAIRE.dose_plotting import plot_dose_map_contours, create_single_dose_map_plot_plt, plot_dose_map
+from AniMAIRE.dose_plotting import plot_dose_map_contours, create_single_dose_map_plot_plt, plot_dose_map, get_plotting_mesh
+from AniMAIRE.anisotropic_MAIRE_engine.spatialGrids import get_equal_area_array_of_lats_and_longs
 
 @pytest.fixture
 def sample_dose_map():
@@ -24,3 +25,26 @@ def test_create_single_dose_map_plot_plt(sample_dose_map):
 
 def test_plot_dose_map(sample_dose_map):
     plot_dose_map(sample_dose_map, plot_title="Test Plot", plot_contours=True, levels=3)
+
+@pytest.fixture
+def equal_area_dose_map():
+    array_of_lats_and_longs = get_equal_area_array_of_lats_and_longs(15.0)
+    data = {
+        "longitude": array_of_lats_and_longs[:, 1],
+        "longitudeTranslated": np.where(array_of_lats_and_longs[:, 1] > 180.0, array_of_lats_and_longs[:, 1] - 360.0, array_of_lats_and_longs[:, 1]),
+        "latitude": array_of_lats_and_longs[:, 0],
+        "altitude (km)": np.full(len(array_of_lats_and_longs), 12.192),
+        "edose": np.cos(np.radians(array_of_lats_and_longs[:, 0])),
+    }
+    return pd.DataFrame(data)
+
+def test_get_plotting_mesh():
+    lon_mesh, lat_mesh = get_plotting_mesh(np.tile([0.0, 10.0, 20.0], 2), np.repeat([-5.0, 5.0], 3))
+    np.testing.assert_array_equal(lon_mesh, [[0.0, 10.0, 20.0], [0.0, 10.0, 20.0]])
+    np.testing.assert_array_equal(lat_mesh, [[-5.0, -5.0, -5.0], [5.0, 5.0, 5.0]])
+
+def test_plot_dose_map_equal_area_grid(equal_area_dose_map):
+    lon_mesh, lat_mesh = get_plotting_mesh(equal_area_dose_map["longitude"], equal_area_dose_map["latitude"])
+    assert lon_mesh.size < 4 * len(equal_area_dose_map)
+
+    plot_dose_map(equal_area_dose_map, plot_title="Test Plot", plot_contours=True, levels=3)
@@ -0,0 +1,97 @@
+import sys
+import subprocess
+import datetime as dt
+import pytest
+import numpy as np
+import pandas as pd
+from joblib import Memory
+
+from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import get_fingerprint, get_fingerprint_key, memoize_by_fingerprint
+from AniMAIRE.anisotropic_MAIRE_engine.spatialGrids import get_equal_area_array_of_lats_and_longs
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.particleDistribution import particleDistribution
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.pitchAngleDistribution import (GaussianPitchAngleDistribution,
+                                                                                         PitchAngleDistribution,
+                                                                                         IsotropicPitchAngleDistribution)
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.rigiditySpectrum import (CommonModifiedPowerLawSpectrum,
+                                                                                   PowerLawSpectrum,
+                                                                                   RigiditySpectrum)
+
+def get_sample_particle_distribution(J0=1e5, sigma=0.5):
+    pitch_angle_distribution = GaussianPitchAngleDistribution(1.0, sigma, reference_latitude_in_GSM=10.0) + IsotropicPitchAngleDistribution()
+    return particleDistribution("proton", CommonModifiedPowerLawSpectrum(J0, 5.0, 0.2), pitch_angle_distribution)
+
+def test_equal_objects_have_equal_fingerprints():
+    assert get_fingerprint_key(get_sample_particle_distribution()) == get_fingerprint_key(get_sample_particle_distribution())
+    assert get_fingerprint_key(get_sample_particle_distribution()) != get_fingerprint_key(get_sample_particle_distribution(J0=1.0001e5))
+    assert get_fingerprint_key(get_sample_particle_distribution()) != get_fingerprint_key(get_sample_particle_distribution(sigma=0.6))
+    assert get_fingerprint_key(PowerLawSpectrum(1.0, -2.0)) != get_fingerprint_key(PowerLawSpectrum(1.0, -2.0) * 2.0)
+    assert (get_fingerprint_key(GaussianPitchAngleDistribution(1.0, 0.5, reference_latitude_in_GSM=10.0)) !=
+            get_fingerprint_key(GaussianPitchAngleDistribution(1.0, 0.5, reference_latitude_in_GSM=20.0)))
+
+def test_fingerprints_of_functions_and_grids():
+    def get_power_law(spectral_index):
+        return RigiditySpectrum(lambda rigidity: rigidity ** spectral_index)
+
+    # lambdas are fingerprinted by their source and the values they close over
+    assert get_fingerprint_key(get_power_law(-2.0)) == get_fingerprint_key(get_power_law(-2.0))
+    assert get_fingerprint_key(get_power_law(-2.0)) != get_fingerprint_key(get_power_law(-3.0))
+
+    grid = get_equal_area_array_of_lats_and_longs(5.0)
+    assert get_fingerprint(grid) == get_fingerprint(grid.copy())
+    assert get_fingerprint(grid) != get_fingerprint(grid[::-1])
+    assert get_fingerprint(dt.datetime(2006, 12, 13, 3, 0)) == get_fingerprint(np.datetime64("2006-12-13T03:00"))
+    sample_DF = pd.DataFrame({"Rigidity": [1.0, 2.0], "flux": [3.0, 4.0]})
+    assert get_fingerprint(sample_DF) == get_fingerprint(sample_DF.copy())
+    assert get_fingerprint(sample_DF) != get_fingerprint(sample_DF["flux"])
+
+width = 0.5
+
+def get_width_dependent_distribution():
+    return PitchAngleDistribution(lambda pitch_angle, rigidity: np.exp(-pitch_angle**2 / width))
+
+def test_fingerprints_of_lambdas_on_one_line_and_module_globals(monkeypatch):
+    # lambdas on the same line share their source line, but not their bytecode constants
+    first_distribution, second_distribution = [PitchAngleDistribution(lambda a, r: np.exp(-a**2 / 0.5)), PitchAngleDistribution(lambda a, r: np.exp(-a**2 / 0.9))]
+    assert first_distribution(1.0, 1.0) != second_distribution(1.0, 1.0)
+    assert get_fingerprint_key(first_distribution) != get_fingerprint_key(second_distribution)
+
+    # module globals used by a function are part of its fingerprint
+    first_key = get_fingerprint_key(get_width_dependent_distribution())
+    assert get_fingerprint_key(get_width_dependent_distribution()) == first_key
+    monkeypatch.setattr(sys.modules[__name__], "width", 0.9)
+    assert get_fingerprint_key(get_width_dependent_distribution()) != first_key
+
+    # globals that cannot be fingerprinted make the function impossible to fingerprint, so calls run without a cache
+    monkeypatch.setattr(sys.modules[__name__], "width", object())
+    with pytest.raises(TypeError):
+        get_fingerprint_key(get_width_dependent_distribution())
+
+def test_fingerprints_are_equal_across_processes():
+    fingerprint_code = ("from pytests.test_fingerprints import get_sample_particle_distribution; "
+                        "from AniMAIRE.anisotropic_MAIRE_engine.fingerprints import get_fingerprint_key; "
+                        "print(get_fingerprint_key(get_sample_particle_distribution()))")
+    other_process_key = subprocess.run([sys.executable, "-c", fingerprint_code], capture_output=True, text=True, check=True).stdout.split()[-1]
+
+    assert other_process_key == get_fingerprint_key(get_sample_particle_distribution())
+
+def test_memoize_by_fingerprint(tmp_path, capsys):
+    number_of_calculations = []
+
+    @memoize_by_fingerprint(Memory(str(tmp_path), verbose=0), "event")
+    def calculate(particle_distribution, scale=1.0, **kwargs):
+        number_of_calculations.append(1)
+        return particle_distribution.momentum_distribution.rigidity_spectrum(2.0) * scale
+
+    first_result = calculate(get_sample_particle_distribution(), array_of_lats_and_longs=np.zeros((10, 2)))
+    second_result = calculate(get_sample_particle_distribution(), 1.0, array_of_lats_and_longs=np.zeros((10, 2)))
+    assert len(number_of_calculations) == 1
+    assert first_result == second_result
+
+    calculate(get_sample_particle_distribution(), 2.0, array_of_lats_and_longs=np.zeros((10, 2)))
+    assert len(number_of_calculations) == 2
+
+    # arguments that cannot be fingerprinted are calculated without the cache
+    calculate(get_sample_particle_distribution(), unhashable_option=object())
+    calculate(get_sample_particle_distribution(), unhashable_option=object())
+    assert len(number_of_calculations) == 4
+    assert "without the cache" in capsys.readouterr().out
@@ -1,10 +1,12 @@
 import pytest
 import datetime as dt
 import numpy as np
+import pandas as pd
 from AniMAIRE.anisotropic_MAIRE_engine.generalEngineInstance import generalEngineInstance
+from AniMAIRE.anisotropic_MAIRE_engine.AsymptoticDirectionSet import AsymptoticDirectionSet
 from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.particleDistribution import particleDistribution
-from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.rigiditySpectrum import rigiditySpectrum
-from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.pitchAngleDistribution import isotropicPitchAngleDistribution
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.rigiditySpectrum import rigiditySpectrum, CommonModifiedPowerLawSpectrum
+from AniMAIRE.anisotropic_MAIRE_engine.spectralCalculations.pitchAngleDistribution import isotropicPitchAngleDistribution, gaussianPitchAngleDistribution
 
 @pytest.fixture
 def sample_particle_distribution():
@@ -31,3 +33,315 @@ def test_generalEngineInstance(sample_particle_distribution):
     assert engine.reference_longitude == 45.0
     assert engine.cache_magnetocosmics_runs == False
     assert engine.generate_NM_count_rates == False
+
+def test_fused_species_pass_matches_separate_species():
+    rigidities = np.concatenate([np.linspace(0.1, 20.0, 30), np.linspace(20.0, 1010.0, 16)[1:]])
+    rows = []
+    for latitude, longitude, cutoff_rigidity in [(0.0, 0.0, 14.0), (60.0, 90.0, 1.0)]:
+        for rigidity in rigidities:
+            for direction_index in range(3):
+                rows.append({"initialLatitude": latitude, "initialLongitude": longitude, "Rigidity": rigidity,
+                             "Lat": 10.0 * direction_index, "Long": 40.0 * direction_index,
+                             "Filter": int(rigidity >= cutoff_rigidity + direction_index),
+                             "angleBetweenIMFinRadians": 0.5 * direction_index})
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(pd.DataFrame(rows), 0.0, 45.0)
+
+    particle_distributions = [particleDistribution("proton", lambda x: x**-2.7, gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.8)),
+                              particleDistribution("alpha", lambda x: 0.1 * x**-2.5, isotropicPitchAngleDistribution())]
+
+    output_dose_rates = {}
+    for integration_mode in ["matrix", "quadrature"]:
+        engine = generalEngineInstance(
+            list_of_particle_distributions=particle_distributions,
+            list_of_altitudes_km=[0.0, 12.0],
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            generate_NM_count_rates=True,
+            integration_mode=integration_mode,
+            asymptotic_direction_set=asymptotic_direction_set,
+        )
+        output_dose_rates[integration_mode] = engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+
+    pd.testing.assert_frame_equal(output_dose_rates["matrix"], output_dose_rates["quadrature"], rtol=1e-10)
+
+def test_isotropic_locations_sharing_cutoff_profiles():
+    rigidities = np.concatenate([np.linspace(0.1, 20.0, 30), np.linspace(20.0, 1010.0, 16)[1:]])
+    latitudes = np.array([0.0, 10.0, 20.0, 30.0])
+    longitudes = np.array([0.0, 90.0, 180.0, 270.0])
+    cutoff_rigidities = np.array([14.0, 5.0, 14.0, 5.05])
+    asymptotic_direction_set = AsymptoticDirectionSet.from_cutoff_rigidities(latitudes, longitudes, cutoff_rigidities, rigidities, 0.0, 45.0)
+
+    particle_distributions = [particleDistribution("proton", lambda x: x**-2.7, isotropicPitchAngleDistribution()),
+                              particleDistribution("alpha", lambda x: 0.1 * x**-2.5, isotropicPitchAngleDistribution())]
+
+    output_dose_rates = {}
+    for integration_mode in ["matrix", "quadrature"]:
+        engine = generalEngineInstance(
+            list_of_particle_distributions=particle_distributions,
+            list_of_altitudes_km=[0.0, 12.0],
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            generate_NM_count_rates=True,
+            integration_mode=integration_mode,
+            asymptotic_direction_set=asymptotic_direction_set,
+        )
+        output_dose_rates[integration_mode] = engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+
+    pd.testing.assert_frame_equal(output_dose_rates["matrix"], output_dose_rates["quadrature"], rtol=1e-10)
+
+    # locations whose cutoffs fall between the same pair of rigidities share a cutoff profile and dose rates
+    matrix_dose_rates = output_dose_rates["matrix"].set_index(["latitude", "longitude", "altitude (km)"])
+    np.testing.assert_array_equal(matrix_dose_rates.loc[(10.0, 90.0)].values, matrix_dose_rates.loc[(30.0, 270.0)].values)
+
+def test_run_over_reference_directions_matches_separate_runs():
+    rigidities = np.concatenate([np.linspace(0.1, 20.0, 30), np.linspace(20.0, 1010.0, 16)[1:]])
+    rows = []
+    for latitude, longitude, cutoff_rigidity in [(0.0, 0.0, 14.0), (60.0, 90.0, 1.0)]:
+        for rigidity in rigidities:
+            for direction_index in range(3):
+                rows.append({"initialLatitude": latitude, "initialLongitude": longitude, "Rigidity": rigidity,
+                             "Lat": 10.0 * direction_index, "Long": 40.0 * direction_index,
+                             "Filter": int(rigidity >= cutoff_rigidity + direction_index),
+                             "angleBetweenIMFinRadians": 0.0})
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(pd.DataFrame(rows), None, None)
+
+    particle_distributions = [particleDistribution("proton", lambda x: x**-2.7, gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.8)),
+                              particleDistribution("alpha", lambda x: 0.1 * x**-2.5, gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.5))]
+    reference_directions = [(0.0, 45.0), (30.0, 100.0), (-60.0, 250.0)]
+
+    def create_engine(reference_latitude, reference_longitude):
+        return generalEngineInstance(
+            list_of_particle_distributions=particle_distributions,
+            list_of_altitudes_km=[0.0, 12.0],
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            reference_latitude=reference_latitude,
+            reference_longitude=reference_longitude,
+            generate_NM_count_rates=True,
+            asymptotic_direction_set=asymptotic_direction_set,
+        )
+
+    engine = create_engine(*reference_directions[0])
+    engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+    swept_dose_rates = engine.runOverReferenceDirections([latitude for latitude, _ in reference_directions],
+                                                         [longitude for _, longitude in reference_directions])
+
+    assert len(swept_dose_rates) == len(reference_directions)
+    for (reference_latitude, reference_longitude), dose_rates in zip(reference_directions, swept_dose_rates):
+        expected_dose_rates = create_engine(reference_latitude, reference_longitude).getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+        pd.testing.assert_frame_equal(dose_rates, expected_dose_rates, rtol=1e-12)
+    assert not swept_dose_rates[0]["adose"].equals(swept_dose_rates[1]["adose"])
+
+def test_limited_spectrum_support_matches_quadrature():
+    rigidities = np.concatenate([np.linspace(0.1, 20.0, 30), np.linspace(20.0, 1010.0, 16)[1:]])
+    rows = []
+    for latitude, longitude, cutoff_rigidity in [(0.0, 0.0, 14.0), (60.0, 90.0, 1.0)]:
+        for rigidity in rigidities:
+            for direction_index in range(3):
+                rows.append({"initialLatitude": latitude, "initialLongitude": longitude, "Rigidity": rigidity,
+                             "Lat": 10.0 * direction_index, "Long": 40.0 * direction_index,
+                             "Filter": int(rigidity >= cutoff_rigidity + direction_index),
+                             "angleBetweenIMFinRadians": 0.5 * direction_index})
+    asymptotic_direction_set = AsymptoticDirectionSet.from_dataframe(pd.DataFrame(rows), 0.0, 45.0)
+
+    limited_spectrum = CommonModifiedPowerLawSpectrum(J0=1e4, gamma=5.0, deltaGamma=0.1, lowerLimit=0.814529, upperLimit=21.084584)
+    particle_distributions = [particleDistribution("proton", limited_spectrum, gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.8))]
+
+    output_dose_rates = {}
+    for integration_mode in ["matrix", "quadrature"]:
+        engine = generalEngineInstance(
+            list_of_particle_distributions=particle_distributions,
+            list_of_altitudes_km=[0.0, 12.0],
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            generate_NM_count_rates=True,
+            integration_mode=integration_mode,
+            asymptotic_direction_set=asymptotic_direction_set,
+        )
+        output_dose_rates[integration_mode] = engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+
+    pd.testing.assert_frame_equal(output_dose_rates["matrix"], output_dose_rates["quadrature"], rtol=1e-10)
+    assert (output_dose_rates["matrix"]["adose"] > 0.0).all()
+
+@pytest.mark.parametrize("integration_mode", ["matrix", "quadrature"])
+def test_selected_dose_types_match_full_output(integration_mode):
+    rigidities = np.concatenate([np.linspace(0.1, 20.0, 30), np.linspace(20.0, 1010.0, 16)[1:]])
+    latitudes = np.array([0.0, 60.0])
+    longitudes = np.array([0.0, 90.0])
+    asymptotic_direction_set = AsymptoticDirectionSet.from_cutoff_rigidities(latitudes, longitudes, np.array([14.0, 1.0]), rigidities, 0.0, 45.0)
+
+    particle_distributions = [particleDistribution("proton", lambda x: x**-2.7, isotropicPitchAngleDistribution()),
+                              particleDistribution("alpha", lambda x: 0.1 * x**-2.5, isotropicPitchAngleDistribution())]
+
+    def run_engine(dose_types):
+        return generalEngineInstance(
+            list_of_particle_distributions=particle_distributions,
+            list_of_altitudes_km=[0.0, 12.0],
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            generate_NM_count_rates=True,
+            integration_mode=integration_mode,
+            asymptotic_direction_set=asymptotic_direction_set,
+            dose_types=dose_types,
+        ).getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+
+    full_dose_rates = run_engine(None)
+    selected_dose_rates = run_engine(["SEL", "tn1", "edose"])
+
+    assert list(selected_dose_rates.columns) == ["latitude", "longitude", "altitude (km)", "edose", "tn1", "SEL", "NM64_cr_unnorm"]
+    pd.testing.assert_frame_equal(selected_dose_rates, full_dose_rates[selected_dose_rates.columns], rtol=1e-12)
+
+def test_repeated_locations_are_calculated_once(monkeypatch):
+    array_of_lats_and_longs = np.array([[90.0, 0.0], [90.0, 120.0], [10.0, 0.0], [-30.0, 45.0], [10.0, 360.0], [90.0, 240.0]])
+    traced_locations = []
+
+    def acquire_synthetic_asymptotic_directions(engine, use_default_9_zeniths_and_azimuths, **magneto_kwargs):
+        traced_locations.append(np.asarray(engine.array_of_lats_and_longs))
+        engine.asymptotic_direction_set = AsymptoticDirectionSet.from_cutoff_rigidities(engine.array_of_lats_and_longs[:, 0],
+                                                                                        engine.array_of_lats_and_longs[:, 1],
+                                                                                        14.9 * np.cos(np.radians(engine.array_of_lats_and_longs[:, 0]))**4,
+                                                                                        np.linspace(0.1, 20.0, 100),
+                                                                                        0.0, 45.0)
+        engine.df_of_asymptotic_directions = engine.asymptotic_direction_set.to_dataframe()
+
+    monkeypatch.setattr(generalEngineInstance, "acquireDFofAllAsymptoticDirections", acquire_synthetic_asymptotic_directions)
+    engine = generalEngineInstance(
+        list_of_particle_distributions=[particleDistribution("proton", lambda x: x**-2.7, isotropicPitchAngleDistribution())],
+        list_of_altitudes_km=[0.0, 12.0],
+        Kp_index=3,
+        date_and_time=dt.datetime(2023, 1, 1),
+        array_of_lats_and_longs=array_of_lats_and_longs,
+    )
+    output_dose_rates = engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+
+    np.testing.assert_array_equal(traced_locations[0], [[90.0, 0.0], [10.0, 0.0], [-30.0, 45.0]])
+    assert len(output_dose_rates) == len(array_of_lats_and_longs) * 2
+    assert set(zip(output_dose_rates["latitude"], output_dose_rates["longitude"])) == set(map(tuple, array_of_lats_and_longs))
+    for repeated_locations in [[(90.0, 0.0), (90.0, 120.0), (90.0, 240.0)], [(10.0, 0.0), (10.0, 360.0)]]:
+        repeated_dose_rates = [output_dose_rates.query(f"latitude == {latitude} and longitude == {longitude}")["edose"].to_numpy()
+                               for latitude, longitude in repeated_locations]
+        for dose_rates in repeated_dose_rates[1:]:
+            np.testing.assert_array_equal(dose_rates, repeated_dose_rates[0])
+
+def test_run_over_reference_directions_expands_repeated_locations(monkeypatch):
+    array_of_lats_and_longs = np.array([[90.0, 0.0], [90.0, 90.0], [0.0, 0.0], [0.0, 180.0]])
+    traced_locations = []
+
+    def acquire_synthetic_asymptotic_directions(engine, use_default_9_zeniths_and_azimuths, **magneto_kwargs):
+        traced_locations.append(np.asarray(engine.array_of_lats_and_longs))
+        engine.asymptotic_direction_set = AsymptoticDirectionSet.from_cutoff_rigidities(engine.array_of_lats_and_longs[:, 0],
+                                                                                        engine.array_of_lats_and_longs[:, 1],
+                                                                                        14.9 * np.cos(np.radians(engine.array_of_lats_and_longs[:, 0]))**4,
+                                                                                        np.linspace(0.1, 20.0, 100),
+                                                                                        0.0, 45.0)
+        engine.df_of_asymptotic_directions = engine.asymptotic_direction_set.to_dataframe()
+
+    monkeypatch.setattr(generalEngineInstance, "acquireDFofAllAsymptoticDirections", acquire_synthetic_asymptotic_directions)
+
+    def create_engine():
+        return generalEngineInstance(
+            list_of_particle_distributions=[particleDistribution("proton", lambda x: x**-2.7, gaussianPitchAngleDistribution(normFactor=1.0, sigma=0.8))],
+            list_of_altitudes_km=[0.0, 12.0],
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            array_of_lats_and_longs=array_of_lats_and_longs,
+        )
+
+    engine = create_engine()
+    output_dose_rates = engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+    swept_dose_rates = engine.runOverReferenceDirections([0.0], [45.0])
+
+    assert len(traced_locations[-1]) == 3
+    assert len(output_dose_rates) == len(array_of_lats_and_longs) * 2
+    pd.testing.assert_frame_equal(swept_dose_rates[0], output_dose_rates, rtol=1e-12)
+
+    # the pole is only traced once for vertically arriving particles
+    for use_default_9_zeniths_azimuths, magneto_kwargs in [(True, {}), (False, {"array_of_zeniths_and_azimuths": [[0.0, 0.0], [30.0, 90.0]]})]:
+        output_dose_rates = create_engine().getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=use_default_9_zeniths_azimuths, **magneto_kwargs)
+        np.testing.assert_array_equal(traced_locations[-1], array_of_lats_and_longs)
+        assert len(output_dose_rates) == len(array_of_lats_and_longs) * 2
+    create_engine().getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False, array_of_zeniths_and_azimuths=[[0.0, 0.0], [0.0, 90.0]])
+    assert len(traced_locations[-1]) == 3
+
+def test_locations_without_repeats_are_passed_on_unchanged(sample_particle_distribution):
+    array_of_lats_and_longs = [[46.2, 187.4], [-28.3, -92.7]]
+    engine = generalEngineInstance(
+        list_of_particle_distributions=[sample_particle_distribution],
+        list_of_altitudes_km=[0.0],
+        Kp_index=3,
+        date_and_time=dt.datetime(2023, 1, 1),
+        array_of_lats_and_longs=array_of_lats_and_longs,
+    )
+
+    assert engine.array_of_lats_and_longs is array_of_lats_and_longs
+    assert engine.requested_array_of_lats_and_longs is None
+
+def test_reruns_only_recalculate_changed_stages(monkeypatch):
+    from AniMAIRE.anisotropic_MAIRE_engine import generalEngineInstance as generalEngineInstance_module
+    from AniMAIRE.anisotropic_MAIRE_engine.stageCache import configure_stage_caches, get_stage_cache_statistics
+
+    stage_calculations = {"raw_directions": 0, "pitch_angles": 0, "weighting_factors": 0, "dose_integration": 0}
+    from_cutoff_rigidities = AsymptoticDirectionSet.from_cutoff_rigidities
+    calculate_weighting_factor_arrays = generalEngineInstance_module.calculate_weighting_factor_arrays
+    calculate_summed_dose_rates = generalEngineInstance.calculate_summed_dose_rates
+
+    def predict_synthetic_cutoff_rigidities(engine, use_cutoff_rigidity_predictor, use_default_9_zeniths_and_azimuths, **magneto_kwargs):
+        stage_calculations["raw_directions"] += 1
+        array_of_lats_and_longs = np.asarray(engine.array_of_lats_and_longs)
+        return pd.DataFrame({"latitude": array_of_lats_and_longs[:, 0], "longitude": array_of_lats_and_longs[:, 1],
+                             "Rc": 14.9 * np.cos(np.radians(array_of_lats_and_longs[:, 0]))**4})
+
+    def count_stage(stage_name, function):
+        def counted_function(*args, **kwargs):
+            stage_calculations[stage_name] += 1
+            return function(*args, **kwargs)
+        return counted_function
+
+    monkeypatch.setattr(generalEngineInstance, "get_raw_asymptotic_directions", predict_synthetic_cutoff_rigidities)
+    monkeypatch.setattr(AsymptoticDirectionSet, "from_cutoff_rigidities", count_stage("pitch_angles", from_cutoff_rigidities))
+    monkeypatch.setattr(generalEngineInstance_module, "calculate_weighting_factor_arrays", count_stage("weighting_factors", calculate_weighting_factor_arrays))
+    monkeypatch.setattr(generalEngineInstance, "calculate_summed_dose_rates", count_stage("dose_integration", calculate_summed_dose_rates))
+
+    def get_spectrum(spectral_index):
+        return lambda x: x**spectral_index
+
+    def run_engine(spectral_index=-2.7, altitudes_km=(0.0, 12.0), reference_longitude=45.0, memoize_stages=True):
+        engine = generalEngineInstance(
+            list_of_particle_distributions=[particleDistribution("proton", get_spectrum(spectral_index), isotropicPitchAngleDistribution(use_fast_calculation=True))],
+            list_of_altitudes_km=list(altitudes_km),
+            Kp_index=3,
+            date_and_time=dt.datetime(2023, 1, 1),
+            reference_longitude=reference_longitude,
+            array_of_lats_and_longs=np.array([[0.0, 0.0], [40.0, 90.0], [70.0, 180.0]]),
+            rigidity_levels=np.linspace(20.0, 0.1, 100),
+            memoize_stages=memoize_stages,
+        )
+        return engine.getAsymptoticDirsAndRun(use_default_9_zeniths_azimuths=False)
+
+    def get_stage_calculations():
+        return [stage_calculations[stage_name] for stage_name in ["raw_directions", "pitch_angles", "weighting_factors", "dose_integration"]]
+
+    configure_stage_caches()
+    try:
+        first_dose_rates = run_engine()
+        assert get_stage_calculations() == [1, 1, 1, 1]
+
+        run_engine(spectral_index=-2.5)
+        assert get_stage_calculations() == [1, 1, 2, 2]
+
+        altitude_dose_rates = run_engine(spectral_index=-2.5, altitudes_km=(0.0, 12.0, 15.0))
+        assert get_stage_calculations() == [1, 1, 2, 3]
+        assert len(altitude_dose_rates) == 9
+
+        run_engine(reference_longitude=90.0)
+        assert get_stage_calculations() == [1, 2, 3, 4]
+
+        repeated_dose_rates = run_engine()
+        assert get_stage_calculations() == [1, 2, 3, 4]
+        pd.testing.assert_frame_equal(repeated_dose_rates, first_dose_rates)
+        assert get_stage_cache_statistics()["dose_integration"]["hits"] == 1
+
+        pd.testing.assert_frame_equal(run_engine(memoize_stages=False), first_dose_rates)
+        assert get_stage_calculations() == [2, 3, 4, 5]
+    finally:
+        configure_stage_caches()
@@ -0,0 +1,40 @@
+import pytest
+import numpy as np
+
+from AniMAIRE.anisotropic_MAIRE_engine.gridQualityPresets import (
+    grid_quality_presets,
+    get_grid_quality_preset,
+    benchmark_grid_quality_presets,
+    get_dipole_cutoff_rigidities,
+)
+from AniMAIRE.anisotropic_MAIRE_engine.generalEngineInstance import default_array_of_lats_and_longs, default_9_zeniths_and_azimuths
+
+def test_standard_preset_matches_defaults():
+    standard_preset = get_grid_quality_preset("standard")
+
+    np.testing.assert_array_equal(standard_preset.get_array_of_lats_and_longs(), default_array_of_lats_and_longs)
+    assert standard_preset.get_asymptotic_direction_kwargs() == {"nIncrements_high": 60, "nIncrements_low": 200, "array_of_zeniths_and_azimuths": [[0.0, 0.0]]}
+    assert get_grid_quality_preset("precise").get_asymptotic_direction_kwargs()["array_of_zeniths_and_azimuths"] == default_9_zeniths_and_azimuths
+    assert get_grid_quality_preset(standard_preset) is standard_preset
+
+    with pytest.raises(ValueError):
+        get_grid_quality_preset("ultra")
+
+def test_presets_get_finer_with_quality():
+    draft_preset, standard_preset, precise_preset = (grid_quality_presets[name] for name in ["draft", "standard", "precise"])
+
+    assert len(draft_preset.get_rigidity_levels()) < len(standard_preset.get_rigidity_levels()) < len(precise_preset.get_rigidity_levels())
+    assert len(draft_preset.get_array_of_lats_and_longs()) < len(standard_preset.get_array_of_lats_and_longs()) < len(precise_preset.get_array_of_lats_and_longs())
+    assert draft_preset.max_error > standard_preset.max_error > precise_preset.max_error == 0.0
+
+def test_dipole_cutoff_rigidities():
+    cutoff_rigidities = get_dipole_cutoff_rigidities(np.array([80.65, -80.65, 0.0]), np.array([287.6, 107.6, 287.6]))
+    np.testing.assert_allclose(cutoff_rigidities[:2], 0.0, atol=1e-12)
+    assert 10.0 < cutoff_rigidities[2] < 14.9
+
+def test_benchmarked_errors_within_stated_bounds():
+    benchmark_DF = benchmark_grid_quality_presets()
+
+    assert (benchmark_DF["rigidity_grid_error"] <= benchmark_DF["max_rigidity_grid_error"]).all()
+    assert (benchmark_DF["spatial_grid_error"] <= benchmark_DF["max_spatial_grid_error"]).all()
+    assert benchmark_DF.loc["draft", "rigidity_grid_error"] > benchmark_DF.loc["standard", "rigidity_grid_error"]
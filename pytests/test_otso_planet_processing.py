@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+from AniMAIRE.anisotropic_MAIRE_engine.otso_planet_processing import (create_and_convert_full_planet,
+                                                                      get_coarse_level_indices,
+                                                                      get_intervals_to_refine,
+                                                                      get_rigidity_ladder,
+                                                                      get_unit_vectors,
+                                                                      interpolate_asymptotic_directions,
+                                                                      trace_asymptotic_directions_adaptively)
+
+def test_get_coarse_level_indices():
+    assert list(get_coarse_level_indices([10], 4)) == [0, 4, 8, 9]
+    assert list(get_coarse_level_indices([5, 7], 3)) == [0, 3, 4, 5, 8, 11]
+    assert list(get_coarse_level_indices([6], 1)) == [0, 1, 2, 3, 4, 5]
+
+def test_get_intervals_to_refine():
+    rigidity_levels = np.array([20.0, 16.0, 12.0, 8.0, 4.0, 2.0, 1.0])
+    filter_flags = np.array([[1, 1, 1, 1, 1, 1, 1],
+                             [1, 1, -1, 1, -1, -1, -1],
+                             [1, 1, 1, 1, 1, 1, 1],
+                             [-1, -1, -1, -1, -1, -1, -1]])
+    latitudes = np.zeros(filter_flags.shape)
+    longitudes = np.zeros(filter_flags.shape)
+    latitudes[2, 4] = 20.0
+    latitudes[3, 3] = 40.0
+
+    intervals_to_refine = get_intervals_to_refine(rigidity_levels, filter_flags, latitudes, longitudes, refinement_tolerance_degrees=5.0)
+
+    assert not intervals_to_refine[0].any()
+    # the penumbra runs from the last allowed level above the first forbidden one down to half the lowest allowed rigidity
+    assert list(intervals_to_refine[1]) == [False, True, True, True, True, False]
+    assert list(intervals_to_refine[2]) == [False, False, False, True, True, False]
+    # directions of forbidden trajectories are not checked
+    assert not intervals_to_refine[3].any()
+
+def test_interpolate_asymptotic_directions():
+    latitudes, longitudes = interpolate_asymptotic_directions(np.array([0.0, 10.0]), np.array([350.0, 100.0]),
+                                                              np.array([0.0, 10.0]), np.array([10.0, 100.0]),
+                                                              np.array([[0.0, 0.5, 1.0], [0.0, 0.5, 1.0]]))
+
+    np.testing.assert_allclose(latitudes, [[0.0, 0.0, 0.0], [10.0, 10.0, 10.0]], atol=1e-9)
+    np.testing.assert_allclose(longitudes, [[350.0, 0.0, 10.0], [100.0, 100.0, 100.0]], atol=1e-9)
+
+def create_synthetic_asymptotic_directions(array_of_lats_and_longs, kpIndex, dateAndTime, corenum, zenith, azimuth, rigidity_levels_GV, **kwargs):
+    # smooth asymptotic directions, with a sharp cutoff and an allowed penumbral band below it at the first location
+    rows = []
+    for latitude, longitude in array_of_lats_and_longs:
+        cutoff_rigidity = 14.9 * np.cos(np.radians(latitude))**4
+        for rigidity in rigidity_levels_GV:
+            allowed = (rigidity >= cutoff_rigidity) or ((latitude == 0.0) and (11.0 <= rigidity <= 11.5))
+            rows.append({"initialLatitude": latitude, "initialLongitude": longitude, "Energy": rigidity,
+                         "Lat": latitude - (30.0 / (1.0 + rigidity)), "Long": (longitude + zenith + (100.0 / (1.0 + rigidity))) % 360.0,
+                         "Filter": 1 if allowed else -1, "Rigidity": rigidity, "zenith": zenith, "azimuth": azimuth})
+    return pd.DataFrame(rows)
+
+def test_adaptive_refinement_matches_full_tracing(capsys):
+    array_of_lats_and_longs = [[0.0, 0.0], [45.0, 90.0], [80.0, 180.0]]
+    array_of_zeniths_and_azimuths = [[0.0, 0.0], [16.0, 90.0]]
+    rigidity_ladders = [get_rigidity_ladder(1010.0, 20.0, 990.0 / 59), get_rigidity_ladder(20.0 - 0.1, 0.1, 0.1)]
+    rigidity_levels = sum(rigidity_ladders, [])
+
+    adaptive_DF = trace_asymptotic_directions_adaptively(create_synthetic_asymptotic_directions, array_of_lats_and_longs, 1, None, 1,
+                                                         array_of_zeniths_and_azimuths, rigidity_levels,
+                                                         get_coarse_level_indices([len(rigidity_ladder) for rigidity_ladder in rigidity_ladders], 8))
+    full_DF = pd.concat([create_synthetic_asymptotic_directions(array_of_lats_and_longs, 1, None, 1, zenith, azimuth, rigidity_levels)
+                         for zenith, azimuth in array_of_zeniths_and_azimuths], ignore_index=True)
+
+    number_traced = int(capsys.readouterr().out.split("traced ")[1].split(" of")[0])
+    assert number_traced < len(full_DF) / 2
+
+    sort_columns = ["zenith", "initialLatitude", "initialLongitude", "Rigidity"]
+    adaptive_DF = adaptive_DF.sort_values(sort_columns, ignore_index=True)
+    full_DF = full_DF.sort_values(sort_columns, ignore_index=True)
+    assert len(adaptive_DF) == len(full_DF)
+    np.testing.assert_array_equal(adaptive_DF["Rigidity"], full_DF["Rigidity"])
+    np.testing.assert_array_equal(adaptive_DF["Filter"], full_DF["Filter"])
+
+    allowed = full_DF["Filter"] == 1
+    cos_direction_errors = np.sum(get_unit_vectors(adaptive_DF["Lat"][allowed], adaptive_DF["Long"][allowed]) *
+                                  get_unit_vectors(full_DF["Lat"][allowed], full_DF["Long"][allowed]), axis=-1)
+    assert np.degrees(np.arccos(np.clip(cos_direction_errors, -1.0, 1.0))).max() < 2.0
+
+def test_adaptive_OTSO_planet_matches_full_planet():
+    run_kwargs = dict(array_of_lats_and_longs=[[0.0, 0.0], [50.0, 10.0]],
+                      KpIndex=1,
+                      dateAndTime=dt.datetime(2006, 12, 13, 3, 0),
+                      cache=False,
+                      highestMaxRigValue=60,
+                      maxRigValue=20,
+                      minRigValue=1.0,
+                      nIncrements_high=6,
+                      nIncrements_low=77,
+                      corenum=1)
+
+    full_DF = create_and_convert_full_planet(**run_kwargs)
+    adaptive_DF = create_and_convert_full_planet(adaptive_rigidity_refinement=True, **run_kwargs)
+
+    for output_DF in [full_DF, adaptive_DF]:
+        output_DF["Rigidity"] = output_DF["Rigidity"].round(6)
+    merged_DF = full_DF.merge(adaptive_DF, on=["initialLatitude", "initialLongitude", "Rigidity"], suffixes=("_full", "_adaptive"))
+
+    assert len(merged_DF) == len(full_DF) == len(adaptive_DF)
+    np.testing.assert_array_equal(merged_DF["Filter_full"] == 1, merged_DF["Filter_adaptive"] == 1)
@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from AniMAIRE.anisotropic_MAIRE_engine import parallelExecutor
+from AniMAIRE.anisotropic_MAIRE_engine.parallelExecutor import ParallelExecutor, available_backends, configure_executor, get_executor
+
+@pytest.fixture
+def sample_asymptotic_direction_DF():
+    return pd.DataFrame({"Lat": [10.0, -20.0, 35.0, 80.0, 0.0],
+                         "Long": [5.0, 190.0, 300.0, 45.0, 90.0]},
+                        index=[3, 1, 4, 1, 5])
+
+@pytest.mark.parametrize("backend", available_backends)
+def test_apply_matches_pandas_apply(backend, sample_asymptotic_direction_DF):
+    executor = ParallelExecutor(backend=backend, n_workers=2, chunk_size=2)
+    try:
+        row_function = lambda row: np.hypot(row["Lat"], row["Long"])
+        executor_output = executor.apply(sample_asymptotic_direction_DF, row_function, axis=1)
+        pd.testing.assert_series_equal(executor_output, sample_asymptotic_direction_DF.apply(row_function, axis=1))
+
+        series_output = executor.apply(sample_asymptotic_direction_DF["Lat"], lambda latitude: 2.0 * latitude)
+        pd.testing.assert_series_equal(series_output, 2.0 * sample_asymptotic_direction_DF["Lat"])
+    finally:
+        executor.shutdown()
+
+def test_worker_pool_persists_across_calls():
+    executor = ParallelExecutor(backend="thread", n_workers=2)
+    try:
+        executor.map(lambda x: x + 1, range(10))
+        pool = executor._pool
+        assert executor.map(lambda x: x + 1, range(10)) == list(range(1, 11))
+        assert executor._pool is pool
+    finally:
+        executor.shutdown()
+    assert executor._pool is None
+
+def test_configure_executor(monkeypatch):
+    monkeypatch.setattr(parallelExecutor, "_configured_executor", None)
+    executor = configure_executor(backend="serial", chunk_size=10)
+    assert get_executor() is executor
+    assert get_executor().backend == "serial"
+
+def test_invalid_executor_settings():
+    with pytest.raises(ValueError):
+        ParallelExecutor(backend="pandarallel")
+    with pytest.raises(ValueError):
+        ParallelExecutor(n_workers=0)
+    with pytest.raises(ValueError):
+        ParallelExecutor(chunk_size=0)
+    with pytest.raises(ValueError):
+        ParallelExecutor(backend="serial").apply(pd.DataFrame({"a": [1.0]}), lambda row: row["a"])
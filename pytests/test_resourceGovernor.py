@@ -0,0 +1,67 @@
+import pytest
+import numba
+
+from AniMAIRE.anisotropic_MAIRE_engine import resourceGovernor
+from AniMAIRE.anisotropic_MAIRE_engine.resourceGovernor import (
+    configure_cpu_budget,
+    cpu_budget_environment_variable,
+    get_cpu_budget,
+    get_executor_worker_count,
+    get_OTSO_core_count,
+    get_threads_per_worker,
+)
+from AniMAIRE.anisotropic_MAIRE_engine.parallelExecutor import ParallelExecutor
+
+@pytest.fixture(autouse=True)
+def reset_cpu_budget(monkeypatch):
+    monkeypatch.delenv(cpu_budget_environment_variable, raising=False)
+    monkeypatch.setattr(resourceGovernor, "_configured_cpu_budget", None)
+    monkeypatch.setattr(resourceGovernor, "_applied_environment_budget", None)
+    original_numba_thread_count = numba.get_num_threads()
+    yield
+    numba.set_num_threads(original_numba_thread_count)
+
+def test_default_budget_leaves_cores_free_for_OTSO():
+    assert get_cpu_budget() == resourceGovernor.get_available_core_count()
+    assert get_OTSO_core_count() == max(1, get_cpu_budget() - resourceGovernor.default_reserved_cores)
+
+def test_configured_budget_is_shared_between_levels():
+    configure_cpu_budget(8)
+    assert get_OTSO_core_count() == 8
+    assert get_executor_worker_count() == 8
+    assert ParallelExecutor(backend="process").n_workers == 8
+    assert get_threads_per_worker(4) == 2
+    assert get_threads_per_worker(16) == 1
+    assert numba.get_num_threads() == min(8, numba.config.NUMBA_NUM_THREADS)
+
+def test_budget_from_environment_variable(monkeypatch):
+    monkeypatch.setenv(cpu_budget_environment_variable, "3")
+    assert get_cpu_budget() == 3
+    assert get_OTSO_core_count() == 3
+    assert numba.get_num_threads() == min(3, numba.config.NUMBA_NUM_THREADS)
+
+    configure_cpu_budget(2)
+    assert get_cpu_budget() == 2
+
+def test_executors_follow_budget_changes():
+    configure_cpu_budget(4)
+    executor = ParallelExecutor(backend="thread")
+    fixed_executor = ParallelExecutor(backend="thread", n_workers=3)
+    try:
+        assert executor.map(lambda x: x + 1, range(8)) == list(range(1, 9))
+        assert executor._pool_settings == (4, 1)
+
+        configure_cpu_budget(2)
+        assert (executor.n_workers, fixed_executor.n_workers) == (2, 3)
+        assert executor.map(lambda x: x + 1, range(8)) == list(range(1, 9))
+        assert executor._pool_settings == (2, 1)
+    finally:
+        executor.shutdown()
+        fixed_executor.shutdown()
+
+def test_invalid_budgets(monkeypatch):
+    with pytest.raises(ValueError):
+        configure_cpu_budget(0)
+    monkeypatch.setenv(cpu_budget_environment_variable, "many")
+    with pytest.raises(ValueError):
+        get_cpu_budget()
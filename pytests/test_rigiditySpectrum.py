@@ -36,3 +36,20 @@ def test_CommonModifiedPowerLawSpectrumSplit():
     spectrum = CommonModifiedPowerLawSpectrumSplit(J0=1.0, gamma=2.7, deltaGamma=0.1)
     assert np.isclose(spectrum(1.0), 1.0 / (100**2))
     assert np.isclose(spectrum(2.0), 2.0**(-2.8) / 100**2)
+
+def test_spectrum_support(tmp_path):
+    assert rigiditySpectrum(lambda x: x).support == (-np.inf, np.inf)
+
+    limited_spectrum = CommonModifiedPowerLawSpectrum(J0=1.0, gamma=2.7, deltaGamma=0.1, lowerLimit=0.81, upperLimit=21.0)
+    assert limited_spectrum.support == (0.81, 21.0)
+    assert list(limited_spectrum.is_within_support([0.5, 0.81, 10.0, 21.0, 30.0])) == [False, True, True, True, False]
+    assert limited_spectrum(0.5) == 0.0 and limited_spectrum(30.0) == 0.0
+
+    file_path = tmp_path / "spectrum.csv"
+    file_path.write_text("1.0,10.0\n2.0,20.0\n3.0,30.0\n")
+    assert interpolatedInputFileSpectrum(str(file_path)).support == (1.0, 3.0)
+
+    other_spectrum = CommonModifiedPowerLawSpectrum(J0=1.0, gamma=2.7, deltaGamma=0.1, lowerLimit=5.0, upperLimit=50.0)
+    assert (limited_spectrum + other_spectrum).support == (0.81, 50.0)
+    assert (2.0 * limited_spectrum).support == (0.81, 21.0)
+    assert (limited_spectrum + powerLawSpectrum(1.0, -2.7)).support == (-np.inf, np.inf)
@@ -33,3 +33,66 @@ def test_singleParticleEngineInstance(sample_particle_distribution, sample_asymp
     assert engine.particle_distribution == sample_particle_distribution
     assert engine.list_of_altitudes_in_km == [0.0, 10.0, 20.0]
     assert engine.generate_NM_count_rates == False
+
+@pytest.fixture
+def sample_weighting_factor_DF():
+    rigidities = np.concatenate([np.linspace(0.1, 20.0, 40), np.linspace(20.0, 1010.0, 16)[1:]])
+    rows = []
+    for latitude, longitude, cutoff_rigidity in [(0.0, 0.0, 14.0), (45.0, 90.0, 3.0), (80.0, 180.0, 0.5)]:
+        for rigidity in rigidities:
+            rows.append({"initialLatitude": latitude,
+                         "initialLongitude": longitude,
+                         "Rigidity": rigidity,
+                         "fullRigidityPitchWeightingFactor": (rigidity ** -2.7) * float(rigidity >= cutoff_rigidity)})
+    return pd.DataFrame(rows)
+
+def test_matrix_integration_matches_quadrature(sample_particle_distribution, sample_weighting_factor_DF):
+    altitudes_in_km = [0.0, 11.0, 18.0]
+    output_dose_rates = {}
+    for integration_mode in ["matrix", "quadrature"]:
+        engine = singleParticleEngineInstance(
+            particle_distribution=sample_particle_distribution,
+            dfofAsymptoticDirections=sample_weighting_factor_DF,
+            list_of_altitudes_in_km=altitudes_in_km,
+            generate_NM_count_rates=True,
+            integration_mode=integration_mode
+        )
+        output_dose_rates[integration_mode] = engine.calc_output_dose_flux(sample_weighting_factor_DF, altitudes_in_km, "proton")
+
+    assert list(output_dose_rates["matrix"].columns) == list(output_dose_rates["quadrature"].columns)
+    pd.testing.assert_frame_equal(output_dose_rates["matrix"], output_dose_rates["quadrature"], rtol=1e-10)
+
+def test_invalid_integration_mode(sample_particle_distribution, sample_asymptotic_directions):
+    with pytest.raises(Exception):
+        singleParticleEngineInstance(
+            particle_distribution=sample_particle_distribution,
+            dfofAsymptoticDirections=sample_asymptotic_directions,
+            list_of_altitudes_in_km=[0.0],
+            generate_NM_count_rates=False,
+            integration_mode="not_a_mode"
+        )
+
+def test_contributing_rigidity_indices():
+    from AniMAIRE.anisotropic_MAIRE_engine.singleParticleEngineInstance import get_contributing_rigidity_indices, integrate_weighting_factors_over_kernel
+
+    weighting_factors = np.array([[0.0, 0.0, 1.0, 0.5],
+                                  [0.0, 0.0, 0.0, 2.0]])
+    assert list(get_contributing_rigidity_indices(weighting_factors)) == [2, 3]
+
+    dose_rates = integrate_weighting_factors_over_kernel(np.zeros((2, 4)), "proton", [0.0, 12.0], np.array([0.5, 1.0, 5.0, 20.0]))
+    assert dose_rates.shape == (2, 2, 8)
+    assert np.all(dose_rates == 0.0)
+
+def test_multiply_by_location_blocks_matches_dense_product():
+    from AniMAIRE.anisotropic_MAIRE_engine.singleParticleEngineInstance import multiply_by_location_blocks
+
+    rng = np.random.default_rng(0)
+    number_of_locations, number_of_rigidities = 50, 40
+    # each location is forbidden below its own cutoff, with some forbidden trajectories in a penumbra above it
+    cutoff_indices = rng.integers(0, number_of_rigidities + 1, number_of_locations)
+    allowed_entries = (np.arange(number_of_rigidities) >= cutoff_indices[:, np.newaxis]) & (rng.uniform(size=(number_of_locations, number_of_rigidities)) > 0.1)
+    weighting_factors = rng.uniform(size=(3, number_of_locations, number_of_rigidities)) * allowed_entries
+    kernel = rng.uniform(size=(7, number_of_rigidities))
+
+    np.testing.assert_allclose(multiply_by_location_blocks(weighting_factors, kernel), weighting_factors @ kernel.T, rtol=1e-12)
+    np.testing.assert_allclose(multiply_by_location_blocks(weighting_factors[0], kernel, maximum_number_of_blocks=1), weighting_factors[0] @ kernel.T, rtol=1e-12)
@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from AniMAIRE.anisotropic_MAIRE_engine.spatialGrids import (get_regular_grid_cells,
+                                                            get_cell_corners,
+                                                            subdivide_cells,
+                                                            get_location_keys,
+                                                            get_cells_to_refine,
+                                                            collapse_degenerate_locations,
+                                                            get_healpix_array_of_lats_and_longs,
+                                                            get_equal_area_array_of_lats_and_longs)
+from AniMAIRE.anisotropic_MAIRE_engine.generalEngineInstance import default_array_of_lats_and_longs
+
+def test_regular_grid_cells_cover_globe():
+    cells = get_regular_grid_cells(30.0)
+
+    assert cells.shape == (6 * 12, 3)
+    assert np.all(cells[:, 2] == 30.0)
+    corners = get_cell_corners(cells).reshape(-1, 2)
+    assert corners[:, 0].min() == -90.0 and corners[:, 0].max() == 90.0
+    assert set(np.unique(corners[:, 1])) == set(30.0 * np.arange(12))
+
+    with pytest.raises(ValueError):
+        get_regular_grid_cells(7.0)
+
+def test_subdivide_cells():
+    subdivided_cells = subdivide_cells(np.array([[0.0, 340.0, 20.0]]))
+
+    np.testing.assert_array_equal(subdivided_cells, [[0.0, 340.0, 10.0], [0.0, 350.0, 10.0], [10.0, 340.0, 10.0], [10.0, 350.0, 10.0]])
+    np.testing.assert_array_equal(get_cell_corners(subdivided_cells[1])[0], [[0.0, 350.0], [0.0, 0.0], [10.0, 350.0], [10.0, 0.0]])
+
+def test_location_keys_ignore_rounding_and_wrapping():
+    assert get_location_keys([[10.0, 360.0]]).equals(get_location_keys([[10.0 + 1e-12, 0.0]]))
+    assert get_location_keys([[10.0, -10.0]]).equals(get_location_keys([[10.0, 350.0]]))
+
+def test_cells_to_refine():
+    cells = np.array([[0.0, 0.0, 10.0], [0.0, 10.0, 10.0], [0.0, 20.0, 10.0]])
+    corners = np.unique(get_cell_corners(cells).reshape(-1, 2), axis=0)
+    dose_rates = np.where(corners[:, 1] == 30.0, 2.0, 1.0)
+    dose_rates_at_locations = pd.DataFrame({12.192: dose_rates}, index=get_location_keys(corners))
+
+    assert list(get_cells_to_refine(cells, dose_rates_at_locations, 0.1, 1.0)) == [False, False, True]
+    # cells are not split below the minimum cell size
+    assert list(get_cells_to_refine(cells, dose_rates_at_locations, 0.1, 6.0)) == [False, False, False]
+
+def test_collapse_degenerate_locations():
+    distinct_locations, location_indices = collapse_degenerate_locations([[90.0, 10.0], [0.0, 360.0], [90.0, 20.0], [0.0, 0.0], [-90.0, 5.0]])
+
+    np.testing.assert_array_equal(distinct_locations, [[90.0, 10.0], [0.0, 360.0], [-90.0, 5.0]])
+    np.testing.assert_array_equal(location_indices, [0, 1, 0, 1, 2])
+
+    # each pole appears at 72 longitudes in the default grid
+    distinct_locations, location_indices = collapse_degenerate_locations(default_array_of_lats_and_longs)
+    assert len(distinct_locations) == len(default_array_of_lats_and_longs) - (2 * 71)
+    np.testing.assert_array_equal(distinct_locations[location_indices][:, 0], default_array_of_lats_and_longs[:, 0])
+
+@pytest.mark.parametrize("nside", [4, 8, 16])
+def test_healpix_grid_is_equal_area(nside):
+    array_of_lats_and_longs = get_healpix_array_of_lats_and_longs(nside)
+
+    assert array_of_lats_and_longs.shape == (12 * nside**2, 2)
+    assert len(collapse_degenerate_locations(array_of_lats_and_longs)[0]) == len(array_of_lats_and_longs)
+    assert np.all((array_of_lats_and_longs[:, 1] >= 0.0) & (array_of_lats_and_longs[:, 1] < 360.0))
+    # equal areas of the sphere lie between equally spaced values of sin(latitude), so each band holds the same number of pixels
+    pixels_per_band = np.histogram(np.sin(np.radians(array_of_lats_and_longs[:, 0])), bins=[-1.0, -0.6, 0.6, 1.0])[0]
+    np.testing.assert_allclose(pixels_per_band, 12 * nside**2 * np.array([0.2, 0.6, 0.2]), rtol=1.0 / nside)
+
+def test_equal_area_grid_needs_fewer_locations():
+    array_of_lats_and_longs = get_equal_area_array_of_lats_and_longs(5.0)
+
+    assert len(array_of_lats_and_longs) < 0.7 * len(default_array_of_lats_and_longs)
+    # no location is much further than the grid spacing from its nearest neighbour
+    unit_vectors = np.column_stack([np.cos(np.radians(array_of_lats_and_longs[:, 0])) * np.cos(np.radians(array_of_lats_and_longs[:, 1])),
+                                    np.cos(np.radians(array_of_lats_and_longs[:, 0])) * np.sin(np.radians(array_of_lats_and_longs[:, 1])),
+                                    np.sin(np.radians(array_of_lats_and_longs[:, 0]))])
+    cos_angles = unit_vectors @ unit_vectors.T
+    np.fill_diagonal(cos_angles, -1.0)
+    assert np.degrees(np.arccos(np.clip(cos_angles.max(axis=1), -1.0, 1.0))).max() < 1.1 * 5.0
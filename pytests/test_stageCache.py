@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+
+from AniMAIRE.anisotropic_MAIRE_engine.stageCache import StageCache, configure_stage_caches, get_output_nbytes, get_stage_cache
+
+def test_stage_cache_evicts_least_recently_used_outputs():
+    stage_cache = StageCache(max_entries=2)
+    calculations = []
+
+    def calculate(value):
+        calculations.append(value)
+        return value * 2
+
+    for value in [1, 2, 1, 3, 1, 2]:
+        assert stage_cache.get_or_compute({"value": np.array([value])}, lambda: calculate(value)) == value * 2
+
+    # 2 is evicted when 3 is added, as 1 was used more recently
+    assert calculations == [1, 2, 3, 2]
+    assert (stage_cache.hits, stage_cache.misses, len(stage_cache)) == (2, 4, 2)
+
+def test_stage_cache_evicts_outputs_over_byte_budget():
+    stage_cache = StageCache(max_entries=8, max_bytes=2000)
+
+    for value in range(3):
+        stage_cache.get_or_compute({"value": value}, lambda: np.zeros(100))
+    # three 800 byte outputs do not fit, so the least recently used one is evicted
+    assert (len(stage_cache), stage_cache.nbytes) == (2, 1600)
+
+    # outputs larger than the budget are returned without being kept
+    assert len(stage_cache.get_or_compute({"value": "large"}, lambda: np.zeros(1000))) == 1000
+    assert (len(stage_cache), stage_cache.nbytes) == (2, 1600)
+
+    assert get_output_nbytes([np.zeros(10), {"a": np.zeros(5, dtype=np.float32)}]) == 100
+    stage_cache.clear()
+    assert stage_cache.nbytes == 0
+
+def test_stage_cache_skips_inputs_that_cannot_be_fingerprinted():
+    stage_cache = StageCache()
+    calculations = []
+
+    for _ in range(2):
+        stage_cache.get_or_compute({"option": object()}, lambda: calculations.append(1))
+
+    assert len(calculations) == 2
+    assert len(stage_cache) == 0
+
+def test_configure_stage_caches():
+    try:
+        configure_stage_caches(0, ["weighting_factors"])
+        calculations = []
+        for _ in range(2):
+            get_stage_cache("weighting_factors").get_or_compute({"value": 1}, lambda: calculations.append(1))
+        assert len(calculations) == 2
+
+        with pytest.raises(ValueError):
+            get_stage_cache("unknown")
+        with pytest.raises(ValueError):
+            StageCache(-1)
+        with pytest.raises(ValueError):
+            StageCache(max_bytes=-1)
+    finally:
+        configure_stage_caches()